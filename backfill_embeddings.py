@@ -0,0 +1,821 @@
+#!/usr/bin/env python3
+"""
+Backfill OpenAI embeddings for every product in chatbot_products_flat.
+
+Mirrors the text generation and validation of the `generate-embedding` edge
+function, but embeds products in batches so a full catalog reload costs a
+handful of API calls instead of one round trip per product.
+
+Vectors are held as contiguous float32 NumPy arrays and written to Supabase
+as base64 float32 blobs rather than JSON float lists.
+
+Embeddings are cached locally by a hash of (model, dimensions, text), so
+unchanged products are never sent to OpenAI twice; `--only-changed` also
+skips the database write for products whose stored hash already matches.
+
+Usage:
+    python backfill_embeddings.py
+    python backfill_embeddings.py --only-changed
+    python backfill_embeddings.py --export-matrix .cache/product_embeddings
+    python backfill_embeddings.py --concurrent --embed-workers 4 --rpm 3000 --tpm 1000000
+    python backfill_embeddings.py --only-changed --ann-index .cache/product_index
+"""
+
+import argparse
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from openai import OpenAI
+from supabase import create_client
+
+from edible_tools.ann_index import IVFFlatIndex
+from edible_tools.embedding_cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_MAX_ENTRIES,
+    EmbeddingCache,
+    embedding_cache_key,
+)
+from edible_tools.pipeline import Stage, run_pipeline
+from edible_tools.rate_limit import RateLimitScheduler
+from edible_tools.vectors import (
+    EMBEDDING_DTYPE,
+    as_vector,
+    decode_base64,
+    encode_base64,
+    save_matrix,
+)
+
+# Load environment variables
+load_dotenv(dotenv_path='.env.local')
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_DIMENSIONS = 1536
+
+# OpenAI accepts up to 2048 inputs per request and ~300k tokens in total.
+# We stay well under both and estimate tokens at ~4 chars per token, the same
+# heuristic the edge function uses for truncation.
+EMBEDDING_BATCH_MAX_ITEMS = 256
+EMBEDDING_BATCH_MAX_TOKENS = 250_000
+MAX_INPUT_CHARS = 20000
+CHARS_PER_TOKEN = 4
+
+# Rows fetched from chatbot_products_flat per page
+FETCH_PAGE_SIZE = 500
+
+# Defaults for --concurrent mode (text-embedding-ada-002, usage tier 1)
+DEFAULT_REQUESTS_PER_MINUTE = 3000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+CONCURRENT_PAGE_SIZE = 100
+CONCURRENT_BATCH_MAX_ITEMS = 50
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Rows read per get_product_embeddings_b64 RPC call
+EXPORT_PAGE_SIZE = 1000
+
+# Embeddings written per update_product_embeddings RPC call
+WRITE_BATCH_SIZE = 200
+MAX_WRITE_RETRIES = 2
+
+supabase_client = None
+openai_api_client = None
+
+
+def init_clients() -> bool:
+    """Create the Supabase and OpenAI clients from the environment."""
+    global supabase_client, openai_api_client
+
+    if not all([SUPABASE_URL, SUPABASE_SERVICE_KEY, OPENAI_API_KEY]):
+        print("❌ Missing environment variables. Please check .env.local")
+        return False
+
+    supabase_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    openai_api_client = OpenAI(api_key=OPENAI_API_KEY)
+    return True
+
+
+def generate_text_for_embedding(product_data: Optional[dict]) -> str:
+    """Build the embedding text for a product (same format as generate-embedding)."""
+    if not product_data:
+        return ""
+
+    parts = []
+    product_info = product_data.get("product_info") or {}
+
+    if product_info.get("name"):
+        parts.append(f"Product Name: {product_info['name']}")
+
+    if product_info.get("description"):
+        description = product_info["description"]
+        if description.endswith("."):
+            description = description[:-1]
+        parts.append(f"Description: {description}")
+
+    categories = product_data.get("categories") or []
+    cat_names = [cat.get("name") for cat in categories if cat.get("name")]
+    if cat_names:
+        parts.append(f"Categories: {', '.join(cat_names)}")
+
+    ingredients = product_data.get("ingredients") or []
+    if ingredients:
+        parts.append(f"Key Ingredients: {', '.join(ingredients)}")
+
+    options = product_data.get("options") or []
+    option_texts = []
+    for opt in options:
+        if not opt.get("option_name"):
+            continue
+        if opt.get("description"):
+            option_texts.append(f"Option: {opt['option_name']} ({opt['description']})")
+        else:
+            option_texts.append(f"Option: {opt['option_name']}")
+    if option_texts:
+        parts.append(f"Available Options: {', '.join(option_texts)}")
+
+    return ". ".join(parts)
+
+
+def _prepare_input(text: Optional[str]) -> str:
+    """Truncate overly long text and strip whitespace before sending to OpenAI."""
+    if not text:
+        return ""
+    if len(text) > MAX_INPUT_CHARS:
+        text = text[:MAX_INPUT_CHARS]
+    return text.strip()
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _pack_batches(
+    indexed_inputs: list[tuple[int, str]],
+    max_items: Optional[int] = None
+) -> list[list[tuple[int, str]]]:
+    """Group (slot, text) pairs into batches that respect the item and token limits."""
+    max_items = max_items or EMBEDDING_BATCH_MAX_ITEMS
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for slot, text in indexed_inputs:
+        tokens = _estimate_tokens(text)
+        if current and (
+            len(current) >= max_items
+            or current_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS
+        ):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((slot, text))
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _validate_embedding(embedding) -> Optional[np.ndarray]:
+    vector = as_vector(embedding, EMBEDDING_DIMENSIONS)
+    if vector is None:
+        length = len(embedding) if hasattr(embedding, '__len__') else None
+        print(f"⚠️  Invalid embedding dimensions: {length}")
+    return vector
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, 'status_code', None) == 429
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _create_embeddings(inputs: list[str], scheduler: Optional[RateLimitScheduler]):
+    """Call embeddings.create, waiting on the scheduler's budget and retrying 429s."""
+    if scheduler is None:
+        return openai_api_client.embeddings.create(input=inputs, model=EMBEDDING_MODEL)
+
+    tokens = sum(_estimate_tokens(text) for text in inputs)
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        scheduler.acquire(tokens)
+        try:
+            response = openai_api_client.embeddings.create(input=inputs, model=EMBEDDING_MODEL)
+        except Exception as e:
+            if not _is_rate_limit_error(e) or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            pause = scheduler.report_rate_limited(_retry_after_seconds(e))
+            print(f"⏳ OpenAI rate limit hit, backing off {pause:.1f}s")
+            continue
+        scheduler.report_success()
+        return response
+
+
+def _embed_batch(
+    batch: list[tuple[int, str]],
+    results: list,
+    scheduler: Optional[RateLimitScheduler] = None
+) -> None:
+    """
+    Embed one batch and write each vector into its slot in `results`.
+
+    If the API rejects the request, the batch is split in half and retried so a
+    single bad input only costs its own slot.
+    """
+    try:
+        response = _create_embeddings([text for _, text in batch], scheduler)
+    except Exception as e:
+        if len(batch) == 1 or _is_rate_limit_error(e):
+            print(f"❌ Error calling OpenAI API: {e}")
+            return
+        middle = len(batch) // 2
+        _embed_batch(batch[:middle], results, scheduler)
+        _embed_batch(batch[middle:], results, scheduler)
+        return
+
+    for position, item in enumerate(response.data):
+        # Responses carry the input index; fall back to order if it is missing
+        index = getattr(item, 'index', None)
+        if not isinstance(index, int):
+            index = position
+        if index >= len(batch):
+            continue
+        slot = batch[index][0]
+        results[slot] = _validate_embedding(item.embedding)
+
+
+def _pack_rows(results: list[Optional[np.ndarray]]) -> list[Optional[np.ndarray]]:
+    """Copy the vectors into one contiguous float32 matrix and return row views."""
+    filled = [slot for slot, vector in enumerate(results) if vector is not None]
+    if not filled:
+        return results
+    matrix = np.empty((len(filled), EMBEDDING_DIMENSIONS), dtype=EMBEDDING_DTYPE)
+    for row, slot in enumerate(filled):
+        matrix[row] = results[slot]
+        results[slot] = matrix[row]
+    return results
+
+
+def get_embeddings_from_openai(
+    texts: list[str],
+    scheduler: Optional[RateLimitScheduler] = None,
+    max_batch_items: Optional[int] = None
+) -> list[Optional[np.ndarray]]:
+    """
+    Embed many texts with as few API calls as possible.
+
+    Returns one float32 vector per input text, in order; the vectors share a
+    single contiguous buffer. Empty texts, rejected inputs and vectors with
+    the wrong dimensions come back as None without failing the rest of the
+    batch. With a `scheduler`, every call waits for the requests/tokens
+    budget and 429 responses are retried after a backoff.
+    """
+    results: list[Optional[np.ndarray]] = [None] * len(texts)
+
+    indexed_inputs = []
+    for slot, text in enumerate(texts):
+        prepared = _prepare_input(text)
+        if prepared:
+            indexed_inputs.append((slot, prepared))
+
+    if not indexed_inputs:
+        return results
+
+    for batch in _pack_batches(indexed_inputs, max_batch_items):
+        _embed_batch(batch, results, scheduler)
+
+    return _pack_rows(results)
+
+
+def get_embedding_from_openai(text: str) -> Optional[np.ndarray]:
+    """Embed a single text. Returns None on error or dimension mismatch."""
+    if not text or not text.strip():
+        print("No text provided for embedding generation")
+        return None
+    return get_embeddings_from_openai([text])[0]
+
+
+def content_hash(text: str) -> str:
+    """Hash of everything that determines a product's embedding."""
+    return embedding_cache_key(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, text)
+
+
+def get_embeddings_cached(
+    texts: list[str],
+    cache: Optional[EmbeddingCache],
+    scheduler: Optional[RateLimitScheduler] = None,
+    max_batch_items: Optional[int] = None
+) -> list[Optional[np.ndarray]]:
+    """
+    Like get_embeddings_from_openai, but serve unchanged texts from `cache`
+    and only send the misses to the API.
+    """
+    if cache is None:
+        return get_embeddings_from_openai(texts, scheduler, max_batch_items)
+
+    prepared = [_prepare_input(text) for text in texts]
+    keys = [content_hash(text) if text else None for text in prepared]
+    cached = cache.get_many(key for key in keys if key)
+
+    results: list[Optional[np.ndarray]] = [cached.get(key) if key else None for key in keys]
+    missing = [slot for slot, key in enumerate(keys) if key and results[slot] is None]
+    if not missing:
+        return results
+
+    fresh = get_embeddings_from_openai(
+        [prepared[slot] for slot in missing], scheduler, max_batch_items
+    )
+    new_entries = {}
+    for slot, embedding in zip(missing, fresh):
+        results[slot] = embedding
+        if embedding is not None:
+            new_entries[keys[slot]] = embedding
+    cache.put_many(new_entries)
+    return _pack_rows(results)
+
+
+def fetch_flat_products() -> list[dict]:
+    """Page through chatbot_products_flat and return every row."""
+    rows = []
+    start = 0
+    while True:
+        response = (
+            supabase_client.table('chatbot_products_flat')
+            .select('product_id, product_data')
+            .order('product_id')
+            .range(start, start + FETCH_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < FETCH_PAGE_SIZE:
+            break
+        start += FETCH_PAGE_SIZE
+    return rows
+
+
+def _write_batch(batch: list[tuple[str, np.ndarray]]) -> tuple[list, list, list]:
+    """
+    Write one batch through the update_product_embeddings RPC.
+
+    Returns (written, missing, errored) product ids. A batch the RPC rejects
+    outright is bisected so one bad row does not fail its neighbours.
+    """
+    payload = [
+        {"id": product_id, "embedding_b64": encode_base64(embedding)}
+        for product_id, embedding in batch
+    ]
+    try:
+        response = supabase_client.rpc(
+            'update_product_embeddings', {'p_updates': payload}
+        ).execute()
+    except Exception as e:
+        if len(batch) == 1:
+            print(f"❌ Error updating embedding for product {batch[0][0]}: {e}")
+            return [], [], [batch[0][0]]
+        middle = len(batch) // 2
+        left = _write_batch(batch[:middle])
+        right = _write_batch(batch[middle:])
+        return left[0] + right[0], left[1] + right[1], left[2] + right[2]
+
+    data = response.data or {}
+    updated = {str(pid) for pid in data.get('updated') or []}
+    written = [pid for pid, _ in batch if str(pid) in updated]
+    missing = [pid for pid, _ in batch if str(pid) not in updated]
+    return written, missing, []
+
+
+def write_embeddings(
+    pairs: list[tuple[str, np.ndarray]],
+    batch_size: int = WRITE_BATCH_SIZE,
+    max_retries: int = MAX_WRITE_RETRIES
+) -> tuple[list, list]:
+    """
+    Store (product_id, embedding) pairs in batches of `batch_size`.
+
+    Rows that error are retried up to `max_retries` more times, without
+    resending the rows that already succeeded. Products that do not exist
+    are not retried. Returns (written_ids, failed_ids).
+    """
+    by_id = dict(pairs)
+    pending = list(pairs)
+    written: list = []
+    failed: list = []
+
+    for attempt in range(max_retries + 1):
+        errored = []
+        for start in range(0, len(pending), batch_size):
+            ok, missing, bad = _write_batch(pending[start:start + batch_size])
+            written.extend(ok)
+            failed.extend(missing)
+            errored.extend(bad)
+        if not errored:
+            break
+        if attempt == max_retries:
+            failed.extend(errored)
+            break
+        print(f"🔁 Retrying {len(errored)} failed embedding writes")
+        pending = [(pid, by_id[pid]) for pid in errored]
+
+    for product_id in failed:
+        print(f"❌ Embedding not stored for product {product_id}")
+    return written, failed
+
+
+def fetch_product_embeddings(page_size: int = EXPORT_PAGE_SIZE) -> tuple[list[str], np.ndarray]:
+    """
+    Read every stored product embedding into one (n, EMBEDDING_DIMENSIONS)
+    float32 matrix, paging through get_product_embeddings_b64 by id.
+    """
+    ids: list[str] = []
+    chunks: list[np.ndarray] = []
+    after = None
+    while True:
+        response = supabase_client.rpc(
+            'get_product_embeddings_b64', {'p_after': after, 'p_limit': page_size}
+        ).execute()
+        rows = response.data or []
+        if not rows:
+            break
+        chunk = np.empty((len(rows), EMBEDDING_DIMENSIONS), dtype=EMBEDDING_DTYPE)
+        for i, row in enumerate(rows):
+            chunk[i] = decode_base64(row['embedding_b64'], EMBEDDING_DIMENSIONS)
+            ids.append(str(row['product_id']))
+        chunks.append(chunk)
+        if len(rows) < page_size:
+            break
+        after = ids[-1]
+
+    if not chunks:
+        return ids, np.empty((0, EMBEDDING_DIMENSIONS), dtype=EMBEDDING_DTYPE)
+    return ids, np.concatenate(chunks)
+
+
+def export_product_embeddings(path: str) -> int:
+    """Save all stored embeddings as `<path>.npy` + `<path>.ids.json`."""
+    ids, matrix = fetch_product_embeddings()
+    save_matrix(path, ids, matrix)
+    print(f"💾 Exported {len(ids)} embeddings ({matrix.nbytes / 1e6:.1f} MB) to {path}.npy")
+    return len(ids)
+
+
+def _new_stats() -> dict:
+    return {"total": 0, "embedded": 0, "skipped": 0, "unchanged": 0, "failed": 0}
+
+
+def _is_unchanged(cache: Optional[EmbeddingCache], product_id, text_hash: str) -> bool:
+    return cache is not None and cache.get_product_hash(product_id) == text_hash
+
+
+def _update_index(
+    ann_index: Optional[IVFFlatIndex],
+    pairs: list[tuple[str, np.ndarray]],
+    written: list
+) -> None:
+    """Upsert the embeddings that were actually stored into the ANN index."""
+    if ann_index is None or not written:
+        return
+    stored = set(written)
+    pairs = [(pid, emb) for pid, emb in pairs if pid in stored]
+    ann_index.upsert([pid for pid, _ in pairs], np.stack([emb for _, emb in pairs]))
+
+
+def _print_summary(stats: dict, cache: Optional[EmbeddingCache]) -> None:
+    print(f"✅ Embedded {stats['embedded']}/{stats['total']} products "
+          f"({stats['unchanged']} unchanged, {stats['skipped']} skipped, "
+          f"{stats['failed']} failed)")
+    if cache is not None:
+        print(f"🗄️  Embedding cache: {cache.hits} hits, {cache.misses} misses")
+
+
+def backfill_embeddings(
+    cache: Optional[EmbeddingCache] = None,
+    only_changed: bool = False,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+    ann_index: Optional[IVFFlatIndex] = None
+) -> dict:
+    """
+    Generate and store embeddings for all products. Returns run statistics.
+
+    With `only_changed`, products whose last written content hash matches the
+    current text are skipped entirely (requires a cache). Written embeddings
+    are also upserted into `ann_index` when one is given.
+    """
+    stats = _new_stats()
+
+    rows = fetch_flat_products()
+    stats["total"] = len(rows)
+    print(f"📦 Found {len(rows)} products in chatbot_products_flat")
+
+    product_ids = []
+    texts = []
+    hashes = []
+    for row in rows:
+        text = _prepare_input(generate_text_for_embedding(row.get("product_data")))
+        if not text:
+            stats["skipped"] += 1
+            continue
+        text_hash = content_hash(text)
+        if only_changed and _is_unchanged(cache, row["product_id"], text_hash):
+            stats["unchanged"] += 1
+            continue
+        product_ids.append(row["product_id"])
+        texts.append(text)
+        hashes.append(text_hash)
+
+    embeddings = get_embeddings_cached(texts, cache)
+
+    to_write = []
+    hash_by_id = {}
+    for product_id, embedding, text_hash in zip(product_ids, embeddings, hashes):
+        if embedding is None:
+            stats["failed"] += 1
+            continue
+        to_write.append((product_id, embedding))
+        hash_by_id[product_id] = text_hash
+
+    written, failed = write_embeddings(to_write, batch_size=write_batch_size)
+    stats["embedded"] += len(written)
+    stats["failed"] += len(failed)
+
+    if cache is not None:
+        cache.set_product_hashes({pid: hash_by_id[pid] for pid in written})
+    _update_index(ann_index, to_write, written)
+
+    _print_summary(stats, cache)
+    return stats
+
+
+def fetch_product_ids(identifiers: list[str]) -> dict[str, str]:
+    """Map 4-digit product identifiers to products.id UUIDs."""
+    numeric = sorted({int(i) for i in identifiers if str(i).isdigit()})
+    ids = {}
+    for start in range(0, len(numeric), FETCH_PAGE_SIZE):
+        response = (
+            supabase_client.table('products')
+            .select('id, product_identifier')
+            .in_('product_identifier', numeric[start:start + FETCH_PAGE_SIZE])
+            .execute()
+        )
+        for row in response.data or []:
+            ids[str(row['product_identifier'])] = row['id']
+    return ids
+
+
+def backfill_catalog_embeddings(
+    products: list[dict],
+    cache: Optional[EmbeddingCache] = None,
+    only_changed: bool = False,
+    write_batch_size: int = WRITE_BATCH_SIZE
+) -> dict:
+    """
+    Embed product_data dicts produced from catalog CSVs and store the vectors
+    on the products they match by product_identifier. Products that are not
+    in the database yet are counted as skipped.
+    """
+    stats = _new_stats()
+    stats["total"] = len(products)
+
+    identifiers = [
+        str((p.get("product_info") or {}).get("product_identifier") or "") for p in products
+    ]
+    id_by_identifier = fetch_product_ids(identifiers)
+
+    product_ids = []
+    texts = []
+    hashes = []
+    for identifier, product_data in zip(identifiers, products):
+        product_id = id_by_identifier.get(identifier)
+        text = _prepare_input(generate_text_for_embedding(product_data))
+        if product_id is None or not text:
+            stats["skipped"] += 1
+            continue
+        text_hash = content_hash(text)
+        if only_changed and _is_unchanged(cache, product_id, text_hash):
+            stats["unchanged"] += 1
+            continue
+        product_ids.append(product_id)
+        texts.append(text)
+        hashes.append(text_hash)
+
+    embeddings = get_embeddings_cached(texts, cache)
+
+    to_write = []
+    hash_by_id = {}
+    for product_id, embedding, text_hash in zip(product_ids, embeddings, hashes):
+        if embedding is None:
+            stats["failed"] += 1
+            continue
+        to_write.append((product_id, embedding))
+        hash_by_id[product_id] = text_hash
+
+    written, failed = write_embeddings(to_write, batch_size=write_batch_size)
+    stats["embedded"] += len(written)
+    stats["failed"] += len(failed)
+    if cache is not None:
+        cache.set_product_hashes({pid: hash_by_id[pid] for pid in written})
+
+    _print_summary(stats, cache)
+    return stats
+
+
+def count_flat_products() -> int:
+    response = (
+        supabase_client.table('chatbot_products_flat')
+        .select('product_id', count='exact')
+        .limit(1)
+        .execute()
+    )
+    return response.count or 0
+
+
+def fetch_flat_products_page(start: int, page_size: int) -> list[dict]:
+    # Pages are fetched in parallel by offset: without a fixed order Postgres
+    # may hand back rows in a different order per query, skipping or repeating some
+    response = (
+        supabase_client.table('chatbot_products_flat')
+        .select('product_id, product_data')
+        .order('product_id')
+        .range(start, start + page_size - 1)
+        .execute()
+    )
+    return response.data or []
+
+
+def backfill_embeddings_concurrent(
+    fetch_workers: int = 2,
+    text_workers: int = 1,
+    embed_workers: int = 4,
+    write_workers: int = 2,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+    page_size: int = CONCURRENT_PAGE_SIZE,
+    batch_max_items: int = CONCURRENT_BATCH_MAX_ITEMS,
+    cache: Optional[EmbeddingCache] = None,
+    only_changed: bool = False,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+    ann_index: Optional[IVFFlatIndex] = None
+) -> dict:
+    """
+    Pipelined backfill: fetch → text → embed → write, each stage with its own
+    worker pool, so total runtime is bounded by throughput rather than by the
+    sum of per-product latencies. OpenAI calls share one RPM/TPM scheduler.
+    """
+    stats = _new_stats()
+    stats_lock = threading.Lock()
+    scheduler = RateLimitScheduler(requests_per_minute, tokens_per_minute)
+
+    def bump(key: str, amount: int = 1) -> None:
+        with stats_lock:
+            stats[key] += amount
+
+    def fetch_stage(start: int):
+        rows = fetch_flat_products_page(start, page_size)
+        bump("total", len(rows))
+        return [rows]
+
+    def text_stage(rows: list[dict]):
+        pairs = []
+        for row in rows:
+            text = _prepare_input(generate_text_for_embedding(row.get("product_data")))
+            if not text:
+                bump("skipped")
+                continue
+            if only_changed and _is_unchanged(cache, row["product_id"], content_hash(text)):
+                bump("unchanged")
+                continue
+            pairs.append((row["product_id"], text))
+        # Re-pack the page into API-sized batches for the embed workers
+        indexed = [(i, text) for i, (_, text) in enumerate(pairs)]
+        return [
+            [pairs[slot] for slot, _ in batch]
+            for batch in _pack_batches(indexed, batch_max_items)
+        ]
+
+    def embed_stage(batch: list[tuple[str, str]]):
+        embeddings = get_embeddings_cached(
+            [text for _, text in batch], cache,
+            scheduler=scheduler, max_batch_items=batch_max_items
+        )
+        # Hand the whole batch to one write worker so it becomes a bulk write
+        return [[
+            (product_id, emb, content_hash(text))
+            for (product_id, text), emb in zip(batch, embeddings)
+        ]]
+
+    def write_stage(batch: list[tuple[str, Optional[np.ndarray], str]]):
+        to_write = [(pid, emb) for pid, emb, _ in batch if emb is not None]
+        bump("failed", len(batch) - len(to_write))
+
+        written, failed = write_embeddings(to_write, batch_size=write_batch_size)
+        bump("embedded", len(written))
+        bump("failed", len(failed))
+        if cache is not None:
+            hash_by_id = {pid: text_hash for pid, _, text_hash in batch}
+            cache.set_product_hashes({pid: hash_by_id[pid] for pid in written})
+        _update_index(ann_index, to_write, written)
+        return written
+
+    total = count_flat_products()
+    print(f"📦 Found {total} products in chatbot_products_flat")
+
+    result = run_pipeline(
+        range(0, total, page_size),
+        [
+            Stage("fetch", fetch_stage, workers=fetch_workers),
+            Stage("text", text_stage, workers=text_workers),
+            Stage("embed", embed_stage, workers=embed_workers),
+            Stage("write", write_stage, workers=write_workers),
+        ]
+    )
+
+    # Items dropped by a crashing stage still count as failures
+    accounted = stats["embedded"] + stats["skipped"] + stats["unchanged"] + stats["failed"]
+    stats["failed"] += max(0, stats["total"] - accounted)
+    stats["elapsed_seconds"] = round(result.elapsed_seconds, 2)
+    stats["rate_limited"] = scheduler.rate_limited_count
+
+    _print_summary(stats, cache)
+    print(f"⏱️  {stats['elapsed_seconds']}s, {stats['rate_limited']} rate-limit backoffs")
+    return stats
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill product embeddings")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="Run the pipelined fetch/text/embed/write mode")
+    parser.add_argument("--fetch-workers", type=int, default=2)
+    parser.add_argument("--text-workers", type=int, default=1)
+    parser.add_argument("--embed-workers", type=int, default=4)
+    parser.add_argument("--write-workers", type=int, default=2)
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE,
+                        help="Embeddings per update_product_embeddings RPC call")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help="OpenAI requests-per-minute budget")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TOKENS_PER_MINUTE,
+                        help="OpenAI tokens-per-minute budget")
+    parser.add_argument("--only-changed", action="store_true",
+                        help="Skip products whose stored content hash already matches")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file for the embedding cache")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES)
+    parser.add_argument("--export-matrix", metavar="PATH",
+                        help="Only export stored embeddings to PATH.npy / PATH.ids.json")
+    parser.add_argument("--ann-index", metavar="PATH",
+                        help="Keep the ANN index at PATH in sync (built from all stored "
+                             "embeddings if it does not exist yet)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always call OpenAI (incompatible with --only-changed)")
+    args = parser.parse_args(argv)
+    if args.no_cache and args.only_changed:
+        parser.error("--only-changed needs the embedding cache")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not init_clients():
+        exit(1)
+    if args.export_matrix:
+        export_product_embeddings(args.export_matrix)
+        exit(0)
+    cache = None if args.no_cache else EmbeddingCache(args.cache_path, args.cache_max_entries)
+    ann_index = None
+    if args.ann_index and os.path.exists(f"{args.ann_index}.meta.json"):
+        ann_index = IVFFlatIndex.load(args.ann_index, mmap=False)
+    if args.concurrent:
+        backfill_embeddings_concurrent(
+            fetch_workers=args.fetch_workers,
+            text_workers=args.text_workers,
+            embed_workers=args.embed_workers,
+            write_workers=args.write_workers,
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            cache=cache,
+            only_changed=args.only_changed,
+            write_batch_size=args.write_batch_size,
+            ann_index=ann_index
+        )
+    else:
+        backfill_embeddings(
+            cache=cache,
+            only_changed=args.only_changed,
+            write_batch_size=args.write_batch_size,
+            ann_index=ann_index
+        )
+    if args.ann_index:
+        if ann_index is None:
+            ann_index = IVFFlatIndex.build(*fetch_product_embeddings())
+        ann_index.save(args.ann_index)
+        print(f"🧭 ANN index with {len(ann_index)} products saved to {args.ann_index}")
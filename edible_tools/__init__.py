@@ -0,0 +1,7 @@
+"""
+Python tooling for the Edible catalog, search and ordering backend.
+
+These modules back the offline jobs (embedding backfill, catalog ingestion,
+bulk maintenance) and the local benchmarks that exercise the Supabase edge
+function contracts.
+"""
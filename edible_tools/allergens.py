@@ -0,0 +1,258 @@
+"""
+Allergen classes as bits, for allergen-safety filtering without JSON scans.
+
+Customer allergies ("nuts", "dairy", ...) are checked against each
+product's allergen guesses, the flagged names in
+`analyzed_ingredients_with_allergen_guess_json`. Matching those names
+against every excluded allergen on every request is a string scan per
+product. Instead, ingest classifies each product's guesses once and stores
+the result as `product_data["allergen_mask"]`, one bit per class in
+`ALLERGEN_CLASSES`; a request's allergies become one bitmask, and
+`CatalogIndex.allergen_safe_mask` excludes them over the whole catalog with
+a single vectorised AND.
+
+`verify` checks the bitmask filter on the sample catalogs, before and after
+ingredient analysis, for every combination of allergen classes, against
+two filters that share nothing with `ALLERGEN_CLASSES`:
+
+- `reference_is_safe`: a separately written keyword list per class
+  (`REFERENCE_KEYWORDS`), matched word by word against the allergen list,
+  so a class pattern that misses or over-matches a term shows up as a
+  mismatch;
+- `edge_function_is_safe`: the rule `product-search-enhanced` applies
+  today (`ingredients.includes(allergen.toLowerCase())`). Anything it
+  excludes the bitmask must exclude too.
+
+Usage:
+    python -m edible_tools.allergens --verify
+    python -m edible_tools.allergens --verify samples/processed_new_for_the_season_options.csv
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import re
+import sys
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Nut allergens, the same guess the processed export's
+# analyzed_ingredients_with_allergen_guess_json column makes
+NUT_KEYWORDS = re.compile(
+    r"\b(peanuts?|nuts?|almonds?|pecans?|walnuts?|hazelnuts?|cashews?|pistachios?|"
+    r"macadamias?|praline|nutella|coconut)\b",
+    re.IGNORECASE,
+)
+
+# Bit i of an allergen mask is the i-th class; append only, masks are stored
+ALLERGEN_CLASSES = {
+    "nuts": NUT_KEYWORDS,
+    "peanut": re.compile(r"\bpeanuts?\b", re.IGNORECASE),
+    "dairy": re.compile(r"\b(milk|dairy|cream|cheese|cheesecake|(?<!peanut )butter|yogurt|whey)\b",
+                        re.IGNORECASE),
+    "gluten": re.compile(r"\b(gluten|wheat|flour|cookies?|brownies?|cupcakes?|waffle|cake)\b",
+                         re.IGNORECASE),
+    "soy": re.compile(r"\b(soy|soya|lecithin)\b", re.IGNORECASE),
+    "egg": re.compile(r"\b(eggs?|meringue)\b", re.IGNORECASE),
+    "citrus": re.compile(r"\b(citrus|oranges?|lemons?|limes?|grapefruits?|clementines?|mandarins?)\b",
+                         re.IGNORECASE),
+}
+ALLERGEN_BITS = {name: 1 << i for i, name in enumerate(ALLERGEN_CLASSES)}
+ALIASES = {
+    "nut": "nuts",
+    "tree nuts": "nuts",
+    "tree nut": "nuts",
+    "peanuts": "peanut",
+    "milk": "dairy",
+    "lactose": "dairy",
+    "wheat": "gluten",
+    "eggs": "egg",
+}
+MASK_DTYPE = np.uint32
+
+# Written independently of ALLERGEN_CLASSES, for `verify` only: singular
+# words and phrases per class, matched against the words of an allergen name
+REFERENCE_KEYWORDS = {
+    "nuts": {"nut", "peanut", "almond", "pecan", "walnut", "hazelnut", "cashew", "pistachio",
+             "macadamia", "praline", "nutella", "coconut"},
+    "peanut": {"peanut"},
+    "dairy": {"milk", "dairy", "cream", "cheese", "cheesecake", "butter", "yogurt", "whey"},
+    "gluten": {"gluten", "wheat", "flour", "cookie", "brownie", "cupcake", "waffle", "cake"},
+    "soy": {"soy", "soya", "lecithin"},
+    "egg": {"egg", "meringue"},
+    "citrus": {"citrus", "orange", "lemon", "lime", "grapefruit", "clementine", "mandarin"},
+}
+# Phrases that contain a keyword without being the allergen
+REFERENCE_EXCEPTIONS = {"dairy": {"peanut butter"}}
+
+
+def allergen_class(term: str) -> Optional[str]:
+    """Class name for a customer's allergy term, or None when it has no bit."""
+    term = (term or "").strip().lower()
+    term = ALIASES.get(term, term)
+    return term if term in ALLERGEN_CLASSES else None
+
+
+def classify(name: str) -> int:
+    """Bits of every allergen class an ingredient name matches."""
+    bits = 0
+    for allergen, pattern in ALLERGEN_CLASSES.items():
+        if pattern.search(name):
+            bits |= ALLERGEN_BITS[allergen]
+    return bits
+
+
+def allergen_mask(allergen_names: Iterable[str]) -> int:
+    """A product's mask: the union of the classes of its allergen guesses."""
+    mask = 0
+    for name in allergen_names:
+        mask |= classify(name)
+    return mask
+
+
+def exclusion_bits(terms: Iterable[str]) -> tuple[int, list[str]]:
+    """(bits of the known allergy terms, terms that have no class)."""
+    bits, unknown = 0, []
+    for term in terms:
+        allergen = allergen_class(term)
+        if allergen is None:
+            unknown.append(term)
+        else:
+            bits |= ALLERGEN_BITS[allergen]
+    return bits, unknown
+
+
+def product_mask(product_data: dict) -> int:
+    """Stored mask, or one computed from the allergen list for older rows."""
+    mask = product_data.get("allergen_mask")
+    if mask is None:
+        mask = allergen_mask(product_data.get("allergens") or [])
+    return mask
+
+
+def term_pattern(term: str) -> re.Pattern:
+    """A class's keywords, or the term itself as a word for unknown allergies."""
+    allergen = allergen_class(term)
+    if allergen is not None:
+        return ALLERGEN_CLASSES[allergen]
+    return re.compile(rf"\b{re.escape(term.strip())}\b", re.IGNORECASE)
+
+
+def json_list_is_safe(product_data: dict, terms: Iterable[str]) -> bool:
+    """Scan the product's allergen list for each excluded allergy (the fallback for unknown terms)."""
+    patterns = [term_pattern(term) for term in terms if term and term.strip()]
+    return not any(
+        pattern.search(name)
+        for name in product_data.get("allergens") or []
+        for pattern in patterns
+    )
+
+
+def _words(name: str) -> str:
+    """' peanut butter and jelly cookie ': lower-case singular words, space padded."""
+    words = re.findall(r"[a-z]+", name.lower())
+    return " " + " ".join(w[:-1] if w.endswith("s") and not w.endswith("ss") else w for w in words) + " "
+
+
+def reference_is_safe(product_data: dict, terms: Iterable[str]) -> bool:
+    """Independent check for `verify`: `REFERENCE_KEYWORDS` against the allergen list."""
+    classes = {allergen_class(term) for term in terms} - {None}
+    for name in product_data.get("allergens") or []:
+        for allergen in classes:
+            words = _words(name)
+            for phrase in REFERENCE_EXCEPTIONS.get(allergen, ()):
+                words = words.replace(f" {phrase} ", " ")
+            if any(f" {keyword} " in words for keyword in REFERENCE_KEYWORDS[allergen]):
+                return False
+    return True
+
+
+def edge_function_is_safe(product_data: dict, terms: Iterable[str]) -> bool:
+    """`product-search-enhanced`'s filter: an exact, lower-cased match in the ingredient list."""
+    ingredients = product_data.get("ingredients") or []
+    return not any(term.lower() in ingredients for term in terms)
+
+
+def _sample_products(paths: list[str]) -> dict[str, list[dict]]:
+    from edible_tools.catalog_ingest import iter_catalog
+    from edible_tools.catalog_process import analyze_product
+
+    ingested = [product for path in paths for product in iter_catalog(path)]
+    analyzed = [analyze_product(json.loads(json.dumps(product))) for product in ingested]
+    return {"ingested": ingested, "analyzed": analyzed}
+
+
+def verify(paths: list[str]) -> dict:
+    """
+    Compare the bitmask filter with `reference_is_safe` and
+    `edge_function_is_safe` for every combination of allergen classes.
+    Returns per-catalog counts, mismatches with the reference and products
+    the edge function excludes but the bitmask keeps (product identifiers,
+    at most 5 per combination).
+    """
+    from edible_tools.catalog_index import CatalogIndex
+
+    report = {}
+    for label, products in _sample_products(paths).items():
+        index = CatalogIndex([{"product_id": str(i), "product_data": p} for i, p in enumerate(products)])
+        combinations = mismatches = edge_misses = 0
+        examples = []
+        for size in range(1, len(ALLERGEN_CLASSES) + 1):
+            for terms in itertools.combinations(ALLERGEN_CLASSES, size):
+                combinations += 1
+                safe = index.allergen_safe_mask(terms)
+                expected = np.array([reference_is_safe(p, terms) for p in products], dtype=bool)
+                edge_safe = np.array([edge_function_is_safe(p, terms) for p in products], dtype=bool)
+                wrong = np.flatnonzero(safe != expected)
+                kept = np.flatnonzero(safe & ~edge_safe)
+                mismatches += bool(len(wrong))
+                edge_misses += bool(len(kept))
+                for check, found in (("reference", wrong), ("edge_function", kept)):
+                    if len(found):
+                        examples.append({
+                            "check": check,
+                            "allergens": list(terms),
+                            "products": [products[i]["product_info"]["product_identifier"] for i in found[:5]],
+                        })
+        report[label] = {
+            "products": len(products),
+            "with_allergens": int(np.count_nonzero(index.allergen_masks)),
+            "combinations": combinations,
+            "mismatches": mismatches,
+            "edge_misses": edge_misses,
+            "examples": examples,
+        }
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Allergen bitmask tools")
+    parser.add_argument("paths", nargs="*", help="Catalog CSVs (default: samples/*.csv)")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check the bitmask filter against an independent keyword list "
+                             "and the edge function's rule")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or sorted(
+        glob.glob(os.path.join(os.path.dirname(__file__), "..", "samples", "*.csv"))
+    )
+    if not args.verify:
+        for name, bit in ALLERGEN_BITS.items():
+            print(f"{bit:#06x}  {name}")
+        return
+
+    report = verify(paths)
+    print(json.dumps(report, indent=2))
+    failed = any(entry["mismatches"] or entry["edge_misses"] for entry in report.values())
+    if failed:
+        print("❌ Bitmask allergen filter disagrees with the reference or keeps what the edge function drops",
+              file=sys.stderr)
+        sys.exit(1)
+    print("✅ Bitmask allergen filter agrees with the reference and the edge function", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
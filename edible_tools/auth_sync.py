@@ -0,0 +1,440 @@
+"""
+Bulk sync of Supabase auth users into `customers`, paginated and resumable.
+
+`syncAllAuthUsers` in the `sync-auth-customers` function makes one
+`listUsers()` call (the first page only) and then syncs each user in turn,
+with 2-3 `customers` queries per user. This tool does the same linking in
+bulk:
+
+1. Pages through every auth user (`/auth/v1/admin/users?page=&per_page=`).
+2. For each page, prefetches the matching `customers` rows in a few
+   `auth_user_id=in.(...)` and `email=in.(...)` queries.
+3. Plans the function's actions in memory: update the customer already
+   linked to the user, else link the one unlinked customer with the same
+   email, else create one.
+4. Writes the page's rows as batched upserts (`on_conflict=id`).
+
+Pages go through a `run_pipeline` with `workers` threads per stage. A
+`SyncCursor` file records the pages that are done; after a crash the next
+run starts after the last page with every earlier page complete. Pages
+are idempotent to replay: created customers carry the auth user id, so a
+replayed page finds and updates them instead of creating them again.
+
+Usage:
+    python -m edible_tools.auth_sync --users 100000
+    python -m edible_tools.auth_sync --live --cursor .auth_sync_cursor.json
+    python -m edible_tools.auth_sync --live --dry-run
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterator, Optional
+
+from edible_tools.pipeline import Stage, run_pipeline
+
+AUTH_USERS_PER_PAGE = 1000
+IN_FILTER_CHUNK = 200  # values per in.(...) filter, keeps request URLs short
+UPSERT_BATCH_SIZE = 500
+
+
+def _in_filter(values: list[str]) -> str:
+    """PostgREST `in.(...)` with every value quoted."""
+    quoted = ('"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values)
+    return f"in.({','.join(quoted)})"
+
+
+def _chunks(values: list, size: int) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def auth_profile(auth_user: dict) -> dict:
+    """Email, names and phone from an auth user, as the edge function reads them."""
+    metadata = auth_user.get("user_metadata") or {}
+    return {
+        "auth_user_id": auth_user["id"],
+        "email": auth_user.get("email"),
+        "first_name": metadata.get("first_name") or metadata.get("firstName") or "",
+        "last_name": metadata.get("last_name") or metadata.get("lastName") or "",
+        "phone": metadata.get("phone") or metadata.get("phone_number"),
+    }
+
+
+def _with_webapp_source(preferences: Optional[dict]) -> list:
+    sources = list((preferences or {}).get("account_sources") or [])
+    return sources if "webapp" in sources else sources + ["webapp"]
+
+
+def plan_actions(auth_users: list[dict], customers: list[dict], now: Optional[str] = None) -> dict:
+    """
+    The function's per-user decision, for a whole page at once.
+
+    Returns {"update": [...], "link": [...], "create": [...]} customer rows
+    to upsert, plus counts of users that were "unchanged" (already linked
+    with the same data, so nothing is written), "skipped" (no email) and
+    "conflicts": several unlinked customers share the email (left for the
+    dedupe job rather than picking one), or the email already belongs to
+    another customer, e.g. one linked to a deleted and re-created auth
+    user; writing it would break the unique email.
+    """
+    now = now or datetime.now(timezone.utc).isoformat()
+    by_auth = {c["auth_user_id"]: c for c in customers if c.get("auth_user_id")}
+    by_email: dict[str, list[dict]] = {}
+    unlinked_by_email: dict[str, list[dict]] = {}
+    for customer in customers:
+        if customer.get("email"):
+            by_email.setdefault(customer["email"], []).append(customer)
+            if not customer.get("auth_user_id"):
+                unlinked_by_email.setdefault(customer["email"], []).append(customer)
+
+    plan = {"update": [], "link": [], "create": [], "unchanged": 0, "skipped": 0, "conflicts": []}
+    for auth_user in auth_users:
+        profile = auth_profile(auth_user)
+        if not profile["email"]:
+            plan["skipped"] += 1
+            continue
+
+        existing = by_auth.get(profile["auth_user_id"])
+        if existing is not None:
+            holders = [c for c in by_email.get(profile["email"], []) if c["id"] != existing["id"]]
+        else:
+            holders = [c for c in by_email.get(profile["email"], []) if c.get("auth_user_id")]
+        if holders:
+            plan["conflicts"].append({"authUserId": profile["auth_user_id"],
+                                      "error": f"Email already belongs to customer {holders[0]['id']}"})
+            continue
+        if existing is not None:
+            row = {
+                "id": existing["id"],
+                "auth_user_id": profile["auth_user_id"],
+                "email": profile["email"],
+                "first_name": profile["first_name"] or existing.get("first_name"),
+                "last_name": profile["last_name"] or existing.get("last_name"),
+                "phone": profile["phone"] or existing.get("phone"),
+            }
+            preferences = existing.get("preferences") or {}
+            if all(row[k] == existing.get(k) for k in row) and "webapp" in preferences.get("account_sources", []):
+                plan["unchanged"] += 1
+                continue
+            row["preferences"] = {
+                **preferences,
+                "account_sources": _with_webapp_source(preferences),
+                "last_auth_sync": now,
+                "sync_source": "auth_override",
+            }
+            plan["update"].append(row)
+            continue
+
+        matches = unlinked_by_email.get(profile["email"], [])
+        if len(matches) > 1:
+            plan["conflicts"].append({"authUserId": profile["auth_user_id"],
+                                      "error": f"{len(matches)} unlinked customers share this email"})
+            continue
+        if matches:
+            customer = matches[0]
+            del unlinked_by_email[profile["email"]]
+            preferences = customer.get("preferences") or {}
+            plan["link"].append({
+                "id": customer["id"],
+                "auth_user_id": profile["auth_user_id"],
+                "email": profile["email"],
+                "first_name": profile["first_name"] or customer.get("first_name"),
+                "last_name": profile["last_name"] or customer.get("last_name"),
+                "phone": profile["phone"] or customer.get("phone"),
+                "preferences": {
+                    **preferences,
+                    "account_sources": _with_webapp_source(preferences),
+                    "linked_at": now,
+                    "linked_from": "email_match",
+                    "auth_override": True,
+                },
+            })
+            continue
+
+        plan["create"].append({
+            # Generated here so a replayed batch upserts the same rows
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"auth-user-{profile['auth_user_id']}")),
+            **profile,
+            "allergies": [],
+            "dietary_restrictions": [],
+            "preferences": {"account_sources": ["webapp"], "created_from": "auth_sync", "created_at": now},
+        })
+    return plan
+
+
+class SyncCursor:
+    """
+    Pages completed so far, persisted to `path` after each one. `start_page`
+    is the first page after the contiguous run of completed pages; pages
+    finished beyond it are replayed on resume, which is safe.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed: set[int] = set()
+        self.totals: dict = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.completed = set(range(1, state.get("next_page", 1))) | set(state.get("completed_ahead", []))
+            self.totals = state.get("totals", {})
+
+    @property
+    def start_page(self) -> int:
+        page = 1
+        while page in self.completed:
+            page += 1
+        return page
+
+    def mark_done(self, page: int, counts: dict) -> None:
+        with self._lock:
+            self.completed.add(page)
+            for key, value in counts.items():
+                self.totals[key] = self.totals.get(key, 0) + value
+            self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        next_page = self.start_page
+        state = {
+            "next_page": next_page,
+            "completed_ahead": sorted(p for p in self.completed if p > next_page),
+            "totals": self.totals,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+def iter_auth_user_pages(client, start_page: int = 1, per_page: int = AUTH_USERS_PER_PAGE) -> Iterator[tuple[int, list]]:
+    """(page number, users) from the GoTrue admin API until a short page."""
+    page = start_page
+    while True:
+        response = client.get("auth/v1/admin/users", params={"page": page, "per_page": per_page})
+        response.raise_for_status()
+        users = response.json().get("users") or []
+        if users:
+            yield page, users
+        if len(users) < per_page:
+            return
+        page += 1
+
+
+def prefetch_customers(client, auth_users: list[dict]) -> list[dict]:
+    """Customers linked to any of `auth_users`, or sharing one of their emails."""
+    auth_ids = [u["id"] for u in auth_users if u.get("email")]
+    emails = sorted({u["email"] for u in auth_users if u.get("email")})
+    found: dict[str, dict] = {}
+    for column, values in (("auth_user_id", auth_ids), ("email", emails)):
+        for chunk in _chunks(values, IN_FILTER_CHUNK):
+            response = client.get("rest/v1/customers", params={"select": "*", column: _in_filter(chunk)})
+            response.raise_for_status()
+            for customer in response.json():
+                found[customer["id"]] = customer
+    return list(found.values())
+
+
+def _rejects_rows(error: Exception) -> bool:
+    """A 4xx from PostgREST: the rows are bad (e.g. a unique violation), not the connection."""
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500
+
+
+def _upsert_chunk(client, rows: list[dict], rejected: list[dict]) -> int:
+    """Upsert `rows`; a rejected batch is bisected down to the rows that fail."""
+    try:
+        response = client.post(
+            "rest/v1/customers",
+            params={"on_conflict": "id"},
+            json=rows,
+            headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+        )
+        response.raise_for_status()
+        return len(rows)
+    except Exception as e:
+        if not _rejects_rows(e):
+            raise
+        if len(rows) == 1:
+            try:
+                message = e.response.json().get("message")
+            except ValueError:
+                message = None
+            rejected.append({"id": rows[0]["id"], "authUserId": rows[0].get("auth_user_id"),
+                             "error": message or str(e)})
+            return 0
+        mid = len(rows) // 2
+        return _upsert_chunk(client, rows[:mid], rejected) + _upsert_chunk(client, rows[mid:], rejected)
+
+
+def upsert_customers(client, rows: list[dict], batch_size: int = UPSERT_BATCH_SIZE) -> tuple[int, list[dict]]:
+    """
+    Batched `customers` upserts on id; rows in one call share their columns.
+
+    Returns (rows written, rows the database rejected). One bad row costs
+    a few extra calls instead of failing its page; connection errors and
+    5xx still raise, so the page is retried.
+    """
+    written, rejected = 0, []
+    for chunk in _chunks(rows, batch_size):
+        written += _upsert_chunk(client, chunk, rejected)
+    return written, rejected
+
+
+class AuthSync:
+    """Pipelined, resumable `sync-auth-customers` for every auth user."""
+
+    def __init__(
+        self,
+        client,
+        cursor: Optional[SyncCursor] = None,
+        workers: int = 4,
+        per_page: int = AUTH_USERS_PER_PAGE,
+        dry_run: bool = False,
+    ):
+        self.client = client
+        self.cursor = cursor or SyncCursor()
+        self.workers = workers
+        self.per_page = per_page
+        self.dry_run = dry_run
+
+    def _plan(self, item: tuple[int, list]) -> list:
+        page, users = item
+        return [(page, plan_actions(users, prefetch_customers(self.client, users)))]
+
+    def _apply(self, item: tuple[int, dict]) -> list:
+        page, plan = item
+        rejected = []
+        if not self.dry_run:
+            # Creates carry allergies/dietary_restrictions, updates and links do not
+            rejected += upsert_customers(self.client, plan["update"] + plan["link"])[1]
+            rejected += upsert_customers(self.client, plan["create"])[1]
+        rejected_ids = {row["id"] for row in rejected}
+        conflicts = plan["conflicts"] + [{"authUserId": r["authUserId"], "error": r["error"]} for r in rejected]
+        counts = {
+            "updated": sum(row["id"] not in rejected_ids for row in plan["update"]),
+            "linked": sum(row["id"] not in rejected_ids for row in plan["link"]),
+            "created": sum(row["id"] not in rejected_ids for row in plan["create"]),
+            "unchanged": plan["unchanged"],
+            "skipped": plan["skipped"],
+            "conflicts": len(conflicts),
+        }
+        if not self.dry_run:
+            self.cursor.mark_done(page, counts)
+        return [(page, counts, conflicts)]
+
+    def run(self, max_pages: Optional[int] = None) -> dict:
+        """Sync from the cursor on; `max_pages` stops early (e.g. to test resuming)."""
+        start_page = self.cursor.start_page
+        pages = iter_auth_user_pages(self.client, start_page, self.per_page)
+        if max_pages is not None:
+            pages = islice(pages, max_pages)
+        result = run_pipeline(pages, [
+            Stage("plan", self._plan, workers=self.workers),
+            Stage("apply", self._apply, workers=self.workers),
+        ])
+
+        totals: dict = {}
+        conflicts = []
+        for _, counts, page_conflicts in result.outputs:
+            for key, value in counts.items():
+                totals[key] = totals.get(key, 0) + value
+            conflicts.extend(page_conflicts)
+        failed = sum(stats.errors for stats in result.stats.values())
+        return {
+            "start_page": start_page,
+            "pages": len(result.outputs),
+            "failed_pages": failed,
+            "next_page": self.cursor.start_page,
+            **totals,
+            "conflicts": conflicts[:20],
+            "elapsed_s": round(result.elapsed_seconds, 2),
+            "summary": (f"Sync completed: {totals.get('linked', 0)} linked, {totals.get('created', 0)} "
+                        f"created, {totals.get('updated', 0)} updated, {failed} failed pages"),
+        }
+
+
+def synthetic_auth_users(count: int, seed: int = 11) -> tuple[list[dict], list[dict]]:
+    """
+    `count` auth users and the customers table they meet: a third already
+    linked, a third with an unlinked customer on the same email, the rest
+    new; a few without email.
+    """
+    rng = random.Random(seed)
+    users, customers = [], []
+    for i in range(count):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        email = None if i % 97 == 0 else f"user{i}@example.com"
+        users.append({
+            "id": user_id,
+            "email": email,
+            "user_metadata": {"first_name": f"User{i}", "phone": f"+1415{i:07d}"} if i % 2 else {},
+            "created_at": f"2025-01-01T00:00:{i % 60:02d}",
+        })
+        kind = i % 3
+        if email and kind < 2:
+            customers.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "auth_user_id": user_id if kind == 0 else None,
+                "email": email,
+                "phone": None,
+                "first_name": f"User{i}" if kind == 0 else None,
+                "last_name": None,
+                "preferences": {"account_sources": ["webapp"] if kind == 0 else ["chatbot"]},
+            })
+    return users, customers
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Sync every auth user into customers, resumably")
+    parser.add_argument("--cursor", help="Cursor file; the sync resumes from it when it exists")
+    parser.add_argument("--workers", type=int, default=4, help="Threads per stage (prefetch, upsert)")
+    parser.add_argument("--per-page", type=int, default=AUTH_USERS_PER_PAGE)
+    parser.add_argument("--dry-run", action="store_true", help="Plan and report without writing")
+    parser.add_argument("--live", action="store_true", help="Use SUPABASE_URL instead of a local stand-in")
+    parser.add_argument("--users", type=int, default=20000, help="Synthetic auth users for the local stand-in")
+    args = parser.parse_args(argv)
+
+    from edible_tools.edge_client import EdgeClient
+
+    server = None
+    if args.live:
+        client = EdgeClient.from_env(pool_size=args.workers * 2)
+    else:
+        from edible_tools.local_edge import LocalEdgeServer
+        from edible_tools.local_services import LocalStore, customer_routes
+        from edible_tools.product_search import ProductSearchEngine
+        store = LocalStore(ProductSearchEngine([], {}, 8))
+        users, customers = synthetic_auth_users(args.users)
+        store.auth_users = users
+        store.load_customers(customers)
+        server = LocalEdgeServer(customer_routes(store)).start()
+        client = EdgeClient(server.url, pool_size=args.workers * 2)
+
+    cursor = SyncCursor(args.cursor)
+    if cursor.start_page > 1:
+        print(f"🧭 Resuming at page {cursor.start_page} ({cursor.totals})")
+    print(f"🚀 Syncing auth users, {args.per_page} per page, {args.workers} workers per stage"
+          f"{' (dry run)' if args.dry_run else ''}")
+    try:
+        result = AuthSync(client, cursor, args.workers, args.per_page, args.dry_run).run()
+    finally:
+        client.close()
+        if server is not None:
+            server.stop()
+
+    print(json.dumps(result))
+    print(f"{'❌' if result['failed_pages'] else '✅'} {result['summary']} in {result['elapsed_s']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Inverted indexes over the catalog's filterable fields.
+
+Level 2 and Level 3 of `product-search-enhanced` narrow
+`chatbot_products_flat` by price, occasion/category and allergens with a
+PostgREST query per filter before any similarity is computed.
+`CatalogIndex` precomputes, once per catalog load:
+
+- a boolean row bitmap per exact category name, and per normalised
+  occasion key ("Mother's Day", "mothers day" and "mothers-day" all
+  become "mothers-day"),
+- a bitmap per ingredient, for the edge function's exact-name allergen
+  exclusion, and the products' allergen-class masks (see
+  `edible_tools.allergens`) as one array, so excluding a customer's
+  allergies is a single vectorised AND,
+- product rows sorted by price, so a price window is two binary searches
+  (a contiguous run of the sorted order) instead of a scan.
+
+A request's filters then resolve to a handful of bitmap ANDs/ORs, and only
+the rows left standing are scored.
+"""
+
+import math
+import re
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from edible_tools.allergens import MASK_DTYPE, exclusion_bits, json_list_is_safe, product_mask
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def occasion_key(name: str) -> str:
+    """Spelling-insensitive key: "Mother's Day" / "mothers-day" → "mothers-day"."""
+    return _NON_ALNUM.sub("-", (name or "").lower().replace("'", "").replace("’", "")).strip("-")
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class CatalogIndex:
+    """Row bitmaps for categories, occasions and ingredients, plus a price order."""
+
+    def __init__(self, rows: Sequence[dict]):
+        self.size = len(rows)
+        infos = [row['product_data'].get('product_info') or {} for row in rows]
+        self.prices = np.array([_to_float(info.get('base_price')) for info in infos])
+        self._price_order = np.argsort(self.prices, kind='stable')
+        self._sorted_prices = self.prices[self._price_order]
+
+        categories: dict[str, list[int]] = {}
+        occasions: dict[str, list[int]] = {}
+        ingredients: dict[str, list[int]] = {}
+        for i, row in enumerate(rows):
+            product_data = row['product_data']
+            for category in product_data.get('categories') or []:
+                name = category.get('name')
+                if name:
+                    categories.setdefault(name, []).append(i)
+                    occasions.setdefault(occasion_key(name), []).append(i)
+            for ingredient in product_data.get('ingredients') or []:
+                ingredients.setdefault(ingredient, []).append(i)
+
+        self.categories = {name: self._bitmap(rows_) for name, rows_ in categories.items()}
+        self.occasions = {key: self._bitmap(rows_) for key, rows_ in occasions.items()}
+        self.ingredients = {name: self._bitmap(rows_) for name, rows_ in ingredients.items()}
+        self._product_data = [row['product_data'] for row in rows]
+        self.allergen_masks = np.fromiter(
+            (product_mask(product_data) for product_data in self._product_data),
+            dtype=MASK_DTYPE, count=self.size,
+        )
+
+    def _bitmap(self, indices: Iterable[int]) -> np.ndarray:
+        bitmap = np.zeros(self.size, dtype=bool)
+        bitmap[list(indices)] = True
+        return bitmap
+
+    def all(self) -> np.ndarray:
+        return np.ones(self.size, dtype=bool)
+
+    def price_mask(self, low: float = -math.inf, high: float = math.inf) -> np.ndarray:
+        """Rows with low <= price <= high; no bounds keeps unpriced rows too."""
+        if low == -math.inf and high == math.inf:
+            return self.all()
+        mask = np.zeros(self.size, dtype=bool)
+        start = np.searchsorted(self._sorted_prices, low, side='left')
+        end = np.searchsorted(self._sorted_prices, high, side='right')
+        mask[self._price_order[start:end]] = True
+        return mask
+
+    def category_mask(self, names: Iterable[str]) -> np.ndarray:
+        """Rows carrying any of the exact category `names`."""
+        mask = np.zeros(self.size, dtype=bool)
+        for name in names:
+            bitmap = self.categories.get(name)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def occasion_mask(self, term: str) -> np.ndarray:
+        """Rows in the category whose normalised key matches `term`."""
+        bitmap = self.occasions.get(occasion_key(term))
+        return bitmap.copy() if bitmap is not None else np.zeros(self.size, dtype=bool)
+
+    def ingredient_mask(self, names: Iterable[str]) -> np.ndarray:
+        """Rows listing any of the ingredients in `names` (exact match)."""
+        mask = np.zeros(self.size, dtype=bool)
+        for name in names:
+            bitmap = self.ingredients.get(name)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def allergen_safe_mask(self, allergens: Iterable[str]) -> np.ndarray:
+        """
+        Rows whose allergen guesses contain none of `allergens`. Known
+        classes are one AND over the mask array; terms without a class
+        fall back to scanning the allergen lists.
+        """
+        bits, unknown = exclusion_bits(allergens)
+        mask = (self.allergen_masks & MASK_DTYPE(bits)) == 0
+        if unknown:
+            mask &= np.fromiter(
+                (json_list_is_safe(product_data, unknown) for product_data in self._product_data),
+                dtype=bool, count=self.size,
+            )
+        return mask
+
+    def rows_mask(self, indices: Optional[Iterable[int]]) -> np.ndarray:
+        return self._bitmap(indices or [])
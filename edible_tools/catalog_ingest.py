@@ -0,0 +1,287 @@
+"""
+Streaming ingester for the Edible catalog CSV exports.
+
+Reads any of the three formats in `samples/`, one row at a time, and yields
+the `product_data` dicts that `chatbot_products_flat` stores and
+`generate_text_for_embedding` consumes:
+
+- scraper:   web-scraper export (`Edible-new-for-the-season.csv`), keyed by
+             the "Product Code: NNNN" column
+- processed: one row per option with JSON ingredient/allergen columns
+             (`processed_new_for_the_season_options.csv`), keyed by
+             `source_product_code`
+- shopify:   `;`-delimited Shopify-style export (`Formatted2_mothersday.csv`),
+             keyed by `Handle`
+
+Option rows are grouped as they stream past, so only one product is held in
+memory at a time. Exports list a product's rows contiguously; a product
+whose rows are split up is emitted once per run of rows.
+
+Usage:
+    python -m edible_tools.catalog_ingest samples/Formatted2_mothersday.csv --category "Mother's Day"
+    python -m edible_tools.catalog_ingest samples/*.csv --out .cache/catalog.jsonl
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import re
+import sys
+from typing import Iterable, Iterator, Optional, TextIO
+
+from edible_tools.allergens import allergen_mask
+
+SCRAPER = "scraper"
+PROCESSED = "processed"
+SHOPIFY = "shopify"
+
+_PRICE = re.compile(r"\$?\s*([0-9][0-9,]*(?:\.[0-9]+)?)")
+_STARTING_AT = re.compile(r"Starting At\s*\$\s*([0-9][0-9,]*(?:\.[0-9]+)?)", re.IGNORECASE)
+_PRODUCT_CODE = re.compile(r"(\d+)\s*$")
+
+# Cells like the scraper's description can exceed csv's 128 KB default
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def parse_price(value: Optional[str]) -> Optional[float]:
+    """'$1,114.98' / '114.98' → 1114.98; None when there is no number."""
+    match = _PRICE.search(value or "")
+    return float(match.group(1).replace(",", "")) if match else None
+
+
+def _format_price(value: Optional[float]) -> Optional[str]:
+    return f"{value:.2f}" if value is not None else None
+
+
+def _product_code(value: str) -> str:
+    """'Product Code: 9144' / 'product-code-9144' → '9144'."""
+    match = _PRODUCT_CODE.search(value or "")
+    return match.group(1) if match else (value or "").strip()
+
+
+def _json_list(value: Optional[str]) -> list:
+    try:
+        parsed = json.loads(value) if value else []
+    except json.JSONDecodeError:
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def _ingredient_names(value: Optional[str]) -> list[str]:
+    """Names from either `[{"item_ingredients": ...}]` or `[{"name": ...}]` JSON."""
+    names = []
+    for item in _json_list(value):
+        if isinstance(item, dict):
+            name = item.get("item_ingredients") or item.get("name")
+        else:
+            name = item
+        if isinstance(name, str) and name.strip():
+            names.append(name.strip())
+    return names
+
+
+def _allergen_guesses(value: Optional[str]) -> list[str]:
+    return [
+        item["name"] for item in _json_list(value)
+        if isinstance(item, dict) and item.get("is_allergen_guess") and item.get("name")
+    ]
+
+
+def detect_format(header_line: str) -> tuple[str, str]:
+    """(format, delimiter) for a CSV header line."""
+    header_line = header_line.lstrip("\ufeff")
+    if header_line.startswith("Handle;") or ";Handle;" in header_line:
+        return SHOPIFY, ";"
+    if "source_product_code" in header_line:
+        return PROCESSED, ","
+    if "web-scraper-order" in header_line:
+        return SCRAPER, ","
+    raise ValueError(f"Unrecognised catalog header: {header_line[:80]!r}")
+
+
+def iter_rows(stream: TextIO) -> tuple[str, Iterator[dict]]:
+    """Detect the format from the header and return (format, row iterator)."""
+    header_line = stream.readline()
+    catalog_format, delimiter = detect_format(header_line)
+    fieldnames = next(csv.reader([header_line.lstrip("\ufeff")], delimiter=delimiter))
+    return catalog_format, csv.DictReader(stream, fieldnames=fieldnames, delimiter=delimiter)
+
+
+def _option(name, price, description=None, image_url=None) -> dict:
+    return {
+        "option_name": name,
+        "price": _format_price(price),
+        "description": description or None,
+        "image_url": image_url or None,
+    }
+
+
+def _product_data(
+    identifier: str,
+    name: str,
+    description: str,
+    base_price: Optional[float],
+    image_url: Optional[str],
+    options: list[dict],
+    ingredients: list[str],
+    allergens: list[str],
+    categories: list[dict],
+    source_url: Optional[str] = None,
+) -> dict:
+    if base_price is None:
+        prices = [parse_price(opt["price"]) for opt in options if opt["price"]]
+        base_price = min(prices) if prices else None
+    product_info = {
+        "product_identifier": identifier,
+        "name": name,
+        "description": description,
+        "base_price": _format_price(base_price),
+        "image_url": image_url or None,
+        "is_active": True,
+    }
+    if source_url:
+        product_info["source_url"] = source_url
+    return {
+        "product_info": product_info,
+        "options": options,
+        "categories": categories,
+        "ingredients": ingredients,
+        "allergens": allergens,
+        "allergen_mask": allergen_mask(allergens),
+        "addons": [],
+    }
+
+
+def _from_scraper(rows: list[dict], categories: list[dict]) -> dict:
+    first = rows[0]
+    starting_at = _STARTING_AT.search(first.get("item_link") or "")
+    return _product_data(
+        identifier=_product_code(first.get("product_id")),
+        name=(first.get("item_name") or "").strip(),
+        description=(first.get("item_description") or "").strip(),
+        base_price=parse_price(starting_at.group(1)) if starting_at else None,
+        image_url=first.get("item_img-src"),
+        options=[
+            _option(row["item_option"], parse_price(row.get("item_price")),
+                    image_url=row.get("item_options_img-src"))
+            for row in rows if (row.get("item_option") or "").strip()
+        ],
+        ingredients=_ingredient_names(first.get("item_ingredients")),
+        allergens=[],
+        categories=categories,
+        source_url=first.get("item_link-href"),
+    )
+
+
+def _from_processed(rows: list[dict], categories: list[dict]) -> dict:
+    first = rows[0]
+    return _product_data(
+        identifier=_product_code(first.get("source_product_code")),
+        name=(first.get("base_product_name") or "").strip(),
+        description=(first.get("base_product_description_original") or "").strip(),
+        base_price=parse_price(first.get("calculated_base_product_price")),
+        image_url=first.get("base_product_main_image_url_original"),
+        options=[
+            _option(row["option_name"], parse_price(row.get("option_price")),
+                    row.get("synthesized_option_description"), row.get("option_specific_image_url"))
+            for row in rows if (row.get("option_name") or "").strip()
+        ],
+        ingredients=_ingredient_names(first.get("original_ingredients_json")),
+        allergens=_allergen_guesses(first.get("analyzed_ingredients_with_allergen_guess_json")),
+        categories=categories,
+        source_url=first.get("original_item_link_href"),
+    )
+
+
+def _from_shopify(rows: list[dict], categories: list[dict]) -> dict:
+    first = rows[0]
+    options = [
+        _option(row["Option1 Value"], parse_price(row.get("Variant Price")),
+                image_url=row.get("Image Src"))
+        for row in rows if (row.get("Option1 Value") or "").strip()
+    ]
+    # A single-variant product has no option values, only the row's own price
+    priced = any(option["price"] for option in options)
+    return _product_data(
+        identifier=_product_code(first.get("Handle")),
+        name=(first.get("Title") or first.get("SEO Title") or "").strip(),
+        description=(first.get("Body (HTML)") or "").strip(),
+        base_price=None if priced else parse_price(first.get("Variant Price")),
+        image_url=first.get("Image Src"),
+        options=options,
+        ingredients=[],
+        allergens=[],
+        categories=categories,
+    )
+
+
+GROUP_KEYS = {
+    SCRAPER: "product_id",
+    PROCESSED: "source_product_code",
+    SHOPIFY: "Handle",
+}
+_BUILDERS = {
+    SCRAPER: _from_scraper,
+    PROCESSED: _from_processed,
+    SHOPIFY: _from_shopify,
+}
+
+
+def group_rows(rows: Iterable[dict], catalog_format: str) -> Iterator[tuple[str, list[dict]]]:
+    """Yield (product key, rows) for each run of consecutive rows of one product."""
+    key = GROUP_KEYS[catalog_format]
+    for code, group in itertools.groupby(rows, key=lambda row: (row.get(key) or "").strip()):
+        if code:
+            yield code, list(group)
+
+
+def build_product(rows: list[dict], catalog_format: str, categories: Optional[list[str]] = None) -> dict:
+    """product_data dict for all the option rows of one product."""
+    category_dicts = [{"name": name, "type": "occasion"} for name in categories or []]
+    return _BUILDERS[catalog_format](rows, category_dicts)
+
+
+def iter_products(
+    rows: Iterable[dict],
+    catalog_format: str,
+    categories: Optional[list[str]] = None,
+) -> Iterator[dict]:
+    """Group consecutive option rows by product key and yield product_data dicts."""
+    for _, group in group_rows(rows, catalog_format):
+        yield build_product(group, catalog_format, categories)
+
+
+def iter_catalog(path: str, categories: Optional[list[str]] = None) -> Iterator[dict]:
+    """Stream product_data dicts from a catalog CSV in any supported format."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        catalog_format, rows = iter_rows(f)
+        yield from iter_products(rows, catalog_format, categories)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Stream catalog CSV exports into product_data JSON")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--category", action="append",
+                        help="Occasion category to attach to every product (repeatable)")
+    parser.add_argument("--out", help="Write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        total = 0
+        for path in args.paths:
+            count = 0
+            for product_data in iter_catalog(path, args.category):
+                out.write(json.dumps(product_data, ensure_ascii=False) + "\n")
+                count += 1
+            total += count
+            print(f"📦 {path}: {count} products", file=sys.stderr)
+        print(f"✅ {total} products", file=sys.stderr)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
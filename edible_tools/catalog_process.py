@@ -0,0 +1,299 @@
+"""
+Parallel catalog processing across a process pool.
+
+Seasonal drops arrive as many CSVs, and parsing, price parsing and
+ingredient/allergen analysis are CPU-bound. `process_catalog` cuts every
+file into byte ranges that end on a row boundary (newlines inside quoted
+cells are skipped by tracking quote parity), parses the ranges on a
+`ProcessPoolExecutor`, and stitches the results back together in file
+order, so the output is identical to a single-process run.
+
+A product whose rows straddle a range boundary comes back from each worker
+as raw rows and is merged and built in the parent; every other product is
+built and analysed in the worker.
+
+Usage:
+    python -m edible_tools.catalog_process samples/*.csv --out .cache/catalog.jsonl
+    python -m edible_tools.catalog_process drops/*.csv --processed-csv processed.csv --backfill
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from edible_tools.allergens import NUT_KEYWORDS, allergen_mask
+from edible_tools.catalog_ingest import build_product, detect_format, group_rows
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+SCAN_BLOCK_BYTES = 1024 * 1024
+
+# Nut allergens, the same guess the processed export's
+# analyzed_ingredients_with_allergen_guess_json column makes
+ALLERGEN_KEYWORDS = NUT_KEYWORDS
+
+PROCESSED_COLUMNS = [
+    "original_web_scraper_order",
+    "original_web_scraper_start_url",
+    "original_item_link_text",
+    "original_item_link_href",
+    "source_product_code",
+    "base_product_name",
+    "base_product_description_original",
+    "base_product_main_image_url_original",
+    "calculated_base_product_price",
+    "option_name",
+    "option_price",
+    "option_specific_image_url",
+    "synthesized_option_description",
+    "original_ingredients_json",
+    "analyzed_ingredients_with_allergen_guess_json",
+]
+
+
+@dataclass(frozen=True)
+class Chunk:
+    path: str
+    start: int
+    end: int
+
+
+def analyze_ingredients(names: Iterable[str]) -> list[dict]:
+    return [
+        {"name": name, "is_allergen_guess": bool(ALLERGEN_KEYWORDS.search(name))}
+        for name in names
+    ]
+
+
+def analyze_product(product_data: dict) -> dict:
+    """Fill `allergens` (and its mask) from the ingredient list when the source had no guesses."""
+    if not product_data.get("allergens"):
+        product_data["allergens"] = [
+            item["name"] for item in analyze_ingredients(product_data.get("ingredients") or [])
+            if item["is_allergen_guess"]
+        ]
+        product_data["allergen_mask"] = allergen_mask(product_data["allergens"])
+    return product_data
+
+
+def _header(path: str) -> tuple[str, str, list[str], int]:
+    """(format, delimiter, fieldnames, byte offset of the first data row)."""
+    with open(path, "rb") as f:
+        raw = f.readline()
+    header_line = raw.decode("utf-8-sig")
+    catalog_format, delimiter = detect_format(header_line)
+    fieldnames = next(csv.reader([header_line], delimiter=delimiter))
+    return catalog_format, delimiter, fieldnames, len(raw)
+
+
+def split_file(path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> list[Chunk]:
+    """
+    Byte ranges of roughly `chunk_bytes` that each start and end on a row
+    boundary. A newline only ends a row when an even number of quote
+    characters precede it.
+    """
+    data_start = _header(path)[3]
+    size = os.path.getsize(path)
+    if size - data_start <= chunk_bytes:
+        return [Chunk(path, data_start, size)] if size > data_start else []
+
+    boundaries = [data_start]
+    target = data_start + chunk_bytes
+    quotes = 0
+    with open(path, "rb") as f:
+        f.seek(data_start)
+        offset = data_start
+        while target < size:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            pos = max(0, target - offset)
+            while pos < len(block):
+                newline = block.find(b"\n", pos)
+                if newline == -1:
+                    break
+                if (quotes + block.count(b'"', 0, newline)) % 2 == 0:
+                    boundaries.append(offset + newline + 1)
+                    target = offset + newline + 1 + chunk_bytes
+                    pos = max(newline + 1, target - offset)
+                else:
+                    pos = newline + 1
+            quotes += block.count(b'"')
+            offset += len(block)
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return [Chunk(path, start, end) for start, end in zip(boundaries, boundaries[1:])]
+
+
+def process_chunk(chunk: Chunk, categories: Optional[list[str]] = None) -> list[tuple]:
+    """
+    Parse one byte range. Returns ("rows", key, rows) for the first and last
+    product (they may continue in a neighbouring range) and
+    ("product", key, product_data) for the ones in between.
+    """
+    catalog_format, delimiter, fieldnames, _ = _header(chunk.path)
+    with open(chunk.path, "rb") as f:
+        f.seek(chunk.start)
+        text = f.read(chunk.end - chunk.start).decode("utf-8")
+
+    rows = csv.DictReader(io.StringIO(text, newline=""), fieldnames=fieldnames, delimiter=delimiter)
+    groups = list(group_rows(rows, catalog_format))
+
+    entries = []
+    for i, (code, group) in enumerate(groups):
+        if i == 0 or i == len(groups) - 1:
+            entries.append(("rows", code, group))
+        else:
+            product_data = build_product(group, catalog_format, categories)
+            entries.append(("product", code, analyze_product(product_data)))
+    return entries
+
+
+def _process_chunk_args(args: tuple) -> tuple[str, list[tuple]]:
+    chunk, categories = args
+    return chunk.path, process_chunk(chunk, categories)
+
+
+def process_catalog(
+    paths: list[str],
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    categories: Optional[list[str]] = None,
+) -> list[dict]:
+    """
+    Parse every file on a process pool and return product_data dicts in
+    file order (products keep the order of their first row).
+    """
+    chunks = [chunk for path in paths for chunk in split_file(path, chunk_bytes)]
+    jobs = [(chunk, categories) for chunk in chunks]
+    if workers == 1 or len(chunks) <= 1:
+        results = map(_process_chunk_args, jobs)
+        return _merge(results, categories)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() yields in submission order, which keeps the merge deterministic
+        return _merge(executor.map(_process_chunk_args, jobs), categories)
+
+
+def _merge(results: Iterable[tuple[str, list[tuple]]], categories: Optional[list[str]]) -> list[dict]:
+    formats: dict[str, str] = {}
+    products: list[dict] = []
+    pending: Optional[tuple[str, str, list[dict]]] = None  # (path, key, rows)
+
+    def flush():
+        nonlocal pending
+        if pending is not None:
+            path, _, rows = pending
+            products.append(analyze_product(build_product(rows, formats[path], categories)))
+            pending = None
+
+    for path, entries in results:
+        if path not in formats:
+            formats[path] = _header(path)[0]
+        for kind, key, value in entries:
+            if kind == "product":
+                flush()
+                products.append(value)
+            elif pending is not None and pending[0] == path and pending[1] == key:
+                pending[2].extend(value)
+            else:
+                flush()
+                pending = (path, key, list(value))
+    flush()
+    return products
+
+
+def _option_rows(product_data: dict) -> list[dict]:
+    info = product_data.get("product_info") or {}
+    ingredients = product_data.get("ingredients") or []
+    allergens = set(product_data.get("allergens") or [])
+    base = {
+        "original_item_link_href": info.get("source_url") or "",
+        "source_product_code": info.get("product_identifier") or "",
+        "base_product_name": info.get("name") or "",
+        "base_product_description_original": info.get("description") or "",
+        "base_product_main_image_url_original": info.get("image_url") or "",
+        "calculated_base_product_price": info.get("base_price") or "",
+        "original_ingredients_json": json.dumps([{"item_ingredients": n} for n in ingredients]),
+        "analyzed_ingredients_with_allergen_guess_json": json.dumps(
+            [{"name": n, "is_allergen_guess": n in allergens} for n in ingredients]
+        ),
+    }
+    options = product_data.get("options") or [{}]
+    rows = []
+    for option in options:
+        name = option.get("option_name") or ""
+        description = option.get("description")
+        if not description and name:
+            description = f"{info.get('description') or ''} This is the '{name}' option.".strip()
+        rows.append({
+            **base,
+            "option_name": name,
+            "option_price": option.get("price") or info.get("base_price") or "",
+            "option_specific_image_url": option.get("image_url") or "",
+            "synthesized_option_description": description or "",
+        })
+    return rows
+
+
+def write_processed_csv(products: Iterable[dict], path: str) -> int:
+    """Write one row per option in the processed_*_options.csv layout."""
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PROCESSED_COLUMNS, restval="")
+        writer.writeheader()
+        for product_data in products:
+            for row in _option_rows(product_data):
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Process catalog CSVs on a process pool")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / 1024 / 1024,
+                        help="Target size of the byte range each worker parses")
+    parser.add_argument("--category", action="append",
+                        help="Occasion category to attach to every product (repeatable)")
+    parser.add_argument("--out", help="Write product_data JSON lines here")
+    parser.add_argument("--processed-csv", help="Write the one-row-per-option CSV here")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Embed the products and store them on matching products rows")
+    parser.add_argument("--only-changed", action="store_true",
+                        help="With --backfill, skip products whose content hash is unchanged")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    products = process_catalog(
+        args.paths, args.workers, int(args.chunk_mb * 1024 * 1024), args.category
+    )
+    print(f"📦 {len(products)} products from {len(args.paths)} files "
+          f"in {time.perf_counter() - started:.2f}s ({args.workers} workers)", file=sys.stderr)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for product_data in products:
+                f.write(json.dumps(product_data, ensure_ascii=False) + "\n")
+    if args.processed_csv:
+        rows = write_processed_csv(products, args.processed_csv)
+        print(f"💾 {rows} option rows → {args.processed_csv}", file=sys.stderr)
+    if args.backfill:
+        import backfill_embeddings
+        from edible_tools.embedding_cache import EmbeddingCache
+
+        if not backfill_embeddings.init_clients():
+            raise SystemExit(1)
+        backfill_embeddings.backfill_catalog_embeddings(
+            products, cache=EmbeddingCache(), only_changed=args.only_changed
+        )
+
+
+if __name__ == "__main__":
+    main()
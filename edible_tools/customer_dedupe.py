@@ -0,0 +1,396 @@
+"""
+Bulk duplicate-account detection and merging for the customers table.
+
+Duplicates are only merged today when `customer-management` meets them on a
+live call (`handleDuplicateAccounts`), one phone/email pair per RPC, so the
+`chatbot_*@temp.local` accounts the voice flow created next to real ones
+are never merged unless that caller rings again. This job cleans up the
+whole table in one pass:
+
+1. Streams `customers` in keyset-paginated pages (`id > last`, by id), so
+   every page costs the same however deep the scan is.
+2. Blocks candidates by hash: every live account goes in a bucket for its
+   normalized phone and one for its normalized real email, and accounts
+   sharing a bucket are joined (union-find), so the grouping is linear in
+   the table size instead of comparing every pair.
+3. Picks a primary per group (auth user, then real email, then a name, then
+   the oldest) and pairs it with the members that share its phone or email.
+   A member linked only through another member (X and Y share an email, Y
+   and Z a phone) is not merged into X; it is counted as `unlinked`.
+   The pairs go to `merge_customer_pairs`
+   (20250706_bulk_customer_dedupe.sql), a batch of whole groups per call,
+   `workers` calls at a time. Groups are disjoint, so batches never touch
+   the same account.
+
+Dry run is the default: the RPC runs only `check_merge_pair` and reports
+what would be merged and why the rest would not. `--apply` merges.
+
+Usage:
+    python -m edible_tools.customer_dedupe --customers 20000
+    python -m edible_tools.customer_dedupe --live
+    python -m edible_tools.customer_dedupe --live --apply --workers 4 --batch-size 100
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+TEMP_EMAIL_SUFFIX = "@temp.local"
+ARCHIVED_PREFIX = "archived_"
+CUSTOMER_COLUMNS = "id,phone,email,first_name,last_name,auth_user_id,created_at"
+MAX_PAIRS_PER_CALL = 500  # merge_customer_pairs refuses larger batches
+
+
+def is_temp_email(email: Optional[str]) -> bool:
+    return bool(email) and email.strip().lower().endswith(TEMP_EMAIL_SUFFIX)
+
+
+def is_archived(customer: dict) -> bool:
+    return (customer.get("email") or "").startswith(ARCHIVED_PREFIX)
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    E.164-style key for blocking: "(619) 555-0123", "619.555.0123" and
+    "+1 619 555 0123" all give "+16195550123". None when too short to be
+    a phone number.
+    """
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if phone.strip().startswith("+"):
+        return f"+{digits}" if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return f"+1{digits}"
+    if len(digits) == 11 and digits.startswith("1"):
+        return f"+{digits}"
+    return f"+{digits}" if 11 <= len(digits) <= 15 else None
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lower-cased real email; temp and archived addresses are not identities."""
+    if not email:
+        return None
+    email = email.strip().lower()
+    if "@" not in email or email.endswith(TEMP_EMAIL_SUFFIX) or email.startswith(ARCHIVED_PREFIX):
+        return None
+    return email
+
+
+def identity_blocks(customer: dict) -> set[tuple[str, str]]:
+    """The ("phone", key) / ("email", key) buckets an account is blocked under."""
+    blocks = {("phone", normalize_phone(customer.get("phone"))),
+              ("email", normalize_email(customer.get("email")))}
+    return {block for block in blocks if block[1] is not None}
+
+
+def primary_rank(customer: dict) -> tuple:
+    """Sort key: the account to keep comes first."""
+    return (
+        customer.get("auth_user_id") is None,
+        normalize_email(customer.get("email")) is None,
+        not (customer.get("first_name") or customer.get("last_name")),
+        customer.get("created_at") or "",
+        customer["id"],
+    )
+
+
+def check_merge_pair(primary: dict, secondary: dict) -> dict:
+    """Reference of the `check_merge_pair` RPC's rules, without order counts."""
+    if primary["id"] == secondary["id"]:
+        return {"can_merge": False, "reason": "same_account"}
+    if is_archived(primary) or is_archived(secondary):
+        return {"can_merge": False, "reason": "already_merged"}
+    for field, reason in (("first_name", "name_mismatch"), ("last_name", "lastname_mismatch")):
+        a, b = primary.get(field), secondary.get(field)
+        if a and b and a.lower() != b.lower():
+            return {"can_merge": False, "reason": reason}
+    a, b = primary.get("auth_user_id"), secondary.get("auth_user_id")
+    if a and b and a != b:
+        return {"can_merge": False, "reason": "auth_conflict"}
+    return {"can_merge": True, "merge_strategy": "bulk_dedupe"}
+
+
+class DuplicateIndex:
+    """
+    Hash blocking on normalized phone and email with union-find over the
+    accounts that share a block. Keeps only the columns the plan needs.
+    """
+
+    def __init__(self):
+        self.customers: dict[str, dict] = {}
+        self._block_owner: dict[tuple[str, str], str] = {}
+        self._parent: dict[str, str] = {}
+
+    def _find(self, customer_id: str) -> str:
+        root = customer_id
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[customer_id] != root:
+            self._parent[customer_id], customer_id = root, self._parent[customer_id]
+        return root
+
+    def _union(self, a: str, b: str) -> None:
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            self._parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def add(self, customer: dict) -> None:
+        if is_archived(customer):
+            return
+        customer_id = customer["id"]
+        self.customers[customer_id] = {
+            key: customer.get(key) for key in CUSTOMER_COLUMNS.split(",")
+        }
+        self._parent.setdefault(customer_id, customer_id)
+        for block in identity_blocks(customer):
+            owner = self._block_owner.setdefault(block, customer_id)
+            if owner != customer_id:
+                self._union(owner, customer_id)
+
+    def groups(self) -> list[list[dict]]:
+        """Groups of two or more accounts, primary first, largest first."""
+        by_root: dict[str, list[dict]] = {}
+        for customer_id, customer in self.customers.items():
+            by_root.setdefault(self._find(customer_id), []).append(customer)
+        groups = [sorted(members, key=primary_rank) for members in by_root.values() if len(members) > 1]
+        return sorted(groups, key=lambda g: (-len(g), g[0]["id"]))
+
+
+def merge_pairs(group: list[dict]) -> list[dict]:
+    """
+    The accounts of the group that share a phone or email with its primary,
+    merged into it in rank order. Groups are transitive, so other members
+    may share nothing with the primary; those are left alone.
+    """
+    primary = group[0]
+    shared = identity_blocks(primary)
+    return [{"primary_id": primary["id"], "secondary_id": other["id"]}
+            for other in group[1:] if identity_blocks(other) & shared]
+
+
+def iter_customer_pages(client, page_size: int = 1000) -> Iterator[list[dict]]:
+    """`customers` by id through PostgREST, one keyset page at a time."""
+    last_id = None
+    while True:
+        params = {"select": CUSTOMER_COLUMNS, "order": "id.asc", "limit": page_size}
+        if last_id is not None:
+            params["id"] = f"gt.{last_id}"
+        response = client.get("rest/v1/customers", params=params)
+        response.raise_for_status()
+        page = response.json()
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+class DedupeJob:
+    """Scan, group and merge (or dry-run) duplicate customer accounts."""
+
+    def __init__(
+        self,
+        client,
+        dry_run: bool = True,
+        batch_size: int = 100,
+        workers: int = 4,
+        page_size: int = 1000,
+        max_group: int = 10,
+        source: str = "bulk_dedupe",
+    ):
+        """
+        batch_size: pairs per `merge_customer_pairs` call; whole groups are
+            kept in one call.
+        max_group: larger groups (a shared placeholder phone, a front-desk
+            email) are reported for manual review instead of merged.
+        """
+        self.client = client
+        self.dry_run = dry_run
+        self.batch_size = min(batch_size, MAX_PAIRS_PER_CALL)
+        self.workers = workers
+        self.page_size = page_size
+        self.max_group = max_group
+        self.source = source
+        self._lock = threading.Lock()
+
+    def scan(self) -> tuple[DuplicateIndex, int]:
+        index = DuplicateIndex()
+        pages = 0
+        for page in iter_customer_pages(self.client, self.page_size):
+            pages += 1
+            for customer in page:
+                index.add(customer)
+        return index, pages
+
+    def batches(self, groups: list[list[dict]]) -> list[list[dict]]:
+        batches, current = [], []
+        for group in groups:
+            pairs = merge_pairs(group)
+            if current and len(current) + len(pairs) > self.batch_size:
+                batches.append(current)
+                current = []
+            current.extend(pairs)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _call(self, pairs: list[dict]) -> list[dict]:
+        response = self.client.rpc("merge_customer_pairs", {
+            "p_pairs": pairs, "p_source": self.source, "p_dry_run": self.dry_run,
+        })
+        response.raise_for_status()
+        return response.json()["results"]
+
+    def run(self) -> dict:
+        started = time.perf_counter()
+        index, pages = self.scan()
+        scanned = time.perf_counter()
+        groups = index.groups()
+        review = [g for g in groups if len(g) > self.max_group]
+        mergeable = [g for g in groups if len(g) <= self.max_group]
+        batches = self.batches(mergeable)
+        outcome = "mergeable" if self.dry_run else "merged"
+
+        stats = {
+            "dry_run": self.dry_run,
+            "customers": len(index.customers),
+            "pages": pages,
+            "groups": len(groups),
+            "manual_review_groups": len(review),
+            "pairs": sum(len(batch) for batch in batches),
+            "unlinked": sum(len(g) - 1 for g in mergeable) - sum(len(batch) for batch in batches),
+            outcome: 0,
+            "skipped": {},
+            "errors": 0,
+            "calls": len(batches),
+        }
+
+        def run_batch(pairs: list[dict]) -> None:
+            try:
+                results = self._call(pairs)
+            except Exception:
+                with self._lock:
+                    stats["errors"] += len(pairs)
+                return
+            with self._lock:
+                for result in results:
+                    if result.get("can_merge") or result.get("success"):
+                        stats[outcome] += 1
+                    elif result.get("error"):
+                        stats["errors"] += 1
+                    else:
+                        reason = result.get("reason") or "unknown"
+                        stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(run_batch, batches))
+
+        stats["scan_s"] = round(scanned - started, 2)
+        stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+        return stats
+
+
+def synthetic_customers(count: int, duplicate_rate: float = 0.2, seed: int = 7) -> list[dict]:
+    """
+    `count` web/phone accounts plus chatbot temp-email duplicates for
+    `duplicate_rate` of them, the phone written differently, and a few
+    households sharing a phone under different names.
+    """
+    rng = random.Random(seed)
+    first_names = ["Ana", "Ben", "Chloe", "Dev", "Eli", "Fatima", "Gus", "Hana", "Ivan", "Jo"]
+    customers = []
+    for i in range(count):
+        area, line = 200 + rng.randrange(700), rng.randrange(10_000_000)
+        phone = f"+1{area}{line:07d}"
+        first, last = rng.choice(first_names), f"Tester{i}"
+        customers.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "phone": phone,
+            "email": f"{first.lower()}.{last.lower()}@example.com",
+            "first_name": first,
+            "last_name": last,
+            "auth_user_id": str(uuid.UUID(int=rng.getrandbits(128))) if rng.random() < 0.5 else None,
+            "created_at": f"2025-01-{1 + i % 28:02d}T10:00:00",
+        })
+        roll = rng.random()
+        if roll < duplicate_rate:
+            customers.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "phone": f"({area}) {line // 10_000:03d}-{line % 10_000:04d}",
+                "email": f"chatbot_{1_749_000_000_000 + i}{TEMP_EMAIL_SUFFIX}",
+                "first_name": first if rng.random() < 0.5 else None,
+                "last_name": None,
+                "auth_user_id": None,
+                "created_at": f"2025-06-{1 + i % 28:02d}T10:00:00",
+            })
+        elif roll < duplicate_rate * 1.1:
+            customers.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "phone": phone,
+                "email": f"chatbot_{1_749_000_000_000 + i}{TEMP_EMAIL_SUFFIX}",
+                "first_name": "Someone",
+                "last_name": "Else",
+                "auth_user_id": None,
+                "created_at": f"2025-06-{1 + i % 28:02d}T10:00:00",
+            })
+    return customers
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Find and merge duplicate customer accounts in bulk")
+    parser.add_argument("--apply", action="store_true", help="Merge; without it the job is a dry run")
+    parser.add_argument("--batch-size", type=int, default=100, help="Pairs per merge_customer_pairs call")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent merge calls")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--max-group", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="Use SUPABASE_URL instead of a local stand-in")
+    parser.add_argument("--customers", type=int, default=5000, help="Synthetic accounts for the local stand-in")
+    args = parser.parse_args(argv)
+
+    from edible_tools.edge_client import EdgeClient
+
+    server = None
+    if args.live:
+        client = EdgeClient.from_env(pool_size=args.workers, retries=0)
+    else:
+        from edible_tools.local_edge import LocalEdgeServer
+        from edible_tools.local_services import LocalStore, customer_routes
+        from edible_tools.product_search import ProductSearchEngine
+        store = LocalStore(ProductSearchEngine([], {}, 8))
+        store.load_customers(synthetic_customers(args.customers))
+        server = LocalEdgeServer(customer_routes(store)).start()
+        client = EdgeClient(server.url, pool_size=args.workers, retries=0)
+
+    mode = "merging" if args.apply else "dry run"
+    print(f"🧭 Scanning customers ({mode}, {args.workers} workers, {args.batch_size} pairs per call)")
+    try:
+        job = DedupeJob(client, dry_run=not args.apply, batch_size=args.batch_size,
+                        workers=args.workers, page_size=args.page_size, max_group=args.max_group)
+        stats = job.run()
+    finally:
+        client.close()
+        if server is not None:
+            server.stop()
+
+    print(json.dumps(stats))
+    outcome, verb = ("merged", "merged") if args.apply else ("mergeable", "can be merged")
+    print(f"✅ {stats[outcome]} of {stats['pairs']} pairs {verb} in {stats['calls']} calls "
+          f"({stats['elapsed_s']}s)")
+    if stats["skipped"] or stats["manual_review_groups"]:
+        print(f"⚠️  Skipped {stats['skipped']}; {stats['manual_review_groups']} groups need manual review")
+    if stats["unlinked"]:
+        print(f"⚠️  {stats['unlinked']} accounts share no phone or email with their group's primary (not merged)")
+    if stats["errors"]:
+        print(f"❌ {stats['errors']} pairs failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Pooled keep-alive HTTP client for the Supabase edge functions and RPCs.
+
+Calling `requests.post` per request opens a fresh TCP (and TLS) connection
+and rebuilds the auth headers every time; in chatty flows like the merge
+tests that setup cost is most of the wall time. `EdgeClient` keeps one
+`requests.Session` with a connection pool, builds the headers once, applies
+per-endpoint timeouts, retries transient failures with jittered
+exponential backoff, and records how long every request took.
+
+Retries: idempotent methods retry on connection errors, timeouts and
+429/502/503/504. POSTs (orders, customer creation) only retry on 429 and
+503, where the server did not process the request, unless the call passes
+`retry=True`.
+
+Usage:
+    client = EdgeClient.from_env()
+    client.post_function("product-search", {"query": "chocolate"})
+    client.get_function("franchisee-inventory/find-nearest", {"zipCode": "92101"})
+    client.rpc("detect_phone_duplicates", {"p_phone": "+15551234567"})
+    print(client.timing_summary())
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.25
+MAX_BACKOFF = 5.0
+MAX_TIMINGS = 10_000
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# The server rejected these without doing the work, so even a POST is safe to resend
+NOT_PROCESSED_STATUSES = frozenset({429, 503})
+
+
+@dataclass
+class RequestTiming:
+    method: str
+    endpoint: str
+    status: Optional[int]
+    elapsed_ms: float
+    attempts: int
+    error: Optional[str] = None
+
+
+def endpoint_name(path: str) -> str:
+    """'functions/v1/franchisee-inventory/find-nearest' → 'franchisee-inventory'."""
+    parts = [p for p in urlparse(path).path.split("/") if p]
+    if parts[:2] == ["functions", "v1"] and len(parts) > 2:
+        return parts[2]
+    if parts[:3] == ["rest", "v1", "rpc"] and len(parts) > 3:
+        return f"rpc/{parts[3]}"
+    if parts[:2] == ["rest", "v1"] and len(parts) > 2:
+        return f"rest/{parts[2]}"
+    return "/".join(parts)
+
+
+class EdgeClient:
+    """Thread-safe pooled client for `<base_url>/functions/v1` and `/rest/v1`."""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        timeouts: Optional[dict[str, float]] = None,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        clock=time.perf_counter,
+        sleep=time.sleep,
+    ):
+        """
+        pool_size: connections kept alive (and the most used at once).
+        timeouts: seconds per endpoint name (see `endpoint_name`), e.g.
+            {"product-search": 30, "rpc/merge_customer_accounts": 60}.
+        retries: extra attempts after the first one.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.retries = retries
+        self.backoff = backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.timings: deque[RequestTiming] = deque(maxlen=MAX_TIMINGS)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        if api_key:
+            self.session.headers.update({"apikey": api_key, "Authorization": f"Bearer {api_key}"})
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "EdgeClient":
+        """SUPABASE_URL and the service key from the environment / .env.local."""
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path='.env.local')
+        base_url = os.environ.get("SUPABASE_URL")
+        if not base_url:
+            raise ValueError("SUPABASE_URL is not set")
+        api_key = os.environ.get("SUPABASE_SERVICE_KEY") or os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        return cls(base_url, api_key, **kwargs)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        json=None,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        retry: Optional[bool] = None,
+    ) -> requests.Response:
+        """
+        Send `method` to `<base_url>/<path>` (or to `path` when it is a full
+        URL) with retries. `headers` are added to the shared ones. Returns the last
+        response (which may be an error status); raises the last
+        `requests.RequestException` when no attempt got a response.
+        """
+        method = method.upper()
+        endpoint = endpoint_name(path)
+        if timeout is None:
+            timeout = self.timeouts.get(endpoint, self.timeout)
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if retry else NOT_PROCESSED_STATUSES
+        url = path if "://" in path else f"{self.base_url}/{path.lstrip('/')}"
+
+        started = self._clock()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self.session.request(
+                    method, url, json=json, params=params, headers=headers, timeout=timeout
+                )
+            except requests.RequestException as e:
+                if not retry or attempt > self.retries:
+                    self._record(method, endpoint, None, started, attempt, type(e).__name__)
+                    raise
+                self._sleep(self._delay(attempt))
+                continue
+            if response.status_code in retry_statuses and attempt <= self.retries:
+                self._sleep(self._delay(attempt, response.headers.get("Retry-After")))
+                continue
+            self._record(method, endpoint, response.status_code, started, attempt)
+            return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def post_function(self, name: str, payload: Optional[dict] = None, **kwargs) -> requests.Response:
+        return self.request("POST", f"functions/v1/{name}", json=payload, **kwargs)
+
+    def get_function(self, name: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+        return self.request("GET", f"functions/v1/{name}", params=params, **kwargs)
+
+    def rpc(self, name: str, params: Optional[dict] = None, **kwargs) -> requests.Response:
+        """Call a Postgres function through PostgREST (`/rest/v1/rpc/<name>`)."""
+        return self.request("POST", f"rest/v1/rpc/{name}", json=params or {}, **kwargs)
+
+    def timing_summary(self) -> dict[str, dict]:
+        """Per-endpoint request count, errors, retries and latency percentiles."""
+        with self._lock:
+            timings = list(self.timings)
+        by_endpoint: dict[str, list[RequestTiming]] = {}
+        for timing in timings:
+            by_endpoint.setdefault(timing.endpoint, []).append(timing)
+
+        summary = {}
+        for endpoint, items in by_endpoint.items():
+            latencies = np.array([t.elapsed_ms for t in items])
+            summary[endpoint] = {
+                "requests": len(items),
+                "errors": sum(1 for t in items if t.error or (t.status or 0) >= 500),
+                "retries": sum(t.attempts - 1 for t in items),
+                "mean_ms": round(float(latencies.mean()), 3),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                "max_ms": round(float(latencies.max()), 3),
+            }
+        return summary
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "EdgeClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when given."""
+        if retry_after:
+            try:
+                return min(float(retry_after), MAX_BACKOFF)
+            except ValueError:
+                pass
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** (attempt - 1)))
+
+    def _record(self, method, endpoint, status, started, attempts, error=None) -> None:
+        timing = RequestTiming(method, endpoint, status, (self._clock() - started) * 1000, attempts, error)
+        with self._lock:
+            self.timings.append(timing)
+
+
+_shared: dict[tuple[str, Optional[str]], EdgeClient] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(base_url: str, api_key: Optional[str] = None, **kwargs) -> EdgeClient:
+    """One process-wide client per (base_url, api_key), so helpers reuse its pool."""
+    key = (base_url.rstrip("/"), api_key)
+    with _shared_lock:
+        client = _shared.get(key)
+        if client is None:
+            client = _shared[key] = EdgeClient(base_url, api_key, **kwargs)
+        return client
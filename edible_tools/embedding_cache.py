@@ -0,0 +1,185 @@
+"""
+Persistent content-hash cache for embeddings.
+
+Vectors are keyed by a SHA-256 of (model, dimensions, text), so a product is
+only re-embedded when the text produced by `generate_text_for_embedding`
+actually changes. The store is a single SQLite file of packed float32
+blobs; when it grows past `max_entries` the least recently used vectors are
+evicted.
+
+The same file also remembers which content hash was last written for each
+product, which is what `backfill_embeddings.py --only-changed` compares
+against.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from edible_tools.vectors import EMBEDDING_DTYPE
+
+DEFAULT_CACHE_PATH = ".cache/embeddings.sqlite3"
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+def embedding_cache_key(model: str, dimensions: int, text: str) -> str:
+    """Stable cache key for one embedding input."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(dimensions).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _pack(embedding) -> bytes:
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def _unpack(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store with size-bounded LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock=time.time,
+    ):
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS product_hashes (
+                product_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, np.ndarray]:
+        """Return cached vectors for the given keys and refresh their LRU stamp."""
+        keys = list(dict.fromkeys(keys))
+        found: dict[str, np.ndarray] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _unpack(blob)
+
+            if found:
+                now = self._clock()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, entries: dict) -> None:
+        """Store vectors and evict the least recently used ones past `max_entries`."""
+        if not entries:
+            return
+        now = self._clock()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dimensions, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (key, len(embedding), _pack(embedding), now)
+                    for key, embedding in entries.items()
+                ],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, embedding) -> None:
+        self.put_many({key: embedding})
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def get_product_hash(self, product_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM product_hashes WHERE product_id = ?",
+                (str(product_id),),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_product_hashes(self, hashes: dict[str, str]) -> None:
+        """Record the content hash whose embedding was written for each product."""
+        if not hashes:
+            return
+        now = self._clock()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO product_hashes (product_id, content_hash, updated_at) "
+                "VALUES (?, ?, ?)",
+                [(str(pid), content_hash, now) for pid, content_hash in hashes.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,816 @@
+"""
+Incremental refresh of the chatbot_*_flat tables.
+
+The voice functions read products, orders, stores and customers from four
+denormalized tables. `createChatbotFlatRecord` writes customer rows by hand
+and the other tables are rebuilt as a whole, so a price or stock change is
+either missing from the flat rows or costs a full rebuild. Most source
+tables have no `updated_at` to diff by, so changes are tracked in a change
+log instead: row triggers (migration `20250707_flat_refresh_queue.sql`)
+queue the flat keys a change affects in `flat_refresh_queue`.
+
+`FlatRefresher` has three modes:
+
+- `refresh()`: read the queue, rebuild only the queued rows in batches
+  (one embedded PostgREST select per batch), upsert them, delete rows whose
+  source is gone, and acknowledge the entries. An entry queued again while
+  its batch was in flight keeps its newer `queued_at` and is refreshed on
+  the next pass. `watch()` runs it every few seconds.
+- `rebuild()`: every row of a flat table, by keyset pages of source ids.
+- `check()`: rebuild in memory and diff against the stored rows; reports
+  missing, stale and orphaned rows, and repairs them with `fix=True`.
+
+The builders are pure functions of the embedded source rows, shared by all
+three modes, so a check after a refresh or rebuild finds nothing to fix.
+
+Usage:
+    python -m edible_tools.flat_refresh --products 20000
+    python -m edible_tools.flat_refresh --live
+    python -m edible_tools.flat_refresh --live --watch 2
+    python -m edible_tools.flat_refresh --live --full --table chatbot_products_flat
+    python -m edible_tools.flat_refresh --live --check --fix
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
+
+from edible_tools.allergens import allergen_mask
+from edible_tools.auth_sync import IN_FILTER_CHUNK, _chunks, _in_filter
+
+ALL_ROWS = "00000000-0000-0000-0000-000000000000"  # queued by addon changes
+REFRESH_BATCH_SIZE = 200
+QUEUE_READ_SIZE = 2000
+ORDER_HISTORY_LIMIT = 10
+
+
+def _price(value) -> Optional[str]:
+    return f"{float(value):.2f}" if value is not None else None
+
+
+def build_product_data(product: dict, addons: list[dict]) -> dict:
+    """product_data from a products row with its options, categories and ingredients embedded."""
+    ingredients = [link["ingredients"] for link in product.get("product_ingredients") or [] if link.get("ingredients")]
+    allergens = sorted(i["name"] for i in ingredients if i.get("is_allergen"))
+    options = [
+        {
+            "id": option["id"],
+            "option_name": option.get("option_name"),
+            "price": _price(option.get("price")),
+            "description": option.get("description"),
+            "image_url": option.get("image_url"),
+        }
+        for option in product.get("product_options") or []
+        if option.get("is_available", True)
+    ]
+    categories = [
+        {"name": link["categories"]["name"], "type": link["categories"].get("type")}
+        for link in product.get("product_categories") or [] if link.get("categories")
+    ]
+    return {
+        "product_info": {
+            "id": product["id"],
+            "product_identifier": str(product["product_identifier"]),
+            "name": product.get("name"),
+            "description": product.get("description"),
+            "base_price": _price(product.get("base_price")),
+            "image_url": product.get("image_url"),
+            "is_active": product.get("is_active", True),
+        },
+        "options": sorted(options, key=lambda o: (o["option_name"] or "", o["id"])),
+        "categories": sorted(categories, key=lambda c: c["name"]),
+        "ingredients": sorted(i["name"] for i in ingredients),
+        "allergens": allergens,
+        "allergen_mask": allergen_mask(allergens),
+        "addons": [
+            {"id": addon["id"], "name": addon["name"], "price": _price(addon.get("price"))}
+            for addon in sorted(addons, key=lambda a: a["name"])
+        ],
+    }
+
+
+def build_franchisee_data(franchisee: dict, addons: list[dict] = ()) -> dict:
+    """franchisee_data from a franchisees row with its delivery zone and inventory embedded."""
+    zones = franchisee.get("delivery_zones") or []
+    zone = zones[0] if isinstance(zones, list) and zones else (zones or None)
+    return {
+        "franchisee_info": {
+            key: franchisee.get(key)
+            for key in ("id", "store_number", "name", "email", "phone", "address",
+                        "city", "state", "zip_code", "is_active", "operating_hours")
+        },
+        "delivery_zone": {
+            "zip_codes": sorted(zone.get("zip_codes") or []),
+            "delivery_fee": _price(zone.get("delivery_fee")),
+            "min_order_amount": _price(zone.get("min_order_amount")),
+        } if zone else None,
+        # product_id -> units on hand
+        "inventory": {
+            row["product_id"]: row.get("quantity_available") or 0
+            for row in franchisee.get("inventory") or []
+        },
+    }
+
+
+def build_order_data(order: dict, addons: list[dict] = ()) -> dict:
+    """order_data from an orders row with customer, store, address and items embedded."""
+    items = []
+    for item in order.get("order_items") or []:
+        product = item.get("products") or {}
+        option = item.get("product_options") or {}
+        items.append({
+            "product_name": product.get("name"),
+            "product_identifier": str(product["product_identifier"]) if product.get("product_identifier") else None,
+            "option_name": option.get("option_name"),
+            "quantity": item.get("quantity"),
+            "unit_price": _price(item.get("unit_price")),
+            "total_price": _price(item.get("total_price")),
+            "addons": sorted(
+                ({"name": (addon.get("addons") or {}).get("name"), "quantity": addon.get("quantity"),
+                  "unit_price": _price(addon.get("unit_price"))}
+                 for addon in item.get("order_addons") or []),
+                key=lambda a: a["name"] or "",
+            ),
+        })
+    customer = order.get("customers") or {}
+    store = order.get("franchisees") or {}
+    address = order.get("recipient_addresses")
+    return {
+        "order_info": {
+            "id": order["id"],
+            "order_number": order.get("order_number"),
+            "status": order.get("status"),
+            "fulfillment_type": order.get("fulfillment_type"),
+            "subtotal": _price(order.get("subtotal")),
+            "tax_amount": _price(order.get("tax_amount")),
+            "total_amount": _price(order.get("total_amount")),
+            "scheduled_date": order.get("scheduled_date"),
+            "scheduled_time_slot": order.get("scheduled_time_slot"),
+            "special_instructions": order.get("special_instructions"),
+            "created_at": order.get("created_at"),
+        },
+        "customer_info": {key: customer.get(key) for key in ("first_name", "last_name", "email", "phone")},
+        "store_info": {key: store.get(key) for key in ("store_number", "name", "phone")},
+        "items": sorted(items, key=lambda i: (i["product_identifier"] or "", i["option_name"] or "")),
+        "delivery_info": {
+            "recipient_name": address.get("recipient_name"),
+            "recipient_phone": address.get("recipient_phone"),
+            "address": ", ".join(filter(None, (address.get("street_address"), address.get("city"),
+                                               address.get("state"), address.get("zip_code")))),
+            "instructions": address.get("delivery_instructions"),
+        } if address else None,
+    }
+
+
+def build_customer_data(customer: dict, addons: list[dict] = ()) -> dict:
+    """customer_data from a customers row with its orders embedded; same shape as createChatbotFlatRecord."""
+    orders = sorted(customer.get("orders") or [], key=lambda o: (o.get("created_at") or "", o["id"]), reverse=True)
+    return {
+        "customer_info": {key: customer.get(key) for key in ("first_name", "last_name", "email", "phone", "allergies")},
+        "order_history": [
+            {
+                "order_id": order["id"],
+                "order_number": order.get("order_number"),
+                "status": order.get("status"),
+                "total_amount": _price(order.get("total_amount")),
+                "created_at": order.get("created_at"),
+            }
+            for order in orders[:ORDER_HISTORY_LIMIT]
+        ],
+        "account_sources": (customer.get("preferences") or {}).get("account_sources") or [],
+    }
+
+
+@dataclass(frozen=True)
+class FlatTable:
+    name: str
+    key: str  # primary key of the flat table, the source row's id
+    data: str  # JSONB column
+    source: str
+    select: str  # PostgREST select that embeds everything `build` reads
+    build: Callable[[dict, list], dict]
+
+
+FLAT_TABLES = {
+    flat.name: flat
+    for flat in (
+        FlatTable(
+            "chatbot_products_flat", "product_id", "product_data", "products",
+            "id,product_identifier,name,description,base_price,image_url,is_active,"
+            "product_options(id,option_name,price,description,image_url,is_available),"
+            "product_categories(categories(name,type)),"
+            "product_ingredients(ingredients(name,is_allergen))",
+            build_product_data,
+        ),
+        FlatTable(
+            "chatbot_franchisees_flat", "franchisee_id", "franchisee_data", "franchisees",
+            "*,delivery_zones(zip_codes,delivery_fee,min_order_amount),inventory(product_id,quantity_available)",
+            build_franchisee_data,
+        ),
+        FlatTable(
+            "chatbot_orders_flat", "order_id", "order_data", "orders",
+            "*,customers(first_name,last_name,email,phone),franchisees(store_number,name,phone),"
+            "recipient_addresses(*),order_items(quantity,unit_price,total_price,"
+            "products(name,product_identifier),product_options(option_name),"
+            "order_addons(quantity,unit_price,addons(name)))",
+            build_order_data,
+        ),
+        FlatTable(
+            "chatbot_customers_flat", "customer_id", "customer_data", "customers",
+            "id,first_name,last_name,email,phone,allergies,preferences,"
+            "orders(id,order_number,status,total_amount,created_at)",
+            build_customer_data,
+        ),
+    )
+}
+
+# Which flat keys a change to a source row affects; mirrors the triggers in
+# 20250707_flat_refresh_queue.sql. (flat table, column holding the key or
+# "*" for every row, optional (link table, link column, link key column))
+CHANGE_ROUTES = {
+    "products": [("chatbot_products_flat", "id", None)],
+    "product_options": [("chatbot_products_flat", "product_id", None)],
+    "product_categories": [("chatbot_products_flat", "product_id", None)],
+    "product_ingredients": [("chatbot_products_flat", "product_id", None)],
+    "categories": [("chatbot_products_flat", "id", ("product_categories", "category_id", "product_id"))],
+    "ingredients": [("chatbot_products_flat", "id", ("product_ingredients", "ingredient_id", "product_id"))],
+    "addons": [("chatbot_products_flat", "*", None)],
+    "franchisees": [("chatbot_franchisees_flat", "id", None)],
+    "delivery_zones": [("chatbot_franchisees_flat", "franchisee_id", None)],
+    "inventory": [("chatbot_franchisees_flat", "franchisee_id", None)],
+    "orders": [("chatbot_orders_flat", "id", None), ("chatbot_customers_flat", "customer_id", None)],
+    "order_items": [("chatbot_orders_flat", "order_id", None)],
+    "order_addons": [("chatbot_orders_flat", "order_item_id", ("order_items", "id", "order_id"))],
+    "recipient_addresses": [("chatbot_orders_flat", "id", ("orders", "recipient_address_id", "id"))],
+    "customers": [("chatbot_customers_flat", "id", None),
+                  ("chatbot_orders_flat", "id", ("orders", "customer_id", "id"))],
+}
+
+# Composite keys of the link tables; every other table is keyed by id
+_ROW_KEYS = {
+    "product_categories": ("product_id", "category_id"),
+    "product_ingredients": ("product_id", "ingredient_id"),
+}
+
+
+class RestTables:
+    """Source tables, flat tables and the refresh queue through PostgREST."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _get(self, path: str, params: dict) -> list[dict]:
+        response = self.client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def addons(self) -> list[dict]:
+        return self._get("rest/v1/addons", {"select": "id,name,price", "is_active": "eq.true"})
+
+    def source_ids(self, flat: FlatTable, after: Optional[str], limit: int) -> list[str]:
+        params = {"select": "id", "order": "id.asc", "limit": limit}
+        if after is not None:
+            params["id"] = f"gt.{after}"
+        return [row["id"] for row in self._get(f"rest/v1/{flat.source}", params)]
+
+    def fetch_sources(self, flat: FlatTable, ids: list[str]) -> list[dict]:
+        rows = []
+        for chunk in _chunks(ids, IN_FILTER_CHUNK):
+            rows.extend(self._get(f"rest/v1/{flat.source}", {"select": flat.select, "id": _in_filter(chunk)}))
+        return rows
+
+    def flat_keys(self, flat: FlatTable, after: Optional[str], limit: int) -> list[str]:
+        params = {"select": flat.key, "order": f"{flat.key}.asc", "limit": limit}
+        if after is not None:
+            params[flat.key] = f"gt.{after}"
+        return [row[flat.key] for row in self._get(f"rest/v1/{flat.name}", params)]
+
+    def fetch_flat(self, flat: FlatTable, keys: list[str]) -> dict[str, dict]:
+        stored = {}
+        for chunk in _chunks(keys, IN_FILTER_CHUNK):
+            params = {"select": f"{flat.key},{flat.data}", flat.key: _in_filter(chunk)}
+            for row in self._get(f"rest/v1/{flat.name}", params):
+                stored[row[flat.key]] = row[flat.data]
+        return stored
+
+    def upsert(self, flat: FlatTable, rows: list[dict]) -> None:
+        if not rows:
+            return
+        response = self.client.post(
+            f"rest/v1/{flat.name}",
+            params={"on_conflict": flat.key},
+            json=rows,
+            headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+        )
+        response.raise_for_status()
+
+    def delete(self, flat: FlatTable, keys: list[str]) -> None:
+        for chunk in _chunks(keys, IN_FILTER_CHUNK):
+            self.client.delete(f"rest/v1/{flat.name}", params={flat.key: _in_filter(chunk)}).raise_for_status()
+
+    def pending(self, flat: FlatTable, limit: int) -> list[dict]:
+        return self._get("rest/v1/flat_refresh_queue", {
+            "select": "entity_id,queued_at",
+            "flat_table": f"eq.{flat.name}",
+            "order": "queued_at.asc",
+            "limit": limit,
+        })
+
+    def ack(self, flat: FlatTable, entries: list[dict]) -> None:
+        response = self.client.rpc("ack_flat_refresh", {"p_flat_table": flat.name, "p_entries": entries})
+        response.raise_for_status()
+
+
+class MemoryTables:
+    """
+    In-memory stand-in for `RestTables`: the normalized tables, the flat
+    tables and a refresh queue fed by `CHANGE_ROUTES`, as the triggers feed
+    the real one. Used by the CLI's local mode and the tests.
+    """
+
+    def __init__(self, tables: Optional[dict[str, list[dict]]] = None):
+        self.tables: dict[str, dict[tuple, dict]] = {}
+        self._index: dict[tuple[str, str], dict[str, set]] = {}
+        self.flat: dict[str, dict[str, dict]] = {name: {} for name in FLAT_TABLES}
+        self.queue: dict[str, dict[str, int]] = {name: {} for name in FLAT_TABLES}
+        self._tick = itertools.count(1)
+        self._lock = threading.Lock()
+        for table, rows in (tables or {}).items():
+            for row in rows:
+                self._put(table, row)
+
+    def _row_key(self, table: str, row: dict) -> tuple:
+        return tuple(row[column] for column in _ROW_KEYS.get(table, ("id",)))
+
+    def _put(self, table: str, row: dict) -> Optional[dict]:
+        key = self._row_key(table, row)
+        old = self._drop(table, key)
+        self.tables.setdefault(table, {})[key] = row
+        for column, value in row.items():
+            if column.endswith("id") and value is not None:
+                self._index.setdefault((table, column), {}).setdefault(value, set()).add(key)
+        return old
+
+    def _drop(self, table: str, key: tuple) -> Optional[dict]:
+        old = self.tables.get(table, {}).pop(key, None)
+        if old is not None:
+            for column, value in old.items():
+                if column.endswith("id") and value is not None:
+                    self._index[(table, column)][value].discard(key)
+        return old
+
+    def _where(self, table: str, column: str, value) -> list[dict]:
+        rows = self.tables.get(table, {})
+        return [rows[key] for key in self._index.get((table, column), {}).get(value, ())]
+
+    def _get(self, table: str, row_id) -> Optional[dict]:
+        return self.tables.get(table, {}).get((row_id,))
+
+    def _enqueue(self, table: str, rows: Iterable[dict]) -> None:
+        for flat_name, column, link in CHANGE_ROUTES.get(table, []):
+            if column == "*":
+                keys = {ALL_ROWS}
+            else:
+                keys = {row[column] for row in rows if row.get(column) is not None}
+            if link is not None:
+                link_table, link_column, link_key = link
+                keys = {linked[link_key] for key in keys for linked in self._where(link_table, link_column, key)
+                        if linked.get(link_key) is not None}
+            for key in keys:
+                self.queue[flat_name][key] = next(self._tick)
+
+    def write(self, table: str, row: dict) -> None:
+        """Insert or update a source row and queue what it affects, like the triggers."""
+        with self._lock:
+            old = self._put(table, row)
+            self._enqueue(table, [row] + ([old] if old else []))
+
+    def remove(self, table: str, row: dict) -> None:
+        with self._lock:
+            old = self._drop(table, self._row_key(table, row))
+            if old is not None:
+                self._enqueue(table, [old])
+
+    def _embed(self, flat: FlatTable, row: dict) -> dict:
+        """The row as `flat.select` returns it from PostgREST."""
+        if flat.source == "products":
+            return {
+                **row,
+                "product_options": self._where("product_options", "product_id", row["id"]),
+                "product_categories": [{"categories": self._get("categories", link["category_id"])}
+                                       for link in self._where("product_categories", "product_id", row["id"])],
+                "product_ingredients": [{"ingredients": self._get("ingredients", link["ingredient_id"])}
+                                        for link in self._where("product_ingredients", "product_id", row["id"])],
+            }
+        if flat.source == "franchisees":
+            return {
+                **row,
+                "delivery_zones": self._where("delivery_zones", "franchisee_id", row["id"]),
+                "inventory": self._where("inventory", "franchisee_id", row["id"]),
+            }
+        if flat.source == "orders":
+            return {
+                **row,
+                "customers": self._get("customers", row.get("customer_id")),
+                "franchisees": self._get("franchisees", row.get("franchisee_id")),
+                "recipient_addresses": self._get("recipient_addresses", row.get("recipient_address_id")),
+                "order_items": [
+                    {
+                        **item,
+                        "products": self._get("products", item.get("product_id")),
+                        "product_options": self._get("product_options", item.get("product_option_id")),
+                        "order_addons": [{**addon, "addons": self._get("addons", addon.get("addon_id"))}
+                                         for addon in self._where("order_addons", "order_item_id", item["id"])],
+                    }
+                    for item in self._where("order_items", "order_id", row["id"])
+                ],
+            }
+        return {**row, "orders": self._where("orders", "customer_id", row["id"])}
+
+    def addons(self) -> list[dict]:
+        with self._lock:
+            return [addon for addon in self.tables.get("addons", {}).values() if addon.get("is_active", True)]
+
+    def source_ids(self, flat: FlatTable, after: Optional[str], limit: int) -> list[str]:
+        with self._lock:
+            ids = sorted(key[0] for key in self.tables.get(flat.source, {}))
+        return [i for i in ids if after is None or i > after][:limit]
+
+    def fetch_sources(self, flat: FlatTable, ids: list[str]) -> list[dict]:
+        with self._lock:
+            return [self._embed(flat, row) for row in (self._get(flat.source, i) for i in ids) if row]
+
+    def flat_keys(self, flat: FlatTable, after: Optional[str], limit: int) -> list[str]:
+        with self._lock:
+            keys = sorted(self.flat[flat.name])
+        return [k for k in keys if after is None or k > after][:limit]
+
+    def fetch_flat(self, flat: FlatTable, keys: list[str]) -> dict[str, dict]:
+        with self._lock:
+            stored = self.flat[flat.name]
+            return {key: stored[key][flat.data] for key in keys if key in stored}
+
+    def upsert(self, flat: FlatTable, rows: list[dict]) -> None:
+        with self._lock:
+            for row in rows:
+                self.flat[flat.name][row[flat.key]] = json.loads(json.dumps(row))
+
+    def delete(self, flat: FlatTable, keys: list[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self.flat[flat.name].pop(key, None)
+
+    def pending(self, flat: FlatTable, limit: int) -> list[dict]:
+        with self._lock:
+            queued = sorted(self.queue[flat.name].items(), key=lambda item: item[1])[:limit]
+        return [{"entity_id": key, "queued_at": tick} for key, tick in queued]
+
+    def ack(self, flat: FlatTable, entries: list[dict]) -> None:
+        with self._lock:
+            queue = self.queue[flat.name]
+            for entry in entries:
+                if queue.get(entry["entity_id"], entry["queued_at"] + 1) <= entry["queued_at"]:
+                    del queue[entry["entity_id"]]
+
+
+class FlatRefresher:
+    """Incremental refresh, full rebuild and consistency check over `RestTables` or `MemoryTables`."""
+
+    def __init__(self, db, batch_size: int = REFRESH_BATCH_SIZE, workers: int = 4,
+                 queue_read_size: int = QUEUE_READ_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.workers = workers
+        self.queue_read_size = queue_read_size
+
+    @staticmethod
+    def _tables(names: Optional[Iterable[str]]) -> list[FlatTable]:
+        return [FLAT_TABLES[name] for name in names] if names else list(FLAT_TABLES.values())
+
+    def _build(self, flat: FlatTable, ids: list[str], addons: list[dict]) -> tuple[list[dict], list[str]]:
+        """(flat rows for the ids that exist, ids whose source row is gone)."""
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {flat.key: source["id"], flat.data: flat.build(source, addons), "last_updated": now}
+            for source in self.db.fetch_sources(flat, ids)
+        ]
+        found = {row[flat.key] for row in rows}
+        return rows, [i for i in ids if i not in found]
+
+    def _write_batch(self, flat: FlatTable, ids: list[str], addons: list[dict]) -> tuple[int, int]:
+        rows, gone = self._build(flat, ids, addons)
+        self.db.upsert(flat, rows)
+        if gone:
+            self.db.delete(flat, gone)
+        return len(rows), len(gone)
+
+    def _run_batches(self, flat: FlatTable, batches: list[list[str]], addons: list[dict], stats: dict) -> list[bool]:
+        """Write each batch, in parallel; True for the batches that succeeded."""
+        def run(batch):
+            try:
+                return self._write_batch(flat, batch, addons)
+            except Exception:
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            outcomes = list(pool.map(run, batches))
+        for outcome in outcomes:
+            if outcome is None:
+                stats["errors"] += 1
+            else:
+                stats["upserted"] += outcome[0]
+                stats["deleted"] += outcome[1]
+        return [outcome is not None for outcome in outcomes]
+
+    def _iter_source_batches(self, flat: FlatTable) -> Iterator[list[str]]:
+        after = None
+        while True:
+            ids = self.db.source_ids(flat, after, self.batch_size)
+            if not ids:
+                return
+            yield ids
+            after = ids[-1]
+
+    def _orphans(self, flat: FlatTable) -> list[str]:
+        """Flat keys whose source row no longer exists."""
+        orphans, after = [], None
+        while True:
+            keys = self.db.flat_keys(flat, after, self.batch_size)
+            if not keys:
+                return orphans
+            found = {row["id"] for row in self.db.fetch_sources(flat, keys)}
+            orphans.extend(key for key in keys if key not in found)
+            after = keys[-1]
+
+    def _rebuild_table(self, flat: FlatTable, addons: list[dict], stats: dict) -> None:
+        batches = self._iter_source_batches(flat)
+        while group := list(itertools.islice(batches, self.workers)):
+            self._run_batches(flat, group, addons, stats)
+        orphans = self._orphans(flat)
+        if orphans:
+            self.db.delete(flat, orphans)
+            stats["deleted"] += len(orphans)
+
+    @staticmethod
+    def _new_stats() -> dict:
+        return {"upserted": 0, "deleted": 0, "errors": 0}
+
+    def refresh(self, tables: Optional[Iterable[str]] = None) -> dict:
+        """Rebuild the queued rows of each flat table until its queue is empty (or a batch fails)."""
+        started = time.perf_counter()
+        report = {}
+        for flat in self._tables(tables):
+            stats = {**self._new_stats(), "acknowledged": 0, "full_rebuild": False}
+            while True:
+                entries = self.db.pending(flat, self.queue_read_size)
+                if not entries:
+                    break
+                # Read after the queue: an addon change queued before this read
+                # is then in the addons the rows are built from, not lost on ack
+                addons = self.db.addons()
+                if any(entry["entity_id"] == ALL_ROWS for entry in entries):
+                    errors = stats["errors"]
+                    self._rebuild_table(flat, addons, stats)
+                    stats["full_rebuild"] = True
+                    done = entries if stats["errors"] == errors else []
+                else:
+                    batches = list(_chunks(entries, self.batch_size))
+                    ok = self._run_batches(flat, [[e["entity_id"] for e in b] for b in batches], addons, stats)
+                    done = [entry for batch, good in zip(batches, ok) if good for entry in batch]
+                if done:
+                    self.db.ack(flat, done)
+                    stats["acknowledged"] += len(done)
+                if len(done) < len(entries):
+                    break  # leave the failed entries queued for the next pass
+            report[flat.name] = stats
+        report["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def rebuild(self, tables: Optional[Iterable[str]] = None) -> dict:
+        """Rebuild every row of each flat table and drop orphaned ones."""
+        started = time.perf_counter()
+        addons = self.db.addons()
+        report = {}
+        for flat in self._tables(tables):
+            stats = self._new_stats()
+            self._rebuild_table(flat, addons, stats)
+            report[flat.name] = stats
+        report["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def check(self, tables: Optional[Iterable[str]] = None, fix: bool = False, sample: int = 10) -> dict:
+        """
+        Diff stored flat rows against freshly built ones.
+
+        Per table: counts of rows checked, "missing" (source row without a
+        flat row), "stale" (flat row differs from the rebuilt one) and
+        "orphaned" (flat row without a source row), with a few keys of each.
+        `fix=True` rewrites the missing and stale rows and deletes orphans.
+        """
+        started = time.perf_counter()
+        addons = self.db.addons()
+        report = {}
+        for flat in self._tables(tables):
+            result = {"checked": 0, "missing": 0, "stale": 0, "orphaned": 0, "sample": {}}
+            for ids in self._iter_source_batches(flat):
+                rows, _ = self._build(flat, ids, addons)
+                stored = self.db.fetch_flat(flat, ids)
+                repairs = []
+                for row in rows:
+                    key = row[flat.key]
+                    current = stored.get(key)
+                    kind = "missing" if current is None else "stale" if current != row[flat.data] else None
+                    if kind:
+                        result[kind] += 1
+                        result["sample"].setdefault(kind, [])
+                        if len(result["sample"][kind]) < sample:
+                            result["sample"][kind].append(key)
+                        repairs.append(row)
+                result["checked"] += len(rows)
+                if fix:
+                    self.db.upsert(flat, repairs)
+            orphans = self._orphans(flat)
+            result["orphaned"] = len(orphans)
+            if orphans:
+                result["sample"]["orphaned"] = orphans[:sample]
+                if fix:
+                    self.db.delete(flat, orphans)
+            report[flat.name] = result
+        report["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def watch(self, interval: float = 2.0, stop: Optional[threading.Event] = None,
+              on_pass: Optional[Callable[[dict], None]] = None) -> None:
+        """`refresh()` every `interval` seconds until `stop` is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            report = self.refresh()
+            if on_pass is not None:
+                on_pass(report)
+            stop.wait(interval)
+
+
+def synthetic_tables(products: int, stores: int = 50, customers: int = 2000, orders: int = 5000,
+                     seed: int = 17) -> dict[str, list[dict]]:
+    """A catalog, stores with zones and stock, and customers with orders, shaped like the real schema."""
+    rng = random.Random(seed)
+
+    def new_id():
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+
+    ingredients = [{"id": new_id(), "name": name, "is_allergen": name in ("chocolate", "peanut", "almond")}
+                   for name in ("strawberry", "pineapple", "chocolate", "peanut", "almond", "melon")]
+    categories = [{"id": new_id(), "name": name, "type": "occasion"}
+                  for name in ("Birthday", "Anniversary", "Thank You", "Get Well")]
+    addons = [{"id": new_id(), "name": name, "price": price, "is_active": True}
+              for name, price in (("Greeting Card", 4.99), ("Balloon", 7.99))]
+    tables: dict[str, list[dict]] = {
+        "ingredients": ingredients, "categories": categories, "addons": addons,
+        "products": [], "product_options": [], "product_ingredients": [], "product_categories": [],
+        "franchisees": [], "delivery_zones": [], "inventory": [],
+        "customers": [], "recipient_addresses": [], "orders": [], "order_items": [], "order_addons": [],
+    }
+    for i in range(products):
+        product_id = new_id()
+        tables["products"].append({
+            "id": product_id, "product_identifier": 1000 + i, "name": f"Bouquet {i}",
+            "description": f"Fresh fruit arrangement {i}", "base_price": 39.99 + i % 40,
+            "image_url": None, "is_active": i % 50 != 0,
+        })
+        for name, markup in (("Standard", 0), ("Large", 15)):
+            tables["product_options"].append({
+                "id": new_id(), "product_id": product_id, "option_name": name,
+                "price": 39.99 + i % 40 + markup, "description": None, "image_url": None, "is_available": True,
+            })
+        for ingredient in rng.sample(ingredients, 3):
+            tables["product_ingredients"].append({"product_id": product_id, "ingredient_id": ingredient["id"]})
+        tables["product_categories"].append({"product_id": product_id, "category_id": rng.choice(categories)["id"]})
+    for s in range(stores):
+        store_id = new_id()
+        tables["franchisees"].append({
+            "id": store_id, "store_number": 100 + s, "name": f"Store {100 + s}", "email": None,
+            "phone": f"+1555{s:07d}", "address": f"{s} Main St", "city": "San Diego", "state": "CA",
+            "zip_code": f"{92100 + s:05d}", "is_active": True, "operating_hours": {},
+        })
+        tables["delivery_zones"].append({
+            "id": new_id(), "franchisee_id": store_id, "zip_codes": [f"{92100 + s:05d}"],
+            "delivery_fee": 9.99, "min_order_amount": 0,
+        })
+        for product in rng.sample(tables["products"], min(len(tables["products"]), 100)):
+            tables["inventory"].append({"id": new_id(), "franchisee_id": store_id, "product_id": product["id"],
+                                        "quantity_available": rng.randint(0, 40)})
+    for c in range(customers):
+        tables["customers"].append({
+            "id": new_id(), "first_name": f"Customer{c}", "last_name": "Test", "email": f"c{c}@example.com",
+            "phone": f"+1415{c:07d}", "allergies": [], "preferences": {"account_sources": ["chatbot"]},
+        })
+    for o in range(orders if tables["products"] and tables["franchisees"] else 0):
+        customer = rng.choice(tables["customers"])
+        address_id = new_id()
+        tables["recipient_addresses"].append({
+            "id": address_id, "customer_id": customer["id"], "recipient_name": "Friend",
+            "recipient_phone": None, "street_address": f"{o} Oak Ave", "city": "San Diego", "state": "CA",
+            "zip_code": "92101", "delivery_instructions": None,
+        })
+        order_id = new_id()
+        product = rng.choice(tables["products"])
+        tables["orders"].append({
+            "id": order_id, "customer_id": customer["id"], "franchisee_id": rng.choice(tables["franchisees"])["id"],
+            "recipient_address_id": address_id, "order_number": f"W100{10000000 + o}-1", "status": "pending",
+            "fulfillment_type": "delivery", "subtotal": product["base_price"], "tax_amount": 0,
+            "total_amount": product["base_price"], "scheduled_date": "2025-07-01",
+            "scheduled_time_slot": "10:00-12:00", "special_instructions": None,
+            "created_at": f"2025-06-{1 + o % 28:02d}T10:00:00",
+        })
+        item_id = new_id()
+        tables["order_items"].append({
+            "id": item_id, "order_id": order_id, "product_id": product["id"], "product_option_id": None,
+            "quantity": 1, "unit_price": product["base_price"], "total_price": product["base_price"],
+        })
+        if o % 3 == 0:
+            tables["order_addons"].append({"id": new_id(), "order_item_id": item_id, "addon_id": addons[0]["id"],
+                                           "quantity": 1, "unit_price": addons[0]["price"]})
+    return tables
+
+
+def _local_demo(db: MemoryTables, refresher: FlatRefresher) -> dict:
+    """Change a price and a stock level, then time the refresh that picks them up."""
+    product = next(iter(db.tables["products"].values()))
+    stock = next(iter(db.tables["inventory"].values()))
+    db.write("products", {**product, "base_price": product["base_price"] + 5})
+    db.write("inventory", {**stock, "quantity_available": stock["quantity_available"] + 3})
+    report = refresher.refresh()
+    flat_product = db.flat["chatbot_products_flat"][product["id"]]["product_data"]
+    flat_store = db.flat["chatbot_franchisees_flat"][stock["franchisee_id"]]["franchisee_data"]
+    return {
+        "refresh_s": report["elapsed_s"],
+        "product_price_current": flat_product["product_info"]["base_price"] == _price(product["base_price"] + 5),
+        "inventory_current": flat_store["inventory"][stock["product_id"]] == stock["quantity_available"] + 3,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Refresh the chatbot_*_flat tables")
+    parser.add_argument("--table", action="append", choices=sorted(FLAT_TABLES),
+                        help="Flat table to process (repeatable); default all four")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--full", action="store_true", help="Rebuild every row")
+    mode.add_argument("--check", action="store_true", help="Diff stored rows against rebuilt ones")
+    mode.add_argument("--watch", type=float, metavar="SECONDS", help="Refresh the queue every SECONDS")
+    parser.add_argument("--fix", action="store_true", help="With --check, repair what differs")
+    parser.add_argument("--batch-size", type=int, default=REFRESH_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--live", action="store_true", help="Use SUPABASE_URL instead of local tables")
+    parser.add_argument("--products", type=int, default=5000, help="Synthetic products for local tables")
+    args = parser.parse_args(argv)
+
+    client = None
+    if args.live:
+        from edible_tools.edge_client import EdgeClient
+        client = EdgeClient.from_env(pool_size=args.workers * 2)
+        db = RestTables(client)
+    else:
+        db = MemoryTables(synthetic_tables(args.products))
+    refresher = FlatRefresher(db, args.batch_size, args.workers)
+
+    try:
+        if args.check:
+            print(f"🧭 Checking flat tables{' (fixing)' if args.fix else ''}")
+            report = refresher.check(args.table, fix=args.fix)
+            bad = sum(r["missing"] + r["stale"] + r["orphaned"]
+                      for name, r in report.items() if name != "elapsed_s")
+            print(json.dumps(report))
+            print(f"{'⚠️' if bad else '✅'} {bad} rows differ in {report['elapsed_s']}s")
+        elif args.watch is not None:
+            print(f"🚀 Refreshing queued flat rows every {args.watch}s (Ctrl-C to stop)")
+            try:
+                refresher.watch(args.watch, on_pass=lambda r: print(json.dumps(r)))
+            except KeyboardInterrupt:
+                print("✅ Stopped")
+        elif args.full or not args.live:
+            print(f"📦 Rebuilding flat tables, batches of {args.batch_size}, {args.workers} workers")
+            report = refresher.rebuild(args.table)
+            print(json.dumps(report))
+            print(f"✅ Rebuilt in {report['elapsed_s']}s")
+            if not args.live:
+                print(f"🚀 Incremental refresh after a price and a stock change: {json.dumps(_local_demo(db, refresher))}")
+        else:
+            report = refresher.refresh(args.table)
+            print(json.dumps(report))
+            failed = sum(r["errors"] for name, r in report.items() if name != "elapsed_s")
+            print(f"{'❌' if failed else '✅'} Refreshed queued rows in {report['elapsed_s']}s")
+    finally:
+        if client is not None:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Load generator for the Voiceflow ordering flow.
+
+Every virtual caller replays what the agent does on a call:
+
+    product-search → customer-management → franchisee-inventory/find-nearest → order
+
+Callers arrive open-loop at `--rate` per second (Poisson arrivals by
+default, `--arrivals constant` for a fixed spacing), so a slow backend does
+not slow the arrivals down the way a closed loop of N clients would. All
+callers share one pooled `httpx.AsyncClient`, so connections are kept
+alive and reused up to `--pool` at a time.
+
+The report has, per step, a latency histogram, p50/p95/p99 and the error
+rate. `--ramp 5,10,20,40` runs one stage per arrival rate and marks the
+first stage that saturates: error rate above `--max-error-rate`, flow p95
+above `--slo-ms`, or completed callers falling behind the offered rate.
+
+`--target local` serves the sample catalog and the in-memory ordering
+stand-ins on a `LocalEdgeServer`, so the whole flow runs offline.
+
+Usage:
+    python -m edible_tools.load_test --target local --rate 20 --duration 30
+    python -m edible_tools.load_test --target local --ramp 10,20,40,80 --duration 15 --out load.json
+    python -m edible_tools.load_test --target supabase --rate 2 --duration 60 --pool 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+import httpx
+import numpy as np
+
+DEFAULT_RATE = 5.0
+DEFAULT_DURATION = 10.0
+DEFAULT_POOL = 50
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_SLO_MS = 2000.0
+DEFAULT_MAX_ERROR_RATE = 0.05
+# A stage counts as keeping up while it completes at least this share of the offered callers
+MIN_COMPLETION_RATIO = 0.9
+PERCENTILES = (50, 95, 99)
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+STEPS = ("search", "customer", "find_store", "order", "flow")
+
+SEARCH_QUERIES = [
+    {"query": "chocolate", "maxResults": 3},
+    {"query": "strawberries", "maxPrice": 150, "maxResults": 3},
+    {"query": "fruit arrangement", "maxPrice": 100, "maxResults": 3},
+]
+ZIP_CODES = ["92101", "92102", "92103"]
+
+
+@dataclass
+class StepStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    error_kinds: dict[str, int] = field(default_factory=dict)
+
+    def record(self, elapsed_ms: float, error: Optional[str] = None) -> None:
+        if error is None:
+            self.latencies_ms.append(elapsed_ms)
+        else:
+            self.errors += 1
+            self.error_kinds[error] = self.error_kinds.get(error, 0) + 1
+
+    def summary(self) -> dict:
+        latencies = np.array(self.latencies_ms, dtype=float)
+        total = len(latencies) + self.errors
+        summary = {
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "histogram": histogram(self.latencies_ms),
+        }
+        if self.error_kinds:
+            summary["error_kinds"] = dict(self.error_kinds)
+        if len(latencies):
+            summary["mean_ms"] = round(float(latencies.mean()), 3)
+            summary["max_ms"] = round(float(latencies.max()), 3)
+            for p in PERCENTILES:
+                summary[f"p{p}_ms"] = round(float(np.percentile(latencies, p)), 3)
+        return summary
+
+
+def histogram(latencies_ms: list[float]) -> dict[str, int]:
+    """Counts per bucket, keyed "≤N ms" (and ">N ms" for the open bucket)."""
+    counts = np.bincount(
+        np.searchsorted(HISTOGRAM_EDGES_MS, latencies_ms, side="left"),
+        minlength=len(HISTOGRAM_EDGES_MS) + 1,
+    )
+    labels = [f"≤{edge} ms" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]} ms"]
+    return {label: int(count) for label, count in zip(labels, counts) if count}
+
+
+@dataclass
+class StageResult:
+    rate: float
+    duration: float
+    offered: int = 0
+    completed: int = 0
+    dropped: int = 0
+    max_in_flight: int = 0
+    elapsed_seconds: float = 0.0
+    steps: dict[str, StepStats] = field(default_factory=lambda: {step: StepStats() for step in STEPS})
+
+    def summary(self) -> dict:
+        flow = self.steps["flow"]
+        return {
+            "rate": self.rate,
+            "duration": self.duration,
+            "offered": self.offered,
+            "completed": self.completed,
+            "failed": flow.errors,
+            "dropped": self.dropped,
+            "max_in_flight": self.max_in_flight,
+            "achieved_rate": round(self.completed / self.elapsed_seconds, 2)
+            if self.elapsed_seconds else 0.0,
+            "steps": {step: stats.summary() for step, stats in self.steps.items()},
+        }
+
+
+class StepError(Exception):
+    """A flow step returned an unexpected status or body; `kind` labels it in the report."""
+
+    def __init__(self, kind: str):
+        super().__init__(kind)
+        self.kind = kind
+
+
+class FlowClient:
+    """The four edge-function calls of one caller, on a shared pooled client."""
+
+    def __init__(self, client: httpx.AsyncClient, base_url: str):
+        self.client = client
+        self.functions_url = f"{base_url.rstrip('/')}/functions/v1"
+
+    async def _call(self, method: str, path: str, expected: tuple[int, ...], **kwargs) -> dict:
+        try:
+            response = await self.client.request(method, f"{self.functions_url}/{path}", **kwargs)
+        except httpx.TimeoutException:
+            raise StepError("timeout")
+        except httpx.HTTPError as e:
+            raise StepError(type(e).__name__)
+        if response.status_code not in expected:
+            raise StepError(f"http_{response.status_code}")
+        try:
+            return response.json()
+        except ValueError:
+            raise StepError("invalid_json")
+
+    async def search(self, payload: dict) -> dict:
+        data = await self._call("POST", "product-search", (200,), json=payload)
+        if not data.get("products"):
+            raise StepError("no_products")
+        return data
+
+    async def customer(self, phone: str, first_name: str) -> dict:
+        payload = {"phone": phone, "firstName": first_name, "lastName": "Load", "source": "chatbot"}
+        data = await self._call("POST", "customer-management", (200, 201), json=payload)
+        if not (data.get("customer") or {}).get("_internalId"):
+            raise StepError("no_customer")
+        return data
+
+    async def find_store(self, zip_code: str) -> dict:
+        data = await self._call("GET", "franchisee-inventory/find-nearest", (200,),
+                                params={"zipCode": zip_code})
+        if not (data.get("store") or {}).get("_internalId"):
+            raise StepError("no_store")
+        return data
+
+    async def order(self, customer_id: str, store_id: str, product_id: str, zip_code: str) -> dict:
+        payload = {
+            "customerId": customer_id,
+            "franchiseeId": store_id,
+            "items": [{"productId": product_id, "quantity": 1}],
+            "deliveryAddress": {
+                "recipientName": "Load Test",
+                "street": "123 Test Street",
+                "city": "San Diego",
+                "state": "CA",
+                "zipCode": zip_code,
+            },
+            "specialInstructions": "Load test order",
+        }
+        data = await self._call("POST", "order", (200, 201), json=payload)
+        if not (data.get("order") or {}).get("orderNumber"):
+            raise StepError("no_order")
+        return data
+
+
+async def run_caller(flow: FlowClient, caller: int, stage: StageResult, rng: random.Random,
+                     clock=time.perf_counter) -> bool:
+    """Replay the flow once; every step is timed, and the first failure ends the call."""
+    steps = stage.steps
+    flow_started = clock()
+    zip_code = rng.choice(ZIP_CODES)
+    # Unique per caller so every call creates a customer, as new callers do
+    phone = f"+1555{caller:07d}"
+
+    async def timed(step: str, call):
+        started = clock()
+        try:
+            result = await call
+        except StepError as e:
+            steps[step].record((clock() - started) * 1000, e.kind)
+            raise
+        steps[step].record((clock() - started) * 1000)
+        return result
+
+    try:
+        search = await timed("search", flow.search(rng.choice(SEARCH_QUERIES)))
+        product_id = search["products"][0]["productId"]
+        customer = await timed("customer", flow.customer(phone, f"Caller{caller}"))
+        store = await timed("find_store", flow.find_store(zip_code))
+        await timed("order", flow.order(
+            customer["customer"]["_internalId"], store["store"]["_internalId"], product_id, zip_code
+        ))
+    except StepError as e:
+        steps["flow"].record((clock() - flow_started) * 1000, e.kind)
+        return False
+    steps["flow"].record((clock() - flow_started) * 1000)
+    return True
+
+
+def arrival_offsets(rate: float, duration: float, arrivals: str = "poisson",
+                    rng: Optional[random.Random] = None) -> list[float]:
+    """Seconds from stage start at which callers arrive."""
+    rng = rng or random.Random()
+    offsets = []
+    t = 0.0
+    while True:
+        # Constant spacing is computed from the count so float error cannot add a caller
+        t = t + rng.expovariate(rate) if arrivals == "poisson" else (len(offsets) + 1) / rate
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+
+async def run_stage(
+    flow: FlowClient,
+    rate: float,
+    duration: float,
+    arrivals: str = "poisson",
+    max_in_flight: Optional[int] = None,
+    seed: Optional[int] = None,
+    first_caller: int = 0,
+) -> StageResult:
+    """
+    Launch callers at `rate` per second for `duration` seconds and wait for
+    them all. With `max_in_flight`, arrivals beyond that many open calls are
+    dropped (and counted) instead of queued.
+    """
+    rng = random.Random(seed)
+    stage = StageResult(rate, duration)
+    in_flight = 0
+    tasks = []
+
+    async def caller(number: int) -> None:
+        nonlocal in_flight
+        try:
+            if await run_caller(flow, number, stage, rng):
+                stage.completed += 1
+        finally:
+            in_flight -= 1
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for i, offset in enumerate(arrival_offsets(rate, duration, arrivals, rng)):
+        delay = started + offset - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stage.offered += 1
+        if max_in_flight is not None and in_flight >= max_in_flight:
+            stage.dropped += 1
+            continue
+        in_flight += 1
+        stage.max_in_flight = max(stage.max_in_flight, in_flight)
+        tasks.append(asyncio.create_task(caller(first_caller + i)))
+    if tasks:
+        await asyncio.gather(*tasks)
+    stage.elapsed_seconds = max(loop.time() - started, duration)
+    return stage
+
+
+def is_saturated(stage: dict, slo_ms: float = DEFAULT_SLO_MS,
+                 max_error_rate: float = DEFAULT_MAX_ERROR_RATE) -> list[str]:
+    """Reasons a stage summary counts as saturated (empty when it kept up)."""
+    reasons = []
+    flow = stage["steps"]["flow"]
+    if flow["error_rate"] > max_error_rate:
+        reasons.append(f"error rate {flow['error_rate']:.1%} > {max_error_rate:.1%}")
+    if flow.get("p95_ms", 0) > slo_ms:
+        reasons.append(f"flow p95 {flow['p95_ms']:.0f} ms > {slo_ms:.0f} ms")
+    if stage["offered"] and stage["completed"] < MIN_COMPLETION_RATIO * stage["offered"]:
+        reasons.append(f"completed {stage['completed']} of {stage['offered']} offered callers")
+    return reasons
+
+
+async def run_load_test(
+    base_url: str,
+    rates: list[float],
+    duration: float = DEFAULT_DURATION,
+    pool: int = DEFAULT_POOL,
+    timeout: float = DEFAULT_TIMEOUT,
+    api_key: Optional[str] = None,
+    arrivals: str = "poisson",
+    max_in_flight: Optional[int] = None,
+    slo_ms: float = DEFAULT_SLO_MS,
+    max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+    seed: Optional[int] = None,
+    stop_on_saturation: bool = True,
+) -> dict:
+    """Run one stage per rate and return the JSON-ready report."""
+    headers = {"Content-Type": "application/json"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    limits = httpx.Limits(max_connections=pool, max_keepalive_connections=pool)
+    report = {
+        "target": base_url,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "arrivals": arrivals,
+        "pool": pool,
+        "slo_ms": slo_ms,
+        "max_error_rate": max_error_rate,
+        "stages": [],
+        "saturation": None,
+    }
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=timeout) as client:
+        flow = FlowClient(client, base_url)
+        first_caller = 0
+        for i, rate in enumerate(rates):
+            stage = await run_stage(flow, rate, duration, arrivals, max_in_flight,
+                                    None if seed is None else seed + i, first_caller)
+            first_caller += stage.offered
+            summary = stage.summary()
+            reasons = is_saturated(summary, slo_ms, max_error_rate)
+            summary["saturated"] = reasons
+            report["stages"].append(summary)
+            if reasons and report["saturation"] is None:
+                report["saturation"] = {"rate": rate, "reasons": reasons}
+                if stop_on_saturation:
+                    break
+    return report
+
+
+@contextmanager
+def local_target() -> Iterator[str]:
+    """Serve the sample catalog and the ordering stand-ins and yield the URL."""
+    from edible_tools.local_services import local_stack
+
+    with local_stack() as server:
+        yield server.url
+
+
+def _print_report(report: dict) -> None:
+    print(f"📊 {report['target']} — {report['arrivals']} arrivals, pool {report['pool']}")
+    for stage in report["stages"]:
+        marker = "🔥" if stage["saturated"] else "✅"
+        print(f"{marker} {stage['rate']:g} callers/s: {stage['completed']}/{stage['offered']} completed, "
+              f"{stage['dropped']} dropped, max in flight {stage['max_in_flight']}")
+        for step, stats in stage["steps"].items():
+            if "p50_ms" not in stats:
+                print(f"   {step:<10} all {stats['errors']} requests failed")
+                continue
+            print(f"   {step:<10} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                  f"p99 {stats['p99_ms']:8.1f} ms  errors {stats['error_rate']:.1%}")
+        for reason in stage["saturated"]:
+            print(f"   ⚠️  {reason}")
+    if report["saturation"]:
+        print(f"🔥 Saturated at {report['saturation']['rate']:g} callers/s")
+    else:
+        print("✅ No saturation within the tested rates")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay the Voiceflow ordering flow under load")
+    parser.add_argument("--target", default="local",
+                        help="'local' (in-process stand-ins), 'supabase' (SUPABASE_URL) or a base URL")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Caller arrivals per second")
+    parser.add_argument("--ramp", help="Comma-separated arrival rates, one stage each (overrides --rate)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds per stage")
+    parser.add_argument("--arrivals", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--pool", type=int, default=DEFAULT_POOL, help="Max pooled HTTP connections")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Drop arriving callers while this many calls are open")
+    parser.add_argument("--slo-ms", type=float, default=DEFAULT_SLO_MS,
+                        help="Flow p95 above this marks a stage as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--keep-going", action="store_true",
+                        help="Run every --ramp stage even after one saturates")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    rates = [float(r) for r in args.ramp.split(",")] if args.ramp else [args.rate]
+
+    def run(base_url: str, api_key: Optional[str] = None) -> dict:
+        return asyncio.run(run_load_test(
+            base_url, rates, args.duration, args.pool, args.timeout, api_key, args.arrivals,
+            args.max_in_flight, args.slo_ms, args.max_error_rate, args.seed, not args.keep_going,
+        ))
+
+    if args.target == "local":
+        with local_target() as url:
+            report = run(url)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path='.env.local')
+        base_url = os.environ.get("SUPABASE_URL") if args.target == "supabase" else args.target
+        if not base_url:
+            print("❌ Missing SUPABASE_URL. Please check .env.local")
+            return 1
+        report = run(base_url, os.environ.get("SUPABASE_SERVICE_KEY"))
+
+    _print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Saved report to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+"""
+Local HTTP stand-in for the Supabase edge functions.
+
+Serves the same paths as `{SUPABASE_URL}/functions/v1/...`, so the Python
+tests and tooling can be pointed at it by setting SUPABASE_URL to the
+server's address. Handlers are plain functions that take a `LocalRequest`
+and return `(status, body)`.
+
+Usage:
+    python -m edible_tools.local_edge --samples
+    python -m edible_tools.local_edge --catalog products.json --matrix .cache/product_embeddings
+    python -m edible_tools.local_edge --from-supabase --ann-index .cache/product_index
+    python -m edible_tools.local_edge --from-supabase --query-log logs/search_queries.txt
+"""
+
+import argparse
+import base64
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from edible_tools.product_search import ProductSearchEngine
+from edible_tools.query_cache import DEFAULT_TTL_SECONDS, QueryEmbeddingCache, load_query_log
+
+FUNCTIONS_PREFIX = "/functions/v1"
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples")
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Weight of the component every hashed embedding shares (see hashed_embedding)
+HASHED_EMBEDDING_OFFSET = np.sqrt(1.8)
+
+SAMPLE_OCCASIONS = {
+    "Birthday": re.compile(r"\bbirthdays?\b", re.IGNORECASE),
+    "Mother's Day": re.compile(r"\bmother'?s'? day\b|\bmoms?\b", re.IGNORECASE),
+    "Graduation": re.compile(r"\bgraduat", re.IGNORECASE),
+    "Thank You": re.compile(r"\bthank", re.IGNORECASE),
+    "Congratulations": re.compile(r"\bcongrat", re.IGNORECASE),
+    "Love & Romance": re.compile(r"\b(love|romantic|romance|anniversary)\b", re.IGNORECASE),
+}
+
+
+@dataclass
+class LocalRequest:
+    method: str
+    path: str
+    query: dict = field(default_factory=dict)  # first value of each query param
+    body: Optional[dict] = None
+    headers: dict = field(default_factory=dict)
+
+
+Handler = Callable[[LocalRequest], tuple[int, dict]]
+
+
+class LocalEdgeServer:
+    """Threaded HTTP server dispatching `/functions/v1/<name>[/<sub>]` to handlers."""
+
+    def __init__(self, routes: dict[str, Handler], host: str = "127.0.0.1", port: int = 0):
+        self.routes = dict(routes)
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without TCP_NODELAY
+            # every keep-alive response stalls ~40 ms on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self, method: str) -> None:
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except json.JSONDecodeError:
+                    self._send(400, {"error": "Invalid JSON body"})
+                    return
+                request = LocalRequest(
+                    method=method,
+                    path=parsed.path,
+                    query={k: v[0] for k, v in parse_qs(parsed.query).items()},
+                    body=body,
+                    headers={k.lower(): v for k, v in self.headers.items()},
+                )
+                if method == "OPTIONS":
+                    self._send(200, {})
+                    return
+                handler = server.resolve(parsed.path)
+                if handler is None:
+                    self._send(404, {"error": f"No local handler for {parsed.path}"})
+                    return
+                try:
+                    status, payload = handler(request)
+                except Exception as e:
+                    status, payload = 500, {"error": "Internal server error", "details": str(e)}
+                self._send(status, payload)
+
+            def _send(self, status: int, payload: dict) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PUT(self):
+                self._dispatch("PUT")
+
+            def do_PATCH(self):
+                self._dispatch("PATCH")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def do_OPTIONS(self):
+                self._dispatch("OPTIONS")
+
+        self._httpd = ThreadingHTTPServer((host, port), RequestHandler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as SUPABASE_URL."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def resolve(self, path: str) -> Optional[Handler]:
+        """
+        Longest registered route that prefixes `path`. Route names are
+        relative to /functions/v1; names starting with "/" match the full
+        path (e.g. "/v1/embeddings").
+        """
+        if path.startswith(FUNCTIONS_PREFIX + "/"):
+            name = path[len(FUNCTIONS_PREFIX) + 1:].rstrip("/")
+        else:
+            name = path.rstrip("/")
+        while name:
+            if name in self.routes:
+                return self.routes[name]
+            if "/" not in name:
+                break
+            name = name.rsplit("/", 1)[0]
+        return None
+
+    def start(self) -> "LocalEdgeServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def __enter__(self) -> "LocalEdgeServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _parse_search_query(query: dict) -> dict:
+    """GET query parameters → SearchRequest, like the edge function does."""
+    def number(name, cast=float):
+        return cast(query[name]) if query.get(name) else None
+
+    search_data = {
+        'query': query.get('query') or None,
+        'productId': query.get('productId') or query.get('id') or None,
+        'category': query.get('category') or None,
+        'maxPrice': number('maxPrice'),
+        'minPrice': number('minPrice'),
+        'allergens': query['allergens'].split(',') if query.get('allergens') else None,
+        'franchiseeId': query.get('franchiseeId') or None,
+        'occasion': query.get('occasion') or None,
+        'priceRange': query.get('priceRange') or None,
+        'semanticThreshold': number('semanticThreshold'),
+        'semanticBoost': query.get('semanticBoost') == 'true',
+        'maxResults': number('maxResults', int),
+    }
+    return {k: v for k, v in search_data.items() if v is not None}
+
+
+def product_search_handler(engine: ProductSearchEngine) -> Handler:
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        if request.method not in ("GET", "POST"):
+            return 405, {"error": "Method not allowed"}
+        if request.method == "GET":
+            search_data = _parse_search_query(request.query)
+        else:
+            search_data = request.body or {}
+        try:
+            return 200, engine.search(search_data)
+        except Exception as e:
+            return 500, {"error": "Search failed", "details": str(e)}
+    return handle
+
+
+def query_cache_stats_handler(cache: QueryEmbeddingCache) -> Handler:
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        return 200, cache.stats()
+    return handle
+
+
+def hashed_embedding(text: str, dimensions: int = 1536) -> Optional[np.ndarray]:
+    """
+    Deterministic offline stand-in for an OpenAI embedding: a unit
+    bag-of-words vector with each word hashed into one dimension, so texts
+    sharing words score higher than texts that don't.
+
+    ada-002 vectors share a large common component, which is why unrelated
+    texts still score ~0.65 and the edge function's 0.7 threshold works.
+    The same offset is added here so that threshold keeps its meaning: one
+    shared word or more clears it, gibberish doesn't.
+    """
+    words = _WORD.findall((text or "").lower())
+    if not words:
+        return None
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in words:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        slot = int.from_bytes(digest[:4], "little") % dimensions
+        vector[slot] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if not norm:
+        return None
+    vector = vector / norm + HASHED_EMBEDDING_OFFSET / np.sqrt(dimensions)
+    return vector / np.linalg.norm(vector)
+
+
+def embeddings_handler(dimensions: int = 1536) -> Handler:
+    """
+    OpenAI-compatible `POST /v1/embeddings` backed by `hashed_embedding`, so
+    clients pointed at it with OPENAI_BASE_URL get deterministic vectors
+    offline.
+    """
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        if request.method != "POST":
+            return 405, {"error": {"message": "Method not allowed"}}
+        body = request.body or {}
+        texts = body.get("input")
+        if isinstance(texts, str):
+            texts = [texts]
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return 400, {"error": {"message": "'input' must be a string or a list of strings",
+                                   "type": "invalid_request_error"}}
+        size = int(body.get("dimensions") or dimensions)
+        data = []
+        for i, text in enumerate(texts):
+            vector = hashed_embedding(text, size)
+            if vector is None:
+                vector = np.zeros(size, dtype=np.float32)
+            if body.get("encoding_format") == "base64":
+                # The openai SDK asks for base64 float32 unless told otherwise
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(_WORD.findall(text.lower())) for text in texts)
+        return 200, {
+            "object": "list",
+            "data": data,
+            "model": body.get("model") or "text-embedding-ada-002",
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+    return handle
+
+
+def sample_occasions(product_data: dict) -> list[dict]:
+    """Occasion categories for a sample product, guessed from its name and description."""
+    info = product_data.get("product_info") or {}
+    text = f"{info.get('name') or ''} {info.get('description') or ''}"
+    return [
+        {"name": name, "type": "occasion"}
+        for name, pattern in SAMPLE_OCCASIONS.items() if pattern.search(text)
+    ]
+
+
+def sample_catalog_rows(paths: Optional[list[str]] = None) -> list[dict]:
+    """
+    chatbot_products_flat-style rows built from the CSVs in samples/. The
+    exports carry no categories, so occasions are guessed from the copy.
+    """
+    from edible_tools.catalog_ingest import iter_catalog
+
+    rows = {}
+    for path in paths or sorted(glob.glob(os.path.join(SAMPLES_DIR, "*.csv"))):
+        for product_data in iter_catalog(path):
+            if not product_data["categories"]:
+                product_data["categories"] = sample_occasions(product_data)
+            identifier = product_data["product_info"]["product_identifier"]
+            product_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"edible-product-{identifier}"))
+            # Later files win, so the processed export overrides the raw scrape
+            rows[product_id] = {"product_id": product_id, "product_data": product_data}
+    return list(rows.values())
+
+
+def sample_search_engine(
+    paths: Optional[list[str]] = None,
+    dimensions: int = 1536,
+    ann_index=None,
+    quantize: Optional[str] = None,
+) -> ProductSearchEngine:
+    """Offline engine over the sample catalog with hashed embeddings."""
+    from backfill_embeddings import generate_text_for_embedding
+
+    rows = sample_catalog_rows(paths)
+    embeddings = {
+        row["product_id"]: hashed_embedding(
+            generate_text_for_embedding(row["product_data"]), dimensions
+        )
+        for row in rows
+    }
+    return ProductSearchEngine(
+        rows,
+        embeddings=embeddings,
+        dimensions=dimensions,
+        embed_query=lambda text: hashed_embedding(text, dimensions),
+        ann_index=ann_index,
+        quantize=quantize,
+    )
+
+
+def _load_engine(args) -> ProductSearchEngine:
+    import backfill_embeddings
+    from edible_tools.vectors import load_matrix
+
+    if args.samples:
+        return sample_search_engine(quantize=args.quantize)
+
+    embed_query = None
+    if args.from_supabase:
+        if not backfill_embeddings.init_clients():
+            raise SystemExit(1)
+        rows = backfill_embeddings.fetch_flat_products()
+        ids, matrix = backfill_embeddings.fetch_product_embeddings()
+        embed_query = backfill_embeddings.get_embedding_from_openai
+    else:
+        with open(args.catalog) as f:
+            rows = json.load(f)
+        ids, matrix = load_matrix(args.matrix) if args.matrix else ([], [])
+        if backfill_embeddings.init_clients():
+            embed_query = backfill_embeddings.get_embedding_from_openai
+
+    if embed_query is not None:
+        embed_query = QueryEmbeddingCache(
+            embed_query,
+            model=backfill_embeddings.EMBEDDING_MODEL,
+            embed_many=backfill_embeddings.get_embeddings_from_openai,
+            ttl_seconds=args.query_cache_ttl,
+        )
+        if args.query_log:
+            added = embed_query.warm_up(load_query_log(args.query_log))
+            print(f"🔥 Warmed query cache with {added} popular queries")
+
+    ann_index = None
+    if args.ann_index:
+        from edible_tools.ann_index import IVFFlatIndex
+        ann_index = IVFFlatIndex.load(args.ann_index)
+
+    return ProductSearchEngine(
+        rows,
+        embeddings=dict(zip(ids, matrix)),
+        dimensions=backfill_embeddings.EMBEDDING_DIMENSIONS,
+        embed_query=embed_query,
+        ann_index=ann_index,
+        quantize=args.quantize,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Supabase edge functions")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--catalog", help="JSON list of chatbot_products_flat rows")
+    source.add_argument("--from-supabase", action="store_true",
+                        help="Load products and embeddings from the live project")
+    source.add_argument("--samples", action="store_true",
+                        help="Serve the samples/ catalog with offline hashed embeddings")
+    parser.add_argument("--matrix", help="Embedding matrix written by --export-matrix")
+    parser.add_argument("--ann-index", help="Index written by `python -m edible_tools.ann_index build`")
+    parser.add_argument("--quantize", choices=["int8"],
+                        help="Hold embeddings as int8 (4x less memory, slightly approximate scores)")
+    parser.add_argument("--query-log", help="Popular queries (one per line or JSON lines) "
+                                            "to pre-embed at startup")
+    parser.add_argument("--query-cache-ttl", type=float, default=DEFAULT_TTL_SECONDS,
+                        help="Seconds a cached query embedding stays valid")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args(argv)
+
+    engine = _load_engine(args)
+    routes = {"product-search": product_search_handler(engine)}
+    if isinstance(engine.embed_query, QueryEmbeddingCache):
+        routes["query-cache-stats"] = query_cache_stats_handler(engine.embed_query)
+    server = LocalEdgeServer(routes, args.host, args.port)
+    print(f"🚀 Local edge functions on {server.url}{FUNCTIONS_PREFIX}")
+    print(f"   export SUPABASE_URL={server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
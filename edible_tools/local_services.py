@@ -0,0 +1,889 @@
+"""
+In-memory stand-ins for the ordering edge functions.
+
+`LocalStore` holds customers, stores and orders, and the handlers below
+implement the request/response contracts of `customer-management`,
+`franchisee-inventory/find-nearest` and `order` closely enough for the
+Voiceflow ordering flow to run against a `LocalEdgeServer`. Products and
+prices come from a `ProductSearchEngine`, so the catalog is the same one
+`product-search` serves.
+
+`local_stack` serves all of them together with `product-search` over the
+samples/ catalog and a deterministic OpenAI-compatible `/v1/embeddings`,
+so the Python tests, benchmarks and load tests run offline against
+stable data. Point clients at it with:
+
+    SUPABASE_URL=<url>  OPENAI_BASE_URL=<url>/v1
+
+Usage:
+    python -m edible_tools.local_services
+    python -m edible_tools.local_services --port 54321 --franchisees stores.json
+"""
+
+import argparse
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from edible_tools.customer_dedupe import CUSTOMER_COLUMNS, check_merge_pair, is_temp_email
+from edible_tools.local_edge import (
+    FUNCTIONS_PREFIX,
+    Handler,
+    LocalEdgeServer,
+    LocalRequest,
+    embeddings_handler,
+    product_search_handler,
+    sample_search_engine,
+)
+from edible_tools.order_items import resolve_order_items
+from edible_tools.order_lookup import OrderNumberIndex
+from edible_tools.order_numbers import SequenceAllocator, format_order_number
+from edible_tools.product_search import ProductSearchEngine, parse_product_identifier
+from edible_tools.rate_limit import SlidingWindowLimiter, UsageSync
+from edible_tools.zip_index import ZipIndex
+
+TAX_RATE = 0.0825
+UUID_PATTERN = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE
+)
+
+DEFAULT_FRANCHISEES = [
+    {
+        "name": "Edible Arrangements - Downtown San Diego",
+        "store_number": 257,
+        "address": "1234 Market St",
+        "city": "San Diego",
+        "state": "CA",
+        "phone": "(619) 555-0100",
+        "operating_hours": {"default": {"open": "9:00", "close": "18:00", "closed": False}},
+        "zip_codes": ["92101", "92102", "92103", "92104"],
+        "delivery_fee": 9.99,
+        "min_order_amount": 25.0,
+    },
+    {
+        "name": "Edible Arrangements - Los Angeles",
+        "store_number": 101,
+        "address": "500 Wilshire Blvd",
+        "city": "Los Angeles",
+        "state": "CA",
+        "phone": "(213) 555-0199",
+        "operating_hours": {"default": {"open": "8:00", "close": "20:00", "closed": False}},
+        "zip_codes": ["90001", "90010", "90012", "90017"],
+        "delivery_fee": 0,
+        "min_order_amount": 30.0,
+    },
+]
+
+
+def _format_time(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    hours, _, minutes = value.partition(":")
+    hour, minute = int(hours), int(minutes or 0)
+    suffix = "AM" if hour < 12 else "PM"
+    return f"{(hour % 12) or 12}:{minute:02d} {suffix}"
+
+
+class LocalStore:
+    """Thread-safe in-memory tables behind the local ordering stand-ins."""
+
+    def __init__(
+        self,
+        engine: ProductSearchEngine,
+        franchisees: Optional[list[dict]] = None,
+        centroids: Optional[dict] = None,
+    ):
+        """
+        franchisees: store rows, each with its delivery zone's zip_codes,
+            delivery_fee and min_order_amount inline.
+        centroids: ZIP -> (lat, lon), for the nearest-store pickup fallback.
+        """
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.customers: dict[str, dict] = {}
+        self.auth_users: list[dict] = []
+        self.orders: dict[str, dict] = {}
+        self.order_sequences = SequenceAllocator()
+        self.order_number_index = OrderNumberIndex()
+        self.order_items: dict[str, list[dict]] = {}
+        self.rate_limit_rows: dict[tuple[str, str], dict] = {}
+        self.addons = {
+            addon["id"]: addon
+            for row in engine.rows
+            for addon in row["product_data"].get("addons") or []
+            if addon.get("id")
+        }
+        self.franchisees: dict[str, dict] = {}
+        for franchisee in franchisees if franchisees is not None else DEFAULT_FRANCHISEES:
+            franchisee_id = franchisee.get("id") or str(
+                uuid.uuid5(uuid.NAMESPACE_URL, f"edible-store-{franchisee['store_number']}")
+            )
+            self.franchisees[franchisee_id] = {**franchisee, "id": franchisee_id}
+        self.zip_index = ZipIndex(
+            [{"franchisee_id": f["id"], "zip_codes": f.get("zip_codes", [])}
+             for f in self.franchisees.values()],
+            self.franchisees,
+            centroids,
+        )
+
+    # Customers ---------------------------------------------------------------
+
+    def find_customers(self, request_data: dict) -> list[dict]:
+        phone = request_data.get("phone")
+        email = request_data.get("email")
+        auth_user_id = request_data.get("authUserId")
+        session_id = request_data.get("sessionId")
+        with self._lock:
+            matches = []
+            for customer in self.customers.values():
+                if (
+                    (phone and customer["phone"] == phone)
+                    or (email and "@temp.local" not in email and customer["email"] == email)
+                    or (auth_user_id and customer["auth_user_id"] == auth_user_id)
+                ):
+                    matches.append(customer)
+            if not matches and session_id:
+                matches = [
+                    c for c in self.customers.values()
+                    if c["preferences"].get("session_id") == session_id
+                ]
+            return matches
+
+    def create_customer(self, request_data: dict) -> dict:
+        customer = {
+            "id": str(uuid.uuid4()),
+            "email": request_data.get("email") or f"chatbot_{int(time.time() * 1000)}@temp.local",
+            "phone": request_data.get("phone"),
+            "first_name": request_data.get("firstName"),
+            "last_name": request_data.get("lastName"),
+            "allergies": request_data.get("allergies") or [],
+            "dietary_restrictions": request_data.get("dietaryRestrictions") or [],
+            "preferences": {
+                "account_sources": [request_data.get("source")],
+                "created_via": request_data.get("source"),
+                "last_updated_via": request_data.get("source"),
+                "session_id": request_data.get("sessionId"),
+            },
+            "auth_user_id": request_data.get("authUserId"),
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            self.customers[customer["id"]] = customer
+        return customer
+
+    def resolve_customer_id(self, identifier: Optional[str]) -> Optional[str]:
+        if not identifier:
+            return None
+        with self._lock:
+            if UUID_PATTERN.match(identifier):
+                return identifier if identifier in self.customers else None
+            for customer in self.customers.values():
+                if customer["phone"] == identifier:
+                    return customer["id"]
+        return None
+
+    def load_customers(self, customers: list[dict]) -> None:
+        """Add existing `customers` rows (e.g. an export) as they are."""
+        with self._lock:
+            for customer in customers:
+                self.customers[customer["id"]] = {
+                    "allergies": [], "dietary_restrictions": [], "preferences": {},
+                    "auth_user_id": None, "first_name": None, "last_name": None,
+                    **customer,
+                }
+
+    def upsert_customers(self, rows: list[dict]) -> None:
+        """
+        PostgREST upsert on id with merge-duplicates: given columns replace,
+        others stay. Like the UNIQUE email, a batch that would leave two
+        customers with one email raises ValueError and writes nothing.
+        """
+        with self._lock:
+            final_emails = {}
+            for row in rows:
+                existing = self.customers.get(row["id"]) or {}
+                final_emails[row["id"]] = row["email"] if "email" in row else existing.get("email")
+            seen: dict[str, str] = {}
+            for customer_id, email in final_emails.items():
+                if email and seen.setdefault(email, customer_id) != customer_id:
+                    raise ValueError(f"duplicate key value violates unique constraint \"customers_email_key\": {email}")
+            for customer in self.customers.values():
+                if customer["id"] not in final_emails and customer.get("email") in seen:
+                    raise ValueError("duplicate key value violates unique constraint "
+                                     f"\"customers_email_key\": {customer['email']}")
+            for row in rows:
+                existing = self.customers.get(row["id"])
+                if existing is not None:
+                    existing.update(row)
+                else:
+                    self.customers[row["id"]] = {
+                        "email": None, "phone": None, "first_name": None, "last_name": None,
+                        "allergies": [], "dietary_restrictions": [], "preferences": {},
+                        "auth_user_id": None, "created_at": datetime.utcnow().isoformat(),
+                        **row,
+                    }
+
+    def merge_customer_pair(self, primary_id: str, secondary_id: str, source: str,
+                            dry_run: bool = False) -> dict:
+        """Reference of `check_merge_pair` / `merge_customer_pair` (20250706_bulk_customer_dedupe.sql)."""
+        with self._lock:
+            primary, secondary = self.customers.get(primary_id), self.customers.get(secondary_id)
+            if primary is None or secondary is None:
+                return {"can_merge": False, "reason": "insufficient_accounts"}
+            check = check_merge_pair(primary, secondary)
+            if dry_run or not check["can_merge"]:
+                return check if dry_run else {"success": False, "reason": check["reason"]}
+
+            secondary_orders = [o for o in self.orders.values() if o["customer_id"] == secondary_id]
+            sources = list(dict.fromkeys(primary["preferences"].get("account_sources", [])
+                                         + secondary["preferences"].get("account_sources", [])))
+            primary["preferences"] = {
+                **secondary["preferences"], **primary["preferences"],
+                "merged_from": secondary_id, "merge_strategy": "bulk_dedupe",
+                "merge_source": source, "account_sources": sources,
+            }
+            secondary["preferences"] = {
+                **secondary["preferences"], "merged_into": primary_id,
+                "original_email": secondary["email"], "original_phone": secondary["phone"],
+            }
+            if (not primary["email"] or is_temp_email(primary["email"])) and \
+                    secondary["email"] and not is_temp_email(secondary["email"]):
+                primary["email"] = secondary["email"]
+            secondary["email"] = f"archived_{secondary_id}_{secondary['email'] or 'no_email'}"
+            for field in ("phone", "first_name", "last_name", "auth_user_id"):
+                primary[field] = primary[field] or secondary[field]
+            if primary["auth_user_id"] == secondary["auth_user_id"]:
+                secondary["auth_user_id"] = None
+            primary["allergies"] = primary["allergies"] + secondary["allergies"]
+            for order in secondary_orders:
+                order["customer_id"] = primary_id
+            return {
+                "success": True,
+                "primary_account_id": primary_id,
+                "secondary_account_id": secondary_id,
+                "orders_transferred": len(secondary_orders),
+                "merge_strategy": "bulk_dedupe",
+            }
+
+    # Stores ------------------------------------------------------------------
+
+    def franchisee_for_zip(self, zip_code: str) -> Optional[dict]:
+        zone = self.zip_index.zone_for_zip(zip_code)
+        return self.franchisees[zone["franchisee_id"]] if zone is not None else None
+
+    def nearest_franchisee(self, zip_code: str) -> Optional[dict]:
+        """Closest store to the ZIP's centroid, else the first store (the edge function's limit(1))."""
+        nearest = self.zip_index.nearest(zip_code)
+        if nearest:
+            return self.franchisees[nearest[0][0]]
+        return next(iter(self.franchisees.values()), None)
+
+    def resolve_franchisee_id(self, identifier) -> Optional[str]:
+        if identifier is None:
+            return None
+        identifier = str(identifier)
+        if UUID_PATTERN.match(identifier):
+            return identifier if identifier in self.franchisees else None
+        try:
+            store_number = int(identifier)
+        except ValueError:
+            return None
+        for franchisee in self.franchisees.values():
+            if franchisee["store_number"] == store_number:
+                return franchisee["id"]
+        return None
+
+    # Orders ------------------------------------------------------------------
+
+    def next_order_number(self, franchisee_id: str) -> str:
+        store_number = self.franchisees[franchisee_id]["store_number"]
+        return format_order_number(store_number, self.order_sequences.allocate(store_number)[0])
+
+    def resolve_product(self, product_id) -> Optional[dict]:
+        identifier = parse_product_identifier(product_id)
+        if identifier is not None and 1000 <= identifier <= 9999:
+            return self.engine.direct_lookup(identifier)
+        return self.engine.lookup_by_id(product_id)
+
+    def resolve_addon(self, addon_id) -> Optional[dict]:
+        return self.addons.get(addon_id)
+
+    def record_rate_limits(self, rows: list[dict], window_seconds: float = 60) -> int:
+        """
+        Upsert `api_rate_limits` usage rows on (identifier, endpoint), as
+        `record_rate_limits` does: a batch's rows per caller are merged, and a
+        count adds to the stored one while its window is open, else replaces
+        it. Returns how many callers were recorded.
+        """
+        merged: dict[tuple[str, str], dict] = {}
+        for row in rows:
+            if not row.get("identifier") or not row.get("endpoint"):
+                continue
+            key = (row["identifier"], row["endpoint"])
+            count = max(int(row.get("request_count") or 1), 1)
+            started = datetime.fromisoformat(row["window_start"]) if row.get("window_start") \
+                else datetime.now(timezone.utc)
+            if started.tzinfo is None:
+                started = started.replace(tzinfo=timezone.utc)
+            if key in merged:
+                merged[key]["request_count"] += count
+                merged[key]["window_start"] = max(merged[key]["window_start"], started)
+            else:
+                merged[key] = {"identifier": key[0], "endpoint": key[1],
+                               "request_count": count, "window_start": started}
+        with self._lock:
+            for key, row in merged.items():
+                stored = self.rate_limit_rows.get(key)
+                if stored is not None and \
+                        stored["window_start"] >= row["window_start"] - timedelta(seconds=window_seconds):
+                    row["request_count"] += stored["request_count"]
+                    row["window_start"] = max(row["window_start"], stored["window_start"])
+                self.rate_limit_rows[key] = row
+        return len(merged)
+
+    def save_order(self, order: dict) -> None:
+        with self._lock:
+            if order["id"] not in self.orders:
+                self.order_number_index.add(order["order_number"], order["id"])
+            self.orders[order["id"]] = order
+
+    def find_orders(self, customer_id=None, order_number=None) -> list[dict]:
+        with self._lock:
+            if order_number:
+                # find_orders_by_number: the full number, or the digits it ends with
+                orders = [self.orders[i] for i in self.order_number_index.find(order_number)]
+            else:
+                orders = list(self.orders.values())
+        if customer_id:
+            orders = [o for o in orders if o["customer_id"] == customer_id]
+        return sorted(orders, key=lambda o: o["created_at"], reverse=True)
+
+
+# customer-management ---------------------------------------------------------
+
+def _customer_payload(customer: dict, is_new: bool, sources: list) -> dict:
+    name = " ".join(filter(None, [customer["first_name"], customer["last_name"]]))
+    return {
+        "id": customer["id"],
+        "email": customer["email"],
+        "phone": customer["phone"],
+        "firstName": customer["first_name"],
+        "lastName": customer["last_name"],
+        "name": name or "Valued Customer",
+        "allergies": customer["allergies"],
+        "isNewAccount": is_new,
+        "accountSources": sources,
+        "_internalId": customer["id"],
+    }
+
+
+def customer_management_handler(store: LocalStore) -> Handler:
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        if request.method != "POST":
+            return 405, {"error": "Method not allowed"}
+        data = request.body or {}
+        if not (data.get("phone") or data.get("email") or data.get("authUserId") or data.get("sessionId")):
+            return 400, {
+                "error": "At least one identifier required",
+                "message": "Please provide phone, email, user authentication, or session ID",
+            }
+
+        accounts = store.find_customers(data)
+        source = data.get("source")
+        if not accounts:
+            customer = store.create_customer(data)
+            return 201, {
+                "customer": _customer_payload(customer, True, [source]),
+                "orderHistory": [],
+                "summary": f"Welcome! I've created your new account via {source}. "
+                           f"Ready to place your first order?",
+            }
+
+        if len(accounts) > 1:
+            return 200, {
+                "customer": _customer_payload(accounts[0], False, ["multiple"]),
+                "orderHistory": [],
+                "summary": "I found multiple accounts that might be yours. "
+                           "Let me help you access the right one.",
+                "conflicts": {
+                    "found": True,
+                    "details": f"Found {len(accounts)} accounts with matching information",
+                },
+            }
+
+        customer = accounts[0]
+        for field, key in (("phone", "phone"), ("first_name", "firstName"), ("last_name", "lastName")):
+            if data.get(key) and not customer[field]:
+                customer[field] = data[key]
+        if data.get("email") and (not customer["email"] or "@temp.local" in customer["email"]):
+            customer["email"] = data["email"]
+        if data.get("allergies") and not customer["allergies"]:
+            customer["allergies"] = data["allergies"]
+        sources = customer["preferences"].setdefault("account_sources", [])
+        if source not in sources:
+            sources.append(source)
+            customer["preferences"]["last_updated_via"] = source
+
+        orders = store.find_orders(customer_id=customer["id"])[:5]
+        first_name = customer["first_name"]
+        source_text = "voice assistant" if source == "chatbot" else "website"
+        if orders:
+            summary = (f"Welcome back {first_name}! " if first_name else "Welcome back! ") + \
+                f"I see you have {len(orders)} previous orders. What can I help you with today?"
+        else:
+            summary = (f"Hi {first_name}! Welcome back via {source_text}." if first_name
+                       else f"Welcome back via {source_text}!") + " Ready to place your first order?"
+        return 200, {
+            "customer": _customer_payload(customer, False, list(sources)),
+            "orderHistory": [_order_record(order) for order in orders],
+            "summary": summary,
+        }
+    return handle
+
+
+# franchisee-inventory/find-nearest -------------------------------------------
+
+def _streamline_store(franchisee: dict, delivery_available: bool) -> dict:
+    hours = franchisee.get("operating_hours") or {}
+    today_name = date.today().strftime("%A")
+    tomorrow_name = (date.today() + timedelta(days=1)).strftime("%A")
+    default = {"open": "9:00", "close": "18:00", "closed": False}
+
+    def hours_string(day):
+        day_hours = hours.get(day) or hours.get("default") or default
+        if day_hours.get("closed"):
+            return "Closed"
+        return f"{_format_time(day_hours.get('open'))} - {_format_time(day_hours.get('close'))}"
+
+    fee = None
+    minimum = None
+    if delivery_available:
+        fee = f"${float(franchisee.get('delivery_fee') or 0):.2f}"
+        if fee == "$0.00":
+            fee = "Free"
+        if franchisee.get("min_order_amount"):
+            minimum = f"${float(franchisee['min_order_amount']):.2f}"
+    delivery = {
+        "available": delivery_available,
+        "fee": fee,
+        "minimumOrder": minimum,
+        "estimatedTime": "30-45 minutes" if delivery_available else None,
+    }
+    return {
+        "name": franchisee.get("name") or "Edible Arrangements",
+        "address": ", ".join(filter(None, [franchisee.get("address"), franchisee.get("city"),
+                                           franchisee.get("state")])),
+        "phone": franchisee.get("phone") or "",
+        "hours": {"today": hours_string(today_name), "tomorrow": hours_string(tomorrow_name)},
+        "delivery": {k: v for k, v in delivery.items() if v is not None},
+        "_internalId": franchisee["id"],
+    }
+
+
+def find_nearest_handler(store: LocalStore) -> Handler:
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        if not request.path.rstrip("/").endswith("/find-nearest"):
+            return 404, {"error": "Endpoint not found", "available": ["/find-nearest"]}
+        data = request.query if request.method == "GET" else (request.body or {})
+        zip_code = data.get("zipCode")
+        if not zip_code:
+            message = "Missing zipCode parameter" if request.method == "GET" else "zipCode is required"
+            return 400, {"error": message}
+
+        franchisee = store.franchisee_for_zip(str(zip_code))
+        if franchisee is None:
+            fallback = store.nearest_franchisee(str(zip_code))
+            if fallback is None:
+                return 404, {
+                    "error": "No delivery available",
+                    "summary": f"Sorry, we don't currently deliver to {zip_code}. "
+                               f"Please try a nearby zip code or consider pickup.",
+                }
+            return 200, {
+                "store": _streamline_store(fallback, False),
+                "summary": f"Found your nearest store for pickup in {zip_code}. "
+                           f"Delivery not available to this area.",
+            }
+        return 200, {
+            "store": _streamline_store(franchisee, True),
+            "serviceArea": {"zipCodes": franchisee.get("zip_codes", []), "deliveryRadius": "15 miles"},
+            "summary": f"Perfect! I found your local store with delivery available to {zip_code}.",
+        }
+    return handle
+
+
+# order -----------------------------------------------------------------------
+
+def _order_record(order: dict) -> dict:
+    return {k: v for k, v in order.items() if k != "items"}
+
+
+def _streamline_order(order: dict) -> dict:
+    delivery = order.get("delivery")
+    return {
+        "orderNumber": order["order_number"],
+        "status": order["status"],
+        "total": f"${order['total_amount']}",
+        "estimatedDelivery": f"{order['scheduled_date']} {order['scheduled_time_slot']}",
+        "items": [
+            {
+                "product": item["product_name"],
+                "product_id": item["product_identifier"],
+                "price": f"${item['unit_price']}",
+                "quantity": item["quantity"],
+                "addons": item.get("addons") or [],
+            }
+            for item in order["items"]
+        ],
+        "delivery": delivery,
+    }
+
+
+def _create_order(store: LocalStore, data: dict) -> tuple[int, dict]:
+    customer_id = store.resolve_customer_id(data.get("customerId") or data.get("customerPhone"))
+    franchisee_id = store.resolve_franchisee_id(data.get("franchiseeId") or data.get("storeNumber"))
+    items = data.get("items")
+    if not customer_id or not franchisee_id or not isinstance(items, list) or not items:
+        return 400, {
+            "error": "Customer, store, and items array are required",
+            "hint": "Use customerId (UUID) or customerPhone (E164), franchiseeId (UUID) "
+                    "or storeNumber (integer)",
+        }
+
+    delivery_address = data.get("deliveryAddress")
+    fulfillment_type = "delivery" if delivery_address else "pickup"
+    if fulfillment_type == "delivery" and not delivery_address.get("street"):
+        return 400, {"error": "deliveryAddress with street is required for delivery orders"}
+
+    resolved = resolve_order_items(store, items)
+    if resolved["errors"]:
+        return 400, {k: v for k, v in resolved["errors"][0].items() if k != "index"}
+    subtotal = sum(item["total_price"] for item in resolved["items"])
+    processed = [
+        {
+            "product_id": item["product_id"],
+            "product_identifier": item["product_identifier"],
+            "product_name": item["product_name"] or "Product",
+            "quantity": item["quantity"],
+            "unit_price": f"{item['unit_price']:.2f}",
+            "total_price": f"{item['total_price']:.2f}",
+            "addons": item["addons"],
+        }
+        for item in resolved["items"]
+    ]
+
+    tax = subtotal * TAX_RATE
+    total = subtotal + tax
+    scheduled_date = data.get("scheduledDate")
+    time_slot = data.get("scheduledTimeSlot")
+    pickup_time = data.get("pickupTime")
+    order = {
+        "id": str(uuid.uuid4()),
+        "customer_id": customer_id,
+        "franchisee_id": franchisee_id,
+        "order_number": store.next_order_number(franchisee_id),
+        "status": "pending",
+        "fulfillment_type": fulfillment_type,
+        "subtotal": f"{subtotal:.2f}",
+        "tax_amount": f"{tax:.2f}",
+        "total_amount": f"{total:.2f}",
+        "scheduled_date": scheduled_date or (date.today() + timedelta(days=1)).isoformat(),
+        "scheduled_time_slot": time_slot or (
+            "2:00 PM - 4:00 PM" if fulfillment_type == "delivery" else pickup_time or "2:00 PM"
+        ),
+        "special_instructions": data.get("specialInstructions") or "",
+        "items": processed,
+        "delivery": {
+            "address": f"{delivery_address['street']}, {delivery_address.get('city')}, "
+                       f"{delivery_address.get('state')}",
+            "instructions": delivery_address.get("specialInstructions"),
+        } if fulfillment_type == "delivery" else None,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    store.save_order(order)
+
+    if fulfillment_type == "delivery":
+        when = f"{scheduled_date or 'Tomorrow'} {time_slot or '2-4 PM'}"
+        confirmation_tail = (f"Delivering {scheduled_date or 'tomorrow'} {time_slot or '2-4 PM'} "
+                             f"to {delivery_address['street']}")
+    else:
+        when = f"Pickup {scheduled_date or 'Tomorrow'} {time_slot or pickup_time or '2:00 PM'}"
+        confirmation_tail = (f"Ready for pickup {scheduled_date or 'tomorrow'} "
+                             f"{time_slot or pickup_time or '2:00 PM'}")
+
+    streamlined = _streamline_order(order)
+    streamlined["estimatedDelivery"] = when
+    streamlined["items"] = [
+        {"product": item["product_name"], "price": f"${item['unit_price']}", "quantity": item["quantity"]}
+        for item in processed
+    ]
+    return 200, {
+        "order": streamlined,
+        "confirmation": f"Perfect! Order {order['order_number']} confirmed for ${total:.2f}. "
+                        f"{confirmation_tail}",
+    }
+
+
+def order_handler(store: LocalStore) -> Handler:
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        if request.method == "POST":
+            return _create_order(store, request.body or {})
+        if request.method != "GET":
+            return 405, {"error": "Method not allowed"}
+
+        query = request.query
+        customer_id = query.get("customerId")
+        phone = query.get("customerPhone")
+        order_number = query.get("orderNumber")
+        if not customer_id and not phone and not order_number:
+            return 400, {"error": "Either customerId, customerPhone, or orderNumber is required"}
+        if phone and not customer_id:
+            customer_id = store.resolve_customer_id(phone)
+            if not customer_id:
+                return 404, {
+                    "error": "Customer not found",
+                    "message": f"No customer found with phone number {phone}",
+                }
+        orders = store.find_orders(customer_id=customer_id, order_number=None if customer_id else order_number)
+        if not orders:
+            return 404, {"error": "Order not found"}
+        order = orders[0]
+        return 200, {
+            "order": _streamline_order(order),
+            "summary": f"Found order {order['order_number']} for you.",
+        }
+    return handle
+
+
+def allocate_order_numbers_handler(store: LocalStore) -> Handler:
+    """`rpc/allocate_order_numbers` (20250703_order_number_sequences.sql)."""
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        body = request.body or {}
+        count = body.get("p_count", 1)
+        if not isinstance(count, int) or not 1 <= count <= 10000:
+            return 400, {"message": f"p_count must be between 1 and 10000, got {count}"}
+        store_number = body.get("p_store_number")
+        if isinstance(store_number, str) and store_number.strip().isdigit():
+            store_number = int(store_number)
+        if not isinstance(store_number, int) or isinstance(store_number, bool):
+            return 400, {"message": f"p_store_number must be an integer, got {store_number}"}
+        first, last = store.order_sequences.allocate(store_number, count)
+        return 200, {"store_number": store_number, "first": first, "last": last}
+    return handle
+
+
+def resolve_order_items_handler(store: LocalStore) -> Handler:
+    """`rpc/resolve_order_items` (20250704_bulk_order_items.sql)."""
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        return 200, resolve_order_items(store, (request.body or {}).get("p_items") or [])
+    return handle
+
+
+def insert_order_items_handler(store: LocalStore) -> Handler:
+    """`rpc/insert_order_items`: keeps the rows in `store.order_items`."""
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        body = request.body or {}
+        rows = [{**item, "id": str(uuid.uuid4())} for item in body.get("p_items") or []]
+        with store._lock:
+            store.order_items.setdefault(body.get("p_order_id"), []).extend(rows)
+        return 200, {
+            "order_item_ids": [row["id"] for row in rows],
+            "addon_count": sum(len(row.get("addons") or []) for row in rows),
+        }
+    return handle
+
+
+def record_rate_limits_handler(store: LocalStore) -> Handler:
+    """`rpc/record_rate_limits` (20250705_rate_limit_usage_batches.sql)."""
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        recorded = store.record_rate_limits((request.body or {}).get("p_rows") or [])
+        return 200, {"recorded": recorded, "deleted": 0}
+    return handle
+
+
+def _client_identifier(request: LocalRequest) -> str:
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.headers.get("x-real-ip") or "unknown"
+
+
+def rate_limited(handler: Handler, limiter: Optional[SlidingWindowLimiter], endpoint: str) -> Handler:
+    """`handler` behind the per-caller limit for `endpoint`; unchanged without a limiter."""
+    if limiter is None:
+        return handler
+
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        retry_after = limiter.check(_client_identifier(request), endpoint)
+        if retry_after > 0:
+            return 429, {
+                "error": "Rate limit exceeded",
+                "message": "Too many requests. Please wait a moment.",
+                "retryAfter": math.ceil(retry_after),
+            }
+        return handler(request)
+    return handle
+
+
+IN_FILTER_VALUE = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,()]+)')
+
+
+def _parse_in_filter(value: str) -> set[str]:
+    """Values of a PostgREST `in.(...)` filter, quoted or bare."""
+    inner = value[len("in."):].strip("()")
+    return {
+        re.sub(r"\\(.)", r"\1", quoted) if quoted else bare
+        for quoted, bare in IN_FILTER_VALUE.findall(inner)
+    }
+
+
+def customers_table_handler(store: LocalStore) -> Handler:
+    """
+    `/rest/v1/customers`: GET with the keyset (`id=gt.`) and `in.(...)`
+    filters the dedupe and auth-sync jobs send, POST as an upsert on id.
+    """
+    def handle(request: LocalRequest) -> tuple[int, list]:
+        if request.method == "POST":
+            rows = request.body if isinstance(request.body, list) else [request.body or {}]
+            try:
+                store.upsert_customers(rows)
+            except ValueError as e:
+                return 409, {"code": "23505", "message": str(e)}
+            return 201, []
+        query = request.query
+        select = query.get("select") or CUSTOMER_COLUMNS
+        after = (query.get("id") or "").removeprefix("gt.") or None
+        limit = int(query.get("limit") or 1_000_000)
+        filters = {column: _parse_in_filter(query[column]) for column in ("auth_user_id", "email")
+                   if (query.get(column) or "").startswith("in.")}
+        with store._lock:
+            rows = sorted(
+                (c for c in store.customers.values()
+                 if (after is None or c["id"] > after)
+                 and all(c.get(column) in values for column, values in filters.items())),
+                key=lambda c: c["id"],
+            )[:limit]
+            if select == "*":
+                return 200, [json.loads(json.dumps(row)) for row in rows]
+            return 200, [{column: row.get(column) for column in select.split(",")} for row in rows]
+    return handle
+
+
+def auth_users_handler(store: LocalStore) -> Handler:
+    """GoTrue `GET /auth/v1/admin/users?page=&per_page=` over `store.auth_users`."""
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        page = int(request.query.get("page") or 1)
+        per_page = int(request.query.get("per_page") or 50)
+        users = store.auth_users[(page - 1) * per_page:page * per_page]
+        return 200, {"users": users, "aud": "authenticated"}
+    return handle
+
+
+def merge_customer_pairs_handler(store: LocalStore) -> Handler:
+    """`rpc/merge_customer_pairs` (20250706_bulk_customer_dedupe.sql)."""
+    def handle(request: LocalRequest) -> tuple[int, dict]:
+        body = request.body or {}
+        pairs = body.get("p_pairs") or []
+        if len(pairs) > 500:
+            return 400, {"message": f"At most 500 pairs per call, got {len(pairs)}"}
+        dry_run = body.get("p_dry_run", True)
+        results = [
+            {**pair, **store.merge_customer_pair(pair["primary_id"], pair["secondary_id"],
+                                                 body.get("p_source") or "bulk_dedupe", dry_run)}
+            for pair in pairs
+        ]
+        return 200, {"results": results}
+    return handle
+
+
+def customer_routes(store: LocalStore) -> dict[str, Handler]:
+    """The `customers` table, auth users and the bulk merge RPC, for the batch jobs."""
+    return {
+        "/rest/v1/customers": customers_table_handler(store),
+        "/auth/v1/admin/users": auth_users_handler(store),
+        "/rest/v1/rpc/merge_customer_pairs": merge_customer_pairs_handler(store),
+    }
+
+
+def ordering_routes(store: LocalStore, limiter: Optional[SlidingWindowLimiter] = None) -> dict[str, Handler]:
+    """
+    Routes for the ordering edge functions, to merge into a LocalEdgeServer.
+    With a `limiter`, each function enforces its per-caller rate limit.
+    """
+    return {
+        "customer-management": rate_limited(customer_management_handler(store), limiter, "customer-management"),
+        "franchisee-inventory": rate_limited(find_nearest_handler(store), limiter, "franchisee-inventory"),
+        "order": rate_limited(order_handler(store), limiter, "order"),
+        "/rest/v1/rpc/allocate_order_numbers": allocate_order_numbers_handler(store),
+        "/rest/v1/rpc/resolve_order_items": resolve_order_items_handler(store),
+        "/rest/v1/rpc/insert_order_items": insert_order_items_handler(store),
+        "/rest/v1/rpc/record_rate_limits": record_rate_limits_handler(store),
+    }
+
+
+def local_routes(
+    store: LocalStore,
+    dimensions: int = 1536,
+    limiter: Optional[SlidingWindowLimiter] = None,
+) -> dict[str, Handler]:
+    """Every stand-in route: product-search, the ordering functions and /v1/embeddings."""
+    return {
+        "product-search": rate_limited(product_search_handler(store.engine), limiter, "product-search"),
+        **ordering_routes(store, limiter),
+        **customer_routes(store),
+        "/v1/embeddings": embeddings_handler(dimensions),
+    }
+
+
+def start_local_stack(
+    franchisees: Optional[list[dict]] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> LocalEdgeServer:
+    """Start the full stand-in over the sample catalog; the caller stops it."""
+    store = LocalStore(sample_search_engine(), franchisees)
+    return LocalEdgeServer(local_routes(store), host, port).start()
+
+
+@contextmanager
+def local_stack(franchisees: Optional[list[dict]] = None) -> Iterator[LocalEdgeServer]:
+    server = start_local_stack(franchisees)
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Offline stand-in for the edge functions and embeddings")
+    parser.add_argument("--franchisees", help="JSON list of stores to serve instead of the defaults")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Enforce the per-caller limits and record usage like the edge functions")
+    args = parser.parse_args(argv)
+
+    franchisees = None
+    if args.franchisees:
+        with open(args.franchisees) as f:
+            franchisees = json.load(f)
+    store = LocalStore(sample_search_engine(), franchisees)
+    limiter = SlidingWindowLimiter() if args.rate_limit else None
+    server = LocalEdgeServer(local_routes(store, limiter=limiter), args.host, args.port)
+    if limiter is not None:
+        UsageSync(limiter, store.record_rate_limits).start()
+    print(f"🚀 Local stand-in on {server.url}{FUNCTIONS_PREFIX} "
+          f"({len(store.engine.rows)} products, {len(store.franchisees)} stores)")
+    print(f"   export SUPABASE_URL={server.url}")
+    print(f"   export OPENAI_BASE_URL={server.url}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Bulk resolution of order items: one call per basket instead of per item.
+
+Order creation in the `order` function used to resolve each item on its
+own: product identifier, product price, option name, option price, and a
+lookup plus an insert per addon, one sequential round trip each.
+`20250704_bulk_order_items.sql` adds `resolve_order_items`, which takes
+the whole basket and returns resolved UUIDs and prices, and
+`insert_order_items`, which writes every `order_items` and `order_addons`
+row in one statement.
+
+- `BulkOrderItems` calls the two RPCs through an `EdgeClient`.
+- `resolve_order_items` is the Python reference of the resolver, used by
+  the local `order` stand-in and served as `rpc/resolve_order_items`.
+- `legacy_round_trips` counts the queries the per-item code made, for
+  comparison.
+
+Usage:
+    python -m edible_tools.order_items --sizes 1 5 20
+    python -m edible_tools.order_items --live --sizes 1 5 --product 3075
+"""
+
+import argparse
+import json
+import re
+import time
+from typing import Optional, Protocol
+
+from edible_tools.product_search import _to_float
+
+UUID_PATTERN = re.compile(
+    r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE
+)
+PRODUCT_HINT = "Use 4-digit product ID (e.g., '3075') or valid product UUID"
+# A positive INTEGER, as order_items.quantity and order_addons.quantity take
+QUANTITY_PATTERN = re.compile(r"^\s*\+?0*[1-9]\d{0,8}\s*$")
+QUANTITY_HINT = "Quantities are whole numbers of at least 1"
+
+
+class ItemCatalog(Protocol):
+    def resolve_product(self, product_id) -> Optional[dict]:
+        """chatbot_products_flat-style row for a 4-digit identifier or UUID."""
+
+    def resolve_addon(self, addon_id) -> Optional[dict]:
+        """Addon row ({"id", "name", "price"}) by UUID."""
+
+
+def _match_option(options: list[dict], reference: str) -> Optional[dict]:
+    """Option by UUID or case-insensitive name; ambiguous names match nothing."""
+    if UUID_PATTERN.match(reference):
+        matches = [o for o in options if o.get("id") == reference]
+    else:
+        matches = [o for o in options if (o.get("option_name") or "").lower() == reference.lower()]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _bad_quantity(value) -> bool:
+    """A quantity set to something the INTEGER columns can't take ("2.5", 0, "")."""
+    return value not in (None, "") and not QUANTITY_PATTERN.match(str(value))
+
+
+def resolve_order_items(catalog: ItemCatalog, items: list[dict]) -> dict:
+    """
+    Reference of the `resolve_order_items` RPC: {"items": [...], "errors":
+    [...]}, each entry carrying the `index` of its input item. Unknown
+    addons are dropped, as the per-item code did.
+    """
+    resolved, errors = [], []
+    for index, item in enumerate(items):
+        product_ref = item.get("productId")
+        row = catalog.resolve_product(product_ref)
+        if row is None:
+            errors.append({"index": index, "error": f"Product {product_ref} not found or inactive",
+                           "hint": PRODUCT_HINT})
+            continue
+        product_data = row["product_data"]
+        info = product_data.get("product_info") or {}
+        unit_price = _to_float(info.get("base_price"))
+        option_id = None
+        option_ref = item.get("productOptionId")
+        if option_ref:
+            option = _match_option(product_data.get("options") or [], str(option_ref))
+            if option is None:
+                errors.append({"index": index,
+                               "error": f"Product option {option_ref} not found for product {product_ref}"})
+                continue
+            option_id = option.get("id")
+            if option.get("price") is not None:
+                unit_price = _to_float(option["price"])
+
+        bad = [q for q in [item.get("quantity")] + [a.get("quantity") for a in item.get("addons") or []]
+               if _bad_quantity(q)]
+        if bad:
+            errors.append({"index": index, "error": f"Invalid quantity {bad[0]} for product {product_ref}",
+                           "hint": QUANTITY_HINT})
+            continue
+        addons = []
+        for addon in item.get("addons") or []:
+            found = catalog.resolve_addon(addon.get("addonId"))
+            if found is not None:
+                addons.append({"addon_id": found["id"], "quantity": int(addon.get("quantity") or 1),
+                               "unit_price": _to_float(found.get("price"))})
+        quantity = int(item.get("quantity") or 1)
+        resolved.append({
+            "index": index,
+            "product_id": row["product_id"],
+            "product_identifier": info.get("product_identifier"),
+            "product_name": info.get("name"),
+            "product_option_id": option_id,
+            "quantity": quantity,
+            "unit_price": round(unit_price, 2),
+            "total_price": round(unit_price * quantity, 2),
+            "addons": addons,
+        })
+    return {"items": resolved, "errors": errors}
+
+
+def legacy_round_trips(items: list[dict]) -> int:
+    """Sequential queries the per-item order code made for `items`."""
+    trips = 0
+    for item in items:
+        trips += 2  # resolveProductId, products price lookup
+        if item.get("productOptionId"):
+            trips += 2  # resolveProductOptionId, product_options price lookup
+        trips += 1  # order_items insert
+        trips += 2 * len(item.get("addons") or [])  # addons lookup + order_addons insert
+    return trips
+
+
+class BulkOrderItems:
+    """`resolve_order_items` / `insert_order_items` over PostgREST."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def resolve(self, items: list[dict]) -> dict:
+        response = self.client.rpc("resolve_order_items", {"p_items": items})
+        response.raise_for_status()
+        return response.json()
+
+    def insert(self, order_id: str, resolved_items: list[dict]) -> dict:
+        response = self.client.rpc(
+            "insert_order_items", {"p_order_id": order_id, "p_items": resolved_items}
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+def sample_basket(size: int, product_ids: list, options: Optional[dict] = None) -> list[dict]:
+    """`size` items cycling through `product_ids`, with an option where one is known."""
+    options = options or {}
+    basket = []
+    for i in range(size):
+        product_id = product_ids[i % len(product_ids)]
+        item = {"productId": product_id, "quantity": 1 + i % 3}
+        if product_id in options:
+            item["productOptionId"] = options[product_id]
+        basket.append(item)
+    return basket
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Time bulk order-item resolution by basket size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--product", action="append", help="Product identifier to order (repeatable)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="Use SUPABASE_URL instead of the local stand-in")
+    args = parser.parse_args(argv)
+
+    from edible_tools.edge_client import EdgeClient
+
+    server = None
+    if args.live:
+        client = EdgeClient.from_env(retries=0)
+        product_ids, options = args.product or ["3075"], {}
+    else:
+        from edible_tools.local_edge import LocalEdgeServer, sample_search_engine
+        from edible_tools.local_services import LocalStore, local_routes
+        store = LocalStore(sample_search_engine())
+        server = LocalEdgeServer(local_routes(store)).start()
+        client = EdgeClient(server.url, retries=0)
+        rows = [r for r in store.engine.rows if r["product_data"].get("options")]
+        product_ids = args.product or [r["product_data"]["product_info"]["product_identifier"] for r in rows[:5]]
+        options = {
+            r["product_data"]["product_info"]["product_identifier"]: r["product_data"]["options"][-1]["option_name"]
+            for r in rows[:5]
+        }
+
+    bulk = BulkOrderItems(client)
+    try:
+        for size in args.sizes:
+            basket = sample_basket(size, product_ids, options)
+            bulk.resolve(basket)
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                result = bulk.resolve(basket)
+            per_call_ms = (time.perf_counter() - started) * 1000 / args.repeat
+            print(json.dumps({
+                "items": size,
+                "resolved": len(result["items"]),
+                "errors": len(result["errors"]),
+                "bulk_round_trips": 2,
+                "legacy_round_trips": legacy_round_trips(basket),
+                "resolve_ms": round(per_call_ms, 2),
+            }))
+    finally:
+        client.close()
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
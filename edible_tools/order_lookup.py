@@ -0,0 +1,260 @@
+"""
+Order lookup by order number: suffix index and benchmark.
+
+The `order` function finds an order with
+`.like('order_data->order_info->>order_number', '%{n}-%')` over
+`chatbot_orders_flat`, a sequential scan of every flat row per lookup.
+`20250708_order_number_lookup.sql` indexes the reversed order number (its
+part before the "-1" version) on `orders`, so "ends with n" becomes a
+btree prefix range, and `find_orders_by_number` serves it.
+
+- `lookup_key` normalizes what a caller said, as `order_lookup_key` does.
+- `OrderNumberIndex` is the in-memory reference of the index: reversed
+  numbers in a sorted list, one `bisect` range per lookup.
+- `legacy_matches` reproduces the LIKE, for comparison.
+
+`benchmark` times both in memory. `benchmark_postgres` seeds synthetic
+orders into a scratch schema of a local Postgres, applies the migration
+there and times the LIKE scan against the RPC (needs `psycopg`).
+
+Usage:
+    python -m edible_tools.order_lookup --orders 1000000
+    python -m edible_tools.order_lookup --postgres postgresql://localhost/postgres --orders 1000000
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from edible_tools.order_numbers import format_order_number
+
+MIGRATION = os.path.join(os.path.dirname(__file__), "..", "supabase", "migrations",
+                         "20250708_order_number_lookup.sql")
+BENCH_SCHEMA = "order_lookup_bench"
+DEFAULT_LIMIT = 5
+
+_NOT_KEY = re.compile(r"[^A-Za-z0-9]")
+
+
+def lookup_key(order_number: Optional[str]) -> str:
+    """'w25710000001-1' → 'W25710000001': the part before the version, alphanumerics only, upper case."""
+    return _NOT_KEY.sub("", (order_number or "").strip().split("-", 1)[0]).upper()
+
+
+def _reversed_base(order_number: str) -> str:
+    return order_number.split("-", 1)[0][::-1]
+
+
+class OrderNumberIndex:
+    """In-memory reference of `idx_orders_order_number_suffix` + `find_orders_by_number`."""
+
+    def __init__(self, orders: Iterable[dict] = ()):
+        entries = [(_reversed_base(o["order_number"]), o["id"]) for o in orders]
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._ids = [order_id for _, order_id in entries]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, order_number: str, order_id: str) -> None:
+        key = _reversed_base(order_number)
+        at = bisect.bisect_right(self._keys, key)
+        self._keys.insert(at, key)
+        self._ids.insert(at, order_id)
+
+    def find(self, order_number: Optional[str]) -> list[str]:
+        """Ids of the orders whose number ends with the lookup key."""
+        key = lookup_key(order_number)
+        if not key:
+            return []
+        prefix = key[::-1]
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + "\x7f")
+        return self._ids[lo:hi]
+
+
+def legacy_matches(orders: Iterable[dict], order_number: str) -> list[str]:
+    """Ids the `%{n}-%` LIKE returns: a scan of every order."""
+    needle = f"{order_number}-"
+    return [o["id"] for o in orders if needle in o["order_number"]]
+
+
+def synthetic_orders(count: int, stores: int = 900, seed: int = 5) -> list[dict]:
+    """`count` orders spread over `stores` stores, numbered per store like the sequences hand them out."""
+    rng = random.Random(seed)
+    return [
+        {"id": f"order-{i}", "order_number": format_order_number(100 + i % stores, i // stores + 1)}
+        for i in rng.sample(range(count), count)
+    ]
+
+
+def sample_lookups(orders: list[dict], count: int, seed: int = 9) -> list[str]:
+    """What callers read out: full numbers, 8-digit sequences and last 4 digits, a third each."""
+    rng = random.Random(seed)
+    lookups = []
+    for i in range(count):
+        base = rng.choice(orders)["order_number"].split("-", 1)[0]
+        lookups.append((base, base[-8:], base[-4:])[i % 3])
+    return lookups
+
+
+def _latency_summary(latencies: list[float]) -> dict:
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def benchmark(count: int, lookups: int = 300) -> dict:
+    """LIKE scan vs suffix index, in memory; also checks both find the same orders."""
+    orders = synthetic_orders(count)
+    started = time.perf_counter()
+    index = OrderNumberIndex(orders)
+    build_s = time.perf_counter() - started
+    queries = sample_lookups(orders, lookups)
+
+    legacy_latency, index_latency, mismatches = [], [], 0
+    for query in queries:
+        started = time.perf_counter()
+        expected = legacy_matches(orders, query)
+        legacy_latency.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        found = index.find(query)
+        index_latency.append(time.perf_counter() - started)
+        mismatches += sorted(found) != sorted(expected)
+
+    legacy, indexed = _latency_summary(legacy_latency), _latency_summary(index_latency)
+    return {
+        "orders": count,
+        "lookups": lookups,
+        "index_build_s": round(build_s, 3),
+        "legacy": legacy,
+        "indexed": indexed,
+        "mismatches": mismatches,
+        "speedup_p50": round(legacy["p50_ms"] / max(indexed["p50_ms"], 1e-6), 1),
+    }
+
+
+def _migration_statements() -> str:
+    """The migration without its GRANTs (a scratch database may have no service_role)."""
+    with open(MIGRATION) as f:
+        return "\n".join(line for line in f.read().splitlines() if not line.startswith("GRANT "))
+
+
+def benchmark_postgres(dsn: str, count: int, lookups: int = 200) -> dict:
+    """
+    Seed `count` orders (and their flat rows) into a scratch schema, then
+    time the order function's LIKE scan, apply the migration and time
+    `find_orders_by_number`. The schema is dropped afterwards.
+    """
+    import psycopg
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        conn.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        conn.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+        try:
+            conn.execute("""
+                CREATE TABLE orders (
+                    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                    order_number TEXT UNIQUE NOT NULL,
+                    status TEXT DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT now()
+                )""")
+            conn.execute("""
+                CREATE TABLE chatbot_orders_flat (
+                    order_id UUID PRIMARY KEY REFERENCES orders(id),
+                    order_data JSONB,
+                    last_updated TIMESTAMP DEFAULT now()
+                )""")
+            started = time.perf_counter()
+            # Same numbering as synthetic_orders: store 100 + i % 900, sequence i / 900 + 1
+            conn.execute("""
+                INSERT INTO orders (order_number, created_at)
+                SELECT 'W' || (100 + i % 900) || lpad((i / 900 + 1)::TEXT, 8, '0') || '-1',
+                       now() - (i || ' seconds')::INTERVAL
+                FROM generate_series(0, %s - 1) AS i""", (count,))
+            conn.execute("""
+                INSERT INTO chatbot_orders_flat (order_id, order_data)
+                SELECT id, jsonb_build_object('order_info', jsonb_build_object(
+                    'id', id, 'order_number', order_number, 'status', status))
+                FROM orders""")
+            conn.execute("ANALYZE orders")
+            conn.execute("ANALYZE chatbot_orders_flat")
+            seed_s = time.perf_counter() - started
+
+            numbers = [row[0] for row in conn.execute(
+                "SELECT order_number FROM orders TABLESAMPLE SYSTEM (1) LIMIT 1000").fetchall()]
+            queries = sample_lookups([{"order_number": n} for n in numbers], lookups)
+
+            def timed(sql: str) -> tuple[list[float], list[int]]:
+                latencies, rows = [], []
+                for query in queries:
+                    started = time.perf_counter()
+                    rows.append(len(conn.execute(sql, (query,)).fetchall()))
+                    latencies.append(time.perf_counter() - started)
+                return latencies, rows
+
+            legacy_sql = ("SELECT * FROM chatbot_orders_flat "
+                          "WHERE order_data->'order_info'->>'order_number' LIKE '%%' || %s || '-%%'")
+            legacy_latency, legacy_rows = timed(legacy_sql)
+
+            started = time.perf_counter()
+            conn.execute(_migration_statements())
+            index_s = time.perf_counter() - started
+            rpc_sql = "SELECT * FROM find_orders_by_number(%s, 100)"
+            rpc_latency, rpc_rows = timed(rpc_sql)
+            plan = "\n".join(row[0] for row in conn.execute("EXPLAIN " + rpc_sql, (queries[0],)).fetchall())
+        finally:
+            conn.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+
+    legacy, indexed = _latency_summary(legacy_latency), _latency_summary(rpc_latency)
+    return {
+        "orders": count,
+        "lookups": len(queries),
+        "seed_s": round(seed_s, 1),
+        "index_build_s": round(index_s, 1),
+        "legacy": legacy,
+        "indexed": indexed,
+        "uses_index": "idx_orders_order_number_suffix" in plan,
+        # The RPC caps at 100 rows; short suffixes can match more
+        "mismatches": sum(min(a, 100) != b for a, b in zip(legacy_rows, rpc_rows)),
+        "speedup_p50": round(legacy["p50_ms"] / max(indexed["p50_ms"], 1e-6), 1),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark order-number lookup: LIKE scan vs suffix index")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--postgres", metavar="DSN", help="Run against a local Postgres instead of in memory")
+    args = parser.parse_args(argv)
+
+    where = "Postgres" if args.postgres else "memory"
+    print(f"📦 {args.orders} orders, {args.lookups} lookups ({where})")
+    if args.postgres:
+        try:
+            result = benchmark_postgres(args.postgres, args.orders, args.lookups)
+        except ImportError:
+            print("❌ --postgres needs psycopg: pip install 'psycopg[binary]'")
+            raise SystemExit(1)
+    else:
+        result = benchmark(args.orders, args.lookups)
+    print(json.dumps(result))
+    ok = not result["mismatches"] and result.get("uses_index", True)
+    print(f"{'✅' if ok else '❌'} p50 {result['legacy']['p50_ms']}ms → {result['indexed']['p50_ms']}ms "
+          f"({result['speedup_p50']}x), {result['mismatches']} mismatches")
+
+
+if __name__ == "__main__":
+    main()
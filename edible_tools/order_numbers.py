@@ -0,0 +1,219 @@
+"""
+Per-store order-number allocation, and a harness that bursts it.
+
+`generateOrderNumber` in the `order` function reads the newest
+`W{store}%` order and adds one: a LIKE scan that grows with the orders
+table, and a read-then-write race, so two orders placed together can get
+the same number. `20250703_order_number_sequences.sql` replaces it with a
+counter row per store that `allocate_order_numbers` bumps in one upsert.
+
+- `SequenceAllocator` is the in-memory reference of that RPC: per-store
+  counters behind a lock, O(1) per allocation.
+- `RpcSequenceSource` calls the RPC through an `EdgeClient`.
+- `BlockAllocator` reserves `block_size` numbers per round trip from either
+  source and hands them out locally. Numbers left in a block when the
+  process exits are never used: numbers stay unique, with gaps.
+- `LegacyScanAllocator` reproduces the scan-and-increment, for comparison.
+
+`burst` runs many concurrent allocations for one store and reports
+duplicates, gaps and per-allocation latency.
+
+Usage:
+    python -m edible_tools.order_numbers --orders 2000 --workers 32 --block 20
+    python -m edible_tools.order_numbers --legacy --orders 200 --workers 16
+    python -m edible_tools.order_numbers --rpc --store 257 --orders 200 --workers 16
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Protocol
+
+ORDER_NUMBER = re.compile(r"^W(\d{3})(\d{8})-(\d+)$")
+MAX_SEQUENCE = 99_999_999
+
+
+def format_order_number(store_number: int, sequence: int) -> str:
+    """W[store_number][8-digit sequence]-1, the format the order function uses."""
+    if not 1 <= sequence <= MAX_SEQUENCE:
+        raise ValueError(f"Sequence {sequence} does not fit in 8 digits")
+    return f"W{store_number}{sequence:08d}-1"
+
+
+def parse_order_number(order_number: str) -> Optional[tuple[int, int]]:
+    """(store_number, sequence), or None when it is not an order number."""
+    match = ORDER_NUMBER.match(order_number or "")
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+class SequenceSource(Protocol):
+    def allocate(self, store_number: int, count: int = 1) -> tuple[int, int]:
+        """Reserve `count` consecutive sequences; returns (first, last)."""
+
+
+class SequenceAllocator:
+    """In-memory reference of `allocate_order_numbers`: one counter per store."""
+
+    def __init__(self, start: Optional[dict[int, int]] = None):
+        """start: store_number -> next sequence to hand out (default 1)."""
+        self._next = dict(start or {})
+        self._lock = threading.Lock()
+
+    def allocate(self, store_number: int, count: int = 1) -> tuple[int, int]:
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        with self._lock:
+            first = self._next.get(store_number, 1)
+            self._next[store_number] = first + count
+        return first, first + count - 1
+
+    def next_order_number(self, store_number: int) -> str:
+        return format_order_number(store_number, self.allocate(store_number)[0])
+
+
+class RpcSequenceSource:
+    """`allocate_order_numbers` over PostgREST."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def allocate(self, store_number: int, count: int = 1) -> tuple[int, int]:
+        response = self.client.rpc(
+            "allocate_order_numbers", {"p_store_number": store_number, "p_count": count}
+        )
+        response.raise_for_status()
+        data = response.json()
+        return int(data["first"]), int(data["last"])
+
+
+class BlockAllocator:
+    """Hands out numbers from blocks reserved `block_size` at a time."""
+
+    def __init__(self, source: SequenceSource, block_size: int = 20):
+        self.source = source
+        self.block_size = block_size
+        self._blocks: dict[int, tuple[int, int]] = {}  # store -> (next, last)
+        self._lock = threading.Lock()
+        self.reservations = 0
+
+    def allocate(self, store_number: int, count: int = 1) -> tuple[int, int]:
+        if count != 1:
+            # Larger requests go straight to the source, keeping the block intact
+            return self.source.allocate(store_number, count)
+        with self._lock:
+            block = self._blocks.get(store_number)
+            if block is None or block[0] > block[1]:
+                block = self.source.allocate(store_number, self.block_size)
+                self.reservations += 1
+            sequence = block[0]
+            self._blocks[store_number] = (sequence + 1, block[1])
+        return sequence, sequence
+
+    def next_order_number(self, store_number: int) -> str:
+        return format_order_number(store_number, self.allocate(store_number)[0])
+
+
+class LegacyScanAllocator:
+    """
+    The order function's current scheme: find the newest order number for
+    the store, add one, insert. `think_time` is the gap between the read
+    and the insert (a PostgREST round trip in production).
+    """
+
+    def __init__(self, think_time: float = 0.001):
+        self.order_numbers: list[str] = []
+        self.think_time = think_time
+        self._lock = threading.Lock()
+
+    def allocate(self, store_number: int, count: int = 1) -> tuple[int, int]:
+        prefix = f"W{store_number}"
+        with self._lock:
+            latest = next((n for n in reversed(self.order_numbers) if n.startswith(prefix)), None)
+        parsed = parse_order_number(latest) if latest else None
+        sequence = parsed[1] + 1 if parsed else 1
+        time.sleep(self.think_time)
+        with self._lock:
+            self.order_numbers.append(format_order_number(store_number, sequence))
+        return sequence, sequence
+
+
+def burst(allocator, store_number: int = 257, orders: int = 1000, workers: int = 32) -> dict:
+    """
+    `orders` single allocations for one store from `workers` threads at once.
+    Reports duplicates (must be 0), gaps and per-allocation latency.
+    """
+    start = threading.Barrier(workers)
+
+    def worker(n: int) -> list[tuple[int, float]]:
+        start.wait()
+        results = []
+        for _ in range(n):
+            began = time.perf_counter()
+            sequence = allocator.allocate(store_number)[0]
+            results.append((sequence, time.perf_counter() - began))
+        return results
+
+    shares = [orders // workers + (1 if i < orders % workers else 0) for i in range(workers)]
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = [r for rs in pool.map(worker, shares) for r in rs]
+    elapsed = time.perf_counter() - began
+
+    sequences = [sequence for sequence, _ in results]
+    latencies = sorted(latency * 1000 for _, latency in results)
+    unique = set(sequences)
+    span = max(unique) - min(unique) + 1 if unique else 0
+    return {
+        "orders": len(sequences),
+        "workers": workers,
+        "unique": len(unique),
+        "duplicates": len(sequences) - len(unique),
+        "gaps": span - len(unique),
+        "first": min(unique) if unique else None,
+        "last": max(unique) if unique else None,
+        "orders_per_s": round(len(sequences) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3)
+        if latencies else None,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Burst order-number allocation for one store")
+    parser.add_argument("--store", type=int, default=257)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--block", type=int, default=1, help="Numbers reserved per round trip")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--rpc", action="store_true",
+                        help="Allocate through allocate_order_numbers on SUPABASE_URL")
+    source.add_argument("--legacy", action="store_true",
+                        help="Scan-and-increment, like generateOrderNumber today")
+    args = parser.parse_args(argv)
+
+    if args.legacy:
+        allocator = LegacyScanAllocator()
+        label = "legacy scan"
+    else:
+        if args.rpc:
+            from edible_tools.edge_client import EdgeClient
+            source = RpcSequenceSource(EdgeClient.from_env(pool_size=args.workers))
+        else:
+            source = SequenceAllocator()
+        allocator = BlockAllocator(source, args.block) if args.block > 1 else source
+        label = f"{'rpc' if args.rpc else 'in-memory'} sequence, block {args.block}"
+
+    print(f"🚀 {args.orders} orders for store {args.store} from {args.workers} workers ({label})")
+    result = burst(allocator, args.store, args.orders, args.workers)
+    print(json.dumps(result))
+    if result["duplicates"]:
+        print(f"❌ {result['duplicates']} duplicate order numbers")
+    else:
+        print(f"✅ All {result['unique']} order numbers unique ({result['gaps']} gaps)")
+
+
+if __name__ == "__main__":
+    main()
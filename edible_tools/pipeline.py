@@ -0,0 +1,123 @@
+"""
+Small threaded pipeline for I/O-bound batch jobs.
+
+Each `Stage` runs its own pool of worker threads and is connected to the next
+stage by a bounded queue, so fetching, transforming, calling external APIs
+and writing back all overlap instead of adding up. Stage functions return an
+iterable of outputs (zero, one or many) for each input item.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Any], Iterable[Any]]
+    workers: int = 1
+    queue_size: int = 0  # 0 means 2x workers
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    emitted: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class PipelineResult:
+    outputs: list = field(default_factory=list)
+    stats: dict = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+
+def run_pipeline(source: Iterable[Any], stages: list[Stage]) -> PipelineResult:
+    """
+    Push every item from `source` through `stages` and collect the outputs of
+    the last stage. An exception in a stage function drops that item (and is
+    counted in the stage's `errors`) without stopping the pipeline.
+    """
+    if not stages:
+        raise ValueError("run_pipeline needs at least one stage")
+
+    started = time.perf_counter()
+    result = PipelineResult(stats={stage.name: StageStats() for stage in stages})
+    workers = [max(1, stage.workers) for stage in stages]
+    queues = [
+        queue.Queue(maxsize=stage.queue_size or count * 2)
+        for stage, count in zip(stages, workers)
+    ]
+    outputs_lock = threading.Lock()
+    remaining = list(workers)
+    remaining_lock = threading.Lock()
+
+    def emit(index: int, item: Any) -> None:
+        if index + 1 < len(stages):
+            queues[index + 1].put(item)
+        else:
+            with outputs_lock:
+                result.outputs.append(item)
+
+    def worker(index: int) -> None:
+        stage = stages[index]
+        stats = result.stats[stage.name]
+        inbox = queues[index]
+
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+
+            begin = time.perf_counter()
+            try:
+                produced = list(stage.func(item) or [])
+            except Exception as e:
+                print(f"❌ Stage '{stage.name}' failed on an item: {e}")
+                with remaining_lock:
+                    stats.errors += 1
+                    stats.processed += 1
+                    stats.busy_seconds += time.perf_counter() - begin
+                continue
+
+            with remaining_lock:
+                stats.processed += 1
+                stats.emitted += len(produced)
+                stats.busy_seconds += time.perf_counter() - begin
+            for output in produced:
+                emit(index, output)
+
+        # The last worker of a stage closes the next stage's queue
+        with remaining_lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and index + 1 < len(stages):
+            for _ in range(workers[index + 1]):
+                queues[index + 1].put(_DONE)
+
+    threads = []
+    for index, stage in enumerate(stages):
+        for n in range(workers[index]):
+            thread = threading.Thread(
+                target=worker, args=(index,), name=f"{stage.name}-{n}", daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+    for item in source:
+        queues[0].put(item)
+    for _ in range(workers[0]):
+        queues[0].put(_DONE)
+
+    for thread in threads:
+        thread.join()
+
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,480 @@
+"""
+Offline port of the `product-search` edge function.
+
+`ProductSearchEngine` mirrors the three search levels of
+`supabase/functions/product-search-enhanced` (direct ID, structured filters,
+semantic fallback/boost) and returns the same response shape, but runs
+entirely in memory. Level 3 scores the *whole* catalog with one
+matrix-vector product over pre-normalised float32 embeddings and picks the
+top k with `argpartition`, instead of scoring only the first 50 candidate
+rows one cosine at a time.
+"""
+
+import functools
+import math
+import re
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from edible_tools.catalog_index import CatalogIndex
+from edible_tools.scoring import VectorScorer
+from edible_tools.vectors import EMBEDDING_DTYPE
+
+DEFAULT_SEMANTIC_THRESHOLD = 0.7
+DEFAULT_MAX_RESULTS = 10
+ALLERGEN_INGREDIENTS = ['nuts', 'peanut', 'dairy', 'gluten', 'soy']
+
+QueryEmbedder = Callable[[str], Optional[np.ndarray]]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _format_price(value) -> str:
+    return f"${_to_float(value):.2f}"
+
+
+def _round_score(score: float) -> float:
+    # Math.round(score * 100) / 100 (round half up, unlike Python's round)
+    return math.floor(score * 100 + 0.5) / 100
+
+
+def category_variations(term: str) -> list[str]:
+    """Same spelling variations the edge function tries for category/occasion."""
+    variations = [
+        term,
+        term.lower(),
+        term[:1].upper() + term[1:].lower(),
+        re.sub(r"s\s+day", "'s Day", term, count=1, flags=re.IGNORECASE),
+        re.sub(r"mothers", "Mother's", term, count=1, flags=re.IGNORECASE),
+        re.sub(r"fathers", "Father's", term, count=1, flags=re.IGNORECASE),
+        re.sub(r"\s+", " ", term),
+    ]
+    return list(dict.fromkeys(variations))
+
+
+def price_bounds(search_data: dict) -> tuple[float, float]:
+    """Combine priceRange, minPrice and maxPrice into one [low, high] window."""
+    low, high = -math.inf, math.inf
+    price_range = (search_data.get('priceRange') or '').lower()
+    if price_range == 'budget':
+        high = 50
+    elif price_range in ('mid', 'medium'):
+        low, high = 50, 100
+    elif price_range in ('premium', 'luxury'):
+        low = 100
+    if search_data.get('maxPrice'):
+        high = min(high, float(search_data['maxPrice']))
+    if search_data.get('minPrice'):
+        low = max(low, float(search_data['minPrice']))
+    return low, high
+
+
+def parse_product_identifier(value) -> Optional[int]:
+    """parseInt() semantics: leading digits, or None."""
+    match = re.match(r"\s*([+-]?\d+)", str(value))
+    return int(match.group(1)) if match else None
+
+
+def streamline_product(row: dict) -> dict:
+    """Voice-friendly product shape returned by the edge function."""
+    product_data = row['product_data']
+    info = product_data.get('product_info') or {}
+    options = product_data.get('options') or []
+    ingredients = product_data.get('ingredients') or []
+    addons = product_data.get('addons') or []
+
+    description = info.get('description')
+    if description:
+        if len(description) > 100:
+            description = description[:97] + '...'
+    else:
+        description = 'Delicious arrangement perfect for any occasion'
+
+    identifier = info.get('product_identifier')
+    product = {
+        'productId': str(identifier) if identifier not in (None, '') else '0000',
+        'name': info.get('name'),
+        'price': _format_price(info.get('base_price')),
+        'description': description,
+    }
+    if len(options) > 1:
+        product['options'] = [
+            {
+                'name': option.get('option_name'),
+                'price': _format_price(option.get('price')),
+                '_internalId': option.get('id'),
+            }
+            for option in options
+        ]
+    product['allergens'] = [
+        ingredient for ingredient in ingredients
+        if ingredient.lower() in ALLERGEN_INGREDIENTS
+    ]
+    product['availableAddons'] = [
+        f"{addon.get('name')} ({_format_price(addon.get('price'))})"
+        for addon in addons[:3]
+    ]
+    product['_internalId'] = row['product_id']
+    return product
+
+
+def generate_search_summary(search_data: dict, count: int, semantic_search_used: bool) -> str:
+    if count == 0:
+        if semantic_search_used:
+            return ("I couldn't find any products that closely match your description. "
+                    "Try different keywords or browse our categories.")
+        return ("I couldn't find any products matching your criteria. "
+                "Try a broader search or different keywords.")
+
+    summary = f"Found {count} product{'s' if count != 1 else ''}"
+    query = search_data.get('query')
+    if query:
+        summary += f' related to "{query}"' if semantic_search_used else f' matching "{query}"'
+
+    category = search_data.get('category') or search_data.get('occasion')
+    if category:
+        summary += f" for {category}"
+
+    price_range = search_data.get('priceRange')
+    min_price, max_price = search_data.get('minPrice'), search_data.get('maxPrice')
+    if price_range:
+        price_text = {
+            'budget': 'under $50',
+            'mid': '$50-100',
+            'medium': '$50-100',
+            'premium': 'over $100',
+            'luxury': 'over $100',
+        }.get(price_range.lower(), price_range)
+        summary += f" in {price_text} range"
+    elif min_price and max_price:
+        summary += f" between ${min_price} and ${max_price}"
+    elif max_price:
+        summary += f" under ${max_price}"
+    elif min_price:
+        summary += f" over ${min_price}"
+
+    allergens = search_data.get('allergens') or []
+    if allergens:
+        summary += f" (safe for {', '.join(allergens)} allergies)"
+
+    if semantic_search_used:
+        summary += " using AI semantic search"
+    return summary
+
+
+class ProductSearchEngine:
+    """In-memory catalog with a pre-normalised embedding matrix."""
+
+    def __init__(
+        self,
+        rows: Sequence[dict],
+        embeddings: Optional[dict] = None,
+        dimensions: int = 1536,
+        embed_query: Optional[QueryEmbedder] = None,
+        inventory: Optional[dict] = None,
+        ann_index=None,
+        quantize: Optional[str] = None,
+    ):
+        """
+        rows: chatbot_products_flat rows ({"product_id", "product_data"}).
+        embeddings: product_id -> vector for products that have one.
+        embed_query: turns the search text into a query vector.
+        inventory: franchisee_id -> set of product_ids in stock.
+        ann_index: optional `IVFFlatIndex`; when set, semantic search probes
+            it instead of scoring every row.
+        quantize: "int8" to hold the embeddings as int8 (see `VectorScorer`).
+        """
+        self.rows = list(rows)
+        self.dimensions = dimensions
+        self.embed_query = embed_query
+        self.inventory = inventory or {}
+        self.ann_index = ann_index
+        self._index_by_id = {row['product_id']: i for i, row in enumerate(self.rows)}
+
+        infos = [row['product_data'].get('product_info') or {} for row in self.rows]
+        self.index = CatalogIndex(self.rows)
+        self.prices = self.index.prices
+        self._identifiers = {}
+        for i, info in enumerate(infos):
+            identifier = parse_product_identifier(info.get('product_identifier', ''))
+            if identifier is not None:
+                self._identifiers.setdefault(identifier, i)
+        self._search_text = [
+            ((info.get('name') or '').lower(), (info.get('description') or '').lower())
+            for info in infos
+        ]
+        self._inventory_masks: dict[str, np.ndarray] = {}
+
+        matrix = np.zeros((len(self.rows), dimensions), dtype=EMBEDDING_DTYPE)
+        for product_id, vector in (embeddings or {}).items():
+            i = self._index_by_id.get(product_id)
+            if i is not None and vector is not None:
+                matrix[i] = vector
+        self.scorer = VectorScorer(matrix, quantize=quantize)
+        # Unit rows (None when quantized); rows without a vector are all zeros
+        self.matrix = self.scorer.matrix
+        self.has_embedding = self.scorer.valid
+
+    # Filters -----------------------------------------------------------------
+
+    def filter_mask(self, search_data: dict) -> np.ndarray:
+        """Boolean mask of rows passing the price and category filters."""
+        low, high = price_bounds(search_data)
+        mask = self.index.price_mask(low, high)
+        category = search_data.get('category') or search_data.get('occasion')
+        if category:
+            mask &= self.index.category_mask(category_variations(category))
+        return mask
+
+    def prefilter_mask(self, search_data: dict) -> np.ndarray:
+        """
+        Every filter of a request as one mask: price, category/occasion
+        (any spelling), excluded allergens (by exact ingredient, like the edge
+        function, and by allergen class) and franchisee inventory.
+        """
+        low, high = price_bounds(search_data)
+        mask = self.index.price_mask(low, high)
+        category = search_data.get('category') or search_data.get('occasion')
+        if category:
+            mask &= (self.index.category_mask(category_variations(category))
+                     | self.index.occasion_mask(category))
+        allergens = search_data.get('allergens') or []
+        if allergens:
+            mask &= ~self.index.ingredient_mask({allergen.lower() for allergen in allergens})
+            mask &= self.index.allergen_safe_mask(allergens)
+        franchisee_id = search_data.get('franchiseeId')
+        if franchisee_id:
+            mask &= self._inventory_mask(franchisee_id)
+        return mask
+
+    def _inventory_mask(self, franchisee_id: str) -> np.ndarray:
+        mask = self._inventory_masks.get(franchisee_id)
+        if mask is None:
+            in_stock = self.inventory.get(franchisee_id, set())
+            mask = self.index.rows_mask(
+                i for i, row in enumerate(self.rows) if row['product_id'] in in_stock
+            )
+            self._inventory_masks[franchisee_id] = mask
+        return mask
+
+    # Search levels -----------------------------------------------------------
+
+    def direct_lookup(self, product_id) -> Optional[dict]:
+        identifier = parse_product_identifier(product_id)
+        if identifier is None:
+            return None
+        i = self._identifiers.get(identifier)
+        return self.rows[i] if i is not None else None
+
+    def lookup_by_id(self, product_id) -> Optional[dict]:
+        """The row whose product_id (UUID) is `product_id`."""
+        i = self._index_by_id.get(str(product_id))
+        return self.rows[i] if i is not None else None
+
+    def structured_search(
+        self,
+        search_data: dict,
+        max_results: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> list[dict]:
+        if mask is None:
+            mask = self.filter_mask(search_data)
+        query = (search_data.get('query') or '').lower()
+        results = []
+        for i in np.flatnonzero(mask):
+            if query:
+                name, description = self._search_text[i]
+                if query not in name and query not in description:
+                    continue
+            results.append(self.rows[i])
+            if len(results) >= max_results:
+                break
+        return results
+
+    def score(self, query_vector: np.ndarray, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of the query against every row (or `candidates`)."""
+        return self.scorer.score(query_vector, candidates)
+
+    def top_k(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        threshold: float,
+        mask: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Indices and scores of the best `k` rows at or above `threshold`."""
+        if self.ann_index is not None:
+            return self._ann_top_k(query_vector, k, threshold, mask)
+
+        return self.scorer.top_k(query_vector, k, threshold, mask)
+
+    def _ann_top_k(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        threshold: float,
+        mask: Optional[np.ndarray],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        allowed = self.has_embedding if mask is None else mask & self.has_embedding
+
+        def where(ids: list[str]) -> np.ndarray:
+            rows = np.array([self._index_by_id.get(i, -1) for i in ids], dtype=np.int64)
+            return (rows >= 0) & allowed[rows]
+
+        ids, scores = self.ann_index.search(query_vector, k, where=where)
+        keep = scores >= threshold
+        indices = np.array([self._index_by_id[i] for i in ids], dtype=np.int64)
+        return indices[keep], scores[keep]
+
+    def semantic_search(
+        self,
+        search_data: dict,
+        max_results: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> tuple[list[dict], list[float]]:
+        query = search_data.get('query')
+        if not query or self.embed_query is None:
+            return [], []
+        query_vector = self.embed_query(query)
+        if query_vector is None:
+            return [], []
+
+        threshold = search_data.get('semanticThreshold') or DEFAULT_SEMANTIC_THRESHOLD
+        if mask is None:
+            mask = self.filter_mask(search_data)
+        indices, scores = self.top_k(query_vector, max_results, threshold, mask)
+        return [self.rows[i] for i in indices], [float(s) for s in scores]
+
+    # Full request ------------------------------------------------------------
+
+    def search(self, search_data: Optional[dict]) -> dict:
+        """Answer a product-search request exactly like the edge function."""
+        return self._search(search_data or {}, prefilter=False)
+
+    def hybrid_search(self, search_data: Optional[dict]) -> dict:
+        """
+        Answer a product-search request in one pass: all filters, including
+        allergens and inventory, are resolved from the catalog index first,
+        and only the surviving rows are text-matched and scored. Unlike
+        `search`, excluded products never take up one of the max_results
+        slots, and occasions match in any spelling ("mothers-day").
+        """
+        return self._search(search_data or {}, prefilter=True)
+
+    def _search(self, search_data: dict, prefilter: bool) -> dict:
+        max_results = search_data.get('maxResults') or DEFAULT_MAX_RESULTS
+
+        # LEVEL 1: Direct lookup by 4-digit product identifier
+        if search_data.get('productId'):
+            row = self.direct_lookup(search_data['productId'])
+            if row is not None:
+                product = streamline_product(row)
+                return {
+                    'products': [product],
+                    'count': 1,
+                    'summary': f"Found {product['name']}",
+                    'searchMethod': 'direct_id',
+                    'semanticSearchUsed': False,
+                }
+
+        search_method = 'structured'
+        semantic_search_used = False
+        mask = self.prefilter_mask(search_data) if prefilter else None
+
+        # LEVEL 2: Structured search with filters
+        structured = []
+        if not search_data.get('semanticBoost'):
+            structured = self.structured_search(search_data, max_results, mask)
+        structured_count = len(structured)
+
+        # LEVEL 3: Semantic search fallback or boost
+        semantic, semantic_scores = [], []
+        query = search_data.get('query')
+        should_use_semantic = (
+            search_data.get('semanticBoost')
+            or (query and len(structured) < 3)
+            or (not query and len(structured) == 0)
+        )
+        if should_use_semantic and query:
+            semantic, semantic_scores = self.semantic_search(search_data, max_results, mask)
+            semantic_search_used = True
+            if search_data.get('semanticBoost'):
+                search_method = 'semantic_boost'
+            else:
+                search_method = 'hybrid_semantic_fallback' if structured else 'semantic_only'
+
+        # Combine and deduplicate results
+        if search_data.get('semanticBoost') and semantic:
+            final, final_scores = semantic, semantic_scores
+        elif structured and semantic:
+            final, final_scores, seen = [], [], set()
+            for row, score in [(r, 0.0) for r in structured] + list(zip(semantic, semantic_scores)):
+                if row['product_id'] not in seen:
+                    seen.add(row['product_id'])
+                    final.append(row)
+                    final_scores.append(score)
+        elif semantic:
+            final, final_scores = semantic, semantic_scores
+        else:
+            final, final_scores = structured, [0.0] * len(structured)
+
+        final, final_scores = final[:max_results], final_scores[:max_results]
+        results = list(zip(final, final_scores))
+
+        allergens = search_data.get('allergens') or []
+        if prefilter:
+            search_method += '_prefiltered'
+        elif allergens:
+            excluded = {allergen.lower() for allergen in allergens}
+            results = [
+                (row, score) for row, score in results
+                if not excluded.intersection(row['product_data'].get('ingredients') or [])
+            ]
+            search_method += '_allergy_filtered'
+
+        franchisee_id = search_data.get('franchiseeId')
+        if franchisee_id and results and not prefilter:
+            in_stock = self.inventory.get(franchisee_id, set())
+            results = [(row, score) for row, score in results if row['product_id'] in in_stock]
+            search_method += '_inventory_checked'
+
+        # Sort by relevance - semantic scores first, then price
+        def compare(a, b):
+            if a[1] > 0 or b[1] > 0:
+                return (b[1] > a[1]) - (b[1] < a[1])
+            price_a = _to_float(a[0]['product_data']['product_info'].get('base_price'))
+            price_b = _to_float(b[0]['product_data']['product_info'].get('base_price'))
+            return (price_a > price_b) - (price_a < price_b)
+
+        results.sort(key=functools.cmp_to_key(compare))
+
+        products = []
+        for row, score in results:
+            product = streamline_product(row)
+            if score > 0:
+                product['semanticScore'] = _round_score(score)
+            products.append(product)
+
+        return {
+            'products': products,
+            'count': len(products),
+            'summary': generate_search_summary(search_data, len(products), semantic_search_used),
+            'searchMethod': search_method,
+            'semanticSearchUsed': semantic_search_used,
+            'structuredResultCount': structured_count,
+            'debugInfo': {
+                'steps': [
+                    f"Generated embedding for query: \"{query or 'N/A'}\"",
+                    f"Found {len(structured) + len(semantic)} products in chatbot_products_flat",
+                    f"Scored {int(self.has_embedding.sum())} products with embeddings",
+                    f"Final products: {len(final)}" if final
+                    else "No candidate products after filtering",
+                ]
+            },
+        }
@@ -0,0 +1,192 @@
+"""
+In-memory cache for search-query embeddings.
+
+Voice and chat traffic repeats the same phrases ("chocolate strawberries
+for birthday", "something for mom"), so Level 3 searches keep asking OpenAI
+for vectors it has already returned. `QueryEmbeddingCache` wraps the
+embedding call and answers repeats from memory: keys are the normalized
+query text plus the model name, entries expire after `ttl_seconds`, and the
+least recently used ones are evicted past `max_entries`.
+
+It can be warmed from a log of popular queries, one batched OpenAI call for
+the whole set, before traffic arrives.
+"""
+
+import json
+import re
+import string
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_WARM_UP_QUERIES = 200
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = string.punctuation + "¿¡“”‘’"
+
+Embedder = Callable[[str], Optional[np.ndarray]]
+BatchEmbedder = Callable[[list[str]], list[Optional[np.ndarray]]]
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and trim surrounding punctuation."""
+    text = _WHITESPACE.sub(" ", (query or "").casefold()).strip()
+    return text.strip(_EDGE_PUNCTUATION + " ")
+
+
+def load_query_log(path: str) -> list[str]:
+    """
+    Read queries from a log file: plain text with one query per line, or
+    JSON lines with a "query" field (other lines are skipped).
+    """
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    query = json.loads(line).get("query")
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(query, str):
+                    queries.append(query)
+            else:
+                queries.append(line)
+    return queries
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU + TTL cache in front of a query embedder."""
+
+    def __init__(
+        self,
+        embed: Embedder,
+        model: str,
+        embed_many: Optional[BatchEmbedder] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        clock=time.monotonic,
+    ):
+        """
+        embed: embeds one query (e.g. `get_embedding_from_openai`).
+        embed_many: optional batch embedder used by `warm_up`.
+        ttl_seconds: None keeps entries until they are evicted.
+        """
+        self.embed = embed
+        self.embed_many = embed_many
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple[float, np.ndarray]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def key(self, query: str) -> tuple[str, str]:
+        return (self.model, normalize_query(query))
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Cached vector for `query`, without calling the embedder."""
+        key = self.key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._store(self.key(query), vector)
+
+    def __call__(self, query: str) -> Optional[np.ndarray]:
+        """
+        Embed `query`, going to the embedder only on a miss. The normalized
+        text is what gets embedded, as in `warm_up`, so a key's vector does
+        not depend on which spelling of the query arrived first.
+        """
+        text = normalize_query(query)
+        if not text:
+            return None
+        vector = self.get(query)
+        if vector is not None:
+            return vector
+        vector = self.embed(text)
+        if vector is not None:
+            self.put(query, vector)
+        return vector
+
+    def warm_up(self, queries: Iterable[str], limit: int = DEFAULT_WARM_UP_QUERIES) -> int:
+        """
+        Pre-embed the `limit` most frequent queries that are not cached yet.
+        Returns how many entries were added.
+        """
+        counts = Counter(q for q in (normalize_query(q) for q in queries) if q)
+        with self._lock:
+            wanted = [
+                q for q, _ in counts.most_common()
+                if not self._is_live((self.model, q))
+            ][:limit]
+        if not wanted:
+            return 0
+
+        if self.embed_many is not None:
+            vectors = self.embed_many(wanted)
+        else:
+            vectors = [self.embed(q) for q in wanted]
+
+        added = 0
+        with self._lock:
+            for query, vector in zip(wanted, vectors):
+                if vector is not None:
+                    self._store((self.model, query), vector)
+                    added += 1
+        return added
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _is_expired(self, entry: tuple[float, np.ndarray]) -> bool:
+        return self.ttl_seconds is not None and self._clock() - entry[0] >= self.ttl_seconds
+
+    def _is_live(self, key: tuple[str, str]) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._is_expired(entry)
+
+    def _store(self, key: tuple[str, str], vector: np.ndarray) -> None:
+        self._entries[key] = (self._clock(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
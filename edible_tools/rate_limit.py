@@ -0,0 +1,490 @@
+"""
+Rate limiting in both directions: client-side budgets for calls to external
+providers (OpenAI), and server-side per-caller limits for the edge functions.
+
+`RateLimitScheduler` enforces a requests-per-minute and a tokens-per-minute
+budget with two token buckets, and pauses every worker when the provider
+answers 429 so concurrent threads back off together instead of hammering
+the API.
+
+`SlidingWindowLimiter` replaces `checkRateLimit` in the edge functions,
+which made 2-4 `api_rate_limits` round trips (delete expired, select, then
+update or insert) before any real work, and let concurrent requests from
+one caller read the same count. It keeps an exact sliding-window log per
+(identifier, endpoint) in memory, so a check costs microseconds and never
+admits more than the limit in any window. `UsageSync` drains the admitted
+counts in the background and writes them in batches through
+`record_rate_limits` (20250705_rate_limit_usage_batches.sql). Limits hold
+per process; the table stays the shared record for monitoring.
+`LegacyTableLimiter` reproduces the table round trips for comparison.
+
+Usage:
+    python -m edible_tools.rate_limit --burst 200 --workers 16
+    python -m edible_tools.rate_limit --endpoint order --identifiers 5000 --legacy
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+
+# endpoint -> (requests, window seconds), as configured in the edge functions
+RATE_LIMITS = {
+    "product-search": (30, 60),
+    "customer-management": (20, 60),
+    "franchisee-inventory": (15, 60),
+    "create-order": (10, 60),
+    "order": (20, 60),
+    "cart-manager": (30, 60),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._updated_at = now
+
+    def try_acquire(self, amount: float = 1) -> float:
+        """
+        Take `amount` tokens if available.
+
+        Returns 0 when the tokens were taken, otherwise the number of seconds
+        to wait before trying again. Requests larger than the bucket are
+        clamped to its capacity so they can still go through.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate_per_second
+
+    def release(self, amount: float = 1) -> None:
+        """Return tokens that were taken but not used."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class RateLimitScheduler:
+    """Shared requests/tokens budget with exponential backoff on 429 responses."""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.requests = TokenBucket(requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._backoff = initial_backoff
+        self.rate_limited_count = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self, tokens: float = 0) -> None:
+        """Block until one request carrying `tokens` tokens fits in the budget."""
+        while True:
+            with self._lock:
+                pause = self._paused_until - self._clock()
+            if pause > 0:
+                self._wait(pause)
+                continue
+
+            wait = self.requests.try_acquire(1)
+            if wait > 0:
+                self._wait(wait)
+                continue
+
+            wait = self.tokens.try_acquire(tokens) if tokens else 0.0
+            if wait > 0:
+                # Give back the request slot while we wait on the token budget
+                self.requests.release(1)
+                self._wait(wait)
+                continue
+            return
+
+    def report_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """
+        Record a 429 from the provider and pause all callers.
+
+        Honours the provider's Retry-After when given, otherwise doubles the
+        backoff up to `max_backoff`. Returns the pause length in seconds.
+        """
+        with self._lock:
+            self.rate_limited_count += 1
+            if retry_after is not None and retry_after > 0:
+                pause = min(retry_after, self.max_backoff)
+            else:
+                pause = self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+            self._paused_until = max(self._paused_until, self._clock() + pause)
+            return pause
+
+    def report_success(self) -> None:
+        with self._lock:
+            self._backoff = self.initial_backoff
+
+    def _wait(self, seconds: float) -> None:
+        with self._lock:
+            self.waited_seconds += seconds
+        self._sleep(seconds)
+
+
+class SlidingWindowLimiter:
+    """
+    Exact sliding-window log per (identifier, endpoint).
+
+    Each key keeps the timestamps of its admitted requests within the last
+    window (at most `requests` of them), in one of `shards` dicts with its
+    own lock so unrelated callers do not contend. Endpoints without a
+    configured limit are always admitted, as in `checkRateLimit`.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[dict[str, tuple[int, float]]] = None,
+        shards: int = 64,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self._clock = clock
+        self._shards = [({}, {}, threading.Lock()) for _ in range(shards)]
+
+    def check(self, identifier: str, endpoint: str) -> float:
+        """
+        Admit one request if it fits in the window.
+
+        Returns 0 when admitted, otherwise the number of seconds until the
+        oldest request in the window expires (the Retry-After).
+        """
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return 0.0
+        requests, window = limit
+        key = (identifier, endpoint)
+        log, pending, lock = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            now = self._clock()
+            times = log.get(key)
+            if times is None:
+                times = log[key] = deque()
+            while times and times[0] <= now - window:
+                times.popleft()
+            if len(times) >= requests:
+                return times[0] + window - now
+            times.append(now)
+            usage = pending.get(key)
+            if usage is None:
+                pending[key] = [1, now]
+            else:
+                usage[0] += 1
+        return 0.0
+
+    def allow(self, identifier: str, endpoint: str) -> bool:
+        return self.check(identifier, endpoint) == 0
+
+    def drain(self) -> list[dict]:
+        """
+        Admitted counts since the last drain, as `api_rate_limits` rows, and
+        forget keys with nothing left in their window.
+        """
+        rows = []
+        now = self._clock()
+        for log, pending, lock in self._shards:
+            with lock:
+                drained = list(pending.items())
+                pending.clear()
+                for key, times in list(log.items()):
+                    window = self.limits[key[1]][1]
+                    if not times or times[-1] <= now - window:
+                        del log[key]
+            for (identifier, endpoint), (count, first) in drained:
+                rows.append({
+                    "identifier": identifier,
+                    "endpoint": endpoint,
+                    "request_count": count,
+                    "window_start": datetime.fromtimestamp(first, timezone.utc).isoformat(),
+                })
+        return rows
+
+    def __len__(self) -> int:
+        return sum(len(log) for log, _, _ in self._shards)
+
+
+class RpcUsageSink:
+    """Writes drained rows with one `record_rate_limits` call per batch."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, rows: list[dict]) -> None:
+        self.client.rpc("record_rate_limits", {"p_rows": rows}).raise_for_status()
+
+
+class UsageSync:
+    """
+    Flushes a limiter's counts to `sink` every `interval` seconds from a
+    background thread, `batch_size` rows per call. Rows from a failed
+    flush are retried with the next one, keeping at most `max_pending`;
+    limiting itself never waits on the database.
+    """
+
+    def __init__(
+        self,
+        limiter: SlidingWindowLimiter,
+        sink: Callable[[list[dict]], None],
+        interval: float = 5.0,
+        batch_size: int = 500,
+        max_pending: int = 50_000,
+    ):
+        self.limiter = limiter
+        self.sink = sink
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._unsent: list[dict] = []
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def flush(self) -> int:
+        """Write everything drained so far; returns the rows written."""
+        with self._flush_lock:
+            rows = self._unsent + self.limiter.drain()
+            written = 0
+            try:
+                for i in range(0, len(rows), self.batch_size):
+                    self.sink(rows[i:i + self.batch_size])
+                    written = i + len(rows[i:i + self.batch_size])
+                    self.batches += 1
+            except Exception:
+                self.failures += 1
+            self._unsent = rows[written:]
+            if len(self._unsent) > self.max_pending:
+                self.dropped += len(self._unsent) - self.max_pending
+                self._unsent = self._unsent[-self.max_pending:]
+            self.rows_written += written
+            return written
+
+    def start(self) -> "UsageSync":
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread and flush what is left."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def __enter__(self) -> "UsageSync":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class LegacyTableLimiter:
+    """
+    `checkRateLimit` as the edge functions run it against `api_rate_limits`:
+    delete expired windows, select the count, then update or insert. Each
+    step sleeps `round_trip` seconds (a PostgREST call in production), and
+    the count read and its write are separate, so concurrent requests from
+    one caller can all pass.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[dict[str, tuple[int, float]]] = None,
+        round_trip: float = 0.002,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.round_trip = round_trip
+        self._clock = clock
+        self.rows: dict[tuple[str, str], list] = {}  # key -> [request_count, window_start]
+        self._lock = threading.Lock()
+        self.round_trips = 0
+
+    def _call(self, operation: Callable):
+        time.sleep(self.round_trip)
+        with self._lock:
+            self.round_trips += 1
+            return operation()
+
+    def check(self, identifier: str, endpoint: str) -> float:
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return 0.0
+        requests, window = limit
+        key = (identifier, endpoint)
+        window_start = self._clock() - window
+
+        def delete_expired():
+            for k in [k for k, (_, started) in self.rows.items() if started < window_start]:
+                del self.rows[k]
+
+        def select():
+            return list(self.rows[key]) if key in self.rows else None
+
+        def update(count):
+            if key in self.rows:
+                self.rows[key][0] = count
+
+        def insert():
+            self.rows[key] = [1, self._clock()]
+
+        self._call(delete_expired)
+        current = self._call(select)
+        if current is None:
+            self._call(insert)
+        elif current[0] >= requests:
+            return current[1] + window - self._clock()
+        else:
+            self._call(lambda: update(current[0] + 1))
+        return 0.0
+
+    def allow(self, identifier: str, endpoint: str) -> bool:
+        return self.check(identifier, endpoint) == 0
+
+
+def burst(limiter, identifier: str = "203.0.113.7", endpoint: str = "order",
+          requests: int = 200, workers: int = 16) -> dict:
+    """
+    `requests` checks for one caller from `workers` threads at once, all
+    within one window. Reports how many were admitted against the limit
+    (overshoot must be 0) and the per-check latency.
+    """
+    start = threading.Barrier(workers)
+
+    def worker(n: int) -> list[tuple[bool, float]]:
+        start.wait()
+        results = []
+        for _ in range(n):
+            began = time.perf_counter()
+            allowed = limiter.allow(identifier, endpoint)
+            results.append((allowed, time.perf_counter() - began))
+        return results
+
+    shares = [requests // workers + (1 if i < requests % workers else 0) for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = [r for rs in pool.map(worker, shares) for r in rs]
+
+    limit = limiter.limits[endpoint][0]
+    admitted = sum(allowed for allowed, _ in results)
+    latencies = sorted(latency * 1e6 for _, latency in results)
+    return {
+        "requests": len(results),
+        "workers": workers,
+        "limit": limit,
+        "admitted": admitted,
+        "overshoot": max(0, admitted - limit),
+        "p50_us": round(latencies[len(latencies) // 2], 1),
+        "p99_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1),
+    }
+
+
+def overhead(limiter, endpoint: str = "order", identifiers: Iterable[str] = (), checks: int = 100_000) -> dict:
+    """Mean cost of one check, cycling through `identifiers` from one thread."""
+    identifiers = list(identifiers) or [f"198.51.100.{i % 256}" for i in range(1000)]
+    began = time.perf_counter()
+    for i in range(checks):
+        limiter.check(identifiers[i % len(identifiers)], endpoint)
+    elapsed = time.perf_counter() - began
+    return {
+        "checks": checks,
+        "identifiers": len(identifiers),
+        "us_per_check": round(elapsed * 1e6 / checks, 2),
+        "round_trips_per_check": round(getattr(limiter, "round_trips", 0) / checks, 2),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-caller rate limiting for the edge functions")
+    parser.add_argument("--endpoint", default="order", choices=sorted(RATE_LIMITS))
+    parser.add_argument("--burst", type=int, default=200, help="Concurrent requests from one caller")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--identifiers", type=int, default=1000, help="Distinct callers for the overhead run")
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--legacy", action="store_true", help="Also run the api_rate_limits round trips")
+    parser.add_argument("--round-trip-ms", type=float, default=2.0, help="Simulated PostgREST latency (legacy)")
+    args = parser.parse_args(argv)
+
+    identifiers = [f"198.51.100.{i}" for i in range(args.identifiers)]
+    limiters = [("sliding window", SlidingWindowLimiter, args.checks)]
+    if args.legacy:
+        # Sleeping round trips: a few hundred checks are enough to measure
+        limiters.append(("legacy table",
+                         lambda: LegacyTableLimiter(round_trip=args.round_trip_ms / 1000),
+                         min(args.checks, 200)))
+
+    for label, make, checks in limiters:
+        print(f"🚀 {label}: {args.burst} requests from one caller on {args.workers} workers "
+              f"({args.endpoint}, limit {RATE_LIMITS[args.endpoint][0]}/{RATE_LIMITS[args.endpoint][1]}s)")
+        result = burst(make(), endpoint=args.endpoint, requests=args.burst, workers=args.workers)
+        print(json.dumps({**result, **overhead(make(), args.endpoint, identifiers, checks)}))
+        if result["overshoot"]:
+            print(f"❌ Admitted {result['overshoot']} requests over the limit")
+        else:
+            print(f"✅ Admitted exactly {result['admitted']} of {result['requests']}")
+
+    limiter = SlidingWindowLimiter()
+    for identifier in identifiers:
+        limiter.check(identifier, args.endpoint)
+    batches = []
+    UsageSync(limiter, batches.append).flush()
+    print(f"📦 {len(identifiers)} callers drain to {sum(map(len, batches))} rows in {len(batches)} batches")
+
+
+if __name__ == "__main__":
+    main()
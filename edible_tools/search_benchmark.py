@@ -0,0 +1,270 @@
+"""
+Latency benchmark for the three product-search levels.
+
+Each level (direct ID, structured, semantic) gets warm-up requests followed
+by N timed iterations, optionally from several concurrent clients, and is
+reported as p50/p95/p99 latency plus throughput. Results are written as
+JSON so runs can be diffed; `--compare` fails when a percentile regressed
+past the allowed ratio.
+
+The target is either a deployed project (`--target supabase`, using
+SUPABASE_URL and SUPABASE_SERVICE_KEY from .env.local) or an in-process
+`LocalEdgeServer` over the sample catalog (`--target local`), which needs
+no network access and is what CI runs.
+
+Usage:
+    python -m edible_tools.search_benchmark --target local --iterations 200 --out bench.json
+    python -m edible_tools.search_benchmark --target supabase --concurrency 4 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import requests
+
+from edible_tools.edge_client import DEFAULT_POOL_SIZE, EdgeClient
+
+DEFAULT_WARMUP = 5
+DEFAULT_ITERATIONS = 50
+DEFAULT_TIMEOUT = 30
+PERCENTILES = (50, 95, 99)
+
+# Requests rotate through each level's payloads so caches see a mix
+LEVELS: dict[str, list[dict]] = {
+    "direct_id": [
+        {"productId": "3075"},
+        {"productId": "6444"},
+        {"productId": "9144"},
+    ],
+    "structured": [
+        {"query": "chocolate", "maxPrice": 100},
+        {"query": "strawberries", "minPrice": 40, "maxPrice": 150},
+        {"category": "Mother's Day"},
+    ],
+    "semantic": [
+        {"query": "romantic exotic arrangement for special person",
+         "semanticBoost": True, "semanticThreshold": 0.5},
+        {"query": "something for mom who loves chocolate",
+         "semanticBoost": True, "semanticThreshold": 0.3},
+        {"query": "graduation gift with flowers", "semanticThreshold": 0.3},
+    ],
+}
+
+
+@dataclass
+class LevelResult:
+    level: str
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed_seconds: float = 0.0
+
+    def summary(self) -> dict:
+        latencies = np.array(self.latencies_ms, dtype=float)
+        total = len(latencies) + self.errors
+        summary = {
+            "requests": total,
+            "errors": self.errors,
+            "throughput_rps": round(len(latencies) / self.elapsed_seconds, 2)
+            if self.elapsed_seconds else 0.0,
+        }
+        if len(latencies):
+            summary.update({
+                "mean_ms": round(float(latencies.mean()), 3),
+                "min_ms": round(float(latencies.min()), 3),
+                "max_ms": round(float(latencies.max()), 3),
+            })
+            for p in PERCENTILES:
+                summary[f"p{p}_ms"] = round(float(np.percentile(latencies, p)), 3)
+        return summary
+
+
+def search_client(
+    base_url: str,
+    api_key: Optional[str] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    pool_size: int = DEFAULT_POOL_SIZE,
+):
+    """POST search payloads to `<base_url>/functions/v1/product-search`."""
+    # No retries: a retried request would hide the failure and skew the latency
+    client = EdgeClient(base_url, api_key, pool_size=pool_size, timeout=timeout, retries=0)
+
+    def send(payload: dict) -> bool:
+        return client.post_function("product-search", payload).status_code == 200
+    return send
+
+
+def run_level(
+    level: str,
+    payloads: list[dict],
+    send: Callable[[dict], bool],
+    iterations: int = DEFAULT_ITERATIONS,
+    warmup: int = DEFAULT_WARMUP,
+    concurrency: int = 1,
+    clock=time.perf_counter,
+) -> LevelResult:
+    """Warm up, then time `iterations` requests spread over `concurrency` threads."""
+    for i in range(warmup):
+        try:
+            send(payloads[i % len(payloads)])
+        except requests.RequestException:
+            pass
+
+    result = LevelResult(level)
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        started = clock()
+        try:
+            ok = send(payloads[i % len(payloads)])
+        except requests.RequestException:
+            ok = False
+        elapsed_ms = (clock() - started) * 1000
+        with lock:
+            if ok:
+                result.latencies_ms.append(elapsed_ms)
+            else:
+                result.errors += 1
+
+    started = clock()
+    if concurrency <= 1:
+        for i in range(iterations):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, range(iterations)))
+    result.elapsed_seconds = clock() - started
+    return result
+
+
+def run_benchmark(
+    send: Callable[[dict], bool],
+    target: str,
+    iterations: int = DEFAULT_ITERATIONS,
+    warmup: int = DEFAULT_WARMUP,
+    concurrency: int = 1,
+    levels: Optional[list[str]] = None,
+) -> dict:
+    report = {
+        "target": target,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "iterations": iterations,
+        "warmup": warmup,
+        "concurrency": concurrency,
+        "levels": {},
+    }
+    for level in levels or list(LEVELS):
+        result = run_level(level, LEVELS[level], send, iterations, warmup, concurrency)
+        report["levels"][level] = result.summary()
+    return report
+
+
+def compare_reports(baseline: dict, current: dict, max_regression: float = 0.2) -> list[str]:
+    """
+    Regressions of `current` against `baseline`: any percentile more than
+    `max_regression` (0.2 = 20%) slower, or new errors.
+    """
+    problems = []
+    for level, stats in current["levels"].items():
+        before = baseline.get("levels", {}).get(level)
+        if not before:
+            continue
+        for p in PERCENTILES:
+            key = f"p{p}_ms"
+            if key in stats and before.get(key):
+                ratio = stats[key] / before[key]
+                if ratio > 1 + max_regression:
+                    problems.append(
+                        f"{level} {key}: {before[key]:.1f} → {stats[key]:.1f} ms (+{ratio - 1:.0%})"
+                    )
+        if stats.get("errors", 0) > before.get("errors", 0):
+            problems.append(f"{level} errors: {before.get('errors', 0)} → {stats['errors']}")
+    return problems
+
+
+@contextmanager
+def local_target() -> Iterator[str]:
+    """Serve the sample catalog on a LocalEdgeServer and yield its URL."""
+    from edible_tools.local_edge import LocalEdgeServer, product_search_handler, sample_search_engine
+
+    engine = sample_search_engine()
+    with LocalEdgeServer({"product-search": product_search_handler(engine)}) as server:
+        yield server.url
+
+
+def _print_report(report: dict) -> None:
+    print(f"📊 {report['target']} — {report['iterations']} iterations, "
+          f"concurrency {report['concurrency']}")
+    for level, stats in report["levels"].items():
+        if "p50_ms" not in stats:
+            print(f"   {level:<10} all {stats['errors']} requests failed")
+            continue
+        print(f"   {level:<10} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+              f"p99 {stats['p99_ms']:8.1f} ms  {stats['throughput_rps']:7.1f} req/s  "
+              f"errors {stats['errors']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the product-search levels")
+    parser.add_argument("--target", default="local",
+                        help="'local' (sample catalog stand-in), 'supabase' (SUPABASE_URL) or a base URL")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--level", action="append", choices=list(LEVELS),
+                        help="Only run this level (repeatable)")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Exit non-zero if this run regressed against a saved report")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    def run(base_url: str, api_key: Optional[str] = None) -> dict:
+        return run_benchmark(
+            search_client(base_url, api_key, pool_size=max(args.concurrency, DEFAULT_POOL_SIZE)),
+            args.target,
+            args.iterations, args.warmup, args.concurrency, args.level,
+        )
+
+    if args.target == "local":
+        with local_target() as url:
+            report = run(url)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path='.env.local')
+        base_url = os.environ.get("SUPABASE_URL") if args.target == "supabase" else args.target
+        if not base_url:
+            print("❌ Missing SUPABASE_URL. Please check .env.local")
+            return 1
+        report = run(base_url, os.environ.get("SUPABASE_SERVICE_KEY"))
+
+    _print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Saved report to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare_reports(json.load(f), report, args.max_regression)
+        for problem in problems:
+            print(f"❌ Regression: {problem}")
+        if problems:
+            return 1
+        print("✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
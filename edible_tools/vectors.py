@@ -0,0 +1,114 @@
+"""
+Compact float32 representation for product embeddings.
+
+Embeddings are held as contiguous NumPy float32 arrays (one row per product)
+instead of Python lists of floats, which cuts a 10k x 1536 catalog from
+hundreds of MB of boxed floats to ~60 MB. On the wire they travel as
+base64-encoded big-endian float32 blobs (the byte order Postgres'
+`float4send` produces), and on disk as `.npy` matrices that can be
+memory-mapped.
+"""
+
+import base64
+import json
+import os
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_DTYPE = np.float32
+WIRE_DTYPE = np.dtype(">f4")
+
+
+def as_vector(values, dimensions: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Convert one embedding (list, array or buffer) to a 1-D float32 array.
+
+    Returns None when the shape does not match `dimensions` or the vector
+    contains NaN/inf.
+    """
+    try:
+        vector = np.asarray(values, dtype=EMBEDDING_DTYPE)
+    except (TypeError, ValueError):
+        return None
+    if vector.ndim != 1:
+        return None
+    if dimensions is not None and vector.shape[0] != dimensions:
+        return None
+    if not np.isfinite(vector).all():
+        return None
+    return vector
+
+
+def to_matrix(vectors: Iterable, dimensions: int) -> np.ndarray:
+    """Stack embeddings into a C-contiguous (n, dimensions) float32 matrix."""
+    if isinstance(vectors, np.ndarray):
+        matrix = np.ascontiguousarray(vectors, dtype=EMBEDDING_DTYPE)
+    else:
+        vectors = list(vectors)
+        if not vectors:
+            return np.empty((0, dimensions), dtype=EMBEDDING_DTYPE)
+        matrix = np.ascontiguousarray(np.stack(vectors), dtype=EMBEDDING_DTYPE)
+    if matrix.ndim != 2 or matrix.shape[1] != dimensions:
+        raise ValueError(f"Expected an (n, {dimensions}) matrix, got {matrix.shape}")
+    return matrix
+
+
+def valid_rows(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """Boolean mask of rows that are finite and not all zeros."""
+    if matrix.ndim != 2 or matrix.shape[1] != dimensions:
+        raise ValueError(f"Expected an (n, {dimensions}) matrix, got {matrix.shape}")
+    return np.isfinite(matrix).all(axis=1) & np.any(matrix != 0, axis=1)
+
+
+def encode_base64(vector) -> str:
+    """Encode one embedding as a base64 big-endian float32 blob."""
+    return base64.b64encode(np.asarray(vector, dtype=WIRE_DTYPE).tobytes()).decode("ascii")
+
+
+def decode_base64(data: str, dimensions: Optional[int] = None) -> np.ndarray:
+    """Decode a base64 big-endian float32 blob (newlines are ignored)."""
+    raw = base64.b64decode(data)
+    if len(raw) % WIRE_DTYPE.itemsize:
+        raise ValueError("Embedding blob length is not a multiple of 4 bytes")
+    vector = np.frombuffer(raw, dtype=WIRE_DTYPE).astype(EMBEDDING_DTYPE)
+    if dimensions is not None and vector.shape[0] != dimensions:
+        raise ValueError(f"Expected {dimensions} dimensions, got {vector.shape[0]}")
+    return vector
+
+
+def parse_pgvector(value, dimensions: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Parse an embedding as PostgREST returns it: a pgvector text literal
+    ("[0.1,0.2,...]"), a JSON list, or a base64 blob.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            vector = np.fromstring(text[1:-1], dtype=EMBEDDING_DTYPE, sep=",")
+        else:
+            vector = decode_base64(text)
+        return as_vector(vector, dimensions)
+    return as_vector(value, dimensions)
+
+
+def save_matrix(path: str, ids: Sequence[str], matrix: np.ndarray) -> None:
+    """Write `<path>.npy` (the matrix) and `<path>.ids.json` (row ids)."""
+    if len(ids) != matrix.shape[0]:
+        raise ValueError("ids and matrix rows must line up")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.save(f"{path}.npy", np.ascontiguousarray(matrix, dtype=EMBEDDING_DTYPE))
+    with open(f"{path}.ids.json", "w") as f:
+        json.dump([str(i) for i in ids], f)
+
+
+def load_matrix(path: str, mmap: bool = True) -> tuple[list[str], np.ndarray]:
+    """Load a matrix written by `save_matrix`, memory-mapped by default."""
+    matrix = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+    with open(f"{path}.ids.json") as f:
+        ids = json.load(f)
+    return ids, matrix
@@ -58,52 +58,18 @@ async function resolveFranchiseeId(supabase, franchiseeIdentifier) {
   if (error || !data) return null;
   return data.id;
 }
-// Helper function to resolve product option by name or UUID
-async function resolveProductOptionId(supabase, productId, optionIdentifier) {
-  if (!optionIdentifier) return null;
-  
-  // Check if it's a UUID pattern
-  const uuidPattern = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i;
-  if (uuidPattern.test(optionIdentifier)) {
-    // It's a UUID, validate it exists
-    const { data, error } = await supabase
-      .from('product_options')
-      .select('id')
-      .eq('id', optionIdentifier)
-      .eq('product_id', productId)
-      .single();
-    return error ? null : data?.id;
-  } else {
-    // Assume it's an option name (e.g., "Large", "Small")
-    const { data, error } = await supabase
-      .from('product_options')
-      .select('id')
-      .eq('product_id', productId)
-      .ilike('option_name', optionIdentifier)
-      .single();
-    return error ? null : data?.id;
-  }
-}
-// Helper function to resolve product ID (4-digit to UUID)
-async function resolveProductId(supabase, productId) {
-  if (!productId) return null;
-  
-  // Try parsing as 4-digit identifier (handle both string and number)
-  const parsed = parseInt(String(productId), 10);
-  if (!isNaN(parsed) && parsed >= 1000 && parsed <= 9999) {
-    // 4-digit product identifier
-    const { data, error } = await supabase.from('products').select('id').eq('product_identifier', parsed).eq('is_active', true).single();
-    if (error || !data) return null;
-    return data.id;
-  }
-  
-  // Assume UUID - validate it exists and is active
-  const { data, error } = await supabase.from('products').select('id').eq('id', String(productId)).eq('is_active', true).single();
-  if (error || !data) return null;
-  return data.id;
-}
 // Helper function to generate order number
 async function generateOrderNumber(supabase, franchiseeId) {
+  // Per-store sequence (migration 20250703_order_number_sequences): constant
+  // time and unique under concurrent orders
+  const { data: allocated, error: allocateError } = await supabase.rpc('next_order_number', {
+    p_franchisee_id: franchiseeId
+  });
+  if (!allocateError && allocated) {
+    return allocated;
+  }
+  console.warn('next_order_number unavailable, scanning orders:', allocateError?.message);
+
   // Get franchisee store number
   const { data: franchisee, error: franchiseeError } = await supabase.from('franchisees').select('store_number').eq('id', franchiseeId).single();
   if (franchiseeError || !franchisee) {
@@ -214,8 +180,11 @@ Deno.serve(async (req)=>{
           query = query.limit(1);
         }
       } else if (orderNumber) {
-        // Search by last 4 digits of order number (more precise pattern)
-        query = supabase.from('chatbot_orders_flat').select('*').like('order_data->order_info->>order_number', `%${orderNumber}-%`);
+        // Full order number or its last digits, via the suffix index on orders
+        // (20250708_order_number_lookup.sql); most recent match first
+        query = supabase.rpc('find_orders_by_number', {
+          p_order_number: orderNumber
+        });
       }
       const { data: orderData, error: orderError } = await query;
       if (orderError || !orderData || orderData.length === 0) {
@@ -379,80 +348,36 @@ Deno.serve(async (req)=>{
         }
         recipientAddressId = recipientAddress.id;
       }
-      // Calculate order totals
-      let subtotal = 0;
-      const processedItems = [];
-      for (const item of items){
-        // Resolve product ID
-        const resolvedProductId = await resolveProductId(supabase, item.productId);
-        if (!resolvedProductId) {
-          return new Response(JSON.stringify({
-            error: `Product ${item.productId} not found or inactive`,
-            hint: "Use 4-digit product ID (e.g., '3075') or valid product UUID"
-          }), {
-            status: 400,
-            headers: {
-              ...corsHeaders,
-              'Content-Type': 'application/json'
-            }
-          });
-        }
-        // Get product information
-        const { data: productData, error: productError } = await supabase.from('products').select('id, base_price, name, product_identifier').eq('id', resolvedProductId).single();
-        if (productError || !productData) {
-          return new Response(JSON.stringify({
-            error: `Product ${item.productId} not found`
-          }), {
-            status: 400,
-            headers: {
-              ...corsHeaders,
-              'Content-Type': 'application/json'
-            }
-          });
-        }
-        let unitPrice = productData.base_price;
-        let resolvedProductOptionId = null;
-        
-        // Handle product option with voice-friendly resolution
-        if (item.productOptionId) {
-          resolvedProductOptionId = await resolveProductOptionId(supabase, resolvedProductId, item.productOptionId);
-          if (!resolvedProductOptionId) {
-            return new Response(JSON.stringify({
-              error: `Product option ${item.productOptionId} not found for product ${item.productId}`
-            }), {
-              status: 400,
-              headers: {
-                ...corsHeaders,
-                'Content-Type': 'application/json'
-              }
-            });
+      // Resolve every item's product, option, prices and addons in one call
+      // (migration 20250704_bulk_order_items)
+      const { data: resolved, error: resolveError } = await supabase.rpc('resolve_order_items', {
+        p_items: items
+      });
+      if (resolveError || !resolved) {
+        console.error('Error resolving order items:', resolveError);
+        return new Response(JSON.stringify({
+          error: 'Failed to resolve order items',
+          details: resolveError?.message
+        }), {
+          status: 500,
+          headers: {
+            ...corsHeaders,
+            'Content-Type': 'application/json'
           }
-          
-          const { data: optionData, error: optionError } = await supabase.from('product_options').select('price, option_name').eq('id', resolvedProductOptionId).single();
-          if (optionError || !optionData) {
-            return new Response(JSON.stringify({
-              error: `Product option ${item.productOptionId} not found`
-            }), {
-              status: 400,
-              headers: {
-                ...corsHeaders,
-                'Content-Type': 'application/json'
-              }
-            });
+        });
+      }
+      if (resolved.errors.length > 0) {
+        const { error, hint } = resolved.errors[0];
+        return new Response(JSON.stringify(hint ? { error, hint } : { error }), {
+          status: 400,
+          headers: {
+            ...corsHeaders,
+            'Content-Type': 'application/json'
           }
-          unitPrice = optionData.price;
-        }
-        const totalPrice = parseFloat(unitPrice) * item.quantity;
-        subtotal += totalPrice;
-        processedItems.push({
-          productId: resolvedProductId,
-          productOptionId: resolvedProductOptionId,
-          quantity: item.quantity,
-          unitPrice: unitPrice,
-          totalPrice: totalPrice,
-          addons: item.addons || []
         });
       }
+      const processedItems = resolved.items;
+      const subtotal = processedItems.reduce((sum, item)=>sum + parseFloat(item.total_price), 0);
       // Calculate tax (8.25%)
       const taxAmount = subtotal * 0.0825;
       const totalAmount = subtotal + taxAmount;
@@ -485,42 +410,22 @@ Deno.serve(async (req)=>{
         });
       }
       const orderId = newOrder.id;
-      // Create order items
-      for (const item of processedItems){
-        const { data: orderItem, error: itemError } = await supabase.from('order_items').insert({
-          order_id: orderId,
-          product_id: item.productId,
-          product_option_id: item.productOptionId,
-          quantity: item.quantity,
-          unit_price: item.unitPrice,
-          total_price: item.totalPrice
-        }).select('id').single();
-        if (itemError) {
-          console.error('Error creating order item:', itemError);
-          return new Response(JSON.stringify({
-            error: 'Failed to create order items'
-          }), {
-            status: 500,
-            headers: {
-              ...corsHeaders,
-              'Content-Type': 'application/json'
-            }
-          });
-        }
-        // Add addons if specified
-        if (item.addons && item.addons.length > 0) {
-          for (const addon of item.addons){
-            const { data: addonData, error: addonError } = await supabase.from('addons').select('price').eq('id', addon.addonId).single();
-            if (!addonError && addonData) {
-              await supabase.from('order_addons').insert({
-                order_item_id: orderItem.id,
-                addon_id: addon.addonId,
-                quantity: addon.quantity,
-                unit_price: addonData.price
-              });
-            }
+      // Create all order items and addons in one call
+      const { error: itemsError } = await supabase.rpc('insert_order_items', {
+        p_order_id: orderId,
+        p_items: processedItems
+      });
+      if (itemsError) {
+        console.error('Error creating order items:', itemsError);
+        return new Response(JSON.stringify({
+          error: 'Failed to create order items'
+        }), {
+          status: 500,
+          headers: {
+            ...corsHeaders,
+            'Content-Type': 'application/json'
           }
-        }
+        });
       }
 
       // Update customer's last_order_at timestamp
@@ -573,8 +478,8 @@ Deno.serve(async (req)=>{
           total: `$${totalAmount.toFixed(2)}`,
           estimatedDelivery: fulfillmentType === 'delivery' ? `${scheduledDate || 'Tomorrow'} ${scheduledTimeSlot || '2-4 PM'}` : `Pickup ${scheduledDate || 'Tomorrow'} ${scheduledTimeSlot || pickupTime || '2:00 PM'}`,
           items: processedItems.map((item)=>({
-              product: createdOrderData.order_data?.items?.find((oi)=>oi.product_id === item.productId)?.product_name || 'Product',
-              price: `$${item.unitPrice}`,
+              product: item.product_name || 'Product',
+              price: `$${item.unit_price}`,
               quantity: item.quantity
             })),
           delivery: fulfillmentType === 'delivery' ? {
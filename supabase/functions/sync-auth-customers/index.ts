@@ -70,6 +70,19 @@ Deno.serve(async (req: Request) => {
   }
 })
 
+// listUsers() returns one page (50 users by default); walk them all
+async function listAllAuthUsers(supabase, perPage = 1000) {
+  const users = []
+  for (let page = 1; ; page++) {
+    const { data, error } = await supabase.auth.admin.listUsers({ page, perPage })
+    if (error) {
+      throw new Error(`Failed to fetch auth users: ${error.message}`)
+    }
+    users.push(...data.users)
+    if (data.users.length < perPage) return users
+  }
+}
+
 async function syncAllAuthUsers(supabase): Promise<SyncResult> {
   const result: SyncResult = {
     linked: 0,
@@ -80,16 +93,13 @@ async function syncAllAuthUsers(supabase): Promise<SyncResult> {
   }
 
   try {
-    // Get all auth users
-    const { data: authUsers, error: authError } = await supabase.auth.admin.listUsers()
-    
-    if (authError) {
-      throw new Error(`Failed to fetch auth users: ${authError.message}`)
-    }
+    // Get all auth users (for large backfills use edible_tools/auth_sync.py,
+    // which prefetches customers in bulk and can resume)
+    const authUsers = await listAllAuthUsers(supabase)
 
-    console.log(`Processing ${authUsers.users.length} auth users...`)
+    console.log(`Processing ${authUsers.length} auth users...`)
 
-    for (const authUser of authUsers.users) {
+    for (const authUser of authUsers) {
       if (!authUser.email) {
         console.log(`Skipping auth user ${authUser.id} - no email`)
         continue
@@ -123,13 +133,9 @@ async function syncAllAuthUsers(supabase): Promise<SyncResult> {
 
 async function syncSingleUserByEmail(supabase, email: string) {
   // Get auth user by email
-  const { data: authUsers, error: authError } = await supabase.auth.admin.listUsers()
-  
-  if (authError) {
-    throw new Error(`Failed to fetch auth users: ${authError.message}`)
-  }
+  const authUsers = await listAllAuthUsers(supabase)
 
-  const authUser = authUsers.users.find(user => user.email === email)
+  const authUser = authUsers.find(user => user.email === email)
   
   if (!authUser) {
     return { 
@@ -337,10 +343,7 @@ async function createCustomerFromAuth(supabase, authData) {
 async function getSyncPreview(supabase) {
   try {
     // Get auth users count
-    const { data: authUsers, error: authError } = await supabase.auth.admin.listUsers()
-    if (authError) {
-      throw new Error(`Failed to fetch auth users: ${authError.message}`)
-    }
+    const authUsers = await listAllAuthUsers(supabase)
 
     // Get customer stats
     const { data: customerStats, error: customerError } = await supabase
@@ -355,15 +358,15 @@ async function getSyncPreview(supabase) {
     const unlinkedCustomers = customerStats.filter(c => !c.auth_user_id)
     
     // Find potential matches
-    const authEmails = new Set(authUsers.users.map(u => u.email).filter(Boolean))
+    const authEmails = new Set(authUsers.map(u => u.email).filter(Boolean))
     const potentialMatches = unlinkedCustomers.filter(c => 
       c.email && authEmails.has(c.email)
     )
 
     return {
       authUsers: {
-        total: authUsers.users.length,
-        withEmail: authUsers.users.filter(u => u.email).length
+        total: authUsers.length,
+        withEmail: authUsers.filter(u => u.email).length
       },
       customers: {
         total: customerStats.length,
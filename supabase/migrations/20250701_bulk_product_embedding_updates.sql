@@ -0,0 +1,40 @@
+-- Bulk Product Embedding Updates
+-- Lets the embedding backfill write many vectors in one round trip instead of
+-- one PostgREST UPDATE per product
+
+-- Function to set embeddings for a batch of products
+-- p_updates: [{"id": "<product uuid>", "embedding": [1536 floats]}, ...]
+CREATE OR REPLACE FUNCTION update_product_embeddings(p_updates JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    updated_ids UUID[];
+    missing_ids UUID[];
+BEGIN
+    WITH input AS (
+        SELECT (item->>'id')::UUID AS id,
+               (item->>'embedding')::vector(1536) AS embedding
+        FROM jsonb_array_elements(p_updates) AS item
+    ),
+    updated AS (
+        UPDATE products p
+        SET embedding = input.embedding,
+            updated_at = now()
+        FROM input
+        WHERE p.id = input.id
+        RETURNING p.id
+    )
+    SELECT
+        COALESCE((SELECT array_agg(id) FROM updated), ARRAY[]::UUID[]),
+        COALESCE((SELECT array_agg(input.id) FROM input
+                  WHERE input.id NOT IN (SELECT id FROM updated)), ARRAY[]::UUID[])
+    INTO updated_ids, missing_ids;
+
+    RETURN jsonb_build_object(
+        'updated', to_jsonb(updated_ids),
+        'missing', to_jsonb(missing_ids)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant permissions
+GRANT EXECUTE ON FUNCTION update_product_embeddings(JSONB) TO service_role;
@@ -0,0 +1,91 @@
+-- Compact Embedding Transport
+-- Embeddings travel between the Python tooling and Postgres as base64-encoded
+-- big-endian float32 blobs (8 KB per 1536-dim vector) instead of JSON float
+-- lists (~30 KB). Big-endian matches what float4send() produces.
+
+-- Function to decode a base64 float32 blob into a pgvector value
+CREATE OR REPLACE FUNCTION vector_from_float4_base64(p_data TEXT)
+RETURNS vector AS $$
+    SELECT array_agg(
+        CASE
+            -- Zero and subnormals (never produced by the embedding models)
+            WHEN (bits >> 23) & 255 = 0 THEN 0::REAL
+            ELSE (
+                (CASE WHEN bits >> 31 = 1 THEN -1 ELSE 1 END)
+                * power(2::DOUBLE PRECISION, ((bits >> 23) & 255) - 127)
+                * (1 + (bits & 8388607)::DOUBLE PRECISION / 8388608)
+            )::REAL
+        END
+        ORDER BY i
+    )::REAL[]::vector
+    FROM (
+        SELECT i,
+               (get_byte(raw, i * 4)::BIGINT << 24)
+             | (get_byte(raw, i * 4 + 1)::BIGINT << 16)
+             | (get_byte(raw, i * 4 + 2)::BIGINT << 8)
+             |  get_byte(raw, i * 4 + 3)::BIGINT AS bits
+        FROM decode(p_data, 'base64') AS raw,
+             generate_series(0, length(decode(p_data, 'base64')) / 4 - 1) AS i
+    ) AS words;
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+-- Function to encode a pgvector value as a base64 float32 blob
+CREATE OR REPLACE FUNCTION vector_to_float4_base64(p_vector vector)
+RETURNS TEXT AS $$
+    SELECT encode(string_agg(float4send(value), ''::BYTEA ORDER BY ord), 'base64')
+    FROM unnest(p_vector::REAL[]) WITH ORDINALITY AS t(value, ord);
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+-- Accept either {"id", "embedding": [...]} or {"id", "embedding_b64": "..."}
+CREATE OR REPLACE FUNCTION update_product_embeddings(p_updates JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    updated_ids UUID[];
+    missing_ids UUID[];
+BEGIN
+    WITH input AS (
+        SELECT (item->>'id')::UUID AS id,
+               CASE
+                   WHEN item ? 'embedding_b64'
+                       THEN vector_from_float4_base64(item->>'embedding_b64')::vector(1536)
+                   ELSE (item->>'embedding')::vector(1536)
+               END AS embedding
+        FROM jsonb_array_elements(p_updates) AS item
+    ),
+    updated AS (
+        UPDATE products p
+        SET embedding = input.embedding,
+            updated_at = now()
+        FROM input
+        WHERE p.id = input.id
+        RETURNING p.id
+    )
+    SELECT
+        COALESCE((SELECT array_agg(id) FROM updated), ARRAY[]::UUID[]),
+        COALESCE((SELECT array_agg(input.id) FROM input
+                  WHERE input.id NOT IN (SELECT id FROM updated)), ARRAY[]::UUID[])
+    INTO updated_ids, missing_ids;
+
+    RETURN jsonb_build_object(
+        'updated', to_jsonb(updated_ids),
+        'missing', to_jsonb(missing_ids)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to page through product embeddings in compact form (keyset on id)
+CREATE OR REPLACE FUNCTION get_product_embeddings_b64(p_after UUID DEFAULT NULL, p_limit INTEGER DEFAULT 1000)
+RETURNS TABLE(product_id UUID, embedding_b64 TEXT) AS $$
+    SELECT p.id, vector_to_float4_base64(p.embedding)
+    FROM products p
+    WHERE p.embedding IS NOT NULL
+      AND (p_after IS NULL OR p.id > p_after)
+    ORDER BY p.id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+-- Grant permissions
+GRANT EXECUTE ON FUNCTION vector_from_float4_base64(TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION vector_to_float4_base64(vector) TO service_role;
+GRANT EXECUTE ON FUNCTION update_product_embeddings(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION get_product_embeddings_b64(UUID, INTEGER) TO service_role;
@@ -0,0 +1,76 @@
+-- Order Number Sequences
+-- One counter row per store replaces the `order_number LIKE 'W{store}%'
+-- ORDER BY created_at DESC LIMIT 1` scan in generateOrderNumber. Allocation
+-- is a single-row upsert, so it takes the same time however many orders
+-- exist, and the row lock serialises concurrent orders for a store: every
+-- caller gets distinct numbers. Numbers reserved but never used (a failed
+-- insert, an unused block) leave gaps, which the order flow tolerates.
+
+CREATE TABLE IF NOT EXISTS order_number_sequences (
+    store_number INTEGER PRIMARY KEY CHECK (store_number BETWEEN 100 AND 999),
+    next_value   BIGINT NOT NULL DEFAULT 1 CHECK (next_value >= 1),
+    updated_at   TIMESTAMP DEFAULT now()
+);
+
+-- Seed from existing orders so new numbers continue after the last one
+-- (a one-time scan; format W[store_number][8-digit sequence]-1)
+INSERT INTO order_number_sequences (store_number, next_value)
+SELECT f.store_number,
+       COALESCE(MAX(substring(o.order_number FROM '^W' || f.store_number || '(\d{8})-')::BIGINT), 0) + 1
+FROM franchisees f
+LEFT JOIN orders o ON o.franchisee_id = f.id
+WHERE f.store_number IS NOT NULL
+GROUP BY f.store_number
+ON CONFLICT (store_number) DO UPDATE
+SET next_value = GREATEST(order_number_sequences.next_value, EXCLUDED.next_value);
+
+-- Function to reserve p_count consecutive sequence numbers for a store
+-- Returns {"store_number", "first", "last"}; first..last are the caller's
+CREATE OR REPLACE FUNCTION allocate_order_numbers(p_store_number INTEGER, p_count INTEGER DEFAULT 1)
+RETURNS JSONB AS $$
+DECLARE
+    reserved_end BIGINT;
+BEGIN
+    IF p_store_number IS NULL THEN
+        RAISE EXCEPTION 'p_store_number must be an integer, got NULL';
+    END IF;
+    IF p_count IS NULL OR p_count < 1 OR p_count > 10000 THEN
+        RAISE EXCEPTION 'p_count must be between 1 and 10000, got %', p_count;
+    END IF;
+
+    INSERT INTO order_number_sequences AS s (store_number, next_value)
+    VALUES (p_store_number, 1 + p_count)
+    ON CONFLICT (store_number) DO UPDATE
+    SET next_value = s.next_value + p_count,
+        updated_at = now()
+    RETURNING s.next_value INTO reserved_end;
+
+    RETURN jsonb_build_object(
+        'store_number', p_store_number,
+        'first', reserved_end - p_count,
+        'last', reserved_end - 1
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to allocate and format one order number for a franchisee
+CREATE OR REPLACE FUNCTION next_order_number(p_franchisee_id UUID)
+RETURNS TEXT AS $$
+DECLARE
+    store INTEGER;
+    sequence_value BIGINT;
+BEGIN
+    SELECT store_number INTO store FROM franchisees WHERE id = p_franchisee_id;
+    IF store IS NULL THEN
+        RAISE EXCEPTION 'Franchisee not found: %', p_franchisee_id;
+    END IF;
+
+    sequence_value := (allocate_order_numbers(store, 1)->>'first')::BIGINT;
+    RETURN 'W' || store || lpad(sequence_value::TEXT, 8, '0') || '-1';
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant permissions
+GRANT SELECT ON order_number_sequences TO service_role;
+GRANT EXECUTE ON FUNCTION allocate_order_numbers(INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION next_order_number(UUID) TO service_role;
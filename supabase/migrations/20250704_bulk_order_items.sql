@@ -0,0 +1,200 @@
+-- Bulk Order Item Resolution
+-- Order creation resolved every basket item with its own queries (product
+-- identifier, product price, option name, option price, then an addon lookup
+-- and insert per addon): 20+ sequential round trips for a 5-item order. These
+-- functions resolve the whole basket in one call and write all order_items
+-- and order_addons rows in another, whatever the basket size.
+
+-- Function to resolve product IDs, options, prices and addons for all items
+-- p_items: [{"productId": "3075" | uuid, "productOptionId": "Large" | uuid,
+--            "quantity": 1, "addons": [{"addonId": uuid, "quantity": 1}]}, ...]
+-- Returns {"items": [...resolved, in input order...],
+--          "errors": [{"index": 0, "error": "...", "hint": "..."}]}
+-- Input is checked with a pattern before every cast, so a bad item (a
+-- quantity like "2.5", a product reference with more digits than BIGINT
+-- holds) lands in "errors" instead of failing the whole call
+CREATE OR REPLACE FUNCTION resolve_order_items(p_items JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    uuid_pattern CONSTANT TEXT := '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$';
+    -- A positive INTEGER, as order_items.quantity and order_addons.quantity take
+    quantity_pattern CONSTANT TEXT := '^\s*\+?0*[1-9]\d{0,8}\s*$';
+    result_items JSONB := '[]'::JSONB;
+    result_errors JSONB := '[]'::JSONB;
+    entry RECORD;
+BEGIN
+    FOR entry IN
+        WITH input AS (
+            SELECT ord - 1 AS idx,
+                   item,
+                   item->>'productId' AS product_ref,
+                   NULLIF(item->>'productOptionId', '') AS option_ref,
+                   NULLIF(item->>'quantity', '') AS quantity_ref,
+                   CASE
+                       WHEN NULLIF(item->>'quantity', '') IS NULL THEN 1
+                       WHEN item->>'quantity' ~ quantity_pattern THEN (item->>'quantity')::INTEGER
+                   END AS quantity,
+                   -- parseInt() semantics: leading digits; more than fit in BIGINT match nothing
+                   CASE WHEN item->>'productId' ~ '^\s*[+-]?0*\d{1,18}(\D|$)'
+                        THEN substring(item->>'productId' FROM '^\s*([+-]?\d+)')::BIGINT
+                   END AS product_number
+            FROM jsonb_array_elements(p_items) WITH ORDINALITY AS t(item, ord)
+        ),
+        products_resolved AS (
+            SELECT i.*, p.id AS product_id, p.base_price, p.name AS product_name,
+                   p.product_identifier
+            FROM input i
+            LEFT JOIN LATERAL (
+                SELECT p.id, p.base_price, p.name, p.product_identifier
+                FROM products p
+                WHERE p.is_active = true
+                  AND CASE
+                      WHEN i.product_number BETWEEN 1000 AND 9999
+                          THEN p.product_identifier = i.product_number
+                      WHEN i.product_ref ~* uuid_pattern
+                          THEN p.id = i.product_ref::UUID
+                      ELSE false
+                  END
+                LIMIT 2
+            ) p ON true
+        ),
+        -- .single() semantics: a reference matching more than one row resolves to nothing
+        products_unique AS (
+            SELECT DISTINCT ON (idx) *,
+                   COUNT(product_id) OVER (PARTITION BY idx) AS product_matches
+            FROM products_resolved
+            ORDER BY idx
+        ),
+        options_resolved AS (
+            SELECT pu.idx,
+                   COUNT(o.id) AS option_matches,
+                   (array_agg(o.id))[1] AS option_id,
+                   (array_agg(o.price))[1] AS option_price
+            FROM products_unique pu
+            LEFT JOIN product_options o
+              ON pu.option_ref IS NOT NULL
+             AND pu.product_matches = 1
+             AND o.product_id = pu.product_id
+             AND CASE
+                 WHEN pu.option_ref ~* uuid_pattern THEN o.id = pu.option_ref::UUID
+                 ELSE o.option_name ILIKE pu.option_ref
+             END
+            GROUP BY pu.idx
+        ),
+        addons_resolved AS (
+            SELECT pu.idx,
+                   COALESCE(jsonb_agg(jsonb_build_object(
+                       'addon_id', a.id,
+                       'quantity', CASE WHEN (addon->>'quantity') ~ quantity_pattern
+                                        THEN (addon->>'quantity')::INTEGER ELSE 1 END,
+                       'unit_price', a.price
+                   ) ORDER BY addon_ord) FILTER (WHERE a.id IS NOT NULL), '[]'::JSONB) AS addons,
+                   (array_agg(addon->>'quantity') FILTER (
+                       WHERE NULLIF(addon->>'quantity', '') IS NOT NULL
+                         AND NOT (addon->>'quantity') ~ quantity_pattern
+                   ))[1] AS bad_addon_quantity
+            FROM products_unique pu
+            LEFT JOIN LATERAL jsonb_array_elements(COALESCE(pu.item->'addons', '[]'::JSONB))
+                WITH ORDINALITY AS ad(addon, addon_ord) ON true
+            -- Unknown addons are skipped, as the per-item code did
+            LEFT JOIN addons a
+              ON a.id = CASE WHEN (addon->>'addonId') ~* uuid_pattern
+                             THEN (addon->>'addonId')::UUID END
+            GROUP BY pu.idx
+        )
+        SELECT pu.*, o.option_matches, o.option_id, o.option_price, ad.addons, ad.bad_addon_quantity
+        FROM products_unique pu
+        JOIN options_resolved o USING (idx)
+        JOIN addons_resolved ad USING (idx)
+        ORDER BY pu.idx
+    LOOP
+        IF entry.product_matches <> 1 THEN
+            result_errors := result_errors || jsonb_build_object(
+                'index', entry.idx,
+                'error', format('Product %s not found or inactive', entry.product_ref),
+                'hint', 'Use 4-digit product ID (e.g., ''3075'') or valid product UUID'
+            );
+        ELSIF entry.option_ref IS NOT NULL AND entry.option_matches <> 1 THEN
+            result_errors := result_errors || jsonb_build_object(
+                'index', entry.idx,
+                'error', format('Product option %s not found for product %s',
+                                entry.option_ref, entry.product_ref)
+            );
+        ELSIF entry.quantity IS NULL OR entry.bad_addon_quantity IS NOT NULL THEN
+            result_errors := result_errors || jsonb_build_object(
+                'index', entry.idx,
+                'error', format('Invalid quantity %s for product %s',
+                                COALESCE(entry.bad_addon_quantity, entry.quantity_ref), entry.product_ref),
+                'hint', 'Quantities are whole numbers of at least 1'
+            );
+        ELSE
+            result_items := result_items || jsonb_build_object(
+                'index', entry.idx,
+                'product_id', entry.product_id,
+                'product_identifier', entry.product_identifier,
+                'product_name', entry.product_name,
+                'product_option_id', entry.option_id,
+                'quantity', entry.quantity,
+                'unit_price', COALESCE(entry.option_price, entry.base_price),
+                'total_price', COALESCE(entry.option_price, entry.base_price) * entry.quantity,
+                'addons', entry.addons
+            );
+        END IF;
+    END LOOP;
+
+    RETURN jsonb_build_object('items', result_items, 'errors', result_errors);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Function to insert all order_items and order_addons of an order at once
+-- p_items: the "items" returned by resolve_order_items
+-- Returns {"order_item_ids": [uuid, ... in input order], "addon_count": n}
+CREATE OR REPLACE FUNCTION insert_order_items(p_order_id UUID, p_items JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    item_ids UUID[];
+    addon_rows BIGINT;
+BEGIN
+    -- Item ids are generated up front so addons can reference them in the
+    -- same statement (foreign keys are checked at the end of it)
+    WITH new_items AS MATERIALIZED (
+        SELECT ord, gen_random_uuid() AS id, item
+        FROM jsonb_array_elements(p_items) WITH ORDINALITY AS t(item, ord)
+    ),
+    inserted_items AS (
+        INSERT INTO order_items (id, order_id, product_id, product_option_id, quantity,
+                                 unit_price, total_price)
+        SELECT id, p_order_id,
+               (item->>'product_id')::UUID,
+               NULLIF(item->>'product_option_id', '')::UUID,
+               (item->>'quantity')::INTEGER,
+               (item->>'unit_price')::DECIMAL(10,2),
+               (item->>'total_price')::DECIMAL(10,2)
+        FROM new_items
+        RETURNING id
+    ),
+    inserted_addons AS (
+        INSERT INTO order_addons (order_item_id, addon_id, quantity, unit_price)
+        SELECT n.id,
+               (addon->>'addon_id')::UUID,
+               COALESCE((addon->>'quantity')::INTEGER, 1),
+               (addon->>'unit_price')::DECIMAL(10,2)
+        FROM new_items n,
+             jsonb_array_elements(COALESCE(n.item->'addons', '[]'::JSONB)) AS addon
+        RETURNING 1
+    )
+    SELECT (SELECT array_agg(n.id ORDER BY n.ord)
+            FROM new_items n JOIN inserted_items i ON i.id = n.id),
+           (SELECT COUNT(*) FROM inserted_addons)
+    INTO item_ids, addon_rows;
+
+    RETURN jsonb_build_object(
+        'order_item_ids', to_jsonb(COALESCE(item_ids, ARRAY[]::UUID[])),
+        'addon_count', addon_rows
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant permissions
+GRANT EXECUTE ON FUNCTION resolve_order_items(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION insert_order_items(UUID, JSONB) TO service_role;
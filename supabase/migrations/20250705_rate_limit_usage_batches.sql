@@ -0,0 +1,57 @@
+-- Batched Rate Limit Usage
+-- checkRateLimit made 2-4 api_rate_limits round trips per request (delete
+-- expired windows, select the count, update or insert) before any real
+-- work. Limits are now checked in memory by each function instance, which
+-- writes the admitted counts here in batches every few seconds: one call
+-- for many callers, off the request path. The table stays the shared
+-- record of usage per identifier and endpoint.
+
+-- Lookups by caller and window, for monitoring queries on usage
+CREATE INDEX IF NOT EXISTS idx_api_rate_limits_identifier_endpoint
+ON api_rate_limits (identifier, endpoint, window_start DESC);
+
+-- Function to record a batch of usage rows and drop expired ones
+-- p_rows: [{"identifier", "endpoint", "request_count", "window_start"}, ...]
+-- The table holds one row per (identifier, endpoint), as the functions'
+-- upserts (onConflict: 'identifier, endpoint') expect. Rows for the same
+-- caller are merged first (counts summed, latest window_start); a count is
+-- added to the stored one while that window is still open (window_start
+-- within p_window), and replaces it otherwise, as checkRateLimit does.
+-- Returns {"recorded": n, "deleted": n}
+CREATE OR REPLACE FUNCTION record_rate_limits(
+    p_rows JSONB,
+    p_retention INTERVAL DEFAULT '1 hour',
+    p_window INTERVAL DEFAULT '1 minute'
+)
+RETURNS JSONB AS $$
+DECLARE
+    recorded_count INTEGER;
+    deleted_count INTEGER;
+BEGIN
+    INSERT INTO api_rate_limits AS a (identifier, endpoint, request_count, window_start)
+    SELECT r->>'identifier',
+           r->>'endpoint',
+           SUM(GREATEST(COALESCE((r->>'request_count')::INTEGER, 1), 1)),
+           MAX(COALESCE((r->>'window_start')::TIMESTAMPTZ, now()))
+    FROM jsonb_array_elements(COALESCE(p_rows, '[]'::JSONB)) AS r
+    WHERE r->>'identifier' IS NOT NULL AND r->>'endpoint' IS NOT NULL
+    GROUP BY r->>'identifier', r->>'endpoint'
+    ON CONFLICT (identifier, endpoint) DO UPDATE SET
+        request_count = CASE
+            WHEN a.window_start >= EXCLUDED.window_start - p_window
+            THEN a.request_count + EXCLUDED.request_count
+            ELSE EXCLUDED.request_count
+        END,
+        window_start = GREATEST(a.window_start, EXCLUDED.window_start);
+    GET DIAGNOSTICS recorded_count = ROW_COUNT;
+
+    -- The per-request cleanup checkRateLimit used to do
+    DELETE FROM api_rate_limits WHERE window_start < now() - p_retention;
+    GET DIAGNOSTICS deleted_count = ROW_COUNT;
+
+    RETURN jsonb_build_object('recorded', recorded_count, 'deleted', deleted_count);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant permissions
+GRANT EXECUTE ON FUNCTION record_rate_limits(JSONB, INTERVAL, INTERVAL) TO service_role;
@@ -0,0 +1,237 @@
+-- Bulk Customer Deduplication
+-- check_merge_compatibility / merge_customer_accounts / get_merge_preview find
+-- the two accounts with `phone = p_phone LIMIT 1` and `email = p_email LIMIT 1`.
+-- That works for one live phone/email pair, but once a phone is shared (a
+-- chatbot_*@temp.local account next to the real one) or still held by an
+-- archived account, LIMIT 1 picks an arbitrary row. These functions take the
+-- two customer ids instead and apply the same rules, and merge_customer_pairs
+-- runs a whole batch of pairs per call for the bulk dedupe job
+-- (edible_tools/customer_dedupe.py).
+
+-- Function to check if two customer accounts, by id, can be safely merged
+-- Same name and primary-account rules as check_merge_compatibility; also
+-- refuses archived accounts and two different auth users
+CREATE OR REPLACE FUNCTION check_merge_pair(p_primary_id UUID, p_secondary_id UUID)
+RETURNS JSONB AS $$
+DECLARE
+    primary_account RECORD;
+    secondary_account RECORD;
+    primary_orders INTEGER;
+    secondary_orders INTEGER;
+BEGIN
+    SELECT * INTO primary_account FROM customers WHERE id = p_primary_id;
+    SELECT * INTO secondary_account FROM customers WHERE id = p_secondary_id;
+
+    IF primary_account IS NULL OR secondary_account IS NULL THEN
+        RETURN jsonb_build_object(
+            'can_merge', false,
+            'reason', 'insufficient_accounts',
+            'primary_account_exists', primary_account IS NOT NULL,
+            'secondary_account_exists', secondary_account IS NOT NULL
+        );
+    END IF;
+
+    IF primary_account.id = secondary_account.id THEN
+        RETURN jsonb_build_object('can_merge', false, 'reason', 'same_account', 'account_id', primary_account.id);
+    END IF;
+
+    IF primary_account.email LIKE 'archived\_%' OR secondary_account.email LIKE 'archived\_%' THEN
+        RETURN jsonb_build_object('can_merge', false, 'reason', 'already_merged');
+    END IF;
+
+    IF primary_account.first_name IS NOT NULL AND primary_account.first_name != ''
+       AND secondary_account.first_name IS NOT NULL AND secondary_account.first_name != ''
+       AND LOWER(primary_account.first_name) != LOWER(secondary_account.first_name) THEN
+        RETURN jsonb_build_object(
+            'can_merge', false,
+            'reason', 'name_mismatch',
+            'primary_name', primary_account.first_name,
+            'secondary_name', secondary_account.first_name
+        );
+    END IF;
+
+    IF primary_account.last_name IS NOT NULL AND primary_account.last_name != ''
+       AND secondary_account.last_name IS NOT NULL AND secondary_account.last_name != ''
+       AND LOWER(primary_account.last_name) != LOWER(secondary_account.last_name) THEN
+        RETURN jsonb_build_object(
+            'can_merge', false,
+            'reason', 'lastname_mismatch',
+            'primary_lastname', primary_account.last_name,
+            'secondary_lastname', secondary_account.last_name
+        );
+    END IF;
+
+    IF primary_account.auth_user_id IS NOT NULL AND secondary_account.auth_user_id IS NOT NULL
+       AND primary_account.auth_user_id != secondary_account.auth_user_id THEN
+        RETURN jsonb_build_object('can_merge', false, 'reason', 'auth_conflict');
+    END IF;
+
+    SELECT COUNT(*) INTO primary_orders FROM orders WHERE customer_id = primary_account.id;
+    SELECT COUNT(*) INTO secondary_orders FROM orders WHERE customer_id = secondary_account.id;
+
+    RETURN jsonb_build_object(
+        'can_merge', true,
+        'accounts', jsonb_build_object(
+            'primary', jsonb_build_object(
+                'id', primary_account.id,
+                'name', COALESCE(primary_account.first_name || ' ' || primary_account.last_name, 'Customer'),
+                'orders', primary_orders,
+                'has_auth', primary_account.auth_user_id IS NOT NULL,
+                'email', primary_account.email,
+                'phone', primary_account.phone
+            ),
+            'secondary', jsonb_build_object(
+                'id', secondary_account.id,
+                'name', COALESCE(secondary_account.first_name || ' ' || secondary_account.last_name, 'Customer'),
+                'orders', secondary_orders,
+                'has_auth', secondary_account.auth_user_id IS NOT NULL,
+                'email', secondary_account.email,
+                'phone', secondary_account.phone
+            )
+        ),
+        'total_orders_after_merge', primary_orders + secondary_orders,
+        'merge_strategy', 'bulk_dedupe'
+    );
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Function to merge the secondary account into the primary one, by id
+-- Same data transfer and archive trail as merge_customer_accounts
+CREATE OR REPLACE FUNCTION merge_customer_pair(p_primary_id UUID, p_secondary_id UUID, p_source TEXT)
+RETURNS JSONB AS $$
+DECLARE
+    primary_account RECORD;
+    secondary_account RECORD;
+    compatibility_check JSONB;
+    merged_preferences JSONB;
+    orders_transferred INTEGER;
+BEGIN
+    -- Lock both rows so a concurrent merge of either account waits for this one
+    PERFORM 1 FROM customers WHERE id IN (p_primary_id, p_secondary_id) ORDER BY id FOR UPDATE;
+
+    compatibility_check := check_merge_pair(p_primary_id, p_secondary_id);
+    IF NOT (compatibility_check->>'can_merge')::BOOLEAN THEN
+        RETURN jsonb_build_object(
+            'success', false,
+            'reason', compatibility_check->>'reason',
+            'message', 'Accounts cannot be safely merged: ' || (compatibility_check->>'reason')
+        );
+    END IF;
+
+    SELECT * INTO primary_account FROM customers WHERE id = p_primary_id;
+    SELECT * INTO secondary_account FROM customers WHERE id = p_secondary_id;
+
+    merged_preferences := COALESCE(secondary_account.preferences, '{}'::JSONB)
+        || COALESCE(primary_account.preferences, '{}'::JSONB);
+    merged_preferences := merged_preferences || jsonb_build_object(
+        'merged_at', NOW()::TEXT,
+        'merged_from', secondary_account.id,
+        'merge_strategy', 'bulk_dedupe',
+        'merge_source', p_source,
+        'account_sources', (
+            SELECT COALESCE(jsonb_agg(DISTINCT source), '[]'::JSONB)
+            FROM jsonb_array_elements_text(
+                COALESCE(primary_account.preferences->'account_sources', '[]'::JSONB)
+                || COALESCE(secondary_account.preferences->'account_sources', '[]'::JSONB)
+            ) AS source
+        )
+    );
+
+    -- Archive the secondary account first (preserve for audit trail), so
+    -- its email and auth user are free to move to the primary
+    UPDATE customers SET
+        email = 'archived_' || secondary_account.id || '_' || COALESCE(secondary_account.email, 'no_email'),
+        auth_user_id = CASE WHEN primary_account.auth_user_id IS NULL THEN NULL ELSE auth_user_id END,
+        preferences = COALESCE(secondary_account.preferences, '{}'::JSONB) || jsonb_build_object(
+            'archived_at', NOW()::TEXT,
+            'merged_into', primary_account.id,
+            'original_email', secondary_account.email,
+            'original_phone', secondary_account.phone
+        )
+    WHERE id = secondary_account.id;
+
+    UPDATE customers SET
+        email = CASE
+            WHEN (primary_account.email IS NULL OR primary_account.email LIKE '%@temp.local')
+                 AND secondary_account.email NOT LIKE '%@temp.local'
+            THEN secondary_account.email
+            ELSE primary_account.email
+        END,
+        phone = COALESCE(primary_account.phone, secondary_account.phone),
+        first_name = COALESCE(NULLIF(primary_account.first_name, ''), NULLIF(secondary_account.first_name, ''),
+                              primary_account.first_name),
+        last_name = COALESCE(NULLIF(primary_account.last_name, ''), NULLIF(secondary_account.last_name, ''),
+                             primary_account.last_name),
+        allergies = COALESCE(primary_account.allergies, '{}') || COALESCE(secondary_account.allergies, '{}'),
+        dietary_restrictions = COALESCE(primary_account.dietary_restrictions, '{}')
+            || COALESCE(secondary_account.dietary_restrictions, '{}'),
+        preferences = merged_preferences,
+        auth_user_id = COALESCE(primary_account.auth_user_id, secondary_account.auth_user_id)
+    WHERE id = primary_account.id;
+
+    UPDATE orders SET customer_id = primary_account.id WHERE customer_id = secondary_account.id;
+    GET DIAGNOSTICS orders_transferred = ROW_COUNT;
+
+    UPDATE customer_addresses SET customer_id = primary_account.id WHERE customer_id = secondary_account.id;
+    UPDATE recipient_addresses SET customer_id = primary_account.id WHERE customer_id = secondary_account.id;
+
+    RETURN jsonb_build_object(
+        'success', true,
+        'primary_account_id', primary_account.id,
+        'secondary_account_id', secondary_account.id,
+        'orders_transferred', orders_transferred,
+        'total_orders', (compatibility_check->'total_orders_after_merge')::INTEGER,
+        'merge_strategy', 'bulk_dedupe',
+        'message', 'Successfully merged ' || orders_transferred || ' orders into unified account'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to check or merge a batch of pairs in one call
+-- p_pairs: [{"primary_id": uuid, "secondary_id": uuid}, ...], applied in order
+-- p_dry_run: only run check_merge_pair
+-- Returns {"results": [{"primary_id", "secondary_id", ...check or merge result}]}
+-- A pair that fails is rolled back on its own; the rest of the batch continues
+CREATE OR REPLACE FUNCTION merge_customer_pairs(
+    p_pairs JSONB,
+    p_source TEXT DEFAULT 'bulk_dedupe',
+    p_dry_run BOOLEAN DEFAULT true
+)
+RETURNS JSONB AS $$
+DECLARE
+    pair JSONB;
+    outcome JSONB;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    IF jsonb_array_length(COALESCE(p_pairs, '[]'::JSONB)) > 500 THEN
+        RAISE EXCEPTION 'At most 500 pairs per call, got %', jsonb_array_length(p_pairs);
+    END IF;
+
+    FOR pair IN SELECT * FROM jsonb_array_elements(COALESCE(p_pairs, '[]'::JSONB)) LOOP
+        BEGIN
+            IF p_dry_run THEN
+                outcome := check_merge_pair((pair->>'primary_id')::UUID, (pair->>'secondary_id')::UUID);
+            ELSE
+                outcome := merge_customer_pair((pair->>'primary_id')::UUID, (pair->>'secondary_id')::UUID, p_source);
+            END IF;
+        EXCEPTION WHEN OTHERS THEN
+            outcome := jsonb_build_object(
+                'success', false,
+                'error', SQLERRM,
+                'message', 'Merge failed due to database error'
+            );
+        END;
+        results := results || (jsonb_build_object(
+            'primary_id', pair->>'primary_id',
+            'secondary_id', pair->>'secondary_id'
+        ) || outcome);
+    END LOOP;
+
+    RETURN jsonb_build_object('results', results);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant permissions
+GRANT EXECUTE ON FUNCTION check_merge_pair(UUID, UUID) TO service_role;
+GRANT EXECUTE ON FUNCTION merge_customer_pair(UUID, UUID, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION merge_customer_pairs(JSONB, TEXT, BOOLEAN) TO service_role;
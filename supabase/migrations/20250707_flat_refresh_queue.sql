@@ -0,0 +1,163 @@
+-- Flat Table Refresh Queue
+-- The chatbot_*_flat tables are written by hand (createChatbotFlatRecord) or
+-- rebuilt as a whole, and most source tables have no updated_at to diff by.
+-- Instead, row triggers on the source tables record which flat rows a change
+-- affects in flat_refresh_queue; edible_tools/flat_refresh.py reads the queue,
+-- rebuilds just those rows in batches and acknowledges them.
+
+CREATE TABLE IF NOT EXISTS flat_refresh_queue (
+    flat_table TEXT NOT NULL,
+    entity_id UUID NOT NULL,
+    queued_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    PRIMARY KEY (flat_table, entity_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_flat_refresh_queue_queued
+ON flat_refresh_queue(flat_table, queued_at);
+
+-- Trigger function to queue the flat rows a source row change affects
+-- TG_ARGV[0]: flat table
+-- TG_ARGV[1]: column of the changed row holding the flat key, or '*' for
+--             every row of the flat table (queued as the all-zero UUID)
+-- TG_ARGV[2..4]: optional link table, its column matching TG_ARGV[1] and its
+--             column holding the flat key, for changes one join away
+--             (e.g. categories -> product_categories.category_id -> product_id)
+-- Queues both the old and the new key on updates, so a row that moves
+-- (an order changing customer) refreshes both sides
+CREATE OR REPLACE FUNCTION queue_flat_refresh()
+RETURNS TRIGGER AS $$
+DECLARE
+    target_table TEXT := TG_ARGV[0];
+    key_column TEXT := TG_ARGV[1];
+    changed_ids UUID[] := '{}';
+BEGIN
+    IF key_column = '*' THEN
+        changed_ids := ARRAY['00000000-0000-0000-0000-000000000000'::UUID];
+    ELSE
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            changed_ids := changed_ids || (to_jsonb(NEW)->>key_column)::UUID;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            changed_ids := changed_ids || (to_jsonb(OLD)->>key_column)::UUID;
+        END IF;
+    END IF;
+
+    IF TG_NARGS > 2 THEN
+        EXECUTE format(
+            'INSERT INTO flat_refresh_queue (flat_table, entity_id)
+             SELECT DISTINCT $1, %I FROM %I WHERE %I = ANY($2) AND %I IS NOT NULL
+             ON CONFLICT (flat_table, entity_id) DO UPDATE SET queued_at = EXCLUDED.queued_at',
+            TG_ARGV[4], TG_ARGV[2], TG_ARGV[3], TG_ARGV[4]
+        ) USING target_table, changed_ids;
+    ELSE
+        INSERT INTO flat_refresh_queue (flat_table, entity_id)
+        SELECT DISTINCT target_table, changed_id FROM unnest(changed_ids) AS changed_id
+        WHERE changed_id IS NOT NULL
+        ON CONFLICT (flat_table, entity_id) DO UPDATE SET queued_at = EXCLUDED.queued_at;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Product changes -> chatbot_products_flat
+DROP TRIGGER IF EXISTS queue_products_flat ON products;
+CREATE TRIGGER queue_products_flat AFTER INSERT OR UPDATE OR DELETE ON products
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_products_flat', 'id');
+
+DROP TRIGGER IF EXISTS queue_products_flat ON product_options;
+CREATE TRIGGER queue_products_flat AFTER INSERT OR UPDATE OR DELETE ON product_options
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_products_flat', 'product_id');
+
+DROP TRIGGER IF EXISTS queue_products_flat ON product_categories;
+CREATE TRIGGER queue_products_flat AFTER INSERT OR UPDATE OR DELETE ON product_categories
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_products_flat', 'product_id');
+
+DROP TRIGGER IF EXISTS queue_products_flat ON product_ingredients;
+CREATE TRIGGER queue_products_flat AFTER INSERT OR UPDATE OR DELETE ON product_ingredients
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_products_flat', 'product_id');
+
+DROP TRIGGER IF EXISTS queue_products_flat ON categories;
+CREATE TRIGGER queue_products_flat AFTER UPDATE OR DELETE ON categories
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh(
+    'chatbot_products_flat', 'id', 'product_categories', 'category_id', 'product_id');
+
+DROP TRIGGER IF EXISTS queue_products_flat ON ingredients;
+CREATE TRIGGER queue_products_flat AFTER UPDATE OR DELETE ON ingredients
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh(
+    'chatbot_products_flat', 'id', 'product_ingredients', 'ingredient_id', 'product_id');
+
+-- Addons are universal: every product row lists them
+DROP TRIGGER IF EXISTS queue_products_flat ON addons;
+CREATE TRIGGER queue_products_flat AFTER INSERT OR UPDATE OR DELETE ON addons
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_products_flat', '*');
+
+-- Store changes -> chatbot_franchisees_flat
+DROP TRIGGER IF EXISTS queue_franchisees_flat ON franchisees;
+CREATE TRIGGER queue_franchisees_flat AFTER INSERT OR UPDATE OR DELETE ON franchisees
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_franchisees_flat', 'id');
+
+DROP TRIGGER IF EXISTS queue_franchisees_flat ON delivery_zones;
+CREATE TRIGGER queue_franchisees_flat AFTER INSERT OR UPDATE OR DELETE ON delivery_zones
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_franchisees_flat', 'franchisee_id');
+
+DROP TRIGGER IF EXISTS queue_franchisees_flat ON inventory;
+CREATE TRIGGER queue_franchisees_flat AFTER INSERT OR UPDATE OR DELETE ON inventory
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_franchisees_flat', 'franchisee_id');
+
+-- Order changes -> chatbot_orders_flat, and the customer's order history
+DROP TRIGGER IF EXISTS queue_orders_flat ON orders;
+CREATE TRIGGER queue_orders_flat AFTER INSERT OR UPDATE OR DELETE ON orders
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_orders_flat', 'id');
+
+DROP TRIGGER IF EXISTS queue_customers_flat ON orders;
+CREATE TRIGGER queue_customers_flat AFTER INSERT OR UPDATE OR DELETE ON orders
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_customers_flat', 'customer_id');
+
+DROP TRIGGER IF EXISTS queue_orders_flat ON order_items;
+CREATE TRIGGER queue_orders_flat AFTER INSERT OR UPDATE OR DELETE ON order_items
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_orders_flat', 'order_id');
+
+DROP TRIGGER IF EXISTS queue_orders_flat ON order_addons;
+CREATE TRIGGER queue_orders_flat AFTER INSERT OR UPDATE OR DELETE ON order_addons
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh(
+    'chatbot_orders_flat', 'order_item_id', 'order_items', 'id', 'order_id');
+
+DROP TRIGGER IF EXISTS queue_orders_flat ON recipient_addresses;
+CREATE TRIGGER queue_orders_flat AFTER UPDATE ON recipient_addresses
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh(
+    'chatbot_orders_flat', 'id', 'orders', 'recipient_address_id', 'id');
+
+-- Customer changes -> chatbot_customers_flat, and the customer on their orders
+DROP TRIGGER IF EXISTS queue_customers_flat ON customers;
+CREATE TRIGGER queue_customers_flat AFTER INSERT OR UPDATE OR DELETE ON customers
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh('chatbot_customers_flat', 'id');
+
+DROP TRIGGER IF EXISTS queue_orders_flat ON customers;
+CREATE TRIGGER queue_orders_flat AFTER UPDATE ON customers
+FOR EACH ROW EXECUTE FUNCTION queue_flat_refresh(
+    'chatbot_orders_flat', 'id', 'orders', 'customer_id', 'id');
+
+-- Function to acknowledge refreshed queue entries
+-- p_entries: [{"entity_id": uuid, "queued_at": timestamptz}, ...] as read
+-- An entry queued again after it was read has a later queued_at and stays
+-- for the next pass
+CREATE OR REPLACE FUNCTION ack_flat_refresh(p_flat_table TEXT, p_entries JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    acknowledged INTEGER;
+BEGIN
+    DELETE FROM flat_refresh_queue q
+    USING jsonb_to_recordset(COALESCE(p_entries, '[]'::JSONB)) AS e(entity_id UUID, queued_at TIMESTAMPTZ)
+    WHERE q.flat_table = p_flat_table
+      AND q.entity_id = e.entity_id
+      AND q.queued_at <= e.queued_at;
+    GET DIAGNOSTICS acknowledged = ROW_COUNT;
+
+    RETURN jsonb_build_object('acknowledged', acknowledged);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Grant permissions
+GRANT SELECT, INSERT, UPDATE, DELETE ON flat_refresh_queue TO service_role;
+GRANT EXECUTE ON FUNCTION ack_flat_refresh(TEXT, JSONB) TO service_role;
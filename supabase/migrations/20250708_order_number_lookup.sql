@@ -0,0 +1,39 @@
+-- Order Number Lookup
+-- The order function finds an order by number with
+-- `.like('order_data->order_info->>order_number', '%{n}-%')` on
+-- chatbot_orders_flat: a leading-wildcard LIKE on a JSON path, so every
+-- "where's my order" call scans the whole table. Callers read out the full
+-- number (W25710000001), the 8-digit sequence or its last digits, i.e. a
+-- suffix of the number before its "-1" version. Reversed, a suffix is a
+-- prefix, which a text_pattern_ops btree answers with a range scan. The
+-- range is spelled out with ~>=~ / ~<~ rather than LIKE 'key%' so it stays
+-- an index scan in the generic plans PostgREST's prepared statements get.
+
+CREATE INDEX IF NOT EXISTS idx_orders_order_number_suffix
+ON orders (reverse(split_part(order_number, '-', 1)) text_pattern_ops);
+
+-- Function to normalize what a caller said into the indexed form
+-- 'w25710000001-1' -> 'W25710000001', ' 0001 ' -> '0001'; the version
+-- suffix, LIKE wildcards and other punctuation are dropped
+CREATE OR REPLACE FUNCTION order_lookup_key(p_order_number TEXT)
+RETURNS TEXT AS $$
+    SELECT upper(regexp_replace(split_part(trim(COALESCE(p_order_number, '')), '-', 1), '[^A-Za-z0-9]', '', 'g'));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Function to find flat order rows by a full order number or a suffix of it
+-- Same matches as the LIKE '%{n}-%' it replaces, most recent order first
+CREATE OR REPLACE FUNCTION find_orders_by_number(p_order_number TEXT, p_limit INTEGER DEFAULT 5)
+RETURNS SETOF chatbot_orders_flat AS $$
+    SELECT f.*
+    FROM orders o
+    JOIN chatbot_orders_flat f ON f.order_id = o.id
+    WHERE order_lookup_key(p_order_number) != ''
+      AND reverse(split_part(o.order_number, '-', 1)) ~>=~ reverse(order_lookup_key(p_order_number))
+      AND reverse(split_part(o.order_number, '-', 1)) ~<~ (reverse(order_lookup_key(p_order_number)) || chr(127))
+    ORDER BY o.created_at DESC
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 5), 1), 100);
+$$ LANGUAGE sql STABLE;
+
+-- Grant permissions
+GRANT EXECUTE ON FUNCTION order_lookup_key(TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION find_orders_by_number(TEXT, INTEGER) TO service_role;
@@ -0,0 +1,93 @@
+# tests/test_allergens.py
+import re
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.allergens import (
+    ALLERGEN_BITS,
+    ALLERGEN_CLASSES,
+    allergen_mask,
+    edge_function_is_safe,
+    exclusion_bits,
+    json_list_is_safe,
+    reference_is_safe,
+    verify,
+)
+from edible_tools.catalog_index import CatalogIndex
+from edible_tools.catalog_ingest import iter_catalog
+from edible_tools.local_edge import sample_search_engine
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', 'samples')
+SAMPLE_FILES = [
+    os.path.join(SAMPLES, name)
+    for name in ("Edible-new-for-the-season.csv", "Formatted2_mothersday.csv",
+                 "processed_new_for_the_season_options.csv")
+]
+
+
+def test_masks_classify_allergen_guesses():
+    mask = allergen_mask(["Premium Peanut Butter and Jelly Cookie"])
+
+    assert mask == ALLERGEN_BITS["nuts"] | ALLERGEN_BITS["peanut"] | ALLERGEN_BITS["gluten"]
+    assert allergen_mask(["Orange Half Slices", "Cheesecake"]) == ALLERGEN_BITS["citrus"] | ALLERGEN_BITS["dairy"]
+    assert allergen_mask([]) == 0
+    assert exclusion_bits(["Nuts", "milk", "sesame"]) == (
+        ALLERGEN_BITS["nuts"] | ALLERGEN_BITS["dairy"], ["sesame"])
+
+def test_ingest_stores_the_mask_from_the_guess_json():
+    products = list(iter_catalog(SAMPLE_FILES[2]))
+    flagged = [p for p in products if p["allergens"]]
+
+    assert flagged
+    assert all(p["allergen_mask"] & ALLERGEN_BITS["nuts"] for p in flagged)
+    assert all(p["allergen_mask"] == 0 for p in products if not p["allergens"])
+
+def test_bitmask_filter_matches_json_list_filter_on_samples():
+    report = verify(SAMPLE_FILES)
+
+    assert set(report) == {"ingested", "analyzed"}
+    for entry in report.values():
+        assert entry["products"] == 250
+        assert entry["combinations"] == 2 ** len(ALLERGEN_BITS) - 1
+        assert entry["mismatches"] == 0, entry["examples"]
+        assert entry["edge_misses"] == 0, entry["examples"]
+    assert report["analyzed"]["with_allergens"] > report["ingested"]["with_allergens"] > 0
+
+def test_verify_checks_against_filters_independent_of_the_classes(monkeypatch):
+    assert not reference_is_safe({"allergens": ["Caramel Pecan Patties"]}, ["tree nuts"])
+    assert reference_is_safe({"allergens": ["Peanut Butter Cups"]}, ["dairy"])
+    assert not reference_is_safe({"allergens": ["Peanut Butter Cups"]}, ["dairy", "peanut"])
+    assert not edge_function_is_safe({"ingredients": ["nuts", "Strawberries"]}, ["Nuts"])
+    assert edge_function_is_safe({"ingredients": ["Almonds"]}, ["nuts"])
+
+    # A class pattern that misses a term is caught, not matched on both sides
+    monkeypatch.setitem(ALLERGEN_CLASSES, "nuts", re.compile(r"\bpeanuts?\b", re.IGNORECASE))
+    report = verify(SAMPLE_FILES[2:])
+    assert report["analyzed"]["mismatches"] > 0
+
+def test_unknown_allergies_fall_back_to_the_lists():
+    rows = [
+        {"product_id": "a", "product_data": {"allergens": ["Sesame Brittle"]}},
+        {"product_id": "b", "product_data": {"allergens": ["Almond Bark"]}},
+        {"product_id": "c", "product_data": {"allergens": []}},
+    ]
+    index = CatalogIndex(rows)
+
+    assert index.allergen_safe_mask(["sesame"]).tolist() == [False, True, True]
+    assert index.allergen_safe_mask(["tree nuts", "sesame"]).tolist() == [False, False, True]
+    assert json_list_is_safe(rows[1]["product_data"], ["dairy"])
+
+def test_hybrid_search_excludes_allergen_classes():
+    engine = sample_search_engine()
+    masks = {row["product_data"]["product_info"]["name"]: row["product_data"]["allergen_mask"]
+             for row in engine.rows}
+    request = {"query": "cookie", "allergens": ["nuts"], "maxResults": 50}
+
+    unfiltered = engine.search({**request, "allergens": []})["products"]
+    result = engine.hybrid_search(request)
+
+    # The edge function only drops exact ingredient names, so "nuts" keeps the peanut cookies
+    assert any(masks[p["name"]] & ALLERGEN_BITS["nuts"] for p in engine.search(request)["products"])
+    assert 0 < result["count"] < len(unfiltered)
+    assert not any(masks[p["name"]] & ALLERGEN_BITS["nuts"] for p in result["products"])
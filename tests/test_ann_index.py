@@ -0,0 +1,147 @@
+# tests/test_ann_index.py
+import numpy as np
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.ann_index import IVFFlatIndex, exact_top_k, recall_report
+from edible_tools.product_search import ProductSearchEngine
+
+DIMENSIONS = 32
+
+
+def _clustered(n=2000, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, DIMENSIONS))
+    points = centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, DIMENSIONS))
+    ids = [f"p{i}" for i in range(n)]
+    return ids, points.astype(np.float32)
+
+
+def _unit(matrix):
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_search_recall_against_exact():
+    ids, matrix = _clustered()
+    index = IVFFlatIndex.build(ids, matrix, n_probe=6)
+    queries = matrix[:100] + 0.2 * np.random.default_rng(1).standard_normal((100, DIMENSIONS))
+
+    report = recall_report(index, ids, matrix, queries.astype(np.float32), k=10)
+
+    assert index.n_lists == 45
+    assert report["recall"] >= 0.9
+    assert report["queries"] == 100
+
+def test_probing_every_list_is_exact():
+    ids, matrix = _clustered(n=500)
+    index = IVFFlatIndex.build(ids, matrix)
+    query = matrix[7]
+
+    found, scores = index.search(query, 5, n_probe=index.n_lists)
+
+    assert found == [ids[i] for i in exact_top_k(_unit(matrix), query, 5)]
+    assert found[0] == "p7"
+    assert np.all(np.diff(scores) <= 0)
+
+def test_upsert_replaces_and_remove_deletes():
+    ids, matrix = _clustered(n=500)
+    index = IVFFlatIndex.build(ids, matrix)
+    target = -matrix[3]
+
+    index.upsert(["p10"], target[None, :])
+    found, scores = index.search(target, 1, n_probe=index.n_lists)
+    assert found == ["p10"]
+    assert scores[0] > 0.999
+    assert len(index) == 500
+
+    assert index.remove(["p10", "missing"]) == 1
+    assert "p10" not in index
+    found, _ = index.search(target, 500, n_probe=index.n_lists)
+    assert "p10" not in found
+    assert len(found) == 499
+
+def test_where_filters_candidates_before_top_k():
+    ids, matrix = _clustered(n=500)
+    index = IVFFlatIndex.build(ids, matrix)
+
+    found, _ = index.search(
+        matrix[0], 5, n_probe=index.n_lists,
+        where=lambda candidates: np.array([int(c[1:]) % 2 == 1 for c in candidates]),
+    )
+
+    assert len(found) == 5
+    assert all(int(i[1:]) % 2 == 1 for i in found)
+
+def test_save_and_mmap_load_round_trip(tmp_path):
+    ids, matrix = _clustered(n=500)
+    index = IVFFlatIndex.build(ids, matrix)
+    index.remove(["p0"])
+    path = str(tmp_path / "index")
+    index.save(path)
+
+    loaded = IVFFlatIndex.load(path)
+
+    assert isinstance(loaded._vectors, np.memmap)
+    assert len(loaded) == 499
+    found, scores = loaded.search(matrix[5], 10)
+    expected, expected_scores = index.search(matrix[5], 10)
+    assert found == expected
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    loaded.upsert(["new"], matrix[5][None, :])
+    assert "new" in loaded
+    assert loaded.search(matrix[5], 1, n_probe=loaded.n_lists)[1][0] > 0.999
+
+def test_engine_uses_ann_index_with_filters():
+    ids, matrix = _clustered(n=300)
+    rows = [
+        {
+            "product_id": pid,
+            "product_data": {
+                "product_info": {"product_identifier": str(i), "name": pid,
+                                 "base_price": "10.00" if i % 2 else "90.00"},
+                "categories": [],
+            },
+        }
+        for i, pid in enumerate(ids)
+    ]
+    index = IVFFlatIndex.build(ids, matrix, n_probe=20)
+    engine = ProductSearchEngine(
+        rows, dict(zip(ids, matrix)), dimensions=DIMENSIONS,
+        embed_query=lambda text: matrix[3], ann_index=index,
+    )
+
+    products, scores = engine.semantic_search(
+        {"query": "x", "maxPrice": 50, "semanticThreshold": 0.1}, 5
+    )
+
+    assert products[0]["product_id"] == "p3"
+    assert all(p["product_data"]["product_info"]["base_price"] == "10.00" for p in products)
+    assert all(s >= 0.1 for s in scores)
+
+def test_backfill_upserts_written_embeddings_into_index():
+    from unittest.mock import MagicMock, patch
+    import backfill_embeddings
+
+    rows = [
+        {"product_id": "p1", "product_data": {"product_info": {"name": "Berry Box"}}},
+        {"product_id": "p2", "product_data": {"product_info": {"name": "Mango Bouquet"}}},
+    ]
+    supabase = MagicMock()
+    flat = supabase.table.return_value.select.return_value.order.return_value.range.return_value
+    flat.execute.return_value = MagicMock(data=rows)
+    supabase.rpc.side_effect = lambda name, params: MagicMock(execute=MagicMock(
+        return_value=MagicMock(data={'updated': [u['id'] for u in params['p_updates']]})
+    ))
+    vector = np.ones(backfill_embeddings.EMBEDDING_DIMENSIONS, dtype=np.float32)
+    index = IVFFlatIndex(vector[None, :])
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase), \
+         patch.object(backfill_embeddings, 'get_embeddings_cached',
+                      return_value=[vector, vector]):
+        backfill_embeddings.backfill_embeddings(ann_index=index)
+
+    assert len(index) == 2
+    supabase.table.return_value.select.return_value.order.assert_called_with('product_id')
+    assert "p1" in index and "p2" in index
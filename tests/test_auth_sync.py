@@ -0,0 +1,153 @@
+# tests/test_auth_sync.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.auth_sync import AuthSync, SyncCursor, plan_actions, synthetic_auth_users, upsert_customers
+from edible_tools.edge_client import EdgeClient
+from edible_tools.local_edge import LocalEdgeServer
+from edible_tools.local_services import LocalStore, customer_routes
+from edible_tools.product_search import ProductSearchEngine
+
+
+def make_store(users=300):
+    store = LocalStore(ProductSearchEngine([], {}, 8))
+    store.auth_users, customers = synthetic_auth_users(users)
+    store.load_customers(customers)
+    return store
+
+def linked_customers(store):
+    linked = {}
+    for customer in store.customers.values():
+        if customer["auth_user_id"]:
+            linked.setdefault(customer["auth_user_id"], []).append(customer)
+    return linked
+
+def test_plans_update_link_create_like_the_function():
+    users = [
+        {"id": "u1", "email": "a@x.com", "user_metadata": {"first_name": "Ann"}},
+        {"id": "u2", "email": "b@x.com", "user_metadata": {"phone": "+14155550100"}},
+        {"id": "u3", "email": "c@x.com"},
+        {"id": "u4", "email": None},
+        {"id": "u5", "email": "d@x.com", "user_metadata": {"firstName": "Dee"}},
+        {"id": "u6", "email": "e@x.com"},
+    ]
+    customers = [
+        {"id": "c1", "auth_user_id": "u1", "email": "old@x.com", "first_name": None, "phone": "+1999"},
+        {"id": "c2", "auth_user_id": None, "email": "b@x.com", "first_name": "Bo",
+         "preferences": {"account_sources": ["chatbot"]}},
+        {"id": "c5", "auth_user_id": "u5", "email": "d@x.com", "first_name": "Dee", "last_name": None,
+         "phone": None, "preferences": {"account_sources": ["webapp"]}},
+        {"id": "c6a", "auth_user_id": None, "email": "e@x.com"},
+        {"id": "c6b", "auth_user_id": None, "email": "e@x.com"},
+    ]
+
+    plan = plan_actions(users, customers, now="2025-07-01T00:00:00+00:00")
+
+    update, = plan["update"]
+    assert (update["id"], update["email"], update["first_name"], update["phone"]) == ("c1", "a@x.com", "Ann", "+1999")
+    assert update["preferences"]["account_sources"] == ["webapp"]
+    link, = plan["link"]
+    assert (link["id"], link["auth_user_id"], link["first_name"], link["phone"]) == ("c2", "u2", "Bo", "+14155550100")
+    assert link["preferences"]["account_sources"] == ["chatbot", "webapp"]
+    create, = plan["create"]
+    assert (create["auth_user_id"], create["email"]) == ("u3", "c@x.com")
+    assert (plan["unchanged"], plan["skipped"]) == (1, 1)
+    assert [c["authUserId"] for c in plan["conflicts"]] == ["u6"]
+
+def test_email_held_by_another_customer_is_a_conflict():
+    # The auth user was deleted and re-created; the old link still holds the email
+    plan = plan_actions([{"id": "new", "email": "a@x.com"}, {"id": "u2", "email": "b@x.com"}], [
+        {"id": "c1", "auth_user_id": "old", "email": "a@x.com"},
+        {"id": "c2", "auth_user_id": "u2", "email": "old-b@x.com"},
+        {"id": "c3", "auth_user_id": None, "email": "b@x.com"},
+    ])
+
+    assert plan["create"] == plan["update"] == plan["link"] == []
+    assert [(c["authUserId"], c["error"]) for c in plan["conflicts"]] == [
+        ("new", "Email already belongs to customer c1"), ("u2", "Email already belongs to customer c3")]
+
+def test_rejected_rows_do_not_stall_the_cursor(tmp_path):
+    store = make_store(120)
+    recreated = store.auth_users[51]
+    old = next(c for c in store.customers.values() if c["email"] == recreated["email"])
+    old["auth_user_id"] = "deleted-auth-user"
+
+    with LocalEdgeServer(customer_routes(store)) as server, EdgeClient(server.url) as client:
+        rows = [{"id": f"n{i}", "email": f"new{i}@x.com"} for i in range(7)] + \
+            [{"id": "dup", "email": recreated["email"]}]
+        written, rejected = upsert_customers(client, rows, batch_size=8)
+        result = AuthSync(client, SyncCursor(str(tmp_path / "cursor.json")), per_page=40, workers=2).run()
+
+    assert written == 7 and [r["id"] for r in rejected] == ["dup"]
+    assert "customers_email_key" in rejected[0]["error"] and "dup" not in store.customers
+    assert (result["failed_pages"], result["next_page"]) == (0, 4)
+    assert [c["authUserId"] for c in result["conflicts"]] == [recreated["id"]]
+    assert old["auth_user_id"] == "deleted-auth-user"
+
+def test_syncs_every_page_and_a_rerun_writes_nothing():
+    store = make_store()
+    with LocalEdgeServer(customer_routes(store)) as server, EdgeClient(server.url, pool_size=8) as client:
+        first = AuthSync(client, per_page=40, workers=3).run()
+        again = AuthSync(client, per_page=40, workers=3).run()
+
+    with_email = [u for u in store.auth_users if u["email"]]
+    assert first["pages"] == 8 and first["failed_pages"] == 0
+    assert first["linked"] + first["created"] + first["updated"] + first["unchanged"] == len(with_email)
+    linked = linked_customers(store)
+    assert sorted(linked) == sorted(u["id"] for u in with_email)
+    assert all(len(customers) == 1 for customers in linked.values())
+    assert again["unchanged"] == len(with_email)
+    assert again["linked"] == again["created"] == again["updated"] == 0
+
+def test_resumes_from_the_cursor_after_a_crash(tmp_path):
+    store = make_store()
+    path = str(tmp_path / "cursor.json")
+
+    with LocalEdgeServer(customer_routes(store)) as server, EdgeClient(server.url, pool_size=8) as client:
+        AuthSync(client, SyncCursor(path), per_page=40, workers=2).run(max_pages=3)
+
+        # A new process picks the cursor up
+        cursor = SyncCursor(path)
+        assert cursor.start_page == 4
+        rest = AuthSync(client, cursor, per_page=40, workers=2).run()
+
+    assert (rest["start_page"], rest["pages"], rest["next_page"]) == (4, 5, 9)
+    totals = SyncCursor(path).totals
+    assert totals["linked"] + totals["created"] + totals["updated"] + totals["unchanged"] == \
+        sum(1 for u in store.auth_users if u["email"])
+    assert all(len(customers) == 1 for customers in linked_customers(store).values())
+
+def test_failed_page_is_retried_and_never_duplicated(tmp_path):
+    store = make_store(120)
+    path = str(tmp_path / "cursor.json")
+
+    class FlakyClient(EdgeClient):
+        fail = True
+
+        def post(self, path, **kwargs):
+            # Fail the upsert carrying user 45's row, on page 2
+            if self.fail and any(row["auth_user_id"] == store.auth_users[45]["id"] for row in kwargs["json"]):
+                raise ConnectionError("connection reset")
+            return super().post(path, **kwargs)
+
+    with LocalEdgeServer(customer_routes(store)) as server, FlakyClient(server.url) as client:
+        crashed = AuthSync(client, SyncCursor(path), per_page=40, workers=1).run()
+        client.fail = False
+        resumed = AuthSync(client, SyncCursor(path), per_page=40, workers=1).run()
+
+    assert (crashed["failed_pages"], crashed["next_page"]) == (1, 2)
+    assert (resumed["start_page"], resumed["failed_pages"]) == (2, 0)
+    assert len(linked_customers(store)) == sum(1 for u in store.auth_users if u["email"])
+    assert all(len(customers) == 1 for customers in linked_customers(store).values())
+
+def test_cursor_keeps_pages_finished_out_of_order(tmp_path):
+    path = str(tmp_path / "cursor.json")
+    cursor = SyncCursor(path)
+    for page in (1, 3, 4):
+        cursor.mark_done(page, {"created": 10})
+
+    reloaded = SyncCursor(path)
+    assert reloaded.start_page == 2
+    reloaded.mark_done(2, {"created": 10})
+    assert (reloaded.start_page, reloaded.totals) == (5, {"created": 40})
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from backfill_embeddings import (
     generate_text_for_embedding,
     get_embedding_from_openai,
+    get_embeddings_from_openai,
     init_clients, # We can test if it tries to load env vars
     EMBEDDING_DIMENSIONS
 )
@@ -104,6 +105,93 @@ def test_get_embedding_from_openai_dimension_mismatch(mock_openai_client):
 def test_get_embedding_from_openai_no_text():
     assert get_embedding_from_openai("") is None
 
+def _embedding_item(index, dimensions=EMBEDDING_DIMENSIONS, value=0.1):
+    item = MagicMock()
+    item.index = index
+    item.embedding = [value] * dimensions
+    return item
+
+def test_get_embeddings_from_openai_single_call_for_batch(mock_openai_client):
+    texts = ["first product", "second product", "third product"]
+    mock_openai_client.embeddings.create.return_value = MagicMock(
+        data=[_embedding_item(i, value=0.1 * (i + 1)) for i in range(len(texts))]
+    )
+
+    embeddings = get_embeddings_from_openai(texts)
+
+    assert len(embeddings) == 3
+    assert all(len(e) == EMBEDDING_DIMENSIONS for e in embeddings)
+    assert embeddings[2][0] == pytest.approx(0.3)
+    mock_openai_client.embeddings.create.assert_called_once_with(
+        input=texts,
+        model="text-embedding-ada-002"
+    )
+
+def test_get_embeddings_from_openai_out_of_order_response(mock_openai_client):
+    mock_openai_client.embeddings.create.return_value = MagicMock(
+        data=[_embedding_item(1, value=0.2), _embedding_item(0, value=0.1)]
+    )
+
+    embeddings = get_embeddings_from_openai(["a", "b"])
+
+    assert embeddings[0][0] == pytest.approx(0.1)
+    assert embeddings[1][0] == pytest.approx(0.2)
+
+def test_get_embeddings_from_openai_dimension_mismatch_only_fails_slot(mock_openai_client):
+    mock_openai_client.embeddings.create.return_value = MagicMock(
+        data=[
+            _embedding_item(0),
+            _embedding_item(1, dimensions=EMBEDDING_DIMENSIONS - 1),
+            _embedding_item(2),
+        ]
+    )
+
+    embeddings = get_embeddings_from_openai(["a", "b", "c"])
+
+    assert embeddings[0] is not None
+    assert embeddings[1] is None
+    assert embeddings[2] is not None
+
+def test_get_embeddings_from_openai_bad_item_isolated(mock_openai_client):
+    def create(input, model):
+        if "bad" in input:
+            raise Exception("Invalid input")
+        return MagicMock(data=[_embedding_item(i) for i in range(len(input))])
+
+    mock_openai_client.embeddings.create.side_effect = create
+
+    embeddings = get_embeddings_from_openai(["good 1", "bad", "good 2", "good 3"])
+
+    assert embeddings[1] is None
+    assert all(embeddings[i] is not None for i in (0, 2, 3))
+
+def test_get_embeddings_from_openai_skips_empty_texts(mock_openai_client):
+    mock_openai_client.embeddings.create.return_value = MagicMock(data=[_embedding_item(0)])
+
+    embeddings = get_embeddings_from_openai(["", "  ", "real text"])
+
+    assert embeddings[0] is None
+    assert embeddings[1] is None
+    assert embeddings[2] is not None
+    mock_openai_client.embeddings.create.assert_called_once_with(
+        input=["real text"],
+        model="text-embedding-ada-002"
+    )
+
+@patch('backfill_embeddings.EMBEDDING_BATCH_MAX_ITEMS', 2)
+def test_get_embeddings_from_openai_respects_item_limit(mock_openai_client):
+    mock_openai_client.embeddings.create.side_effect = lambda input, model: MagicMock(
+        data=[_embedding_item(i) for i in range(len(input))]
+    )
+
+    embeddings = get_embeddings_from_openai(["a", "b", "c", "d", "e"])
+
+    assert all(e is not None for e in embeddings)
+    assert mock_openai_client.embeddings.create.call_count == 3
+
+def test_get_embeddings_from_openai_empty_list():
+    assert get_embeddings_from_openai([]) == []
+
 # To test init_clients properly, we need to patch the module-level variables
 # that were set at import time, not os.environ
 
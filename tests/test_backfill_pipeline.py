@@ -0,0 +1,256 @@
+# tests/test_backfill_pipeline.py
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.pipeline import Stage, run_pipeline
+from edible_tools.rate_limit import TokenBucket, RateLimitScheduler
+import backfill_embeddings
+from backfill_embeddings import backfill_embeddings_concurrent, EMBEDDING_DIMENSIONS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)  # 1 token per second
+
+    assert bucket.try_acquire(60) == 0
+    assert bucket.try_acquire(1) == pytest.approx(1.0)
+
+    clock.now += 5
+    assert bucket.try_acquire(5) == 0
+    assert bucket.try_acquire(1) > 0
+
+def test_token_bucket_clamps_oversized_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(10, clock=clock)
+    assert bucket.try_acquire(1000) == 0
+
+def test_scheduler_waits_for_token_budget():
+    clock = FakeClock()
+    scheduler = RateLimitScheduler(600, 6000, clock=clock, sleep=clock.sleep)
+
+    scheduler.acquire(tokens=6000)
+    scheduler.acquire(tokens=3000)  # needs 30s of refill at 100 tokens/s
+
+    assert clock.now == pytest.approx(30.0)
+    assert scheduler.waited_seconds == pytest.approx(30.0)
+
+def test_scheduler_backs_off_on_rate_limit():
+    clock = FakeClock()
+    scheduler = RateLimitScheduler(
+        6000, 1_000_000, initial_backoff=2, max_backoff=8, clock=clock, sleep=clock.sleep
+    )
+
+    assert scheduler.report_rate_limited() == 2
+    assert scheduler.report_rate_limited() == 4
+    scheduler.acquire(tokens=10)
+    assert clock.now >= 4
+    assert scheduler.report_rate_limited(retry_after=3) == 3
+    scheduler.report_success()
+    assert scheduler.report_rate_limited() == 2
+    assert scheduler.rate_limited_count == 4
+
+
+def test_run_pipeline_passes_items_through_stages():
+    result = run_pipeline(
+        range(10),
+        [
+            Stage("double", lambda x: [x, x], workers=3),
+            Stage("square", lambda x: [x * x], workers=2),
+        ]
+    )
+    assert sorted(result.outputs) == sorted([x * x for x in range(10)] * 2)
+    assert result.stats["double"].processed == 10
+    assert result.stats["square"].emitted == 20
+
+def test_run_pipeline_isolates_stage_errors():
+    def explode_on_three(x):
+        if x == 3:
+            raise ValueError("boom")
+        return [x]
+
+    result = run_pipeline(range(5), [Stage("maybe", explode_on_three, workers=2)])
+
+    assert sorted(result.outputs) == [0, 1, 2, 4]
+    assert result.stats["maybe"].errors == 1
+
+def test_run_pipeline_overlaps_io_bound_stages():
+    def slow(x):
+        time.sleep(0.05)
+        return [x]
+
+    result = run_pipeline(range(20), [Stage("io", slow, workers=10)])
+
+    assert len(result.outputs) == 20
+    # Serial would take ~1s
+    assert result.elapsed_seconds < 0.5
+
+
+def _fake_supabase(rows, failures=None):
+    """`failures` maps a product id to how many RPC calls containing it should fail."""
+    client = MagicMock()
+    updates = []
+    rpc_calls = []
+    failures = dict(failures or {})
+    lock = threading.Lock()
+
+    def table(name):
+        t = MagicMock()
+        count_query = t.select.return_value.limit.return_value
+        count_query.execute.return_value = MagicMock(count=len(rows))
+
+        def page(start, end):
+            q = MagicMock()
+            q.execute.return_value = MagicMock(data=rows[start:end + 1])
+            return q
+        t.select.return_value.order.return_value.range.side_effect = page
+        return t
+
+    def rpc(name, params):
+        assert name == 'update_product_embeddings'
+        batch = params['p_updates']
+        with lock:
+            rpc_calls.append([item['id'] for item in batch])
+        call = MagicMock()
+
+        def execute():
+            with lock:
+                for item in batch:
+                    if failures.get(item['id'], 0) > 0:
+                        failures[item['id']] -= 1
+                        raise Exception("connection reset")
+                known = {row['product_id'] for row in rows}
+                ok = [item['id'] for item in batch if item['id'] in known]
+                updates.extend((item['id'], item['embedding_b64']) for item in batch if item['id'] in known)
+            return MagicMock(data={'updated': ok, 'missing': []})
+        call.execute.side_effect = execute
+        return call
+
+    client.table.side_effect = table
+    client.rpc.side_effect = rpc
+    client.rpc_calls = rpc_calls
+    return client, updates
+
+
+def _fake_openai():
+    client = MagicMock()
+
+    def create(input, model):
+        items = []
+        for i, _ in enumerate(input):
+            item = MagicMock()
+            item.index = i
+            item.embedding = [0.1] * EMBEDDING_DIMENSIONS
+            items.append(item)
+        return MagicMock(data=items)
+
+    client.embeddings.create.side_effect = create
+    return client
+
+
+def test_backfill_embeddings_concurrent_updates_every_product():
+    rows = [
+        {"product_id": f"p{i}", "product_data": {"product_info": {"name": f"Product {i}"}}}
+        for i in range(23)
+    ]
+    rows.append({"product_id": "empty", "product_data": {}})
+    supabase, updates = _fake_supabase(rows)
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase), \
+         patch.object(backfill_embeddings, 'openai_api_client', _fake_openai()):
+        stats = backfill_embeddings_concurrent(page_size=5, batch_max_items=4)
+
+    assert stats["total"] == 24
+    assert stats["embedded"] == 23
+    assert stats["skipped"] == 1
+    assert stats["failed"] == 0
+    assert sorted(pid for pid, _ in updates) == sorted(f"p{i}" for i in range(23))
+
+def test_backfill_embeddings_concurrent_retries_rate_limited_calls():
+    rows = [
+        {"product_id": f"p{i}", "product_data": {"product_info": {"name": f"Product {i}"}}}
+        for i in range(3)
+    ]
+    supabase, updates = _fake_supabase(rows)
+    openai_client = _fake_openai()
+    succeed = openai_client.embeddings.create.side_effect
+
+    rate_limited = Exception("Too many requests")
+    rate_limited.status_code = 429
+    rate_limited.response = MagicMock(headers={'retry-after': '0.01'})
+    calls = {"n": 0}
+
+    def create(input, model):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise rate_limited
+        return succeed(input=input, model=model)
+
+    openai_client.embeddings.create.side_effect = create
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase), \
+         patch.object(backfill_embeddings, 'openai_api_client', openai_client):
+        stats = backfill_embeddings_concurrent(embed_workers=1)
+
+    assert stats["embedded"] == 3
+    assert stats["rate_limited"] == 1
+    assert len(updates) == 3
+
+
+def _rows(n):
+    return [
+        {"product_id": f"p{i}", "product_data": {"product_info": {"name": f"Product {i}"}}}
+        for i in range(n)
+    ]
+
+def test_write_embeddings_batches_rpc_calls():
+    supabase, updates = _fake_supabase(_rows(7))
+    pairs = [(f"p{i}", [0.1] * EMBEDDING_DIMENSIONS) for i in range(7)]
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase):
+        written, failed = backfill_embeddings.write_embeddings(pairs, batch_size=3)
+
+    assert sorted(written) == sorted(pid for pid, _ in pairs)
+    assert failed == []
+    assert [len(call) for call in supabase.rpc_calls] == [3, 3, 1]
+
+def test_write_embeddings_retries_only_failed_rows():
+    # Fails the full batch, the [p2, p3] half and p2 alone, then recovers
+    supabase, updates = _fake_supabase(_rows(4), failures={"p2": 3})
+    pairs = [(f"p{i}", [0.1] * EMBEDDING_DIMENSIONS) for i in range(4)]
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase):
+        written, failed = backfill_embeddings.write_embeddings(pairs, batch_size=4)
+
+    assert sorted(written) == ["p0", "p1", "p2", "p3"]
+    assert failed == []
+    # Only the bad row is resent on the retry pass
+    assert supabase.rpc_calls[-1] == ["p2"]
+    assert supabase.rpc_calls.count(["p2"]) == 2
+    assert sum(call.count("p0") for call in supabase.rpc_calls) == 2
+
+def test_write_embeddings_reports_unknown_products():
+    supabase, _ = _fake_supabase(_rows(1))
+    pairs = [("p0", [0.1] * EMBEDDING_DIMENSIONS), ("ghost", [0.1] * EMBEDDING_DIMENSIONS)]
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase):
+        written, failed = backfill_embeddings.write_embeddings(pairs)
+
+    assert written == ["p0"]
+    assert failed == ["ghost"]
+    assert len(supabase.rpc_calls) == 1
@@ -0,0 +1,106 @@
+# tests/test_catalog_index.py
+import math
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+from edible_tools.catalog_index import CatalogIndex, occasion_key
+from edible_tools.local_edge import sample_search_engine
+from edible_tools.product_search import ProductSearchEngine, price_bounds
+
+
+def make_rows():
+    rng = np.random.default_rng(0)
+    categories = ["Birthday", "Mother's Day", "Thank You", "Love & Romance"]
+    ingredients = ["nuts", "dairy", "gluten", "soy", "Chocolate"]
+    rows = []
+    for i in range(200):
+        rows.append({
+            "product_id": f"p{i}",
+            "product_data": {
+                "product_info": {"product_identifier": str(3000 + i),
+                                 "base_price": None if i % 37 == 0 else round(float(rng.uniform(10, 200)), 2)},
+                "categories": [{"name": c} for c in rng.choice(categories, rng.integers(0, 3), replace=False)],
+                "ingredients": list(rng.choice(ingredients, rng.integers(0, 3), replace=False)),
+            },
+        })
+    return rows
+
+@pytest.fixture(scope="module")
+def sample_engine():
+    return sample_search_engine()
+
+def test_occasion_key():
+    assert occasion_key("Mother's Day") == occasion_key("mothers day") == "mothers-day"
+    assert occasion_key("Love & Romance") == "love-romance"
+
+def test_masks_match_brute_force():
+    rows = make_rows()
+    index = CatalogIndex(rows)
+    prices = [row["product_data"]["product_info"]["base_price"] for row in rows]
+
+    for low, high in [(-math.inf, 75), (50, 100), (100, math.inf), (60, 40)]:
+        expected = [p is not None and low <= p <= high for p in prices]
+        assert index.price_mask(low, high).tolist() == expected
+    assert index.price_mask().all()
+
+    names = [{c["name"] for c in row["product_data"]["categories"]} for row in rows]
+    assert index.category_mask(["Birthday", "Thank You"]).tolist() == [
+        bool(n & {"Birthday", "Thank You"}) for n in names]
+    assert index.occasion_mask("mothers-day").tolist() == ["Mother's Day" in n for n in names]
+    assert not index.occasion_mask("graduation").any()
+    assert index.ingredient_mask({"nuts"}).tolist() == [
+        "nuts" in row["product_data"]["ingredients"] for row in rows]
+
+def test_filter_mask_keeps_edge_function_semantics():
+    rows = make_rows()
+    engine = ProductSearchEngine(rows, {}, 8)
+    for request in [{"maxPrice": 75, "occasion": "Mothers Day"}, {"priceRange": "mid"}, {}]:
+        low, high = price_bounds(request)
+        expected = [
+            (low == -math.inf and high == math.inf)
+            or (p is not None and low <= p <= high)
+            for p in (row["product_data"]["product_info"]["base_price"] for row in rows)
+        ]
+        if request.get("occasion"):
+            expected = [e and "Mother's Day" in {c["name"] for c in row["product_data"]["categories"]}
+                        for e, row in zip(expected, rows)]
+        assert engine.filter_mask(request).tolist() == expected
+
+def test_hybrid_query_answers_in_one_pass(sample_engine):
+    request = {"query": "elegant gift for mother", "maxPrice": 75,
+               "occasion": "mothers-day", "semanticBoost": True}
+
+    result = sample_engine.hybrid_search(request)
+
+    assert result["count"] > 0
+    assert result["searchMethod"] == "semantic_boost_prefiltered"
+    mothers_day = {row["product_id"] for row in sample_engine.rows
+                   if any(occasion_key(c["name"]) == "mothers-day"
+                          for c in row["product_data"]["categories"])}
+    by_name = {row["product_data"]["product_info"]["name"]: row["product_id"] for row in sample_engine.rows}
+    for product in result["products"]:
+        assert by_name[product["name"]] in mothers_day
+        assert float(product["price"].lstrip("$")) <= 75
+
+def test_hybrid_applies_allergens_and_inventory_before_truncating():
+    rows = make_rows()
+    in_stock = {row["product_id"] for row in rows[::2]}
+    engine = ProductSearchEngine(rows, {}, 8, inventory={"store": in_stock})
+    request = {"allergens": ["Nuts"], "franchiseeId": "store", "maxResults": 10}
+
+    post_filtered = engine.search(request)
+    prefiltered = engine.hybrid_search(request)
+
+    # The edge function filters after taking max_results rows, so it can come up short
+    assert post_filtered["count"] < 10
+    assert prefiltered["count"] == 10
+    assert prefiltered["searchMethod"] == "structured_prefiltered"
+    by_id = {row["product_data"]["product_info"]["product_identifier"]: row for row in rows}
+    for product in prefiltered["products"]:
+        row = by_id[str(product["productId"])]
+        assert row["product_id"] in in_stock
+        assert "nuts" not in row["product_data"]["ingredients"]
@@ -0,0 +1,97 @@
+# tests/test_catalog_ingest.py
+import csv
+import io
+import itertools
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.catalog_ingest import (
+    PROCESSED,
+    SHOPIFY,
+    detect_format,
+    iter_catalog,
+    iter_products,
+    iter_rows,
+    parse_price,
+)
+from backfill_embeddings import generate_text_for_embedding
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', 'samples')
+
+
+def _sample(name):
+    return os.path.join(SAMPLES, name)
+
+
+def test_detect_format():
+    assert detect_format("Handle;Title;Body (HTML)\n") == (SHOPIFY, ";")
+    assert detect_format("original_web_scraper_order,source_product_code\n") == (PROCESSED, ",")
+
+def test_parse_price():
+    assert parse_price("$1,114.98") == 1114.98
+    assert parse_price("99.99") == 99.99
+    assert parse_price("") is None
+
+def test_scraper_export_groups_options_by_product_code():
+    products = list(iter_catalog(_sample("Edible-new-for-the-season.csv")))
+
+    assert len(products) == 105
+    first = products[0]
+    assert first["product_info"]["product_identifier"] == "9144"
+    assert first["product_info"]["base_price"] == "99.99"
+    assert [o["option_name"] for o in first["options"]] == ["Single with Clear Vase", "Single Bouquet"]
+    assert first["options"][0]["price"] == "114.98"
+    assert "White Chocolate Molded Letter A" in first["ingredients"]
+
+def test_processed_export_matches_scraper_products():
+    scraped = list(iter_catalog(_sample("Edible-new-for-the-season.csv")))
+    processed = list(iter_catalog(_sample("processed_new_for_the_season_options.csv")))
+
+    assert [p["product_info"]["product_identifier"] for p in processed] == \
+        [p["product_info"]["product_identifier"] for p in scraped]
+    assert processed[0]["options"][0]["description"].endswith("'Single with Clear Vase' option.")
+    assert any(p["allergens"] for p in processed)
+
+def test_shopify_export_groups_by_handle():
+    products = list(iter_catalog(_sample("Formatted2_mothersday.csv"), ["Mother's Day"]))
+
+    assert len(products) == 40
+    by_code = {p["product_info"]["product_identifier"]: p for p in products}
+    deluxe = by_code["6444"]
+    assert deluxe["product_info"]["name"] == "Mother's Day Deluxe Celebration Arrangement"
+    assert [o["option_name"] for o in deluxe["options"]] == ["Janes Garden", "Modern Mosaic"]
+    assert by_code["3075"]["options"] == []
+    assert deluxe["categories"] == [{"name": "Mother's Day", "type": "occasion"}]
+
+    text = generate_text_for_embedding(deluxe)
+    assert "Categories: Mother's Day" in text
+    assert "Option: Janes Garden" in text
+
+def test_single_variant_shopify_product_keeps_its_price():
+    products = list(iter_catalog(_sample("Formatted2_mothersday.csv"), ["Mother's Day"]))
+    by_code = {p["product_info"]["product_identifier"]: p for p in products}
+
+    # product-code-3075 has no option values, only its own Variant Price
+    assert by_code["3075"]["options"] == []
+    assert by_code["3075"]["product_info"]["base_price"] == "49.99"
+    # Products with priced options still take the cheapest option
+    deluxe = by_code["6444"]
+    assert float(deluxe["product_info"]["base_price"]) == min(float(o["price"]) for o in deluxe["options"])
+
+def test_products_stream_without_reading_the_whole_input():
+    header = "Handle;Title;Option1 Value;Variant Price\n"
+
+    def endless():
+        for i in itertools.count():
+            yield f"product-code-{i};Item {i};Small;$10.00\n"
+            yield f"product-code-{i};;Large;$20.00\n"
+
+    catalog_format, _ = iter_rows(io.StringIO(header))
+    rows = csv.DictReader(endless(), fieldnames=header.strip().split(";"), delimiter=";")
+
+    products = list(itertools.islice(iter_products(rows, catalog_format), 3))
+
+    assert [p["product_info"]["product_identifier"] for p in products] == ["0", "1", "2"]
+    assert products[0]["product_info"]["base_price"] == "10.00"
+    assert [o["price"] for o in products[2]["options"]] == ["10.00", "20.00"]
@@ -0,0 +1,107 @@
+# tests/test_catalog_process.py
+import json
+import numpy as np
+from unittest.mock import MagicMock, patch
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.catalog_ingest import iter_catalog
+from edible_tools.catalog_process import (
+    analyze_ingredients,
+    process_catalog,
+    split_file,
+    write_processed_csv,
+)
+import backfill_embeddings
+
+SAMPLES = os.path.join(os.path.dirname(__file__), '..', 'samples')
+SAMPLE_FILES = [
+    os.path.join(SAMPLES, name)
+    for name in ("Edible-new-for-the-season.csv", "Formatted2_mothersday.csv",
+                 "processed_new_for_the_season_options.csv")
+]
+
+
+def test_split_file_lands_on_row_boundaries(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        "web-scraper-order,product_id,item_name,item_description,item_option,item_price\n"
+        + "".join(
+            f'"{i}","Product Code: {1000 + i // 2}","Item","line one\nline two, ""quoted""",'
+            f'"Option {i}","$1{i}.00"\n'
+            for i in range(40)
+        )
+    )
+
+    chunks = split_file(str(path), chunk_bytes=200)
+
+    assert len(chunks) > 5
+    data = path.read_bytes()
+    for chunk in chunks:
+        assert data[chunk.start - 1:chunk.start] == b"\n"
+        assert data[chunk.start:chunk.end].count(b'"') % 2 == 0
+    assert chunks[-1].end == len(data)
+
+    products = process_catalog([str(path)], workers=2, chunk_bytes=200)
+    assert [p["product_info"]["product_identifier"] for p in products] == \
+        [str(1000 + i) for i in range(20)]
+    assert all(len(p["options"]) == 2 for p in products)
+
+def test_parallel_run_matches_serial_run():
+    serial = process_catalog(SAMPLE_FILES, workers=1)
+    parallel = process_catalog(SAMPLE_FILES, workers=3, chunk_bytes=20_000)
+
+    assert len(serial) == 250
+    assert json.dumps(parallel) == json.dumps(serial)
+
+def test_results_match_the_streaming_ingester_apart_from_allergens():
+    processed = process_catalog(SAMPLE_FILES, workers=2, chunk_bytes=50_000)
+    streamed = [p for path in SAMPLE_FILES for p in iter_catalog(path)]
+
+    for a, b in zip(processed, streamed):
+        assert {**a, "allergens": [], "allergen_mask": 0} == {**b, "allergens": [], "allergen_mask": 0}
+
+def test_analyze_ingredients_guesses_nut_allergens():
+    analyzed = analyze_ingredients(["Peanut Butter Cups", "Caramel Pecan Patties", "Pineapple"])
+    assert [item["is_allergen_guess"] for item in analyzed] == [True, True, False]
+
+def test_processed_csv_round_trips(tmp_path):
+    products = process_catalog(SAMPLE_FILES[1:2], workers=1)
+    out = tmp_path / "processed.csv"
+
+    write_processed_csv(products, str(out))
+    reread = list(iter_catalog(str(out)))
+
+    assert [p["product_info"]["product_identifier"] for p in reread] == \
+        [p["product_info"]["product_identifier"] for p in products]
+    assert [o["option_name"] for o in reread[2]["options"]] == \
+        [o["option_name"] for o in products[2]["options"]]
+
+def test_backfill_catalog_embeddings_writes_matching_products():
+    products = process_catalog(SAMPLE_FILES[1:2], workers=1)[:3]
+    codes = [p["product_info"]["product_identifier"] for p in products]
+    supabase = MagicMock()
+    lookup = supabase.table.return_value.select.return_value.in_.return_value
+    lookup.execute.return_value = MagicMock(data=[
+        {"id": "uuid-a", "product_identifier": int(codes[0])},
+        {"id": "uuid-b", "product_identifier": int(codes[2])},
+    ])
+    written = []
+
+    def rpc(name, params):
+        written.extend(item["id"] for item in params["p_updates"])
+        return MagicMock(execute=MagicMock(return_value=MagicMock(
+            data={"updated": [item["id"] for item in params["p_updates"]]}
+        )))
+    supabase.rpc.side_effect = rpc
+    vector = np.ones(backfill_embeddings.EMBEDDING_DIMENSIONS, dtype=np.float32)
+
+    with patch.object(backfill_embeddings, 'supabase_client', supabase), \
+         patch.object(backfill_embeddings, 'get_embeddings_cached',
+                      side_effect=lambda texts, cache: [vector] * len(texts)):
+        stats = backfill_embeddings.backfill_catalog_embeddings(products)
+
+    assert written == ["uuid-a", "uuid-b"]
+    assert stats["embedded"] == 2
+    assert stats["skipped"] == 1
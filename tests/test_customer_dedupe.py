@@ -0,0 +1,98 @@
+# tests/test_customer_dedupe.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.customer_dedupe import (
+    DedupeJob,
+    DuplicateIndex,
+    check_merge_pair,
+    merge_pairs,
+    normalize_email,
+    normalize_phone,
+    synthetic_customers,
+)
+from edible_tools.edge_client import EdgeClient
+from edible_tools.local_edge import LocalEdgeServer
+from edible_tools.local_services import LocalStore, customer_routes
+from edible_tools.product_search import ProductSearchEngine
+
+
+def customer(id, phone=None, email=None, first=None, last=None, auth=None, created="2025-01-01"):
+    return {"id": id, "phone": phone, "email": email, "first_name": first, "last_name": last,
+            "auth_user_id": auth, "created_at": created}
+
+def test_normalizes_phones_and_emails_for_blocking():
+    assert {normalize_phone(p) for p in ("(619) 555-0123", "619.555.0123", "+1 619 555 0123",
+                                         "16195550123")} == {"+16195550123"}
+    assert normalize_phone("+33 7 81 65 58 01") == "+33781655801"
+    assert normalize_phone("555-0123") is None
+    assert normalize_email(" Marcel@Example.COM ") == "marcel@example.com"
+    assert normalize_email("chatbot_1749389420045@temp.local") is None
+    assert normalize_email("archived_abc_marcel@example.com") is None
+
+def test_groups_accounts_sharing_a_phone_or_email_transitively():
+    index = DuplicateIndex()
+    for row in [
+        customer("a", "+16195550123", "chatbot_1@temp.local"),
+        customer("b", "(619) 555-0123", "Marcel@example.com", "Marcel", auth="user-1", created="2025-03-01"),
+        customer("c", None, "marcel@EXAMPLE.com"),
+        customer("d", "+16195550999", "chatbot_2@temp.local"),
+        customer("e", "+16195550999", "archived_x_old@example.com"),
+        customer("f", "+12135550100", "chatbot_3@temp.local"),
+        customer("g", "+12135550111", "chatbot_3@temp.local"),
+    ]:
+        index.add(row)
+
+    groups = index.groups()
+    # Temp emails are not identities, archived accounts are ignored
+    assert [[c["id"] for c in group] for group in groups] == [["b", "c", "a"]]
+
+def test_members_linked_only_through_another_member_are_not_merged_into_the_primary():
+    x = customer("x", "+16195550001", "x@example.com", auth="user-x")
+    y = customer("y", "+16195550002", "X@example.com")
+    z = customer("z", "+16195550002", "zed@example.com")
+    index = DuplicateIndex()
+    for row in (x, y, z):
+        index.add(row)
+
+    (group,) = index.groups()
+    assert [c["id"] for c in group] == ["x", "y", "z"]
+    # The RPC's rules alone would allow it: the pairing has to keep z out
+    assert check_merge_pair(x, z)["can_merge"]
+    assert merge_pairs(group) == [{"primary_id": "x", "secondary_id": "y"}]
+    assert DedupeJob(client=None).batches([group]) == [[{"primary_id": "x", "secondary_id": "y"}]]
+
+def test_batches_keep_groups_whole():
+    groups = [[customer(f"{g}-{i}", f"+1619555{g:04d}") for i in range(size)]
+              for g, size in enumerate([4, 3, 3, 2])]
+    job = DedupeJob(client=None, batch_size=5)
+
+    batches = job.batches(groups)
+
+    assert [len(batch) for batch in batches] == [5, 3]
+    assert {pair["primary_id"] for pair in batches[0]} == {"0-0", "1-0"}
+
+def test_dry_run_reports_and_apply_merges_over_http():
+    store = LocalStore(ProductSearchEngine([], {}, 8))
+    store.load_customers(synthetic_customers(600, seed=3) + [
+        customer("11111111-0000-0000-0000-000000000001", "+14155550100", "jo@example.com", "Jo"),
+        customer("11111111-0000-0000-0000-000000000002", "(415) 555-0100", "chatbot_9@temp.local", "Jo"),
+    ])
+    store.orders["o-1"] = {"id": "o-1", "customer_id": "11111111-0000-0000-0000-000000000002"}
+    before = {k: dict(v) for k, v in store.customers.items()}
+
+    with LocalEdgeServer(customer_routes(store)) as server, EdgeClient(server.url, pool_size=4) as client:
+        dry = DedupeJob(client, batch_size=40, page_size=128).run()
+        assert store.customers == before
+        applied = DedupeJob(client, dry_run=False, batch_size=40, page_size=128).run()
+        again = DedupeJob(client, dry_run=False, page_size=128).run()
+
+    assert dry["pages"] == applied["pages"] == -(-len(before) // 128)
+    assert dry["groups"] > 100 and dry["errors"] == 0
+    assert dry["mergeable"] == applied["merged"]
+    assert dry["skipped"] == applied["skipped"] and set(dry["skipped"]) == {"name_mismatch"}
+    assert store.orders["o-1"]["customer_id"] == "11111111-0000-0000-0000-000000000001"
+    assert store.customers["11111111-0000-0000-0000-000000000002"]["email"].startswith("archived_")
+    # Only the pairs that were refused are left
+    assert again["groups"] == sum(dry["skipped"].values()) and again["merged"] == 0
@@ -0,0 +1,96 @@
+# tests/test_edge_client.py
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+import requests
+
+from edible_tools.edge_client import EdgeClient, endpoint_name, shared_client
+from edible_tools.local_edge import LocalEdgeServer
+
+
+def make_server(statuses=None):
+    """Server whose "flaky" route answers with `statuses` in turn, then 200."""
+    seen = {"threads": set(), "headers": [], "calls": 0}
+    statuses = list(statuses or [])
+
+    def echo(request):
+        # ThreadingHTTPServer runs one thread per connection
+        seen["threads"].add(threading.get_ident())
+        seen["headers"].append(request.headers)
+        return 200, {"method": request.method, "body": request.body, "query": request.query}
+
+    def flaky(request):
+        seen["calls"] += 1
+        return (statuses.pop(0) if statuses else 200), {"call": seen["calls"]}
+
+    return LocalEdgeServer({"echo": echo, "flaky": flaky}), seen
+
+def test_endpoint_name():
+    assert endpoint_name("functions/v1/franchisee-inventory/find-nearest") == "franchisee-inventory"
+    assert endpoint_name("http://x/rest/v1/rpc/merge_customer_accounts") == "rpc/merge_customer_accounts"
+    assert endpoint_name("/rest/v1/customers?phone=eq.1") == "rest/customers"
+
+def test_reuses_one_connection_and_shared_headers():
+    server, seen = make_server()
+    with server, EdgeClient(server.url, "key") as client:
+        for i in range(5):
+            response = client.post_function("echo", {"i": i})
+            assert response.json()["body"] == {"i": i}
+        assert client.get(f"{server.url}/functions/v1/echo", params={"a": "1"}).json()["query"] == {"a": "1"}
+
+    assert len(seen["threads"]) == 1
+    assert all(h["authorization"] == "Bearer key" and h["apikey"] == "key" for h in seen["headers"])
+
+def test_retries_idempotent_requests_with_backoff():
+    server, seen = make_server([503, 502])
+    delays = []
+    with server, EdgeClient(server.url, retries=2, sleep=delays.append) as client:
+        response = client.get_function("flaky")
+
+        assert response.status_code == 200
+        assert seen["calls"] == 3
+        assert len(delays) == 2 and all(0 <= d <= 0.5 for d in delays)
+        assert client.timing_summary()["flaky"]["retries"] == 2
+
+def test_post_only_retries_when_not_processed():
+    server, seen = make_server([502, 503])
+    with server, EdgeClient(server.url, retries=3, sleep=lambda s: None) as client:
+        # A 502 may have reached the function, so the order is not resent
+        assert client.post_function("flaky", {}).status_code == 502
+        assert seen["calls"] == 1
+        assert client.post_function("flaky", {}).status_code == 200
+        assert seen["calls"] == 3
+
+def test_connection_errors_raise_after_retries_and_are_recorded():
+    client = EdgeClient("http://127.0.0.1:9", retries=1, sleep=lambda s: None, timeout=1)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get_function("product-search")
+    timing = client.timings[-1]
+    assert timing.attempts == 2
+    assert timing.error == "ConnectionError"
+    assert client.timing_summary()["product-search"]["errors"] == 1
+
+def test_per_endpoint_timeouts(monkeypatch):
+    client = EdgeClient("http://edge", timeout=30, timeouts={"order": 5})
+    used = []
+
+    def fake_request(method, url, **kwargs):
+        used.append(kwargs["timeout"])
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    client.post_function("order", {})
+    client.post_function("product-search", {})
+    client.rpc("detect_phone_duplicates", {}, timeout=2)
+
+    assert used == [5, 30, 2]
+
+def test_shared_client_is_reused():
+    assert shared_client("http://edge/", "k") is shared_client("http://edge", "k")
+    assert shared_client("http://edge", "k") is not shared_client("http://edge", "other")
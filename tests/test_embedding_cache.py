@@ -0,0 +1,122 @@
+# tests/test_embedding_cache.py
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.embedding_cache import EmbeddingCache, embedding_cache_key
+import backfill_embeddings
+from backfill_embeddings import (
+    backfill_embeddings as run_backfill,
+    content_hash,
+    get_embeddings_cached,
+    EMBEDDING_DIMENSIONS,
+)
+
+
+class Tick:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+def test_cache_key_depends_on_model_dimensions_and_text():
+    base = embedding_cache_key("text-embedding-ada-002", 1536, "Berry Bouquet")
+    assert base == embedding_cache_key("text-embedding-ada-002", 1536, "Berry Bouquet")
+    assert base != embedding_cache_key("text-embedding-3-small", 1536, "Berry Bouquet")
+    assert base != embedding_cache_key("text-embedding-ada-002", 512, "Berry Bouquet")
+    assert base != embedding_cache_key("text-embedding-ada-002", 1536, "Berry Bouquet!")
+
+def test_cache_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put("k1", [0.5, -0.25, 1.0])
+
+    assert cache.get("k1").tolist() == [0.5, -0.25, 1.0]
+    assert cache.get("missing") is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = EmbeddingCache(path)
+    first.put("k1", [0.25])
+    first.set_product_hashes({"p1": "hash-1"})
+    first.close()
+
+    second = EmbeddingCache(path)
+    assert second.get("k1").tolist() == [0.25]
+    assert second.get_product_hash("p1") == "hash-1"
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=2, clock=Tick())
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")          # "b" is now the least recently used
+    cache.put("c", [3.0])
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a").tolist() == [1.0]
+    assert cache.get("c").tolist() == [3.0]
+
+
+@pytest.fixture
+def mock_openai_client():
+    with patch('backfill_embeddings.openai_api_client') as mock_client:
+        def create(input, model):
+            items = []
+            for i, _ in enumerate(input):
+                item = MagicMock()
+                item.index = i
+                item.embedding = [0.5] * EMBEDDING_DIMENSIONS
+                items.append(item)
+            return MagicMock(data=items)
+        mock_client.embeddings.create.side_effect = create
+        yield mock_client
+
+def test_get_embeddings_cached_only_sends_misses(mock_openai_client):
+    cache = EmbeddingCache(":memory:")
+    cache.put(content_hash("known text"), [0.25] * EMBEDDING_DIMENSIONS)
+
+    embeddings = get_embeddings_cached(["known text", "new text"], cache)
+
+    assert embeddings[0][0] == 0.25
+    assert embeddings[1][0] == 0.5
+    mock_openai_client.embeddings.create.assert_called_once_with(
+        input=["new text"],
+        model="text-embedding-ada-002"
+    )
+    assert cache.get(content_hash("new text")) is not None
+
+def _supabase_with_rows(rows):
+    client = MagicMock()
+    flat = client.table.return_value.select.return_value.order.return_value.range.return_value
+    flat.execute.return_value = MagicMock(data=rows)
+
+    def rpc(name, params):
+        ids = [item['id'] for item in params['p_updates']]
+        return MagicMock(execute=MagicMock(return_value=MagicMock(data={'updated': ids})))
+    client.rpc.side_effect = rpc
+    return client
+
+def test_backfill_only_changed_skips_unchanged_products(mock_openai_client):
+    rows = [
+        {"product_id": "p1", "product_data": {"product_info": {"name": "Berry Box"}}},
+        {"product_id": "p2", "product_data": {"product_info": {"name": "Mango Bouquet"}}},
+    ]
+    cache = EmbeddingCache(":memory:")
+
+    with patch.object(backfill_embeddings, 'supabase_client', _supabase_with_rows(rows)):
+        first = run_backfill(cache=cache, only_changed=True)
+        assert first["embedded"] == 2
+
+        rows[1]["product_data"]["product_info"]["name"] = "Mango Bouquet Deluxe"
+        second = run_backfill(cache=cache, only_changed=True)
+
+    assert second["unchanged"] == 1
+    assert second["embedded"] == 1
+    assert mock_openai_client.embeddings.create.call_count == 2
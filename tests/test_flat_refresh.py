@@ -0,0 +1,170 @@
+# tests/test_flat_refresh.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.flat_refresh import (
+    ALL_ROWS, FLAT_TABLES, FlatRefresher, MemoryTables, RestTables, build_product_data, synthetic_tables,
+)
+
+
+def make_db():
+    db = MemoryTables(synthetic_tables(60, stores=3, customers=20, orders=40))
+    FlatRefresher(db, batch_size=16, workers=2).rebuild()
+    for queue in db.queue.values():
+        queue.clear()
+    return db
+
+def test_builds_the_shape_the_functions_read():
+    data = build_product_data({
+        "id": "p1", "product_identifier": 3075, "name": "Berry Bouquet", "base_price": 49.99,
+        "product_options": [{"id": "o2", "option_name": "Large", "price": 64.99},
+                            {"id": "o1", "option_name": "Gone", "price": 1, "is_available": False}],
+        "product_categories": [{"categories": {"name": "Birthday", "type": "occasion"}}],
+        "product_ingredients": [{"ingredients": {"name": "strawberry", "is_allergen": False}},
+                                {"ingredients": {"name": "peanut", "is_allergen": True}}],
+    }, [{"id": "a1", "name": "Balloon", "price": 7.99}])
+
+    assert data["product_info"]["product_identifier"] == "3075"
+    assert data["product_info"]["base_price"] == "49.99"
+    assert data["options"] == [{"id": "o2", "option_name": "Large", "price": "64.99",
+                                "description": None, "image_url": None}]
+    assert data["ingredients"] == ["peanut", "strawberry"] and data["allergens"] == ["peanut"]
+    assert data["allergen_mask"] != 0
+    assert data["addons"] == [{"id": "a1", "name": "Balloon", "price": "7.99"}]
+
+def test_refresh_rebuilds_only_queued_rows():
+    db = make_db()
+    product = next(iter(db.tables["products"].values()))
+    stock = next(iter(db.tables["inventory"].values()))
+    order = next(iter(db.tables["orders"].values()))
+
+    db.write("products", {**product, "base_price": 12.5})
+    db.write("inventory", {**stock, "quantity_available": 999})
+    db.write("orders", {**order, "status": "shipped"})
+    report = FlatRefresher(db, batch_size=16, workers=2).refresh()
+
+    assert report["chatbot_products_flat"]["upserted"] == 1
+    assert report["chatbot_franchisees_flat"]["upserted"] == 1
+    assert report["chatbot_orders_flat"]["upserted"] == 1
+    # The order's customer carries it in their order history
+    assert report["chatbot_customers_flat"]["upserted"] == 1
+    assert db.flat["chatbot_products_flat"][product["id"]]["product_data"]["product_info"]["base_price"] == "12.50"
+    assert db.flat["chatbot_franchisees_flat"][stock["franchisee_id"]]["franchisee_data"]["inventory"][
+        stock["product_id"]] == 999
+    history = db.flat["chatbot_customers_flat"][order["customer_id"]]["customer_data"]["order_history"]
+    assert {"order_id": order["id"], "status": "shipped"}.items() <= \
+        next(h for h in history if h["order_id"] == order["id"]).items()
+    assert all(not queue for queue in db.queue.values())
+
+def test_links_deletes_and_addons_reach_their_rows():
+    db = make_db()
+    category = next(iter(db.tables["categories"].values()))
+    linked = {link["product_id"] for link in db.tables["product_categories"].values()
+              if link["category_id"] == category["id"]}
+    db.write("categories", {**category, "name": "Celebration"})
+    assert set(db.queue["chatbot_products_flat"]) == linked
+
+    order = next(iter(db.tables["orders"].values()))
+    db.remove("orders", order)
+    db.write("addons", {"id": "new-addon", "name": "Teddy Bear", "price": 12.0, "is_active": True})
+    assert ALL_ROWS in db.queue["chatbot_products_flat"]
+
+    report = FlatRefresher(db, batch_size=16, workers=2).refresh()
+
+    assert report["chatbot_products_flat"]["full_rebuild"]
+    assert report["chatbot_orders_flat"]["deleted"] == 1
+    assert order["id"] not in db.flat["chatbot_orders_flat"]
+    rows = db.flat["chatbot_products_flat"].values()
+    assert all("Teddy Bear" in [a["name"] for a in row["product_data"]["addons"]] for row in rows)
+    assert all(not queue for queue in db.queue.values())
+
+def test_entries_queued_again_during_a_pass_stay_queued():
+    db = make_db()
+    product = next(iter(db.tables["products"].values()))
+    flat = FLAT_TABLES["chatbot_products_flat"]
+    db.write("products", {**product, "name": "First"})
+    entries = db.pending(flat, 10)
+    db.write("products", {**product, "name": "Second"})
+
+    db.ack(flat, entries)
+
+    assert list(db.queue["chatbot_products_flat"]) == [product["id"]]
+
+def test_addon_change_just_before_the_queue_read_is_not_lost():
+    class RacingTables(MemoryTables):
+        raced = False
+
+        def pending(self, flat, limit):
+            if flat.name == "chatbot_products_flat" and not self.raced:
+                self.raced = True
+                # Lands after any earlier read of addons, before the queue read
+                self.write("addons", {"id": "late", "name": "Late Addon", "price": 3.0, "is_active": True})
+            return super().pending(flat, limit)
+
+    db = RacingTables(synthetic_tables(30, stores=2, customers=5, orders=5))
+    FlatRefresher(db, batch_size=16, workers=2).refresh()
+
+    rows = db.flat["chatbot_products_flat"].values()
+    assert rows and all("Late Addon" in [a["name"] for a in row["product_data"]["addons"]] for row in rows)
+    assert not db.queue["chatbot_products_flat"]
+
+def test_check_finds_and_fixes_drift():
+    db = make_db()
+    refresher = FlatRefresher(db, batch_size=16, workers=2)
+    assert all(r["missing"] + r["stale"] + r["orphaned"] == 0
+               for name, r in refresher.check().items() if name != "elapsed_s")
+
+    products = db.flat["chatbot_products_flat"]
+    stale, missing = list(products)[:2]
+    products[stale]["product_data"]["product_info"]["base_price"] = "0.01"
+    del products[missing]
+    products["orphan"] = {"product_id": "orphan", "product_data": {}}
+    # A change the triggers never saw, e.g. a bulk load with triggers disabled
+    store = next(iter(db.tables["franchisees"].values()))
+    store["phone"] = "+15559999999"
+
+    report = refresher.check(fix=True)
+
+    assert report["chatbot_products_flat"]["stale"] == 1
+    assert report["chatbot_products_flat"]["missing"] == 1
+    assert report["chatbot_products_flat"]["sample"]["orphaned"] == ["orphan"]
+    assert report["chatbot_franchisees_flat"]["sample"]["stale"] == [store["id"]]
+    assert all(r["missing"] + r["stale"] + r["orphaned"] == 0
+               for name, r in refresher.check().items() if name != "elapsed_s")
+
+def test_rest_tables_batch_requests():
+    calls = []
+
+    class Response:
+        def __init__(self, payload):
+            self.payload = payload
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.payload
+
+    class Client:
+        def get(self, path, params):
+            calls.append(("GET", path, params))
+            return Response([{"id": "a", "product_identifier": 1}])
+
+        def post(self, path, params, json, headers):
+            calls.append(("POST", path, params, len(json)))
+            return Response(None)
+
+        def rpc(self, name, params):
+            calls.append(("RPC", name, len(params["p_entries"])))
+            return Response({"acknowledged": len(params["p_entries"])})
+
+    db = RestTables(Client())
+    flat = FLAT_TABLES["chatbot_products_flat"]
+    db.fetch_sources(flat, [f"id-{i}" for i in range(450)])
+    db.upsert(flat, [{"product_id": "a", "product_data": {}}] * 3)
+    db.ack(flat, [{"entity_id": "a", "queued_at": "2025-07-07T00:00:00+00:00"}])
+
+    assert [c[0] for c in calls] == ["GET", "GET", "GET", "POST", "RPC"]
+    assert calls[0][2]["select"] == flat.select and calls[0][2]["id"].startswith('in.("id-0"')
+    assert calls[3][2] == {"on_conflict": "product_id"}
@@ -0,0 +1,78 @@
+# tests/test_load_test.py
+import asyncio
+import json
+import random
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.load_test import (
+    StepStats,
+    arrival_offsets,
+    histogram,
+    is_saturated,
+    local_target,
+    main,
+    run_load_test,
+)
+
+
+def test_histogram_buckets():
+    counts = histogram([0.5, 1.0, 1.5, 30, 30, 20000])
+
+    assert counts == {"≤1 ms": 2, "≤2 ms": 1, "≤50 ms": 2, ">10000 ms": 1}
+
+def test_step_stats_error_rate_and_kinds():
+    stats = StepStats()
+    for ms in (10, 20, 30):
+        stats.record(ms)
+    stats.record(5, "http_500")
+
+    summary = stats.summary()
+    assert summary["requests"] == 4
+    assert summary["error_rate"] == 0.25
+    assert summary["error_kinds"] == {"http_500": 1}
+    assert summary["p50_ms"] == 20
+
+def test_arrival_offsets():
+    constant = arrival_offsets(4, 1.0, "constant")
+    assert constant == [0.25, 0.5, 0.75]
+
+    poisson = arrival_offsets(50, 10.0, "poisson", random.Random(7))
+    assert all(0 < t < 10 for t in poisson)
+    assert poisson == sorted(poisson)
+    assert 400 < len(poisson) < 600
+
+def test_is_saturated_reasons():
+    def stage(error_rate=0.0, p95=100.0, completed=10, offered=10):
+        return {"offered": offered, "completed": completed,
+                "steps": {"flow": {"error_rate": error_rate, "p95_ms": p95}}}
+
+    assert is_saturated(stage()) == []
+    assert len(is_saturated(stage(error_rate=0.5))) == 1
+    assert len(is_saturated(stage(p95=5000))) == 1
+    assert len(is_saturated(stage(completed=5))) == 1
+    assert len(is_saturated(stage(error_rate=0.5, p95=5000, completed=5))) == 3
+
+def test_flow_against_local_stand_in():
+    with local_target() as url:
+        report = asyncio.run(run_load_test(url, [20], duration=0.5, arrivals="constant", seed=1))
+
+    stage = report["stages"][0]
+    assert stage["offered"] == 9
+    assert stage["completed"] == 9
+    for step in ("search", "customer", "find_store", "order", "flow"):
+        assert stage["steps"][step]["requests"] == 9
+        assert stage["steps"][step]["errors"] == 0
+    assert report["saturation"] is None
+
+def test_unreachable_target_reports_saturation(tmp_path):
+    out = tmp_path / "load.json"
+
+    assert main(["--target", "http://127.0.0.1:9", "--rate", "10", "--duration", "0.3",
+                 "--arrivals", "constant", "--timeout", "1", "--out", str(out)]) == 0
+
+    report = json.loads(out.read_text())
+    assert report["saturation"]["rate"] == 10
+    assert report["stages"][0]["steps"]["search"]["error_rate"] == 1.0
+    assert report["stages"][0]["steps"]["order"]["requests"] == 0
@@ -0,0 +1,93 @@
+# tests/test_local_services.py
+import numpy as np
+import requests
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.local_edge import LocalRequest, sample_search_engine
+from edible_tools.local_services import LocalStore, ordering_routes
+
+ENGINE = sample_search_engine(dimensions=64)
+
+
+def make_routes():
+    return ordering_routes(LocalStore(ENGINE))
+
+def post(handler, body, path="/functions/v1/x"):
+    return handler(LocalRequest("POST", path, body=body))
+
+def test_customer_management_creates_then_finds():
+    routes = make_routes()
+    handler = routes["customer-management"]
+
+    assert post(handler, {"source": "chatbot"})[0] == 400
+    status, created = post(handler, {"phone": "+15550001111", "firstName": "Ana", "source": "chatbot"})
+    assert status == 201
+    assert created["customer"]["isNewAccount"] is True
+    assert created["customer"]["email"].endswith("@temp.local")
+
+    status, found = post(handler, {"phone": "+15550001111", "email": "ana@example.com", "source": "web"})
+    assert status == 200
+    assert found["customer"]["_internalId"] == created["customer"]["_internalId"]
+    assert found["customer"]["email"] == "ana@example.com"
+    assert found["customer"]["accountSources"] == ["chatbot", "web"]
+
+def test_find_nearest_contract():
+    handler = make_routes()["franchisee-inventory"]
+    path = "/functions/v1/franchisee-inventory/find-nearest"
+
+    assert handler(LocalRequest("GET", path))[0] == 400
+    status, body = handler(LocalRequest("GET", path, query={"zipCode": "92101"}))
+    assert status == 200
+    assert body["store"]["delivery"]["available"] is True
+    assert "92101" in body["serviceArea"]["zipCodes"]
+
+    status, body = handler(LocalRequest("GET", path, query={"zipCode": "10001"}))
+    assert status == 200
+    assert body["store"]["delivery"] == {"available": False}
+
+def test_order_create_and_lookup():
+    routes = make_routes()
+    customer = post(routes["customer-management"], {"phone": "+15550002222", "source": "chatbot"})[1]
+    product_id = ENGINE.rows[0]["product_data"]["product_info"]["product_identifier"]
+    order = routes["order"]
+    body = {
+        "customerPhone": "+15550002222",
+        "storeNumber": 257,
+        "items": [{"productId": product_id, "quantity": 2}],
+        "deliveryAddress": {"street": "1 Main St", "city": "San Diego", "state": "CA"},
+    }
+
+    assert post(order, {**body, "items": []})[0] == 400
+    assert post(order, {**body, "deliveryAddress": {"streetAddress": "1 Main St"}})[0] == 400
+    assert post(order, {**body, "items": [{"productId": "0001"}]})[0] == 400
+
+    status, created = post(order, body)
+    assert status == 200
+    number = created["order"]["orderNumber"]
+    assert number == "W25700000001-1"
+    assert created["order"]["items"][0]["quantity"] == 2
+
+    status, looked_up = order(LocalRequest("GET", "/functions/v1/order",
+                                           query={"customerId": customer["customer"]["id"]}))
+    assert status == 200
+    assert looked_up["order"]["orderNumber"] == number
+    assert post(order, {**body})[1]["order"]["orderNumber"] == "W25700000002-1"
+
+def test_local_stack_serves_embeddings_for_openai_client():
+    from openai import OpenAI
+    from edible_tools.local_edge import hashed_embedding
+    from edible_tools.local_services import local_stack
+
+    with local_stack() as server:
+        client = OpenAI(base_url=f"{server.url}/v1", api_key="local")
+        response = client.embeddings.create(input=["chocolate strawberries", "mom"],
+                                            model="text-embedding-ada-002")
+        search = requests.post(f"{server.url}/functions/v1/product-search",
+                               json={"occasion": "Birthday"}, timeout=10).json()
+
+    assert len(response.data) == 2
+    np.testing.assert_allclose(response.data[0].embedding,
+                               hashed_embedding("chocolate strawberries"), rtol=1e-6)
+    assert search["products"]
@@ -0,0 +1,117 @@
+# tests/test_order_items.py
+import uuid
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.edge_client import EdgeClient
+from edible_tools.local_edge import LocalEdgeServer, LocalRequest
+from edible_tools.local_services import LocalStore, ordering_routes
+from edible_tools.order_items import BulkOrderItems, legacy_round_trips, resolve_order_items
+from edible_tools.product_search import ProductSearchEngine
+
+ADDON_ID = str(uuid.uuid4())
+OPTION_ID = str(uuid.uuid4())
+
+
+def make_store():
+    rows = [
+        {
+            "product_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"product-{i}")),
+            "product_data": {
+                "product_info": {"product_identifier": str(3000 + i), "name": f"Bouquet {i}",
+                                 "base_price": f"{40 + i}.99"},
+                "options": [
+                    {"id": OPTION_ID if i == 0 else str(uuid.uuid4()), "option_name": "Large",
+                     "price": f"{60 + i}.99"},
+                    {"id": str(uuid.uuid4()), "option_name": "Small", "price": None},
+                ],
+                "addons": [{"id": ADDON_ID, "name": "Balloon", "price": "5.99"}] if i == 0 else [],
+            },
+        }
+        for i in range(5)
+    ]
+    return LocalStore(ProductSearchEngine(rows, {}, 8))
+
+def test_resolves_products_options_prices_and_addons():
+    store = make_store()
+    items = [
+        {"productId": "3000", "productOptionId": "large", "quantity": 2,
+         "addons": [{"addonId": ADDON_ID, "quantity": 3}, {"addonId": str(uuid.uuid4())}]},
+        {"productId": store.engine.rows[1]["product_id"], "quantity": 1},
+        {"productId": 3002, "productOptionId": "Small"},
+        {"productId": "3000", "productOptionId": OPTION_ID},
+    ]
+
+    result = resolve_order_items(store, items)
+
+    assert result["errors"] == []
+    first, second, third, fourth = result["items"]
+    assert (first["unit_price"], first["total_price"], first["product_name"]) == (60.99, 121.98, "Bouquet 0")
+    assert first["addons"] == [{"addon_id": ADDON_ID, "quantity": 3, "unit_price": 5.99}]
+    assert (second["unit_price"], second["product_option_id"]) == (41.99, None)
+    # An option without its own price keeps the base price
+    assert third["unit_price"] == 42.99 and third["product_option_id"] is not None
+    assert fourth["product_option_id"] == OPTION_ID
+    assert [item["index"] for item in result["items"]] == [0, 1, 2, 3]
+
+def test_reports_errors_per_item():
+    result = resolve_order_items(make_store(), [
+        {"productId": "9999"},
+        {"productId": "3001", "productOptionId": "Jumbo"},
+        {"productId": "3002"},
+    ])
+
+    assert [e["index"] for e in result["errors"]] == [0, 1]
+    assert result["errors"][0]["error"] == "Product 9999 not found or inactive"
+    assert result["errors"][1]["error"] == "Product option Jumbo not found for product 3001"
+    assert [item["index"] for item in result["items"]] == [2]
+
+def test_bad_quantities_and_long_ids_are_item_errors():
+    result = resolve_order_items(make_store(), [
+        {"productId": "3000", "quantity": "2.5"},
+        {"productId": "3001", "quantity": 0},
+        {"productId": "3000", "addons": [{"addonId": ADDON_ID, "quantity": -1}]},
+        {"productId": "3" * 25},
+        {"productId": "3002", "quantity": "3", "addons": [{"addonId": ADDON_ID, "quantity": ""}]},
+    ])
+
+    assert [e["index"] for e in result["errors"]] == [0, 1, 2, 3]
+    assert result["errors"][0]["error"] == "Invalid quantity 2.5 for product 3000"
+    assert result["errors"][2]["error"] == "Invalid quantity -1 for product 3000"
+    assert result["errors"][3]["error"] == f"Product {'3' * 25} not found or inactive"
+    (item,) = result["items"]
+    assert (item["index"], item["quantity"], item["addons"][0]["quantity"]) == (4, 3, 1)
+
+def test_one_round_trip_per_basket_over_http():
+    store = make_store()
+    basket = [{"productId": str(3000 + i % 5), "productOptionId": "Large", "quantity": 1,
+               "addons": [{"addonId": ADDON_ID}] if i % 5 == 0 else []} for i in range(12)]
+
+    with LocalEdgeServer(ordering_routes(store)) as server, EdgeClient(server.url) as client:
+        bulk = BulkOrderItems(client)
+        resolved = bulk.resolve(basket)
+        inserted = bulk.insert("order-1", resolved["items"])
+        trips = len(client.timings)
+
+    assert trips == 2
+    assert legacy_round_trips(basket) == 12 * 5 + 2 * 3
+    assert len(resolved["items"]) == 12 and not resolved["errors"]
+    assert len(inserted["order_item_ids"]) == 12 and inserted["addon_count"] == 3
+    assert [item["product_id"] for item in store.order_items["order-1"]] == \
+        [item["product_id"] for item in resolved["items"]]
+
+def test_order_stand_in_uses_the_resolver():
+    store = make_store()
+    handler = ordering_routes(store)["order"]
+    customer = store.create_customer({"phone": "+15550002222", "source": "test"})
+
+    def create(items):
+        return handler(LocalRequest("POST", "/functions/v1/order", body={
+            "customerId": customer["id"], "storeNumber": 257, "items": items}))
+
+    status, body = create([{"productId": "3000", "productOptionId": "Large", "quantity": 2}])
+    assert status == 200
+    assert body["order"]["items"] == [{"product": "Bouquet 0", "price": "$60.99", "quantity": 2}]
+    assert create([{"productId": "3000", "productOptionId": "Jumbo"}]) == (
+        400, {"error": "Product option Jumbo not found for product 3000"})
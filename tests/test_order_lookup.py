@@ -0,0 +1,45 @@
+# tests/test_order_lookup.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.order_lookup import (
+    MIGRATION, OrderNumberIndex, benchmark, legacy_matches, lookup_key, sample_lookups, synthetic_orders,
+)
+
+
+def test_lookup_key_matches_what_callers_say():
+    assert lookup_key(" w25710000001-1 ") == "W25710000001"
+    assert lookup_key("10000001") == "10000001"
+    assert lookup_key("%0001_") == "0001"
+    assert lookup_key(None) == "" and lookup_key("-1") == ""
+
+def test_index_finds_what_the_like_scan_finds():
+    orders = synthetic_orders(5000, stores=40)
+    index = OrderNumberIndex(orders)
+
+    for query in sample_lookups(orders, 60) + ["W999", "0000", "1"]:
+        assert sorted(index.find(query)) == sorted(legacy_matches(orders, query)), query
+    full = orders[0]["order_number"]
+    assert index.find(full) == [orders[0]["id"]]
+    assert index.find("") == []
+
+def test_index_add_keeps_lookups_sorted():
+    index = OrderNumberIndex()
+    for i, number in enumerate(["W25700000003-1", "W10000000003-1", "W25700000013-1"]):
+        index.add(number, f"o{i}")
+
+    assert sorted(index.find("0003")) == ["o0", "o1"]
+    assert index.find("W25700000013-1") == ["o2"]
+    assert len(index) == 3
+
+def test_benchmark_reports_parity_and_migration_uses_the_index():
+    result = benchmark(20000, lookups=30)
+
+    assert result["mismatches"] == 0
+    assert result["indexed"]["p50_ms"] < result["legacy"]["p50_ms"]
+    with open(MIGRATION) as f:
+        sql = f.read()
+    assert "text_pattern_ops" in sql and "find_orders_by_number" in sql
+    # ~<~ and || share a precedence level: the bound must be parenthesized to stay boolean
+    assert "~<~ (reverse(order_lookup_key(p_order_number)) || chr(127))" in sql
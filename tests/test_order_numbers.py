@@ -0,0 +1,73 @@
+# tests/test_order_numbers.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from edible_tools.edge_client import EdgeClient
+from edible_tools.local_edge import LocalEdgeServer
+from edible_tools.local_services import LocalStore, ordering_routes
+from edible_tools.order_numbers import (
+    BlockAllocator,
+    LegacyScanAllocator,
+    RpcSequenceSource,
+    SequenceAllocator,
+    burst,
+    format_order_number,
+    parse_order_number,
+)
+from edible_tools.product_search import ProductSearchEngine
+
+
+def test_format_and_parse():
+    assert format_order_number(257, 1) == "W25700000001-1"
+    assert parse_order_number("W25700000042-1") == (257, 42)
+    assert parse_order_number("ORD-1") is None
+    with pytest.raises(ValueError):
+        format_order_number(257, 100_000_000)
+
+def test_allocator_is_per_store_and_continues_from_seed():
+    allocator = SequenceAllocator({257: 120})
+
+    assert allocator.allocate(257, 5) == (120, 124)
+    assert allocator.next_order_number(257) == "W25700000125-1"
+    assert allocator.allocate(101) == (1, 1)
+
+def test_burst_is_unique_with_and_without_blocks():
+    plain = burst(SequenceAllocator(), orders=2_000, workers=16)
+    blocks = BlockAllocator(SequenceAllocator(), block_size=25)
+    blocked = burst(blocks, orders=2_000, workers=16)
+
+    for result in (plain, blocked):
+        assert result["duplicates"] == 0 and result["unique"] == 2_000
+    assert blocks.reservations == 80
+
+def test_blocks_leave_gaps_but_never_reuse():
+    source = SequenceAllocator()
+    first_process = BlockAllocator(source, block_size=10)
+    used = [first_process.allocate(257)[0] for _ in range(3)]
+    # A restarted process reserves a fresh block; 4..10 are never handed out
+    second_process = BlockAllocator(source, block_size=10)
+
+    assert used == [1, 2, 3]
+    assert second_process.allocate(257) == (11, 11)
+
+def test_legacy_scan_hands_out_duplicates_under_a_burst():
+    result = burst(LegacyScanAllocator(think_time=0.002), orders=64, workers=8)
+
+    assert result["duplicates"] > 0
+
+def test_rpc_allocation_over_http():
+    store = LocalStore(ProductSearchEngine([], {}, 8))
+    with LocalEdgeServer(ordering_routes(store)) as server, EdgeClient(server.url, pool_size=8) as client:
+        allocator = BlockAllocator(RpcSequenceSource(client), block_size=10)
+        result = burst(allocator, orders=200, workers=8)
+        assert client.rpc("allocate_order_numbers", {"p_store_number": 257, "p_count": 0}).status_code == 400
+        for bad in ({}, {"p_store_number": "W257"}, {"p_store_number": None}):
+            response = client.rpc("allocate_order_numbers", bad)
+            assert response.status_code == 400 and "p_store_number" in response.json()["message"]
+
+    assert result["duplicates"] == 0 and result["unique"] == 200
+    # Orders placed through the stand-in continue after the reserved blocks
+    assert store.next_order_number(next(iter(store.franchisees))) == "W25700000201-1"
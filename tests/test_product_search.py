@@ -0,0 +1,174 @@
+# tests/test_product_search.py
+import numpy as np
+import pytest
+import requests
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.product_search import (
+    ProductSearchEngine,
+    category_variations,
+    streamline_product,
+)
+from edible_tools.local_edge import LocalEdgeServer, product_search_handler
+
+DIMENSIONS = 8
+
+
+def _row(i, name, price, categories=(), ingredients=(), description=None):
+    return {
+        "product_id": f"uuid-{i}",
+        "product_data": {
+            "product_info": {
+                "product_identifier": str(3000 + i),
+                "name": name,
+                "description": description or f"{name} description",
+                "base_price": f"{price:.2f}",
+            },
+            "categories": [{"name": c, "type": "occasion"} for c in categories],
+            "ingredients": list(ingredients),
+            "options": [],
+            "addons": [],
+        },
+    }
+
+
+def _catalog(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    occasions = ["Birthday", "Mother's Day", "Anniversary"]
+    rows = [
+        _row(
+            i,
+            f"Arrangement {i}",
+            price=20 + (i * 7) % 150,
+            categories=[occasions[i % 3]],
+            ingredients=["strawberry", "chocolate"] + (["nuts"] if i % 4 == 0 else []),
+        )
+        for i in range(n)
+    ]
+    vectors = rng.standard_normal((n, DIMENSIONS)).astype(np.float32)
+    return rows, {row["product_id"]: vectors[i] for i, row in enumerate(rows)}, vectors
+
+
+def _engine(rows, embeddings, query_vector):
+    return ProductSearchEngine(
+        rows, embeddings, dimensions=DIMENSIONS, embed_query=lambda text: query_vector
+    )
+
+
+def _brute_force(rows, vectors, query, mask, threshold, k):
+    scored = []
+    for i, row in enumerate(rows):
+        if not mask[i]:
+            continue
+        a, b = vectors[i], query
+        similarity = float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+        if similarity >= threshold:
+            scored.append((similarity, row["product_id"]))
+    scored.sort(reverse=True)
+    return [pid for _, pid in scored[:k]]
+
+
+def test_top_k_matches_brute_force_over_whole_catalog():
+    rows, embeddings, vectors = _catalog(n=200)
+    query = vectors[150] + 0.1  # best match lives far past the first 50 rows
+    engine = _engine(rows, embeddings, query)
+
+    products, scores = engine.semantic_search({"query": "x", "semanticThreshold": 0.1}, 10)
+
+    expected = _brute_force(rows, vectors, query, np.ones(len(rows), bool), 0.1, 10)
+    assert [p["product_id"] for p in products] == expected
+    assert products[0]["product_id"] == "uuid-150"
+    assert scores == sorted(scores, reverse=True)
+
+def test_semantic_search_applies_threshold_and_filters():
+    rows, embeddings, vectors = _catalog()
+    query = vectors[3]
+    engine = _engine(rows, embeddings, query)
+    search = {"query": "x", "occasion": "Mothers Day", "maxPrice": 100, "semanticThreshold": 0.2}
+
+    products, scores = engine.semantic_search(search, 5)
+
+    assert products
+    for product, score in zip(products, scores):
+        info = product["product_data"]["product_info"]
+        assert float(info["base_price"]) <= 100
+        assert product["product_data"]["categories"][0]["name"] == "Mother's Day"
+        assert score >= 0.2
+
+def test_default_threshold_is_point_seven():
+    rows, embeddings, vectors = _catalog()
+    engine = _engine(rows, embeddings, -vectors[0])
+    products, _ = engine.semantic_search({"query": "opposite"}, 10)
+    assert "uuid-0" not in [p["product_id"] for p in products]
+
+def test_category_variations_match_edge_function():
+    assert "Mother's Day" in category_variations("Mothers Day")
+    # Same quirk as the edge function: lowercase input only gets "Mother's day"
+    assert "Mother's Day" not in category_variations("mothers day")
+    assert "Father's day" in category_variations("fathers day")
+    assert "birthday" in category_variations("Birthday")
+
+def test_search_direct_id_lookup():
+    rows, embeddings, vectors = _catalog()
+    result = _engine(rows, embeddings, vectors[0]).search({"productId": "3005"})
+
+    assert result["searchMethod"] == "direct_id"
+    assert result["count"] == 1
+    assert result["products"][0]["productId"] == "3005"
+    assert result["products"][0]["price"].startswith("$")
+
+def test_search_semantic_boost_filters_allergens():
+    rows, embeddings, vectors = _catalog()
+    result = _engine(rows, embeddings, vectors[4]).search({
+        "query": "something with chocolate",
+        "allergens": ["nuts"],
+        "semanticBoost": True,
+        "semanticThreshold": 0.1,
+    })
+
+    assert result["semanticSearchUsed"] is True
+    assert result["searchMethod"] == "semantic_boost_allergy_filtered"
+    assert all("nuts" not in p["allergens"] for p in result["products"])
+    assert all(0 < p["semanticScore"] <= 1 for p in result["products"])
+
+def test_search_structured_sorted_by_price():
+    rows, embeddings, vectors = _catalog()
+    result = _engine(rows, embeddings, vectors[0]).search({"query": "arrangement", "maxPrice": 80})
+
+    prices = [float(p["price"][1:]) for p in result["products"]]
+    assert result["searchMethod"] == "structured"
+    assert prices == sorted(prices)
+    assert all(price <= 80 for price in prices)
+
+def test_streamline_product_truncates_description():
+    row = _row(1, "Long One", 10, description="x" * 150)
+    assert streamline_product(row)["description"] == "x" * 97 + "..."
+
+
+@pytest.fixture
+def local_search_server():
+    rows, embeddings, vectors = _catalog()
+    engine = _engine(rows, embeddings, vectors[7])
+    with LocalEdgeServer({"product-search": product_search_handler(engine)}) as server:
+        yield server
+
+def test_local_server_serves_product_search(local_search_server):
+    url = f"{local_search_server.url}/functions/v1/product-search"
+
+    response = requests.post(url, json={"productId": "3007"}, timeout=5)
+    assert response.status_code == 200
+    assert response.json()["products"][0]["productId"] == "3007"
+
+    response = requests.get(url, params={"query": "chocolate", "semanticBoost": "true",
+                                         "semanticThreshold": "0.3"}, timeout=5)
+    assert response.status_code == 200
+    assert response.json()["semanticSearchUsed"] is True
+
+    response = requests.post(url, json={}, timeout=5)
+    assert response.status_code == 200
+
+def test_local_server_unknown_function(local_search_server):
+    response = requests.post(f"{local_search_server.url}/functions/v1/nope", json={}, timeout=5)
+    assert response.status_code == 404
@@ -0,0 +1,111 @@
+# tests/test_query_cache.py
+import numpy as np
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.query_cache import QueryEmbeddingCache, load_query_log, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return np.full(4, len(text), dtype=np.float32)
+
+    def many(self, texts):
+        self.calls.append(list(texts))
+        return [np.full(4, len(t), dtype=np.float32) for t in texts]
+
+
+def test_normalize_query():
+    assert normalize_query("  Chocolate   Strawberries for Birthday? ") == \
+        "chocolate strawberries for birthday"
+    assert normalize_query("¿Something for MOM!") == "something for mom"
+
+def test_repeated_phrases_hit_the_cache():
+    embed = CountingEmbedder()
+    cache = QueryEmbeddingCache(embed, model="m")
+
+    first = cache("Something for mom")
+    second = cache("something for MOM.")
+
+    # The normalized text is embedded, so the entry is the one warm_up would store
+    assert embed.calls == ["something for mom"]
+    assert second is first
+    assert cache.stats()["hits"] == 1
+    warmed = QueryEmbeddingCache(embed, model="m", embed_many=embed.many)
+    warmed.warm_up(["Something for mom!!"])
+    np.testing.assert_array_equal(warmed.get("something for mom"), first)
+    assert cache.stats()["misses"] == 1
+
+def test_model_is_part_of_the_key():
+    embed = CountingEmbedder()
+    assert QueryEmbeddingCache(embed, model="a").key("roses") == ("a", "roses")
+    assert QueryEmbeddingCache(embed, model="b").key("Roses ") == ("b", "roses")
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    embed = CountingEmbedder()
+    cache = QueryEmbeddingCache(embed, model="m", ttl_seconds=60, clock=clock)
+
+    cache("roses")
+    clock.now = 59
+    cache("roses")
+    clock.now = 120
+    cache("roses")
+
+    assert len(embed.calls) == 2
+    assert cache.stats()["expired"] == 1
+
+def test_lru_eviction():
+    embed = CountingEmbedder()
+    cache = QueryEmbeddingCache(embed, model="m", max_entries=2)
+
+    cache("a")
+    cache("b")
+    cache("a")  # refresh "a"
+    cache("c")  # evicts "b"
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.stats()["evicted"] == 1
+
+def test_failed_embeddings_are_not_cached():
+    calls = []
+    cache = QueryEmbeddingCache(lambda text: calls.append(text), model="m")
+    assert cache("roses") is None
+    assert cache("roses") is None
+    assert len(calls) == 2
+
+def test_warm_up_embeds_most_popular_queries_in_one_batch(tmp_path):
+    log = tmp_path / "queries.txt"
+    log.write_text(
+        "something for mom\n"
+        '{"query": "Something for Mom"}\n'
+        "birthday berries\n"
+        '{"query": "birthday berries"}\n'
+        "{broken json\n"
+        "birthday berries\n"
+        "one-off query\n"
+    )
+    embed = CountingEmbedder()
+    cache = QueryEmbeddingCache(embed, model="m", embed_many=embed.many)
+
+    added = cache.warm_up(load_query_log(str(log)), limit=2)
+
+    assert added == 2
+    assert embed.calls == [["birthday berries", "something for mom"]]
+    cache("Birthday berries!")
+    assert len(embed.calls) == 1
+    assert cache.warm_up(["birthday berries"]) == 0
@@ -0,0 +1,137 @@
+# tests/test_rate_limit.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from edible_tools.edge_client import EdgeClient
+from edible_tools.local_edge import LocalEdgeServer
+from edible_tools.local_services import LocalStore, ordering_routes
+from edible_tools.product_search import ProductSearchEngine
+from edible_tools.rate_limit import (
+    LegacyTableLimiter,
+    RpcUsageSink,
+    SlidingWindowLimiter,
+    UsageSync,
+    burst,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_750_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_window_slides_and_reports_retry_after():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter({"order": (3, 60)}, clock=clock)
+
+    for _ in range(3):
+        assert limiter.check("caller", "order") == 0
+        clock.now += 10
+    assert limiter.check("caller", "order") == pytest.approx(30)
+    assert limiter.allow("someone-else", "order")
+    assert limiter.allow("caller", "unlimited-endpoint")
+
+    clock.now += 30  # the first request leaves the window
+    assert limiter.allow("caller", "order")
+    assert not limiter.allow("caller", "order")
+
+def test_never_more_than_the_limit_in_any_window():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter({"order": (5, 60)}, clock=clock)
+    admitted = []
+    for _ in range(600):  # one request every 1.7s for ~17 minutes
+        clock.now += 1.7
+        if limiter.allow("caller", "order"):
+            admitted.append(clock.now)
+
+    assert max(sum(1 for t in admitted if start <= t < start + 60) for start in admitted) == 5
+    # And no request is refused while there is room: 5 per 60s
+    assert len(admitted) == pytest.approx(600 * 1.7 / 60 * 5, abs=5)
+
+def test_concurrent_burst_admits_exactly_the_limit():
+    exact = burst(SlidingWindowLimiter(), endpoint="order", requests=400, workers=16)
+    legacy = burst(LegacyTableLimiter(round_trip=0.001), endpoint="order", requests=64, workers=16)
+
+    assert (exact["admitted"], exact["overshoot"]) == (20, 0)
+    assert legacy["overshoot"] > 0
+
+def test_drain_returns_usage_rows_and_forgets_idle_callers():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter({"order": (20, 60)}, clock=clock)
+    for _ in range(3):
+        limiter.check("a", "order")
+    limiter.check("b", "order")
+
+    rows = sorted(limiter.drain(), key=lambda row: row["identifier"])
+    assert [(r["identifier"], r["endpoint"], r["request_count"]) for r in rows] == [
+        ("a", "order", 3), ("b", "order", 1)]
+    assert rows[0]["window_start"].startswith("2025-06-15T")
+    assert limiter.drain() == [] and len(limiter) == 2
+
+    clock.now += 61
+    limiter.drain()
+    assert len(limiter) == 0
+
+def test_usage_sync_batches_and_retries_failed_flushes():
+    limiter = SlidingWindowLimiter({"order": (20, 60)})
+    batches, failing = [], [True]
+
+    def sink(rows):
+        if failing[0]:
+            raise ConnectionError("database unavailable")
+        batches.append(rows)
+
+    sync = UsageSync(limiter, sink, batch_size=4)
+    for i in range(10):
+        limiter.check(f"caller-{i}", "order")
+    assert sync.flush() == 0 and sync.failures == 1
+
+    failing[0] = False
+    limiter.check("caller-10", "order")
+    assert sync.flush() == 11
+    assert [len(batch) for batch in batches] == [4, 4, 3]
+
+def test_stand_in_limits_callers_and_records_usage_over_http():
+    store = LocalStore(ProductSearchEngine([], {}, 8))
+    limiter = SlidingWindowLimiter()
+    headers = {"x-forwarded-for": "203.0.113.9, 10.0.0.1"}
+
+    with LocalEdgeServer(ordering_routes(store, limiter)) as server, EdgeClient(server.url, retries=0) as client:
+        statuses = [client.get_function("order", {"orderNumber": "W25700000001-1"}, headers=headers).status_code
+                    for _ in range(22)]
+        limited = client.get_function("order", {"orderNumber": "W25700000001-1"}, headers=headers).json()
+        other = client.get_function("order", {"orderNumber": "W25700000001-1"}).status_code
+        with UsageSync(limiter, RpcUsageSink(client), interval=60):
+            pass
+
+    assert statuses == [404] * 20 + [429] * 2
+    assert limited["error"] == "Rate limit exceeded" and 0 < limited["retryAfter"] <= 60
+    assert other == 404
+    assert sorted((r["identifier"], r["request_count"]) for r in store.rate_limit_rows.values()) == [
+        ("203.0.113.9", 20), ("unknown", 1)]
+def test_stand_in_keeps_one_usage_row_per_caller():
+    store = LocalStore(ProductSearchEngine([], {}, 8))
+    limiter = SlidingWindowLimiter(clock=lambda: 1_000.0)
+    sync = UsageSync(limiter, store.record_rate_limits)
+    for _ in range(3):
+        limiter.check("caller-1", "order")
+    assert sync.flush() == 1
+    limiter.check("caller-1", "order")
+    limiter.check("caller-2", "order")
+    assert sync.flush() == 2
+
+    rows = sorted((r["identifier"], r["request_count"]) for r in store.rate_limit_rows.values())
+    assert rows == [("caller-1", 4), ("caller-2", 1)]
+    assert sync.failures == 0 and sync.dropped == 0
+    # Duplicates within one batch merge; an expired window starts over
+    store.record_rate_limits([
+        {"identifier": "caller-2", "endpoint": "order", "request_count": 2, "window_start": "2030-01-01T00:00:00+00:00"},
+        {"identifier": "caller-2", "endpoint": "order", "request_count": 3, "window_start": "2030-01-01T00:00:10+00:00"},
+    ])
+    assert store.rate_limit_rows[("caller-2", "order")]["request_count"] == 5
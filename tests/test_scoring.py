@@ -0,0 +1,85 @@
+# tests/test_scoring.py
+import numpy as np
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.product_search import ProductSearchEngine
+from edible_tools.scoring import VectorScorer, cosine_similarity, quantization_report
+
+DIMENSIONS = 48
+
+
+def _matrix(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    # Unnormalised, with varied lengths, like raw vectors from the database
+    return (rng.standard_normal((n, DIMENSIONS)) * rng.uniform(0.5, 3, (n, 1))).astype(np.float32)
+
+
+def test_scores_match_reference_cosine():
+    matrix = _matrix(50)
+    query = np.random.default_rng(1).standard_normal(DIMENSIONS)
+    scorer = VectorScorer(matrix)
+
+    expected = [cosine_similarity(query.tolist(), row.tolist()) for row in matrix]
+    np.testing.assert_allclose(scorer.score(query), expected, atol=1e-5)
+    np.testing.assert_allclose(scorer.score(query, np.array([3, 7])), [expected[3], expected[7]], atol=1e-5)
+
+def test_top_k_ranking_matches_reference():
+    matrix = _matrix()
+    query = matrix[11] + 0.5
+    scorer = VectorScorer(matrix)
+    scores = [cosine_similarity(query.tolist(), row.tolist()) for row in matrix]
+    expected = sorted((i for i in range(len(matrix)) if scores[i] >= 0.2), key=lambda i: -scores[i])[:10]
+
+    indices, top_scores = scorer.top_k(query, 10, threshold=0.2)
+
+    assert indices.tolist() == expected
+    assert list(top_scores) == sorted(top_scores, reverse=True)
+
+def test_batch_matches_single_queries():
+    matrix = _matrix()
+    queries = _matrix(8, seed=2)
+    scorer = VectorScorer(matrix)
+
+    batch = scorer.score_many(queries)
+    indices, _ = scorer.top_k_many(queries, 5)
+
+    for i, query in enumerate(queries):
+        np.testing.assert_allclose(batch[i], scorer.score(query), atol=1e-6)
+        assert indices[i].tolist() == scorer.top_k(query, 5)[0].tolist()
+
+def test_zero_and_invalid_rows_never_rank():
+    matrix = _matrix(20)
+    matrix[3] = 0
+    matrix[5, 0] = np.nan
+    scorer = VectorScorer(matrix)
+
+    assert not scorer.valid[3] and not scorer.valid[5]
+    indices, _ = scorer.top_k_many(matrix[:1], 20)
+    assert {3, 5}.isdisjoint(indices[0, :18].tolist())
+    assert np.all(scorer.score(np.zeros(DIMENSIONS)) == 0)
+
+def test_int8_mode_is_close_and_smaller():
+    matrix = _matrix(2000)
+    queries = matrix[:50] + np.random.default_rng(3).standard_normal((50, DIMENSIONS)).astype(np.float32)
+
+    report = quantization_report(matrix, queries, k=10)
+
+    assert report["max_abs_error"] < 0.02
+    assert report["recall_at_k"] >= 0.95
+    assert report["int8_bytes"] < report["float32_bytes"] / 3
+    with pytest.raises(ValueError):
+        VectorScorer(matrix, quantize="int4")
+
+def test_engine_uses_quantized_scorer():
+    matrix = _matrix(30)
+    rows = [{"product_id": f"p{i}", "product_data": {"product_info": {"product_identifier": str(1000 + i)}}}
+            for i in range(30)]
+    embeddings = {f"p{i}": matrix[i] for i in range(30)}
+    exact = ProductSearchEngine(rows, embeddings, DIMENSIONS)
+    quantized = ProductSearchEngine(rows, embeddings, DIMENSIONS, quantize="int8")
+
+    assert quantized.matrix is None
+    assert quantized.top_k(matrix[4], 3, 0.0)[0][0] == exact.top_k(matrix[4], 3, 0.0)[0][0] == 4
@@ -0,0 +1,71 @@
+# tests/test_search_benchmark.py
+import json
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.search_benchmark import (
+    LevelResult,
+    compare_reports,
+    local_target,
+    main,
+    run_benchmark,
+    run_level,
+    search_client,
+)
+
+
+def test_level_summary_percentiles():
+    result = LevelResult("x", latencies_ms=[float(i) for i in range(1, 101)], errors=2,
+                         elapsed_seconds=2.0)
+    summary = result.summary()
+
+    assert summary["requests"] == 102
+    assert summary["p50_ms"] == 50.5
+    assert summary["p99_ms"] == 99.01
+    assert summary["throughput_rps"] == 50.0
+
+def test_run_level_warms_up_and_counts_errors():
+    sent = []
+
+    def send(payload):
+        sent.append(payload["n"])
+        return payload["n"] != 1
+
+    result = run_level("x", [{"n": 0}, {"n": 1}], send, iterations=6, warmup=3)
+
+    assert len(sent) == 9
+    assert result.errors == 3
+    assert len(result.latencies_ms) == 3
+
+def test_compare_reports_flags_slower_percentiles_and_new_errors():
+    baseline = {"levels": {"semantic": {"p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0, "errors": 0}}}
+    current = {"levels": {"semantic": {"p50_ms": 11.0, "p95_ms": 30.0, "p99_ms": 30.0, "errors": 1}}}
+
+    problems = compare_reports(baseline, current, max_regression=0.2)
+
+    assert len(problems) == 2
+    assert problems[0].startswith("semantic p95_ms")
+    assert "errors" in problems[1]
+
+def test_benchmark_runs_against_local_stand_in():
+    with local_target() as url:
+        report = run_benchmark(search_client(url), "local", iterations=6, warmup=1, concurrency=2)
+
+    assert set(report["levels"]) == {"direct_id", "structured", "semantic"}
+    for stats in report["levels"].values():
+        assert stats["errors"] == 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+
+def test_cli_writes_json_and_compares(tmp_path):
+    out = tmp_path / "bench.json"
+    assert main(["--iterations", "3", "--warmup", "0", "--level", "direct_id", "--out", str(out)]) == 0
+
+    report = json.loads(out.read_text())
+    assert list(report["levels"]) == ["direct_id"]
+
+    report["levels"]["direct_id"] = {k: (v / 1000 if k.endswith("_ms") else v)
+                                     for k, v in report["levels"]["direct_id"].items()}
+    out.write_text(json.dumps(report))
+    assert main(["--iterations", "3", "--warmup", "0", "--level", "direct_id",
+                 "--compare", str(out)]) == 1
@@ -2,7 +2,6 @@
 
 import os
 import json
-import requests
 import pytest
 from dotenv import load_dotenv
 from supabase import create_client
@@ -14,20 +13,23 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from edible_tools.edge_client import shared_client
+
 if not all([SUPABASE_URL, SUPABASE_SERVICE_KEY, OPENAI_API_KEY]):
-    print("❌ Missing environment variables. Please check .env.local")
-    exit(1)
+    # No credentials: run against the offline stand-in over samples/
+    from edible_tools.local_services import start_local_stack
+
+    SUPABASE_URL = start_local_stack().url
+    SUPABASE_SERVICE_KEY = "local"
+    print(f"🧭 Missing .env.local credentials, using the local stand-in at {SUPABASE_URL}")
 
 def make_search_request(search_data, timeout=30):
-    """Helper function to make search requests"""
-    url = f"{SUPABASE_URL}/functions/v1/product-search"
-    headers = {
-        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    response = requests.post(url, headers=headers, json=search_data, timeout=timeout)
-    return response
+    """Helper function to make search requests over the shared keep-alive client"""
+    client = shared_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    # Searches are read-only, so transient failures are safe to retry
+    return client.post_function("product-search", search_data, timeout=timeout, retry=True)
 
 class TestSemanticProductSearch:
     
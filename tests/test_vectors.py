@@ -0,0 +1,118 @@
+# tests/test_vectors.py
+import base64
+import struct
+import numpy as np
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.vectors import (
+    as_vector,
+    decode_base64,
+    encode_base64,
+    load_matrix,
+    parse_pgvector,
+    save_matrix,
+    to_matrix,
+    valid_rows,
+)
+import backfill_embeddings
+from backfill_embeddings import get_embeddings_from_openai, EMBEDDING_DIMENSIONS
+
+
+def test_encode_base64_is_big_endian_float32():
+    # Same bytes Postgres' float4send() produces, so the SQL side can decode it
+    encoded = encode_base64([1.0, -2.5])
+    assert base64.b64decode(encoded) == struct.pack(">ff", 1.0, -2.5)
+
+def test_base64_round_trip():
+    vector = np.random.default_rng(0).standard_normal(EMBEDDING_DIMENSIONS).astype(np.float32)
+    decoded = decode_base64(encode_base64(vector), EMBEDDING_DIMENSIONS)
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, vector)
+
+def test_base64_is_much_smaller_than_json():
+    vector = np.random.default_rng(1).standard_normal(EMBEDDING_DIMENSIONS).astype(np.float32)
+    json_size = len(str(vector.astype(float).tolist()))
+    assert len(encode_base64(vector)) < json_size / 3
+
+def test_decode_base64_rejects_wrong_dimensions():
+    with pytest.raises(ValueError):
+        decode_base64(encode_base64([0.1, 0.2]), EMBEDDING_DIMENSIONS)
+
+def test_as_vector_validates_shape_and_values():
+    assert as_vector([0.1] * 4, 4).dtype == np.float32
+    assert as_vector([0.1] * 3, 4) is None
+    assert as_vector([0.1, float("nan")], 2) is None
+    assert as_vector([[0.1, 0.2]], 2) is None
+
+def test_parse_pgvector_literal():
+    vector = parse_pgvector("[0.5,-1,2.25]", 3)
+    assert vector.tolist() == [0.5, -1.0, 2.25]
+    assert parse_pgvector(None) is None
+
+def test_to_matrix_and_valid_rows():
+    matrix = to_matrix([[1.0, 0.0], [0.0, 0.0], [np.inf, 1.0]], 2)
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert valid_rows(matrix, 2).tolist() == [True, False, False]
+    with pytest.raises(ValueError):
+        to_matrix([[1.0, 0.0, 0.0]], 2)
+
+def test_save_and_load_matrix_memory_mapped(tmp_path):
+    matrix = np.arange(12, dtype=np.float32).reshape(3, 4)
+    save_matrix(str(tmp_path / "embeddings"), ["a", "b", "c"], matrix)
+
+    ids, loaded = load_matrix(str(tmp_path / "embeddings"))
+    assert ids == ["a", "b", "c"]
+    assert isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, matrix)
+
+
+def test_get_embeddings_from_openai_returns_contiguous_float32_rows():
+    with patch('backfill_embeddings.openai_api_client') as client:
+        def create(input, model):
+            items = []
+            for i, _ in enumerate(input):
+                item = MagicMock()
+                item.index = i
+                item.embedding = [float(i)] * EMBEDDING_DIMENSIONS
+                items.append(item)
+            return MagicMock(data=items)
+        client.embeddings.create.side_effect = create
+
+        embeddings = get_embeddings_from_openai(["a", "", "b"])
+
+    assert embeddings[1] is None
+    assert embeddings[0].dtype == np.float32
+    # Both rows live in one shared buffer
+    assert embeddings[0].base is embeddings[2].base
+    assert embeddings[2][0] == 1.0
+
+def test_fetch_product_embeddings_pages_by_id():
+    rng = np.random.default_rng(2)
+    stored = rng.standard_normal((5, EMBEDDING_DIMENSIONS)).astype(np.float32)
+    ids = [f"00000000-0000-0000-0000-00000000000{i}" for i in range(5)]
+    calls = []
+
+    def rpc(name, params):
+        calls.append(params)
+        after = params['p_after']
+        start = 0 if after is None else ids.index(after) + 1
+        rows = [
+            {"product_id": ids[i], "embedding_b64": encode_base64(stored[i])}
+            for i in range(start, min(start + params['p_limit'], len(ids)))
+        ]
+        return MagicMock(execute=MagicMock(return_value=MagicMock(data=rows)))
+
+    client = MagicMock()
+    client.rpc.side_effect = rpc
+    with patch.object(backfill_embeddings, 'supabase_client', client):
+        fetched_ids, matrix = backfill_embeddings.fetch_product_embeddings(page_size=2)
+
+    assert fetched_ids == ids
+    assert matrix.shape == (5, EMBEDDING_DIMENSIONS)
+    assert np.array_equal(matrix, stored)
+    assert [c['p_after'] for c in calls] == [None, ids[1], ids[3]]
@@ -0,0 +1,88 @@
+# tests/test_zip_index.py
+import numpy as np
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from edible_tools.local_services import LocalStore, find_nearest_handler
+from edible_tools.local_edge import LocalRequest
+from edible_tools.product_search import ProductSearchEngine
+from edible_tools.zip_index import (
+    KDTree,
+    ZipIndex,
+    benchmark,
+    chord_to_miles,
+    load_centroids,
+    normalize_zip,
+    synthetic_zones,
+    unit_vectors,
+)
+
+CENTROIDS = {
+    "92101": (32.72, -117.16),  # San Diego
+    "92037": (32.84, -117.27),  # La Jolla, unserved
+    "90012": (34.06, -118.24),  # Los Angeles
+    "93101": (34.42, -119.70),  # Santa Barbara, unserved
+}
+
+
+def test_normalize_zip():
+    assert normalize_zip("92101") == normalize_zip("92101-1234") == normalize_zip(92101) == 92101
+    assert normalize_zip(501) == 501
+    assert normalize_zip("9210") is None and normalize_zip("") is None and normalize_zip(None) is None
+
+def test_lookup_matches_scan_and_first_zone_wins():
+    zones, _ = synthetic_zones(zips=2_000, zones=150, seed=3)
+    zones.append({"franchisee_id": "late", "zip_codes": zones[0]["zip_codes"][:2]})
+    index = ZipIndex(zones)
+
+    assert index.duplicates == 2
+    for zip_code in ["00501", zones[0]["zip_codes"][0], zones[77]["zip_codes"][-1], "99999"]:
+        expected = next((zone for zone in zones if zip_code in zone["zip_codes"]), None)
+        assert index.zone_for_zip(zip_code) is expected
+
+def test_kd_tree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points = unit_vectors(rng.uniform(25, 49, 2_000), rng.uniform(-124, -67, 2_000))
+    tree = KDTree(points)
+
+    for query in unit_vectors(rng.uniform(25, 49, 50), rng.uniform(-124, -67, 50)):
+        brute = np.sqrt(((points - query) ** 2).sum(axis=1))
+        indices, distances = tree.query(query, k=3)
+        assert indices.tolist() == np.argsort(brute)[:3].tolist()
+        np.testing.assert_allclose(distances, np.sort(brute)[:3])
+    assert KDTree(np.empty((0, 3))).query(points[0])[0].size == 0
+
+def test_great_circle_miles():
+    san_diego, los_angeles = unit_vectors(*np.array([CENTROIDS["92101"], CENTROIDS["90012"]]).T)
+    assert 105 < chord_to_miles(np.linalg.norm(san_diego - los_angeles)) < 115
+
+def test_unserved_zip_falls_back_to_nearest_store(tmp_path):
+    path = tmp_path / "zcta.txt"
+    path.write_text("GEOID\tALAND\tINTPTLAT\tINTPTLONG\n" + "".join(
+        f"{z}\t0\t{lat}\t{lon}\n" for z, (lat, lon) in CENTROIDS.items()))
+    store = LocalStore(ProductSearchEngine([], {}, 8), centroids=load_centroids(str(path)))
+    handle = find_nearest_handler(store)
+
+    def find(zip_code):
+        request = LocalRequest("GET", "/functions/v1/franchisee-inventory/find-nearest",
+                               query={"zipCode": zip_code})
+        return handle(request)[1]["store"]
+
+    assert find("92101")["delivery"]["available"] is True
+    la_jolla, santa_barbara = find("92037"), find("93101")
+    assert not la_jolla["delivery"]["available"] and "San Diego" in la_jolla["name"]
+    assert not santa_barbara["delivery"]["available"] and "Los Angeles" in santa_barbara["name"]
+    assert store.zip_index.find("93101")["distance_miles"] > 80
+
+def test_benchmark_runs():
+    result = benchmark(zips=3_000, zones=200, queries=200)
+
+    assert result["served_zips"] == 2_400 and result["stores_in_tree"] == 200
+    assert result["lookup_us"] < result["scan_lookup_us"]
+
+def test_tree_beats_brute_force_at_benchmark_size():
+    result = benchmark(zips=40_000, zones=3_000, queries=1_000)
+
+    assert result["tree_query_us"] < result["brute_force_query_us"]
+    assert result["nearest_us"] < result["brute_force_nearest_us"]